@@ -1,9 +1,25 @@
 import os
+import time
 import uuid
-import logging
 from flask import Flask, render_template
-from flask import abort, request, g, has_request_context
+from flask import abort, request, g
+from app.cli import install_cli
+from app.compression import install_response_compression
 from app.config import Config
+from app.metrics import flush_snapshot, record_request
+from app.profiling import install_request_profiler
+from app.query_instrumentation import (
+    check_query_budget,
+    current_query_stats,
+    install_engine_listeners,
+    report_repeated_statements,
+    server_timing_header,
+    start_request_query_stats,
+)
+from app.slow_query_log import install_slow_query_log
+from app.static_assets import install_static_assets
+from app.structured_logging import install_logging_pipeline, request_log_sample_rate, should_log_request
+from app.template_cache import install_template_cache
 from flask_sqlalchemy import SQLAlchemy
 from flask_caching import Cache
 from flask_bcrypt import Bcrypt
@@ -22,32 +38,7 @@ for path_key in ("UPLOAD_ROOT", "UPLOAD_PATH_IMAGE", "UPLOAD_PATH_PDF", "PDF_CAC
     os.makedirs(app.config[path_key], exist_ok=True)
 
 
-class _RequestIdLogFilter(logging.Filter):
-    def filter(self, record):
-        record.request_id = getattr(g, "request_id", "-") if has_request_context() else "-"
-        return True
-
-
-def _configure_logging(flask_app):
-    level_name = str(flask_app.config.get("LOG_LEVEL", "INFO")).upper()
-    level = getattr(logging, level_name, logging.INFO)
-    formatter = logging.Formatter(
-        "%(asctime)s %(levelname)s %(name)s request_id=%(request_id)s %(message)s"
-    )
-    request_id_filter = _RequestIdLogFilter()
-
-    if not flask_app.logger.handlers:
-        flask_app.logger.addHandler(logging.StreamHandler())
-
-    for handler in flask_app.logger.handlers:
-        handler.setFormatter(formatter)
-        if not any(isinstance(existing_filter, _RequestIdLogFilter) for existing_filter in handler.filters):
-            handler.addFilter(request_id_filter)
-
-    flask_app.logger.setLevel(level)
-
-
-_configure_logging(app)
+install_logging_pipeline(app)
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
@@ -57,6 +48,8 @@ login_manager.login_view = "auth.login"
 migrate = Migrate(app, db)
 csrf = CSRFProtect(app)
 cache = Cache(app)
+install_engine_listeners()
+install_slow_query_log()
 
 
 def _handle_403(_error):
@@ -88,6 +81,14 @@ app.register_blueprint(dashboard_bp)
 app.register_error_handler(403, _handle_403)
 app.register_error_handler(404, _handle_404)
 app.register_error_handler(500, _handle_500)
+install_static_assets(app)
+install_template_cache(app)
+install_cli(app)
+
+# after_request hooks run in reverse order: registered first, compression sees the final body.
+install_response_compression(app, cache)
+# Registered ahead of the other request hooks so the profile covers them as well.
+install_request_profiler(app)
 
 
 @app.before_request
@@ -96,6 +97,12 @@ def _assign_request_id():
     g.request_id = incoming_request_id or uuid.uuid4().hex
 
 
+@app.before_request
+def _start_request_instrumentation():
+    g.request_started_at = time.perf_counter()
+    start_request_query_stats()
+
+
 @app.before_request
 def _enforce_max_request_size():
     max_body_size = app.config.get("MAX_CONTENT_LENGTH")
@@ -109,13 +116,45 @@ def _log_response(response):
     request_id = getattr(g, "request_id", None)
     if request_id:
         response.headers["X-Request-ID"] = request_id
-    app.logger.info(
-        "request_completed method=%s path=%s status=%s remote_addr=%s",
-        request.method,
-        request.path,
-        response.status_code,
-        request.remote_addr or "-",
+
+    started_at = getattr(g, "request_started_at", None)
+    duration = time.perf_counter() - started_at if started_at is not None else None
+    query_stats = current_query_stats()
+    server_timing = server_timing_header(query_stats, duration)
+    if server_timing:
+        response.headers["Server-Timing"] = server_timing
+
+    report_repeated_statements(query_stats)
+    if app.config.get("METRICS_ENABLED", True):
+        record_request(response, duration, query_stats)
+        flush_snapshot()
+
+    sample_rate = request_log_sample_rate(
+        app.config.get("LOG_SAMPLE_RULES"), request.endpoint, request.path, response.status_code
     )
+    if should_log_request(sample_rate):
+        log_fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "remote_addr": request.remote_addr or "-",
+            "duration_ms": round(duration * 1000.0, 1) if duration is not None else 0.0,
+            "db_queries": query_stats.count if query_stats else 0,
+            "db_ms": round(query_stats.duration_ms, 1) if query_stats else 0.0,
+        }
+        if sample_rate < 1.0:
+            log_fields["sample_rate"] = sample_rate
+        app.logger.info(
+            "request_completed %s",
+            " ".join(f"{name}={value}" for name, value in log_fields.items()),
+            extra={"event": "request_completed", "log_fields": log_fields},
+        )
+    return response
+
+
+@app.after_request
+def _enforce_query_budget(response):
+    check_query_budget(current_query_stats())
     return response
 
 @event.listens_for(Session, "after_commit")
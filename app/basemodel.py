@@ -1,4 +1,7 @@
 from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
 from app import db
 
 
@@ -7,6 +10,11 @@ def _utcnow_naive():
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
+def dialect_insert(table):
+    """``INSERT`` construct of the active dialect, for ``ON CONFLICT`` upserts on PostgreSQL and SQLite."""
+    return (postgresql.insert if db.engine.dialect.name == "postgresql" else sqlite.insert)(table)
+
+
 class BaseModel(db.Model):
     __abstract__ = True  # This ensures that the BaseModel itself isn't used to create a table
     
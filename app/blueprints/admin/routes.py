@@ -1,4 +1,7 @@
-from flask import flash, redirect, render_template, url_for
+import json
+import os
+
+from flask import abort, current_app, flash, redirect, render_template, send_file, url_for
 from flask_login import login_required
 from flask_wtf import FlaskForm
 from sqlalchemy.orm import selectinload
@@ -20,6 +23,8 @@ from app.forms import (
 from app.http_helpers import _paginate_query
 from app.models import Area, Client, Grower, RawMaterialPackaging, Role, User, Variety
 from app.permissions import admin_required
+from app.profiling import PROFILE_HEADER, generate_profile_token, list_profiles, profile_paths
+from app.slow_query_log import read_slow_query_entries, summarize_slow_queries
 
 
 @bp.route('/add_user', methods=['GET', 'POST'])
@@ -475,3 +480,57 @@ def toggle_raw_material_packaging(rmp_id):
     estado = 'activado' if rmp.is_active else 'desactivado'
     flash(f'Envase {rmp.name} {estado}.', 'success')
     return redirect(url_for('list_raw_material_packagings'))
+
+
+@bp.route('/admin/slow_queries')
+@login_required
+@admin_required
+def list_slow_queries():
+    entries = read_slow_query_entries(current_app.config.get("SLOW_QUERY_LOG_PATH"))
+    return render_template(
+        'list_slow_queries.html',
+        summaries=summarize_slow_queries(entries),
+        recent_entries=entries[:50],
+        threshold_ms=current_app.config.get("SLOW_QUERY_THRESHOLD_MS", 0),
+    )
+
+
+@bp.route('/admin/profiles')
+@login_required
+@admin_required
+def list_request_profiles():
+    return render_template(
+        'list_request_profiles.html',
+        profiles=list_profiles(current_app.config.get("PROFILING_DIR")),
+        profile_header=PROFILE_HEADER,
+        profile_token=generate_profile_token(),
+        token_max_age=current_app.config.get("PROFILING_TOKEN_MAX_AGE", 3600),
+        sample_rate=current_app.config.get("PROFILING_SAMPLE_RATE", 0),
+    )
+
+
+@bp.route('/admin/profiles/<string:profile_id>')
+@login_required
+@admin_required
+def view_request_profile(profile_id):
+    paths = profile_paths(current_app.config.get("PROFILING_DIR"), profile_id)
+    if paths is None:
+        abort(404)
+    with open(paths[0], encoding="utf-8") as summary_file:
+        profile = json.load(summary_file)
+    return render_template('view_request_profile.html', profile=profile)
+
+
+@bp.route('/admin/profiles/<string:profile_id>/pstats')
+@login_required
+@admin_required
+def download_request_profile(profile_id):
+    paths = profile_paths(current_app.config.get("PROFILING_DIR"), profile_id)
+    if paths is None or not os.path.exists(paths[1]):
+        abort(404)
+    return send_file(
+        paths[1],
+        mimetype='application/octet-stream',
+        download_name=f'{profile_id}.prof',
+        as_attachment=True,
+    )
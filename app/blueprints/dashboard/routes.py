@@ -1,16 +1,22 @@
-from flask import jsonify, render_template, url_for
+from datetime import date
+
+from flask import Response, abort, jsonify, render_template, request, url_for
 from flask_login import current_user, login_required
 from sqlalchemy import text
 
 from app import app, cache, db
 from app.blueprints.dashboard import bp
 from app.blueprints.dashboard.services import _build_dashboard_summary
+from app.http_helpers import _parse_date_arg
 from app.permissions import (
     can_access_lot_lists,
     can_execute_operational_actions,
     can_view_operational_dashboard,
     dashboard_required,
 )
+from app.metrics import cache_metrics, collect_prometheus_text, metrics_request_allowed
+from app.query_instrumentation import query_budget
+from app.services import PROJECTIONS, THROUGHPUT_DIMENSIONS, ProjectionService, ThroughputService, season_start
 
 
 def _attach_alert_links(summary):
@@ -28,6 +34,7 @@ def _build_operational_summary_for_user(user):
 
 
 @bp.route('/')
+@query_budget(10)
 def index():
     dashboard_summary = None
     show_operational_dashboard = False
@@ -46,15 +53,53 @@ def index():
 
 
 @bp.route('/api/index/summary')
+@query_budget(10)
 @login_required
 # Cache dashboard summary per user; timeout is controlled by CACHE_TIMEOUT_DASHBOARD (default 60s) to reduce repeated polling queries.
 @cache.cached(timeout=None, key_prefix=lambda: f"api:index:summary:{current_user.get_id() or 'anon'}")
+@cache_metrics("dashboard")
 def index_summary_api():
     if not can_view_operational_dashboard(current_user):
         return jsonify({"error": "forbidden"}), 403
     return jsonify(_build_operational_summary_for_user(current_user))
 
 
+@bp.route('/api/reports/throughput')
+@query_budget(6)
+@login_required
+def throughput_report_api():
+    if not can_view_operational_dashboard(current_user):
+        return jsonify({"error": "forbidden"}), 403
+    dimension = request.args.get('dimension') or None
+    if dimension is not None and dimension not in THROUGHPUT_DIMENSIONS:
+        return jsonify({"error": f"Agrupación no válida: {dimension}."}), 400
+    # Season to date unless a range is given.
+    date_to = _parse_date_arg(request.args.get('date_to')) or date.today()
+    date_from = _parse_date_arg(request.args.get('date_from')) or season_start(
+        date_to, app.config.get("SEASON_START_MONTH", 3)
+    )
+    return jsonify(ThroughputService.year_over_year(date_from, date_to, dimension))
+
+
+@bp.route('/api/projections/<name>')
+@query_budget(12)
+@login_required
+def projection_api(name):
+    if not can_view_operational_dashboard(current_user):
+        return jsonify({"error": "forbidden"}), 403
+    if name not in PROJECTIONS:
+        return jsonify({"error": f"Proyección no válida: {name}."}), 404
+    # Reading applies the events the projection has not seen yet, if any; commit keeps them and the offset.
+    payload = ProjectionService.read(
+        name,
+        batch_size=app.config.get("PROJECTION_BATCH_SIZE", 1000),
+        settle_seconds=app.config.get("PROJECTION_SETTLE_SECONDS", 5),
+        recheck_seconds=app.config.get("PROJECTION_RECHECK_SECONDS", 3600),
+    )
+    db.session.commit()
+    return jsonify(payload)
+
+
 @bp.route('/dashboard/tv')
 @login_required
 @dashboard_required
@@ -63,10 +108,12 @@ def dashboard_tv():
 
 
 @bp.route('/api/dashboard/summary')
+@query_budget(10)
 @login_required
 @dashboard_required
 # Cache dashboard TV summary per user; timeout is controlled by CACHE_TIMEOUT_DASHBOARD (default 60s) to reduce repeated polling queries.
 @cache.cached(timeout=None, key_prefix=lambda: f"api:dashboard:summary:{current_user.get_id() or 'anon'}")
+@cache_metrics("dashboard_tv")
 def dashboard_summary_api():
     return jsonify(_attach_alert_links(_build_dashboard_summary()))
 
@@ -90,3 +137,11 @@ def healthz():
     if error_message:
         payload['error'] = error_message
     return jsonify(payload), (200 if db_ok else 503)
+
+
+@bp.route('/metrics')
+def metrics():
+    # Internal scrape endpoint: loopback/allowlisted addresses or a bearer token only.
+    if not app.config.get("METRICS_ENABLED", True) or not metrics_request_allowed():
+        abort(404)
+    return Response(collect_prometheus_text(), mimetype='text/plain; version=0.0.4')
@@ -1,16 +1,50 @@
-from flask import abort, flash, redirect, render_template, request, url_for
+from datetime import date
+
+from flask import abort, current_app, flash, redirect, render_template, request, url_for
 from flask_login import login_required
 from flask_wtf import FlaskForm
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select
 
 from app.blueprints.fumigation import bp
 from app.forms import CompleteFumigationForm, FumigationForm, StartFumigationForm
 from app.http_helpers import _paginate_query, _parse_date_arg, _send_private_upload
-from app.models import Fumigation, Lot
+from app import db
+from app.models import Fumigation, Lot, fumigation_lot
 from app.permissions import area_role_required
-from app.services import FumigationService, can_transition
+from app.query_instrumentation import query_budget
+from app.services import (
+    FUMIGATION_PLAN_UNITS,
+    FumigationPlanError,
+    FumigationPlanService,
+    FumigationService,
+    FumigationTransitionError,
+    parse_capacities,
+)
 from app.upload_security import UploadValidationError, save_uploaded_file
 
+# ``status`` filter of the list, as the stored Fumigation.status.
+_FUMIGATION_STATUS_FILTERS = {
+    'asignada': str(FumigationService.ASSIGNED),
+    'en_fumigacion': str(FumigationService.STARTED),
+    'finalizada': str(FumigationService.COMPLETED),
+}
+
+
+def _lot_numbers_by_fumigation(fumigation_ids):
+    """Lot numbers of each listed work order from one column query, without loading the lots."""
+    lot_numbers = {fumigation_id: [] for fumigation_id in fumigation_ids}
+    if not fumigation_ids:
+        return lot_numbers
+    rows = db.session.execute(
+        select(fumigation_lot.c.fumigation_id, Lot.lot_number)
+        .join(Lot, Lot.id == fumigation_lot.c.lot_id)
+        .where(fumigation_lot.c.fumigation_id.in_(fumigation_ids))
+        .order_by(Lot.lot_number)
+    )
+    for fumigation_id, lot_number in rows:
+        lot_numbers[fumigation_id].append(lot_number)
+    return lot_numbers
+
 
 @bp.route('/create_fumigation', methods=['GET', 'POST'])
 @login_required
@@ -33,7 +67,30 @@ def create_fumigation():
     return render_template('create_fumigation.html', form=form)
 
 
+@bp.route('/plan_fumigations')
+@query_budget(10)
+@login_required
+@area_role_required('Materia Prima', ['Contribuidor'])
+def plan_fumigations():
+    unit = request.args.get('unit') or current_app.config.get('FUMIGATION_CHAMBER_UNIT', 'kg')
+    capacities_text = request.args.get('capacities') or current_app.config.get('FUMIGATION_CHAMBER_CAPACITIES', '')
+    plan = None
+    try:
+        plan = FumigationPlanService.plan_waiting_lots(parse_capacities(capacities_text), unit)
+    except FumigationPlanError as exc:
+        flash(str(exc), 'error')
+    return render_template(
+        'plan_fumigations.html',
+        plan=plan,
+        units=FUMIGATION_PLAN_UNITS,
+        filters={"unit": unit, "capacities": capacities_text},
+        work_order_prefix=f"OT-{date.today():%Y%m%d}",
+        csrf_form=FlaskForm(),
+    )
+
+
 @bp.route('/list_fumigations')
+@query_budget(10)
 @login_required
 @area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
 def list_fumigations():
@@ -43,9 +100,7 @@ def list_fumigations():
     date_to = _parse_date_arg(request.args.get('date_to'))
     sort = request.args.get('sort', 'created_desc')
 
-    fumigations_query = Fumigation.query.options(
-        selectinload(Fumigation.lots),
-    )
+    fumigations_query = Fumigation.query
 
     if work_order_filter:
         fumigations_query = fumigations_query.filter(Fumigation.work_order.ilike(f"%{work_order_filter}%"))
@@ -55,19 +110,8 @@ def list_fumigations():
     if date_to:
         fumigations_query = fumigations_query.filter(Fumigation.real_start_date.isnot(None), Fumigation.real_start_date <= date_to)
 
-    if status_filter == 'finalizada':
-        fumigations_query = fumigations_query.filter(Fumigation.real_end_date.isnot(None))
-    elif status_filter == 'en_fumigacion':
-        fumigations_query = fumigations_query.filter(
-            Fumigation.real_end_date.is_(None),
-            Fumigation.lots.any(Lot.fumigation_status == '3'),
-        )
-    elif status_filter == 'asignada':
-        fumigations_query = fumigations_query.filter(
-            Fumigation.real_end_date.is_(None),
-            ~Fumigation.lots.any(Lot.fumigation_status == '3'),
-            Fumigation.lots.any(Lot.fumigation_status == '2'),
-        )
+    if status_filter in _FUMIGATION_STATUS_FILTERS:
+        fumigations_query = fumigations_query.filter(Fumigation.status == _FUMIGATION_STATUS_FILTERS[status_filter])
     else:
         status_filter = ''
 
@@ -86,6 +130,7 @@ def list_fumigations():
     return render_template(
         'list_fumigations.html',
         fumigations=fumigations,
+        lot_numbers=_lot_numbers_by_fumigation([fumigation.id for fumigation in fumigations]),
         csrf_form=csrf_form,
         pagination=pagination,
         pagination_args=pagination_args,
@@ -122,13 +167,11 @@ def start_fumigation(fumigation_id):
     if fumigation.real_end_date is not None:
         flash("Esta fumigación ya fue completada.", 'error')
         return redirect(url_for('fumigation.list_fumigations'))
-    for lot in fumigation.lots:
-        if not can_transition(lot, FumigationService.STARTED):
-            flash(
-                f'Lote {lot.lot_number} no puede pasar de estado {lot.fumigation_status} a {FumigationService.STARTED}.',
-                'error',
-            )
-            return redirect(url_for('fumigation.list_fumigations'))
+    lot_ids = FumigationService.fumigation_lot_ids(fumigation)
+    blocked = FumigationService.blocked_lots(lot_ids, FumigationService.STARTED)
+    if blocked:
+        flash(str(FumigationTransitionError(FumigationService.STARTED, blocked)), 'error')
+        return redirect(url_for('fumigation.list_fumigations'))
 
     if form.validate_on_submit():
         try:
@@ -163,13 +206,11 @@ def complete_fumigation(fumigation_id):
     if fumigation.real_end_date is not None:
         flash("Esta fumigación ya fue completada.", 'error')
         return redirect(url_for('fumigation.list_fumigations'))
-    for lot in fumigation.lots:
-        if not can_transition(lot, FumigationService.COMPLETED):
-            flash(
-                f'Lote {lot.lot_number} no puede pasar de estado {lot.fumigation_status} a {FumigationService.COMPLETED}.',
-                'error',
-            )
-            return redirect(url_for('fumigation.list_fumigations'))
+    lot_ids = FumigationService.fumigation_lot_ids(fumigation)
+    blocked = FumigationService.blocked_lots(lot_ids, FumigationService.COMPLETED)
+    if blocked:
+        flash(str(FumigationTransitionError(FumigationService.COMPLETED, blocked)), 'error')
+        return redirect(url_for('fumigation.list_fumigations'))
 
     if form.validate_on_submit():
         try:
@@ -1,32 +1,41 @@
-import base64
-from io import BytesIO
+import hmac
 
-import qrcode
-from flask import flash, redirect, render_template, request, send_file, url_for
+from flask import current_app, flash, jsonify, redirect, render_template, request, send_file, url_for
 from flask_login import login_required
 from flask_wtf import FlaskForm
 from sqlalchemy import or_
 from sqlalchemy.orm import joinedload, selectinload
-from weasyprint import HTML
 
-from app import db
+from app import csrf, db
 from app.blueprints.dashboard.services import (
     DASHBOARD_ALERTS,
     _alert_cutoff_utc_naive,
     _server_now_local,
 )
 from app.blueprints.materiaprima import bp
-from app.forms import CreateLotForm, CreateRawMaterialReceptionForm, FullTruckWeightForm
+from app.exports import export_response, iter_query_rows
+from app.forms import CreateLotBatchForm, CreateLotForm, CreateRawMaterialReceptionForm, FullTruckWeightForm
 from app.http_helpers import _paginate_query, _parse_date_arg, is_safe_redirect_url
 from app.models import Client, Grower, Lot, LotQC, RawMaterialReception
 from app.permissions import area_role_required
+from app.query_instrumentation import query_budget
 from app.services import (
+    LotNumberAllocator,
     LotService,
+    LotSpec,
     LotValidationError,
+    ScaleService,
+    TruckWeightEntry,
     get_cached_pdf,
     invalidate_cached_pdf,
+    invalidate_cached_pdfs,
+    qr_data_uri,
+    qr_png,
+    render_pdf,
     save_pdf_to_cache,
+    scale_reading_applier,
 )
+from app.services.scale_service import iter_csv_rows, iter_json_lines
 
 
 def _apply_lot_alert_filter(query, alert_key, now_local):
@@ -86,11 +95,8 @@ def create_raw_material_reception():
     return render_template('create_raw_material_reception.html', form=form, reception_id=reception_id)
 
 
-@bp.route('/list_rmrs')
-@login_required
-@area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
-def list_rmrs():
-    receptions_query = RawMaterialReception.query.options(
+def _receptions_query():
+    return RawMaterialReception.query.options(
         selectinload(RawMaterialReception.clients),
         selectinload(RawMaterialReception.growers),
         selectinload(RawMaterialReception.lots),
@@ -99,7 +105,14 @@ def list_rmrs():
         RawMaterialReception.time.desc(),
         RawMaterialReception.id.desc(),
     )
-    receptions, pagination, pagination_args = _paginate_query(receptions_query)
+
+
+@bp.route('/list_rmrs')
+@query_budget(10)
+@login_required
+@area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
+def list_rmrs():
+    receptions, pagination, pagination_args = _paginate_query(_receptions_query())
     return render_template(
         'list_rmrs.html',
         receptions=receptions,
@@ -108,6 +121,44 @@ def list_rmrs():
     )
 
 
+def _reception_export_row(reception):
+    return (
+        reception.id,
+        reception.date,
+        reception.time,
+        reception.waybill,
+        reception.truck_plate,
+        reception.trucker_name,
+        ', '.join(client.name for client in reception.clients),
+        ', '.join(grower.name for grower in reception.growers),
+        len(reception.lots),
+        'Abierta' if reception.is_open else 'Cerrada',
+        reception.observations,
+    )
+
+
+@bp.route('/list_rmrs/export/<export_format>')
+@login_required
+@area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
+def export_rmrs(export_format):
+    return export_response(
+        'recepciones',
+        [
+            'Recepción', 'Fecha', 'Hora', 'Guía', 'Patente', 'Chofer', 'Cliente', 'Productor',
+            'Lotes', 'Estado', 'Observaciones',
+        ],
+        iter_query_rows(_receptions_query(), _reception_export_row),
+        export_format,
+        sheet_name='Recepciones',
+    )
+
+
+def _fill_reception_fields(form, reception):
+    form.grower_name.data = ', '.join(grower.name for grower in reception.growers)
+    form.client_name.data = ', '.join(client.name for client in reception.clients)
+    form.waybill.data = reception.waybill
+
+
 @bp.route('/create_lot/<int:reception_id>', methods=['GET', 'POST'])
 @login_required
 @area_role_required('Materia Prima', ['Contribuidor'])
@@ -118,12 +169,10 @@ def create_lot(reception_id):
 
     if not reception.is_open:
         flash('Esta recepción ya está cerrada y no acepta más lotes.', 'warning')
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
 
     if request.method == 'GET':
-        form.grower_name.data = ', '.join(grower.name for grower in reception.growers)
-        form.client_name.data = ', '.join(client.name for client in reception.clients)
-        form.waybill.data = reception.waybill
+        _fill_reception_fields(form, reception)
 
     if form.validate_on_submit():
         try:
@@ -137,30 +186,108 @@ def create_lot(reception_id):
             )
         except LotValidationError as exc:
             flash(str(exc), 'warning')
-            return render_template('create_lot.html', form=form, reception_id=reception_id, labels_url=labels_url)
+            return render_template(
+                'create_lot.html',
+                form=form,
+                reception_id=reception_id,
+                labels_url=labels_url,
+                next_lot_number=LotNumberAllocator.suggest_next(),
+            )
+        db.session.commit()
 
-        flash(f'Lote {form.lot_number.data} creado exitosamente.', 'success')
+        flash(f'Lote {lot.lot_number} creado exitosamente.', 'success')
         labels_url = url_for('materiaprima.lot_labels_pdf', lot_id=lot.id)
 
         if form.is_last_lot.data:
             flash('Recepción cerrada. Último lote registrado.', 'success')
             return redirect(url_for('materiaprima.list_lots', labels_url=labels_url))
 
-    return render_template('create_lot.html', form=form, reception_id=reception_id, labels_url=labels_url)
+    return render_template(
+        'create_lot.html',
+        form=form,
+        reception_id=reception_id,
+        labels_url=labels_url,
+        next_lot_number=LotNumberAllocator.suggest_next(),
+    )
 
 
-@bp.route('/list_lots')
+@bp.route('/create_lots/<int:reception_id>', methods=['GET', 'POST'])
 @login_required
-@area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
-def list_lots():
-    alert_key = request.args.get('alert')
-    now_local = _server_now_local()
-    status_filter = request.args.get('status', '').strip().lower()
-    client_filter = request.args.get('client', '').strip()
-    grower_filter = request.args.get('grower', '').strip()
-    date_from = _parse_date_arg(request.args.get('date_from'))
-    date_to = _parse_date_arg(request.args.get('date_to'))
-    sort = request.args.get('sort', 'lot_number_asc')
+@area_role_required('Materia Prima', ['Contribuidor'])
+def create_lots(reception_id):
+    form = CreateLotBatchForm()
+    reception = RawMaterialReception.query.get_or_404(reception_id)
+
+    if not reception.is_open:
+        flash('Esta recepción ya está cerrada y no acepta más lotes.', 'warning')
+        return redirect(url_for('dashboard.index'))
+
+    if request.method == 'GET':
+        _fill_reception_fields(form, reception)
+
+    created_lots = []
+    if form.validate_on_submit():
+        lot_specs = [
+            LotSpec(
+                variety_id=entry.variety_id.data,
+                rawmaterialpackaging_id=entry.rawmaterialpackaging_id.data,
+                packagings_quantity=entry.packagings_quantity.data,
+                lot_number=entry.lot_number.data,
+            )
+            for entry in form.lots
+        ]
+        try:
+            lots = LotService.create_lots(reception, lot_specs, close_reception=bool(form.is_last_lot.data))
+        except LotValidationError as exc:
+            flash(str(exc), 'warning')
+            return render_template(
+                'create_lots.html',
+                form=form,
+                reception=reception,
+                created_lots=created_lots,
+                next_lot_number=LotNumberAllocator.suggest_next(),
+            )
+        db.session.commit()
+
+        created_lots = [
+            {
+                'lot_number': lot.lot_number,
+                'labels_url': url_for('materiaprima.lot_labels_pdf', lot_id=lot.id),
+            }
+            for lot in lots
+        ]
+        flash(f'{len(created_lots)} lotes creados exitosamente.', 'success')
+        if not reception.is_open:
+            flash('Recepción cerrada. Último lote registrado.', 'success')
+        form = CreateLotBatchForm(formdata=None)
+        _fill_reception_fields(form, reception)
+
+    return render_template(
+        'create_lots.html',
+        form=form,
+        reception=reception,
+        created_lots=created_lots,
+        next_lot_number=LotNumberAllocator.suggest_next(),
+    )
+
+
+_LOT_STATUS_FILTERS = {
+    "disponible": "1",
+    "asignada": "2",
+    "en_fumigacion": "3",
+    "finalizada": "4",
+}
+_LOT_STATUS_LABELS = {"1": "Disponible", "2": "Asignada", "3": "En fumigación", "4": "Finalizada"}
+
+
+def _filtered_lots_query(args, alert_key, now_local):
+    """Lots matching the ``list_lots`` filters in ``args``; returns ``(query, filters)``."""
+    status_filter = args.get('status', '').strip().lower()
+    client_filter = args.get('client', '').strip()
+    grower_filter = args.get('grower', '').strip()
+    date_from = _parse_date_arg(args.get('date_from'))
+    date_to = _parse_date_arg(args.get('date_to'))
+    sort = args.get('sort', 'lot_number_asc')
 
     lots_query = Lot.query.options(
         joinedload(Lot.variety),
@@ -170,14 +297,8 @@ def list_lots():
     )
     lots_query = _apply_lot_alert_filter(lots_query, alert_key, now_local)
 
-    status_map = {
-        "disponible": "1",
-        "asignada": "2",
-        "en_fumigacion": "3",
-        "finalizada": "4",
-    }
-    if status_filter in status_map:
-        lots_query = lots_query.filter(Lot.fumigation_status == status_map[status_filter])
+    if status_filter in _LOT_STATUS_FILTERS:
+        lots_query = lots_query.filter(Lot.fumigation_status == _LOT_STATUS_FILTERS[status_filter])
 
     if client_filter:
         lots_query = lots_query.filter(
@@ -210,6 +331,24 @@ def list_lots():
         sort = 'lot_number_asc'
         lots_query = lots_query.order_by(Lot.lot_number.asc(), Lot.id.asc())
 
+    filters = {
+        "status": status_filter if status_filter in _LOT_STATUS_FILTERS else "",
+        "client": client_filter,
+        "grower": grower_filter,
+        "date_from": date_from.isoformat() if date_from else "",
+        "date_to": date_to.isoformat() if date_to else "",
+        "sort": sort,
+    }
+    return lots_query, filters
+
+
+@bp.route('/list_lots')
+@query_budget(10)
+@login_required
+@area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
+def list_lots():
+    alert_key = request.args.get('alert')
+    lots_query, filters = _filtered_lots_query(request.args, alert_key, _server_now_local())
     lots, pagination, pagination_args = _paginate_query(lots_query)
 
     active_alert = None
@@ -230,14 +369,41 @@ def list_lots():
         pagination_args=pagination_args,
         csrf_form=csrf_form,
         current_query_string=request.query_string.decode("utf-8"),
-        filters={
-            "status": status_filter if status_filter in status_map else "",
-            "client": client_filter,
-            "grower": grower_filter,
-            "date_from": date_from.isoformat() if date_from else "",
-            "date_to": date_to.isoformat() if date_to else "",
-            "sort": sort,
-        },
+        filters=filters,
+    )
+
+
+def _lot_export_row(lot):
+    reception = lot.raw_material_reception
+    return (
+        lot.lot_number,
+        reception.date,
+        reception.waybill,
+        ', '.join(client.name for client in reception.clients),
+        ', '.join(grower.name for grower in reception.growers),
+        lot.variety.name if lot.variety else None,
+        lot.raw_material_packaging.name if lot.raw_material_packaging else None,
+        lot.packagings_quantity,
+        lot.net_weight or None,
+        _LOT_STATUS_LABELS.get(lot.fumigation_status, 'Desconocida'),
+        lot.has_qc,
+    )
+
+
+@bp.route('/list_lots/export/<export_format>')
+@login_required
+@area_role_required('Materia Prima', ['Contribuidor', 'Lector'])
+def export_lots(export_format):
+    lots_query, _filters = _filtered_lots_query(request.args, request.args.get('alert'), _server_now_local())
+    return export_response(
+        'lotes',
+        [
+            'Lote', 'Fecha recepción', 'Guía', 'Cliente', 'Productor', 'Variedad', 'Envase',
+            'Cantidad envases', 'Peso neto (kg)', 'Estado fumigación', 'Con QC',
+        ],
+        iter_query_rows(lots_query, _lot_export_row),
+        export_format,
+        sheet_name='Lotes',
     )
 
 
@@ -269,6 +435,59 @@ def register_full_truck_weight(lot_id):
     return render_template('register_full_truck_weight.html', form=form, lot=lot)
 
 
+def _truck_weight_entries_from_form(form_data, lot_ids):
+    """Read ``loaded_<id>`` / ``empty_<id>`` pairs; rows left blank are skipped."""
+    entries = []
+    for lot_id in lot_ids:
+        loaded_raw = (form_data.get(f'loaded_{lot_id}') or '').strip()
+        empty_raw = (form_data.get(f'empty_{lot_id}') or '').strip()
+        if not loaded_raw and not empty_raw:
+            continue
+        try:
+            loaded_truck_weight = float(loaded_raw.replace(',', '.')) if loaded_raw else None
+            empty_truck_weight = float(empty_raw.replace(',', '.')) if empty_raw else None
+        except ValueError:
+            raise LotValidationError('Los pesos deben ser numéricos.')
+        entries.append(TruckWeightEntry(lot_id, loaded_truck_weight, empty_truck_weight))
+    return entries
+
+
+@bp.route('/register_truck_weights', methods=['GET', 'POST'])
+@query_budget(12)
+@login_required
+@area_role_required('Materia Prima', ['Contribuidor'])
+def register_truck_weights():
+    csrf_form = FlaskForm()
+    if request.method == 'POST' and csrf_form.validate_on_submit():
+        lot_ids = request.form.getlist('lot_id', type=int)
+        try:
+            entries = _truck_weight_entries_from_form(request.form, lot_ids)
+            computations = LotService.register_full_truck_weights(entries)
+        except LotValidationError as exc:
+            flash(str(exc), 'error')
+        else:
+            db.session.commit()
+            invalidate_cached_pdfs("lot_labels", computations.keys())
+            flash(f'Pesos registrados para {len(computations)} lotes.', 'success')
+            return redirect(url_for('materiaprima.register_truck_weights', **request.args))
+
+    pending_query = Lot.query.options(
+        joinedload(Lot.variety),
+        joinedload(Lot.raw_material_packaging),
+    ).filter(
+        or_(Lot.net_weight.is_(None), Lot.net_weight <= 0),
+    ).order_by(Lot.lot_number.asc(), Lot.id.asc())
+    lots, pagination, pagination_args = _paginate_query(pending_query)
+    return render_template(
+        'select_lot_for_weight_registration.html',
+        lots=lots,
+        pagination=pagination,
+        pagination_args=pagination_args,
+        csrf_form=csrf_form,
+        submitted=request.form if request.method == 'POST' else {},
+    )
+
+
 @bp.route('/lots/<int:lot_id>/inline_weight', methods=['POST'])
 @login_required
 @area_role_required('Materia Prima', ['Contribuidor'])
@@ -298,22 +517,60 @@ def update_lot_weight_inline(lot_id):
     return redirect(url_for('materiaprima.list_lots'))
 
 
+_JSON_LINES_MIMETYPES = {'application/x-ndjson', 'application/jsonl', 'application/json-lines'}
+
+
+def _scale_request_authorized():
+    token = current_app.config.get("SCALE_INGEST_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+@bp.route('/api/scale/readings', methods=['POST'])
+@csrf.exempt
+def ingest_scale_readings():
+    # Machine-to-machine: the scale software authenticates with SCALE_INGEST_TOKEN, not a session.
+    if not _scale_request_authorized():
+        return jsonify({"error": "unauthorized"}), 401
+
+    mimetype = request.mimetype
+    if mimetype in _JSON_LINES_MIMETYPES:
+        numbered_records = iter_json_lines(request.stream)
+    elif mimetype == 'text/csv':
+        numbered_records = iter_csv_rows(request.stream)
+    elif mimetype == 'application/json':
+        payload = request.get_json(silent=True)
+        records = payload.get('readings') if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            return jsonify({"error": "Se espera una lista de lecturas o {\"readings\": [...]}."}), 400
+        numbered_records = enumerate(records, start=1)
+    else:
+        return jsonify({"error": "Formatos aceptados: application/x-ndjson, text/csv o application/json."}), 415
+
+    summary = ScaleService.store_readings(
+        numbered_records,
+        chunk_size=int(current_app.config.get("SCALE_INGEST_CHUNK_SIZE", 500)),
+    )
+    if summary["accepted"]:
+        if current_app.config.get("SCALE_APPLY_IN_BACKGROUND", True):
+            scale_reading_applier.notify()
+        else:
+            summary["applied"] = ScaleService.apply_pending_readings(
+                batch_size=int(current_app.config.get("SCALE_APPLY_BATCH_SIZE", 500)),
+                match_window_hours=int(current_app.config.get("SCALE_MATCH_WINDOW_HOURS", 48)),
+            )
+    status = 400 if summary["invalid"] and not (summary["accepted"] or summary["duplicates"]) else 202
+    return jsonify(summary), status
+
+
 @bp.route('/generate_qr')
 @login_required
 def generate_qr():
     reception_id = request.args.get('reception_id', 'default')
     url = url_for('materiaprima.create_lot', reception_id=reception_id, _external=True)
 
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)  # type: ignore
-    qr.add_data(url)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    img_io = BytesIO()
-    img.save(img_io, 'PNG')
-    img_io.seek(0)
-
-    return send_file(img_io, mimetype='image/png')
+    return send_file(qr_png(url), mimetype='image/png')
 
 
 @bp.route('/lots/<int:lot_id>/labels.pdf')
@@ -336,16 +593,6 @@ def lot_labels_pdf(lot_id):
             as_attachment=True,
         )
 
-    qr_payload = f"LOT-{lot.lot_number:03d}"
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=4, border=2)  # type: ignore
-    qr.add_data(qr_payload)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    img_io = BytesIO()
-    img.save(img_io, 'PNG')
-    img_io.seek(0)
-    qr_data_uri = f"data:image/png;base64,{base64.b64encode(img_io.read()).decode('ascii')}"
-
     labels = list(range(lot.packagings_quantity))
     html = render_template(
         'lot_labels_pdf.html',
@@ -353,10 +600,10 @@ def lot_labels_pdf(lot_id):
         reception=reception,
         clients=clients,
         growers=growers,
-        qr_data_uri=qr_data_uri,
+        qr_data_uri=qr_data_uri(f"LOT-{lot.lot_number:03d}"),
         labels=labels,
     )
-    pdf = HTML(string=html, base_url=request.url_root).write_pdf()
+    pdf = render_pdf(html, request.url_root, kind="lot_labels")
     cached_pdf = save_pdf_to_cache("lot_labels", lot.id, cache_key_updated_at, pdf)
     return send_file(
         cached_pdf,
@@ -1,17 +1,31 @@
-from flask import abort, flash, redirect, render_template, request, send_file, url_for
+from datetime import date, timedelta
+
+from flask import abort, current_app, flash, jsonify, redirect, render_template, request, send_file, url_for
 from flask_login import login_required
-from weasyprint import HTML
+from sqlalchemy.orm import joinedload
 
+from app import db
 from app.blueprints.qc import bp
-from app.forms import LotQCForm, SampleQCForm
-from app.http_helpers import _paginate_query, _send_private_upload, _upload_path_to_file_uri
+from app.exports import export_response, iter_query_rows
+from app.forms import LotQCForm, QCImportForm, SampleQCForm
+from app.http_helpers import _paginate_query, _parse_date_arg, _send_private_upload, _upload_path_to_file_uri
+from app.imports import TableImportError, read_table
 from app.models import LotQC, SampleQC
 from app.permissions import area_role_required
+from app.query_instrumentation import query_budget
 from app.services import (
+    QC_IMPORT_COLUMNS,
+    QC_MEASUREMENT_LABELS,
+    QCImportService,
+    QCRollupService,
     QCService,
     QCValidationError,
+    SPCError,
+    SPCService,
     get_cached_pdf,
     invalidate_cached_pdf,
+    invalidate_cached_pdfs,
+    render_pdf,
     save_pdf_to_cache,
 )
 from app.upload_security import UploadValidationError, save_uploaded_file
@@ -83,12 +97,13 @@ def create_lot_qc():
         except QCValidationError as exc:
             flash(str(exc), 'error')
             return render_template('create_lot_qc.html', form=form)
+        db.session.commit()
 
         invalidate_cached_pdf("lot_qc_report", lot_qc.id)
         invalidate_cached_pdf("lot_labels", payload["lot_id"])
         flash('Registro de QC de lote creado exitosamente.', 'success')
 
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
     else:
         for fieldName, errorMessages in form.errors.items():
             for err in errorMessages:
@@ -133,9 +148,10 @@ def create_sample_qc():
         except QCValidationError as exc:
             flash(str(exc), 'error')
             return render_template('create_sample_qc.html', form=form)
+        db.session.commit()
 
         invalidate_cached_pdf("sample_qc_report", sample_qc.id)
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
     else:
         for fieldName, errorMessages in form.errors.items():
             for err in errorMessages:
@@ -144,12 +160,50 @@ def create_sample_qc():
     return render_template('create_sample_qc.html', form=form)
 
 
+@bp.route('/import_qc', methods=['GET', 'POST'])
+@login_required
+@area_role_required('Calidad', ['Contribuidor'])
+def import_qc():
+    form = QCImportForm()
+    result = None
+    if form.validate_on_submit():
+        upload = form.table.data
+        try:
+            header, rows = read_table(upload.filename, upload.read())
+            result = QCImportService.import_rows(
+                form.kind.data, header, rows, max_rows=current_app.config.get('QC_IMPORT_MAX_ROWS', 2000)
+            )
+        except TableImportError as exc:
+            flash(str(exc), 'error')
+        else:
+            db.session.commit()
+            if result.lot_ids:
+                invalidate_cached_pdfs("lot_labels", result.lot_ids)
+            if result.created_ids:
+                flash(f'{len(result.created_ids)} de {result.total} registros QC importados.', 'success')
+    else:
+        for fieldName, errorMessages in form.errors.items():
+            for err in errorMessages:
+                flash(f'{err}', 'error')
+
+    return render_template(
+        'import_qc.html',
+        form=form,
+        result=result,
+        columns={kind: [label for _name, label, _parser in columns] for kind, columns in QC_IMPORT_COLUMNS.items()},
+    )
+
+
+def _lot_qc_query():
+    return LotQC.query.order_by(LotQC.date.desc(), LotQC.time.desc(), LotQC.id.desc())
+
+
 @bp.route('/list_lot_qc_reports')
+@query_budget(10)
 @login_required
 @area_role_required('Calidad', ['Contribuidor', 'Lector'])
 def list_lot_qc_reports():
-    lot_qc_query = LotQC.query.order_by(LotQC.date.desc(), LotQC.time.desc(), LotQC.id.desc())
-    lot_qc_reports, pagination, pagination_args = _paginate_query(lot_qc_query)
+    lot_qc_reports, pagination, pagination_args = _paginate_query(_lot_qc_query())
     return render_template(
         'list_lot_qc_reports.html',
         lot_qc_records=lot_qc_reports,
@@ -158,7 +212,101 @@ def list_lot_qc_reports():
     )
 
 
+def _lot_qc_export_row(record):
+    return (
+        record.lot.lot_number if record.lot else None,
+        record.date,
+        record.time,
+        record.analyst,
+        *(getattr(record, attribute) for attribute, _title in QC_MEASUREMENT_LABELS),
+    )
+
+
+@bp.route('/list_lot_qc_reports/export/<export_format>')
+@login_required
+@area_role_required('Calidad', ['Contribuidor', 'Lector'])
+def export_lot_qc_reports(export_format):
+    return export_response(
+        'qc_lotes',
+        ['Lote', 'Fecha', 'Hora', 'Analista', *(title for _attribute, title in QC_MEASUREMENT_LABELS)],
+        iter_query_rows(_lot_qc_query().options(joinedload(LotQC.lot)), _lot_qc_export_row),
+        export_format,
+        sheet_name='QC lotes',
+    )
+
+
+_QC_ANALYTICS_GROUPS = {
+    'rendimiento': ('Rendimiento', ('yieldpercentage', 'inshell_weight', 'shelled_weight')),
+    'calibre': ('Calibres', ('lessthan30', 'between3032', 'between3234', 'between3436', 'morethan36')),
+    'defectos': (
+        'Defectos',
+        (
+            'broken_walnut', 'split_walnut', 'light_stain', 'serious_stain', 'adhered_hull',
+            'shrivel', 'empty', 'insect_damage', 'inactive_fungus', 'active_fungus',
+        ),
+    ),
+    'color': ('Color', ('extra_light', 'light', 'light_amber', 'amber', 'yellow')),
+}
+_QC_ANALYTICS_DIMENSIONS = {'grower': 'Productor', 'variety': 'Variedad', 'client': 'Cliente'}
+
+
+@bp.route('/qc_analytics')
+@query_budget(6)
+@login_required
+@area_role_required('Calidad', ['Contribuidor', 'Lector'])
+def qc_analytics():
+    dimension = request.args.get('dimension', 'grower')
+    if dimension not in _QC_ANALYTICS_DIMENSIONS:
+        dimension = 'grower'
+    group = request.args.get('group', 'rendimiento')
+    if group not in _QC_ANALYTICS_GROUPS:
+        group = 'rendimiento'
+    date_to = _parse_date_arg(request.args.get('date_to')) or date.today()
+    date_from = _parse_date_arg(request.args.get('date_from')) or date_to - timedelta(days=30)
+
+    group_label, metrics = _QC_ANALYTICS_GROUPS[group]
+    metric_labels = dict(QC_MEASUREMENT_LABELS)
+    members = QCRollupService.summarize(dimension, date_from=date_from, date_to=date_to, metrics=metrics)
+    plant = QCRollupService.summarize('all', date_from=date_from, date_to=date_to, metrics=metrics)
+    return render_template(
+        'qc_analytics.html',
+        members=members,
+        plant=plant[0] if plant else None,
+        metrics=[(metric, metric_labels[metric]) for metric in metrics],
+        group_label=group_label,
+        dimension_label=_QC_ANALYTICS_DIMENSIONS[dimension],
+        groups={key: label for key, (label, _metrics) in _QC_ANALYTICS_GROUPS.items()},
+        dimensions=_QC_ANALYTICS_DIMENSIONS,
+        filters={
+            'dimension': dimension,
+            'group': group,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+        },
+    )
+
+
+@bp.route('/api/qc/spc')
+@query_budget(4)
+@login_required
+@area_role_required('Calidad', ['Contribuidor', 'Lector'])
+def qc_spc_chart():
+    try:
+        chart = SPCService.chart_data(
+            request.args.get('scope', 'variety'),
+            request.args.get('key', ''),
+            request.args.get('metric', 'yieldpercentage'),
+            points=current_app.config.get('SPC_CHART_POINTS', 50),
+        )
+    except SPCError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if chart is None:
+        return jsonify({"error": "No hay carta de control para ese ámbito y métrica."}), 404
+    return jsonify(chart)
+
+
 @bp.route('/list_sample_qc_reports')
+@query_budget(10)
 @login_required
 @area_role_required('Calidad', ['Contribuidor', 'Lector'])
 def list_sample_qc_reports():
@@ -173,6 +321,7 @@ def list_sample_qc_reports():
 
 
 @bp.route('/view_lot_qc_report/<int:report_id>')
+@query_budget(10)
 @login_required
 @area_role_required('Calidad', ['Contribuidor', 'Lector'])
 def view_lot_qc_report(report_id):
@@ -217,7 +366,7 @@ def view_lot_qc_report_pdf(report_id):
     shelled_image_url = _upload_path_to_file_uri(report.shelled_image_path)
 
     html = render_template('view_lot_qc_report_pdf.html', report=report, reception=reception, clients=clients, growers=growers, inshell_image_url=inshell_image_url, shelled_image_url=shelled_image_url)
-    pdf = HTML(string=html, base_url=request.url_root).write_pdf()
+    pdf = render_pdf(html, request.url_root, kind="lot_qc_report")
     cached_pdf = save_pdf_to_cache("lot_qc_report", report.id, cache_key_updated_at, pdf)
     return send_file(cached_pdf, mimetype='application/pdf', download_name=f'lot_qc_report_{lot_number}.pdf', as_attachment=True)
 
@@ -256,6 +405,6 @@ def view_sample_qc_report_pdf(report_id):
     inshell_image_url = _upload_path_to_file_uri(report.inshell_image_path)
     shelled_image_url = _upload_path_to_file_uri(report.shelled_image_path)
     html = render_template('view_sample_qc_report_pdf.html', report=report, inshell_image_url=inshell_image_url, shelled_image_url=shelled_image_url)
-    pdf = HTML(string=html, base_url=request.url_root).write_pdf()
+    pdf = render_pdf(html, request.url_root, kind="sample_qc_report")
     cached_pdf = save_pdf_to_cache("sample_qc_report", report.id, cache_key_updated_at, pdf)
     return send_file(cached_pdf, mimetype='application/pdf', download_name=f'sample_qc_report_{report_id}.pdf', as_attachment=True)
@@ -0,0 +1,83 @@
+"""Maintenance commands, run as ``python -m flask <command>`` like the migrations."""
+import click
+
+
+def install_cli(flask_app):
+    @flask_app.cli.command("rebuild-qc-rollups")
+    def rebuild_qc_rollups():
+        """Recompute the daily QC rollups from every lot and sample QC record."""
+        from app import db
+        from app.services.qc_rollup_service import QCRollupService
+
+        records = QCRollupService.rebuild()
+        db.session.commit()
+        click.echo(f"QC rollups rebuilt from {records} QC records.")
+
+    @flask_app.cli.command("rebuild-throughput")
+    def rebuild_throughput():
+        """Recompute the daily reception facts from every lot."""
+        from app import db
+        from app.services.throughput_service import ThroughputService
+
+        records = ThroughputService.rebuild()
+        db.session.commit()
+        click.echo(f"Reception throughput rebuilt from {records} lots.")
+
+    @flask_app.cli.command("rebuild-spc-charts")
+    def rebuild_spc_charts():
+        """Replay every lot QC into fresh control charts (after changing SPC_SUBGROUP_SIZE, for instance)."""
+        from app import db
+        from app.services.spc_service import SPCService
+
+        records = SPCService.rebuild(
+            subgroup_size=flask_app.config.get("SPC_SUBGROUP_SIZE", 5),
+            min_subgroups=flask_app.config.get("SPC_MIN_SUBGROUPS", 5),
+        )
+        db.session.commit()
+        click.echo(f"Control charts rebuilt from {records} lot QC records.")
+
+    @flask_app.cli.command("backfill-lot-events")
+    def backfill_lot_events():
+        """Journal a snapshot of every lot created before the lot event journal existed."""
+        from app import db
+        from app.services.lot_event_service import LotEventService
+
+        records = LotEventService.backfill(batch_size=flask_app.config.get("PROJECTION_BATCH_SIZE", 1000))
+        db.session.commit()
+        click.echo(f"Lot event journal backfilled with {records} lot snapshots.")
+
+    @flask_app.cli.command("catch-up-projections")
+    def catch_up_projections():
+        """Apply the lot events each projection has not seen yet."""
+        from app import db
+        from app.services.projection_service import ProjectionService
+
+        applied = ProjectionService.catch_up_all(
+            batch_size=flask_app.config.get("PROJECTION_BATCH_SIZE", 1000),
+            settle_seconds=flask_app.config.get("PROJECTION_SETTLE_SECONDS", 5),
+            recheck_seconds=flask_app.config.get("PROJECTION_RECHECK_SECONDS", 3600),
+        )
+        db.session.commit()
+        for name, records in applied.items():
+            click.echo(f"{name}: {records} events applied.")
+
+    @flask_app.cli.command("rebuild-projections")
+    @click.option("--name", default=None, help="Rebuild only this projection.")
+    def rebuild_projections(name):
+        """Replay the whole lot event journal into fresh projections."""
+        from app import db
+        from app.services.projection_service import PROJECTIONS, ProjectionService
+
+        if name is not None and name not in PROJECTIONS:
+            raise click.BadParameter(
+                f"unknown projection, expected one of: {', '.join(PROJECTIONS)}", param_hint="--name"
+            )
+        for projection_name in [name] if name else PROJECTIONS:
+            records = ProjectionService.rebuild(
+                projection_name,
+                batch_size=flask_app.config.get("PROJECTION_BATCH_SIZE", 1000),
+                settle_seconds=flask_app.config.get("PROJECTION_SETTLE_SECONDS", 5),
+                recheck_seconds=flask_app.config.get("PROJECTION_RECHECK_SECONDS", 3600),
+            )
+            db.session.commit()
+            click.echo(f"{projection_name}: rebuilt from {records} events.")
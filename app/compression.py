@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+
+from flask import current_app, request
+
+from app.metrics import inc_counter
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+_COMPRESSED_CACHE_PREFIX = "compressed-body"
+_STATIC_ENDPOINTS = {"static", "asset"}
+
+
+def _encode(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=int(current_app.config.get("COMPRESSION_BROTLI_QUALITY", 4)))
+    # mtime=0 keeps identical bodies byte-identical, so cached copies and ETags stay stable.
+    return gzip.compress(body, compresslevel=int(current_app.config.get("COMPRESSION_GZIP_LEVEL", 6)), mtime=0)
+
+
+def _negotiated_encoding():
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _compressible_mimetypes():
+    raw = current_app.config.get("COMPRESSION_MIMETYPES", "")
+    return {mimetype.strip().lower() for mimetype in raw.split(",") if mimetype.strip()}
+
+
+def _is_view_cached():
+    # Flask-Caching marks the functions it wraps with ``uncached``; the decorator may sit under others.
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    while view is not None:
+        if hasattr(view, "uncached"):
+            return True
+        view = getattr(view, "__wrapped__", None)
+    return False
+
+
+def _is_cacheable(response):
+    cache_control = response.cache_control
+    if cache_control.no_store or cache_control.private:
+        return False
+    return _is_view_cached() or bool(cache_control.max_age)
+
+
+def compress_response(response, cache=None):
+    """Compress eligible responses with brotli or gzip according to ``Accept-Encoding``."""
+    config = current_app.config
+    if not config.get("COMPRESSION_ENABLED", True):
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304) or request.method == "HEAD":
+        return response
+    if response.mimetype not in _compressible_mimetypes() or "Content-Encoding" in response.headers:
+        return response
+    if response.is_streamed and not (response.direct_passthrough and request.endpoint in _STATIC_ENDPOINTS):
+        return response
+
+    min_bytes = int(config.get("COMPRESSION_MIN_BYTES", 1024))
+    if response.content_length is not None and response.content_length < min_bytes:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiated_encoding()
+    if encoding is None:
+        return response
+
+    # Static files arrive as a file wrapper; small text assets are read so they can be compressed too.
+    response.direct_passthrough = False
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+
+    compressed = None
+    cache_key = None
+    if cache is not None and _is_cacheable(response):
+        cache_key = f"{_COMPRESSED_CACHE_PREFIX}:{encoding}:{hashlib.sha1(body).hexdigest()}"
+        compressed = cache.get(cache_key)
+    cache_result = "hit" if compressed is not None else ("miss" if cache_key else "uncached")
+    if compressed is None:
+        compressed = _encode(body, encoding)
+        if cache_key:
+            cache.set(cache_key, compressed)
+    if len(compressed) >= len(body):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        # The compressed body is a different representation; a weak tag still matches If-None-Match.
+        response.set_etag(etag, weak=True)
+    inc_counter("petru_http_compressed_responses_total", encoding=encoding, cache=cache_result)
+    return response
+
+
+def install_response_compression(flask_app, cache):
+    """Register compression; call before the other after_request hooks so it runs last on the final body."""
+
+    @flask_app.after_request
+    def _compress_response(response):
+        return compress_response(response, cache)
@@ -32,6 +32,13 @@ def _int_from_env(name, default):
         return default
 
 
+def _bool_from_env(name, default):
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    return str(raw).strip().lower() in {"1", "true", "yes"}
+
+
 def _default_database_uri():
     database_url = os.environ.get("DATABASE_URL")
     if database_url:
@@ -67,10 +74,90 @@ class Config(object):
     MAX_UPLOAD_FILE_BYTES = _int_from_env("MAX_UPLOAD_FILE_BYTES", 8 * 1024 * 1024)
     DEFAULT_PAGE_SIZE = _int_from_env("DEFAULT_PAGE_SIZE", 10)
     MAX_PAGE_SIZE = _int_from_env("MAX_PAGE_SIZE", 200)
+    # CSV/XLSX exports of list views fetch this many rows per round trip (server-side cursor on PostgreSQL).
+    EXPORT_YIELD_PER = _int_from_env("EXPORT_YIELD_PER", 1000)
     CACHE_TYPE = os.environ.get("CACHE_TYPE", "SimpleCache")
     CACHE_DEFAULT_TIMEOUT = _int_from_env("CACHE_TIMEOUT_DASHBOARD", 60)
     WTF_CSRF_ENABLED = True
+    # /assets/<digest>/... URLs from asset_url() are cached by browsers for this long and marked immutable.
+    STATIC_ASSET_MAX_AGE = _int_from_env("STATIC_ASSET_MAX_AGE", 31536000)
+    STATIC_ASSET_AUTO_RELOAD = _bool_from_env("STATIC_ASSET_AUTO_RELOAD", IS_DEVELOPMENT)
+    # Compiled template bytecode shared by all workers; gunicorn precompiles every template at startup.
+    TEMPLATE_BYTECODE_CACHE = _bool_from_env("TEMPLATE_BYTECODE_CACHE", True)
+    TEMPLATE_CACHE_DIR = os.path.abspath(
+        os.environ.get("TEMPLATE_CACHE_DIR", os.path.join(_default_app_data_root(), "jinja_cache"))
+    )
+    TEMPLATE_WARMUP = _bool_from_env("TEMPLATE_WARMUP", True)
+    # Truck-scale ingestion (/api/scale/readings): bearer token for the scale software; readings are
+    # stored at once and matched to lots by a background thread (inline under tests).
+    SCALE_INGEST_TOKEN = os.environ.get("SCALE_INGEST_TOKEN")
+    SCALE_INGEST_CHUNK_SIZE = _int_from_env("SCALE_INGEST_CHUNK_SIZE", 500)
+    SCALE_APPLY_IN_BACKGROUND = _bool_from_env("SCALE_APPLY_IN_BACKGROUND", ENVIRONMENT != "testing")
+    SCALE_APPLY_BATCH_SIZE = _int_from_env("SCALE_APPLY_BATCH_SIZE", 500)
+    SCALE_MATCH_WINDOW_HOURS = _int_from_env("SCALE_MATCH_WINDOW_HOURS", 48)
+    # Month the harvest season starts in; season-to-date throughput reports begin on its first day.
+    SEASON_START_MONTH = _int_from_env("SEASON_START_MONTH", 3)
+    # Default chambers for the fumigation planner (/plan_fumigations): comma-separated capacities in
+    # FUMIGATION_CHAMBER_UNIT ("kg" of net weight or "bins").
+    FUMIGATION_CHAMBER_CAPACITIES = os.environ.get("FUMIGATION_CHAMBER_CAPACITIES", "24000")
+    FUMIGATION_CHAMBER_UNIT = os.environ.get("FUMIGATION_CHAMBER_UNIT", "kg")
+    # Lot event projections: journal events applied per batch, how long an id gap is waited on as a
+    # possibly uncommitted event before catching up moves past it, and how long a skipped id is still
+    # looked up in case its transaction commits late.
+    PROJECTION_BATCH_SIZE = _int_from_env("PROJECTION_BATCH_SIZE", 1000)
+    PROJECTION_SETTLE_SECONDS = _int_from_env("PROJECTION_SETTLE_SECONDS", 5)
+    PROJECTION_RECHECK_SECONDS = _int_from_env("PROJECTION_RECHECK_SECONDS", 3600)
+    # Rows accepted by one QC spreadsheet import (/import_qc).
+    QC_IMPORT_MAX_ROWS = _int_from_env("QC_IMPORT_MAX_ROWS", 2000)
+    # QC control charts: X-bar/R subgroup size (2-10) and subgroups needed before points are judged;
+    # /api/qc/spc returns at most SPC_CHART_POINTS points.
+    SPC_SUBGROUP_SIZE = _int_from_env("SPC_SUBGROUP_SIZE", 5)
+    SPC_MIN_SUBGROUPS = _int_from_env("SPC_MIN_SUBGROUPS", 5)
+    SPC_CHART_POINTS = _int_from_env("SPC_CHART_POINTS", 50)
+    # Brotli/gzip for text responses at or above COMPRESSION_MIN_BYTES; PDFs and images are never recompressed.
+    COMPRESSION_ENABLED = _bool_from_env("COMPRESSION_ENABLED", True)
+    COMPRESSION_MIN_BYTES = _int_from_env("COMPRESSION_MIN_BYTES", 1024)
+    COMPRESSION_MIMETYPES = os.environ.get(
+        "COMPRESSION_MIMETYPES",
+        "text/html,text/css,text/plain,text/csv,text/javascript,application/javascript,application/json,image/svg+xml",
+    )
+    COMPRESSION_BROTLI_QUALITY = _int_from_env("COMPRESSION_BROTLI_QUALITY", 4)
+    COMPRESSION_GZIP_LEVEL = _int_from_env("COMPRESSION_GZIP_LEVEL", 6)
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    # Application logs go through a background queue; "json" (default) or "text" lines on stderr.
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE = _int_from_env("LOG_QUEUE_SIZE", 10000)
+    # "target[:status]=rate" pairs (endpoint name or path); matching request_completed lines are sampled.
+    LOG_SAMPLE_RULES = os.environ.get(
+        "LOG_SAMPLE_RULES", "/api/dashboard/summary:200=0.01,/api/index/summary:200=0.01"
+    )
+    SQL_N_PLUS_ONE_THRESHOLD = _int_from_env("SQL_N_PLUS_ONE_THRESHOLD", 5)
+    # Strict mode turns exceeded @query_budget declarations into errors; on by default under tests.
+    SQL_QUERY_BUDGET_STRICT = _bool_from_env("SQL_QUERY_BUDGET_STRICT", ENVIRONMENT == "testing")
+    # Statements slower than this are written to the slow-query log; 0 disables the recorder.
+    SLOW_QUERY_THRESHOLD_MS = _int_from_env("SLOW_QUERY_THRESHOLD_MS", 250)
+    SLOW_QUERY_EXPLAIN = _bool_from_env("SLOW_QUERY_EXPLAIN", True)
+    SLOW_QUERY_LOG_PATH = os.path.abspath(
+        os.environ.get("SLOW_QUERY_LOG_PATH", os.path.join(_default_app_data_root(), "logs", "slow_queries.log"))
+    )
+    SLOW_QUERY_LOG_MAX_BYTES = _int_from_env("SLOW_QUERY_LOG_MAX_BYTES", 5 * 1024 * 1024)
+    SLOW_QUERY_LOG_BACKUPS = _int_from_env("SLOW_QUERY_LOG_BACKUPS", 5)
+    # Each worker writes its metric snapshot here; /metrics merges them for the scraper.
+    METRICS_ENABLED = _bool_from_env("METRICS_ENABLED", True)
+    METRICS_DIR = os.path.abspath(
+        os.environ.get("METRICS_DIR", os.path.join(_default_app_data_root(), "metrics"))
+    )
+    METRICS_FLUSH_SECONDS = _int_from_env("METRICS_FLUSH_SECONDS", 5)
+    METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1")
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    # Request profiler: signed X-Profile-Token header, ?_profile=1 for admins, or 1-in-N sampling (0 = off).
+    PROFILING_ENABLED = _bool_from_env("PROFILING_ENABLED", True)
+    PROFILING_SAMPLE_RATE = _int_from_env("PROFILING_SAMPLE_RATE", 0)
+    PROFILING_DIR = os.path.abspath(
+        os.environ.get("PROFILING_DIR", os.path.join(_default_app_data_root(), "profiles"))
+    )
+    PROFILING_TOKEN_MAX_AGE = _int_from_env("PROFILING_TOKEN_MAX_AGE", 3600)
+    PROFILING_MAX_PROFILES = _int_from_env("PROFILING_MAX_PROFILES", 200)
     
     # SECURITY WARNING: Setup a proper SECRET_KEY in production!
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'very_secret_key'
@@ -1,9 +1,10 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, FloatField, IntegerField, PasswordField, SelectField, SelectMultipleField, DateField, TimeField, SubmitField, HiddenField, RadioField, BooleanField
-from wtforms.validators import DataRequired, InputRequired, ValidationError, Length, Email
+from wtforms import Form, FieldList, FormField, StringField, TextAreaField, FloatField, IntegerField, PasswordField, SelectField, SelectMultipleField, DateField, TimeField, SubmitField, HiddenField, RadioField, BooleanField
+from wtforms.validators import DataRequired, InputRequired, ValidationError, Length, Email, NumberRange, Optional
 from wtforms.widgets import ListWidget, CheckboxInput
 from flask_wtf.file import FileField, FileAllowed, FileRequired
 from app.models import User, Role, Area, Client, Grower, Variety, RawMaterialPackaging, Lot, LotQC
+from app.services.qc_service import QC_SHELLED_FIELDS, QC_SIZE_FIELDS, QCService, QCValidationError
 
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired()])
@@ -105,7 +106,7 @@ class CreateLotForm(FlaskForm):
     variety_id = SelectField('Variedad', coerce=int, validators=[DataRequired()])
     rawmaterialpackaging_id = SelectField('Tipo de Envases', coerce=int, validators=[DataRequired()])
     packagings_quantity = IntegerField('Cantidad de Envases', validators=[DataRequired()])
-    lot_number = IntegerField('Número de Lote', validators=[DataRequired()])
+    lot_number = IntegerField('Número de Lote', validators=[Optional(), NumberRange(min=1)])
     is_last_lot = BooleanField('Último Lote')
     submit = SubmitField('Crear Lote')
 
@@ -114,11 +115,51 @@ class CreateLotForm(FlaskForm):
         self.variety_id.choices = [(v.id, v.name) for v in Variety.query.filter_by(is_active=True).order_by(Variety.name).all()]
         self.rawmaterialpackaging_id.choices = [(p.id, p.name) for p in RawMaterialPackaging.query.filter_by(is_active=True).order_by(RawMaterialPackaging.name).all()]
 
+MAX_LOTS_PER_BATCH = 40
+
+
+class LotEntryForm(Form):
+    variety_id = SelectField('Variedad', coerce=int, validators=[DataRequired()])
+    rawmaterialpackaging_id = SelectField('Tipo de Envases', coerce=int, validators=[DataRequired()])
+    packagings_quantity = IntegerField('Cantidad de Envases', validators=[DataRequired()])
+    lot_number = IntegerField('Número de Lote', validators=[Optional(), NumberRange(min=1)])
+
+
+class CreateLotBatchForm(FlaskForm):
+    grower_name = StringField('Productor', render_kw={'readonly': True})
+    client_name = StringField('Cliente', render_kw={'readonly': True})
+    waybill = StringField('Guía de Despacho Nº', render_kw={'readonly': True})
+    lots = FieldList(FormField(LotEntryForm), min_entries=1, max_entries=MAX_LOTS_PER_BATCH)
+    is_last_lot = BooleanField('Cerrar recepción con estos lotes')
+    submit = SubmitField('Crear Lotes')
+
+    def __init__(self, *args, **kwargs):
+        super(CreateLotBatchForm, self).__init__(*args, **kwargs)
+        # One query per catalog for the whole batch, shared by every row.
+        variety_choices = [(v.id, v.name) for v in Variety.query.filter_by(is_active=True).order_by(Variety.name).all()]
+        packaging_choices = [(p.id, p.name) for p in RawMaterialPackaging.query.filter_by(is_active=True).order_by(RawMaterialPackaging.name).all()]
+        for entry in self.lots:
+            entry.form.variety_id.choices = variety_choices
+            entry.form.rawmaterialpackaging_id.choices = packaging_choices
+
 class FullTruckWeightForm(FlaskForm):
     loaded_truck_weight = FloatField('Loaded Truck Weight', validators=[DataRequired()])
     empty_truck_weight = FloatField('Empty Truck Weight', validators=[DataRequired()])
     submit = SubmitField('Register')
 
+def _apply_qc_metrics(form):
+    """Check the QC rules of ``QCService`` on the form data and fill the computed read-only fields."""
+    payload = {field: form[field].data for field in (*QC_SIZE_FIELDS, *QC_SHELLED_FIELDS, 'inshell_weight')}
+    try:
+        metrics = QCService.validate_payload(payload)
+    except QCValidationError as exc:
+        form.units.errors.append(str(exc))
+        return False
+    form.units.data = metrics['units']
+    form.shelled_weight.data = metrics['shelled_weight']
+    form.yieldpercentage.data = metrics['yieldpercentage']
+    return True
+
 class LotQCForm(FlaskForm):
     analyst = StringField('Analista', validators=[DataRequired(), Length(max=64)])
     date = DateField('Fecha', validators=[DataRequired()], format='%Y-%m-%d')
@@ -166,38 +207,15 @@ class LotQCForm(FlaskForm):
         is_valid = super().validate(extra_validators=extra_validators)
         if not is_valid:
             return False
-
-        inshell_weight = float(self.inshell_weight.data or 0)
-        if inshell_weight <= 0:
-            self.inshell_weight.errors.append('El peso con cáscara debe ser mayor que 0.')
-            return False
-
-        units = (
-            int(self.lessthan30.data or 0)
-            + int(self.between3032.data or 0)
-            + int(self.between3234.data or 0)
-            + int(self.between3436.data or 0)
-            + int(self.morethan36.data or 0)
-        )
-        if units != 100:
-            self.units.errors.append('Las unidades analizadas deben sumar exactamente 100.')
-            return False
-
-        shelled_weight = (
-            float(self.extra_light.data or 0)
-            + float(self.light.data or 0)
-            + float(self.light_amber.data or 0)
-            + float(self.amber.data or 0)
-        )
-        if shelled_weight <= 0:
-            self.shelled_weight.errors.append('El peso de pulpa debe ser mayor que 0.')
-            return False
-
-        self.units.data = units
-        self.shelled_weight.data = shelled_weight
-        self.yieldpercentage.data = round((shelled_weight / inshell_weight) * 100, 2)
-        return True
+        return _apply_qc_metrics(self)
         
+class QCImportForm(FlaskForm):
+    kind = SelectField('Tipo de QC', choices=[('lot', 'QC de lotes'), ('sample', 'QC de muestras')], default='lot')
+    table = FileField(
+        'Planilla', validators=[FileRequired(), FileAllowed(['csv', 'xlsx'], 'Solo archivos CSV o XLSX.')]
+    )
+    submit = SubmitField('Importar')
+
 class SampleQCForm(FlaskForm):
     grower = StringField('Productor', validators=[DataRequired(), Length(max=64)])
     brought_by = StringField('Muestra traida por', validators=[DataRequired(), Length(max=64)])
@@ -236,37 +254,7 @@ class SampleQCForm(FlaskForm):
         is_valid = super().validate(extra_validators=extra_validators)
         if not is_valid:
             return False
-
-        inshell_weight = float(self.inshell_weight.data or 0)
-        if inshell_weight <= 0:
-            self.inshell_weight.errors.append('El peso con cáscara debe ser mayor que 0.')
-            return False
-
-        units = (
-            int(self.lessthan30.data or 0)
-            + int(self.between3032.data or 0)
-            + int(self.between3234.data or 0)
-            + int(self.between3436.data or 0)
-            + int(self.morethan36.data or 0)
-        )
-        if units != 100:
-            self.units.errors.append('Las unidades analizadas deben sumar exactamente 100.')
-            return False
-
-        shelled_weight = (
-            float(self.extra_light.data or 0)
-            + float(self.light.data or 0)
-            + float(self.light_amber.data or 0)
-            + float(self.amber.data or 0)
-        )
-        if shelled_weight <= 0:
-            self.shelled_weight.errors.append('El peso de pulpa debe ser mayor que 0.')
-            return False
-
-        self.units.data = units
-        self.shelled_weight.data = shelled_weight
-        self.yieldpercentage.data = round((shelled_weight / inshell_weight) * 100, 2)
-        return True
+        return _apply_qc_metrics(self)
         
 class FumigationForm(FlaskForm):
     work_order = StringField('Orden de Trabajo', validators=[DataRequired()])
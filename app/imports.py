@@ -0,0 +1,112 @@
+"""Reading uploaded CSV/XLSX tables, the counterpart of ``app.exports``.
+
+Both formats are read with the standard library: CSV with ``csv`` (UTF-8, with or without BOM,
+comma or semicolon separated) and XLSX as a zip of XML parts, the first worksheet only. Cells
+come back as text or numbers; interpreting them is left to the caller.
+"""
+import csv
+import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+IMPORT_FORMATS = ("csv", "xlsx")
+_SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_CELL_COLUMN = re.compile(r"[A-Z]+")
+# Uncompressed size accepted for one XLSX part, against zip bombs.
+_MAX_XLSX_PART_BYTES = 64 * 1024 * 1024
+
+
+class TableImportError(ValueError):
+    pass
+
+
+def _read_csv(data):
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("latin-1")
+    sample = text[:4096]
+    delimiter = ";" if sample.count(";") > sample.count(",") else ","
+    return list(csv.reader(io.StringIO(text), delimiter=delimiter))
+
+
+def _xlsx_part(archive, name):
+    info = archive.getinfo(name)
+    if info.file_size > _MAX_XLSX_PART_BYTES:
+        raise TableImportError("La planilla es demasiado grande.")
+    content = archive.read(name)
+    if b"<!DOCTYPE" in content[:1024]:
+        raise TableImportError("La planilla no es un archivo XLSX válido.")
+    return content
+
+
+def _column_index(reference):
+    index = 0
+    for letter in _CELL_COLUMN.match(reference).group():
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _cell_value(cell, shared_strings):
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(text.text or "" for text in cell.iter(f"{_SHEET_NS}t"))
+    value = cell.find(f"{_SHEET_NS}v")
+    if value is None or value.text is None:
+        return ""
+    if kind == "s":
+        return shared_strings[int(value.text)]
+    if kind in ("str", "e"):
+        return value.text
+    if kind == "b":
+        return value.text == "1"
+    number = float(value.text)
+    return int(number) if number.is_integer() else number
+
+
+def _read_xlsx(data):
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise TableImportError("La planilla no es un archivo XLSX válido.")
+    with archive:
+        names = set(archive.namelist())
+        sheets = sorted(name for name in names if re.fullmatch(r"xl/worksheets/sheet\d+\.xml", name))
+        if not sheets:
+            raise TableImportError("La planilla no tiene hojas.")
+        shared_strings = []
+        if "xl/sharedStrings.xml" in names:
+            root = ET.fromstring(_xlsx_part(archive, "xl/sharedStrings.xml"))
+            shared_strings = [
+                "".join(text.text or "" for text in item.iter(f"{_SHEET_NS}t")) for item in root.iter(f"{_SHEET_NS}si")
+            ]
+        sheet = "xl/worksheets/sheet1.xml" if "xl/worksheets/sheet1.xml" in names else sheets[0]
+        rows = []
+        for row in ET.fromstring(_xlsx_part(archive, sheet)).iter(f"{_SHEET_NS}row"):
+            values = {}
+            for position, cell in enumerate(row.iter(f"{_SHEET_NS}c")):
+                reference = cell.get("r")
+                values[_column_index(reference) if reference else position] = _cell_value(cell, shared_strings)
+            rows.append([values.get(index, "") for index in range(max(values, default=-1) + 1)])
+        return rows
+
+
+def read_table(filename, data):
+    """``(header, rows)`` of an uploaded CSV or XLSX file; blank rows are dropped.
+
+    Each row is ``(line_number, cells)`` with the line number as the user sees it in the file.
+    """
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in (filename or "") else ""
+    if extension not in IMPORT_FORMATS:
+        raise TableImportError("Formatos aceptados: CSV o XLSX.")
+    table = _read_xlsx(data) if extension == "xlsx" else _read_csv(data)
+    numbered = [
+        (line_number, row)
+        for line_number, row in enumerate(table, 1)
+        if any(str(value).strip() for value in row)
+    ]
+    if not numbered:
+        raise TableImportError("El archivo está vacío.")
+    (_header_line, header), rows = numbered[0], numbered[1:]
+    return [str(title).strip() for title in header], rows
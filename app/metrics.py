@@ -0,0 +1,381 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_OPERATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help, histogram buckets)
+METRIC_DEFINITIONS = {
+    "petru_http_requests_total": ("counter", "HTTP responses by endpoint, method and status.", None),
+    "petru_http_request_duration_seconds": ("histogram", "Request latency by endpoint.", LATENCY_BUCKETS),
+    "petru_db_queries_total": ("counter", "SQL statements issued while serving each endpoint.", None),
+    "petru_db_query_seconds_total": ("counter", "Time spent in SQL while serving each endpoint.", None),
+    "petru_cache_requests_total": ("counter", "View cache lookups by cache and result (hit/miss).", None),
+    "petru_pdf_cache_requests_total": ("counter", "Disk PDF cache lookups by document kind and result.", None),
+    "petru_pdf_render_seconds": ("histogram", "WeasyPrint render time by document kind.", SLOW_OPERATION_BUCKETS),
+    "petru_upload_scan_seconds": ("histogram", "Antivirus scan time for uploads by outcome.", SLOW_OPERATION_BUCKETS),
+    "petru_db_pool_checked_out": ("gauge", "Connections currently checked out of the pool.", None),
+    "petru_db_pool_size": ("gauge", "Configured pool size.", None),
+    "petru_db_pool_overflow": ("gauge", "Connections opened beyond the pool size.", None),
+    "petru_http_compressed_responses_total": (
+        "counter",
+        "Compressed responses by encoding and compressed-body cache result.",
+        None,
+    ),
+    "petru_log_records_dropped_total": ("counter", "Log records dropped because the log queue was full.", None),
+    "petru_export_rows_total": ("counter", "Rows streamed by CSV/XLSX exports, by export and format.", None),
+    "petru_spc_out_of_control_total": (
+        "counter",
+        "QC control chart points flagged out of control, by metric and scope.",
+        None,
+    ),
+    "petru_scale_readings_total": ("counter", "Scale readings received by result (accepted/duplicates/invalid).", None),
+    "petru_scale_readings_applied_total": (
+        "counter",
+        "Stored scale readings resolved by result (applied/rejected/unmatched).",
+        None,
+    ),
+    "petru_template_warmup_seconds": ("gauge", "Time spent precompiling templates at startup.", None),
+    "petru_templates_precompiled": ("gauge", "Templates compiled by the startup warm-up.", None),
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((str(name), str(value)) for name, value in labels.items()))
+
+
+class MetricsRegistry:
+    """In-process metric values; each worker publishes a snapshot file for the scrape endpoint to merge."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._last_flush = 0.0
+
+    def _ensure_process(self):
+        # A registry inherited across fork would double count the parent's values.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, amount=1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._ensure_process()
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = METRIC_DEFINITIONS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._ensure_process()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._ensure_process()
+            self._gauges[key] = float(value)
+
+    def snapshot(self):
+        with self._lock:
+            self._ensure_process()
+            return {
+                "pid": self._pid,
+                "written_at": time.time(),
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [
+                    [name, list(labels), dict(histogram, buckets=list(histogram["buckets"]))]
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+                "gauges": [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+            }
+
+    def due_for_flush(self, interval):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_flush < interval:
+                return False
+            self._last_flush = now
+            return True
+
+
+registry = MetricsRegistry()
+
+
+def inc_counter(name, amount=1.0, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    registry.set_gauge(name, value, **labels)
+
+
+@contextmanager
+def timed(name, **labels):
+    """Observe the block's wall time into histogram ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - started, **labels)
+
+
+def cache_metrics(cache_name):
+    """Mark a view as cached and count hits/misses under ``cache_name``.
+
+    Place it directly under ``@cache.cached`` so it only runs when the cache misses;
+    a response served without running it is counted as a hit.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g.view_cache_miss = True
+            return f(*args, **kwargs)
+
+        decorated_function.cache_metric_name = cache_name
+        return decorated_function
+
+    return decorator
+
+
+def _view_cache_metric_name():
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    while view is not None:
+        name = getattr(view, "cache_metric_name", None)
+        if name:
+            return name
+        view = getattr(view, "__wrapped__", None)
+    return None
+
+
+def record_request(response, duration, query_stats):
+    endpoint = request.endpoint or "unmatched"
+    status = response.status_code
+    inc_counter("petru_http_requests_total", endpoint=endpoint, method=request.method, status=status)
+    if duration is not None:
+        observe("petru_http_request_duration_seconds", duration, endpoint=endpoint)
+    if query_stats is not None and query_stats.count:
+        inc_counter("petru_db_queries_total", query_stats.count, endpoint=endpoint)
+        inc_counter("petru_db_query_seconds_total", query_stats.duration, endpoint=endpoint)
+
+    cache_name = _view_cache_metric_name()
+    if cache_name:
+        if g.get("view_cache_miss"):
+            inc_counter("petru_cache_requests_total", cache=cache_name, result="miss")
+        elif status == 200:
+            inc_counter("petru_cache_requests_total", cache=cache_name, result="hit")
+
+
+def _metrics_dir():
+    return current_app.config["METRICS_DIR"]
+
+
+# Snapshot file holding the totals of workers that have exited.
+RETIRED_SNAPSHOT = "retired"
+
+
+def _snapshot_path(metrics_dir, pid):
+    return os.path.join(metrics_dir, f"metrics_{pid}.json")
+
+
+def _record_pool_gauges():
+    extension = current_app.extensions.get("sqlalchemy")
+    if extension is None:
+        return
+    pool = extension.engine.pool
+    for gauge_name, reader in (
+        ("petru_db_pool_checked_out", "checkedout"),
+        ("petru_db_pool_size", "size"),
+        ("petru_db_pool_overflow", "overflow"),
+    ):
+        read = getattr(pool, reader, None)
+        if callable(read):
+            set_gauge(gauge_name, read())
+
+
+def flush_snapshot(force=False):
+    """Write this process' values to ``METRICS_DIR``; throttled by ``METRICS_FLUSH_SECONDS``."""
+    if not has_app_context() or not current_app.config.get("METRICS_ENABLED", True):
+        return
+    interval = float(current_app.config.get("METRICS_FLUSH_SECONDS", 5))
+    if not registry.due_for_flush(0 if force else interval):
+        return
+
+    _record_pool_gauges()
+    metrics_dir = _metrics_dir()
+    os.makedirs(metrics_dir, exist_ok=True)
+    snapshot = registry.snapshot()
+    target_path = _snapshot_path(metrics_dir, snapshot["pid"])
+    temp_path = f"{target_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temp_path, target_path)
+
+
+def _read_snapshots(metrics_dir):
+    snapshots = []
+    for snapshot_path in sorted(glob.glob(os.path.join(metrics_dir, "metrics_*.json"))):
+        try:
+            with open(snapshot_path, encoding="utf-8") as snapshot_file:
+                snapshots.append(json.load(snapshot_file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def retire_snapshot(metrics_dir, pid):
+    """Fold an exited worker's counters and histograms into ``metrics_retired.json`` and drop its file.
+
+    Workers recycled by ``max_requests`` would otherwise leave one snapshot each behind, and every
+    scrape would parse a growing pile of them. Gauges describe a live process and are discarded.
+    Runs in the gunicorn master, one exit at a time.
+    """
+    snapshot_path = _snapshot_path(metrics_dir, pid)
+    try:
+        with open(snapshot_path, encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        snapshot = None
+    if snapshot is not None:
+        retired_path = _snapshot_path(metrics_dir, RETIRED_SNAPSHOT)
+        try:
+            with open(retired_path, encoding="utf-8") as retired_file:
+                retired = json.load(retired_file)
+        except (OSError, ValueError):
+            retired = {}
+        counters, histograms, _gauges = merge_snapshots([retired, snapshot])
+        merged = {
+            "pid": RETIRED_SNAPSHOT,
+            "written_at": time.time(),
+            "counters": [[name, [list(pair) for pair in labels], value] for (name, labels), value in counters.items()],
+            "histograms": [
+                [name, [list(pair) for pair in labels], histogram] for (name, labels), histogram in histograms.items()
+            ],
+            "gauges": [],
+        }
+        temp_path = f"{retired_path}.{pid}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as retired_file:
+            json.dump(merged, retired_file)
+        os.replace(temp_path, retired_path)
+    try:
+        os.remove(snapshot_path)
+    except OSError:
+        pass
+
+
+def merge_snapshots(snapshots, gauge_max_age=None):
+    """Sum counters and histograms across workers; gauges stay per-pid and skip stale workers."""
+    counters = {}
+    histograms = {}
+    gauges = {}
+    now = time.time()
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get("counters", []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, histogram in snapshot.get("histograms", []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.get(key)
+            if merged is None:
+                merged = histograms[key] = {"buckets": [0] * len(histogram["buckets"]), "sum": 0.0, "count": 0}
+            merged["buckets"] = [left + right for left, right in zip(merged["buckets"], histogram["buckets"])]
+            merged["sum"] += histogram["sum"]
+            merged["count"] += histogram["count"]
+        if gauge_max_age is not None and now - snapshot.get("written_at", 0) > gauge_max_age:
+            continue
+        for name, labels, value in snapshot.get("gauges", []):
+            key = (name, tuple(tuple(pair) for pair in labels) + (("pid", str(snapshot.get("pid"))),))
+            gauges[key] = value
+    return counters, histograms, gauges
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus(snapshots, gauge_max_age=None):
+    counters, histograms, gauges = merge_snapshots(snapshots, gauge_max_age)
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRIC_DEFINITIONS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "counter":
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        elif metric_type == "gauge":
+            for (series_name, labels), value in sorted(gauges.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        else:
+            for (series_name, labels), histogram in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for upper_bound, bucket_count in zip(buckets, histogram["buckets"]):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (("le", _format_value(upper_bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def collect_prometheus_text():
+    """Publish this worker's snapshot and render all workers' snapshots."""
+    flush_snapshot(force=True)
+    gauge_max_age = float(current_app.config.get("METRICS_FLUSH_SECONDS", 5)) * 6
+    return render_prometheus(_read_snapshots(_metrics_dir()), gauge_max_age=gauge_max_age)
+
+
+def metrics_request_allowed():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header == f"Bearer {token}":
+            return True
+    allowed = {
+        address.strip()
+        for address in str(current_app.config.get("METRICS_ALLOWED_IPS", "")).split(",")
+        if address.strip()
+    }
+    return (request.remote_addr or "") in allowed
@@ -163,6 +163,14 @@ class RawMaterialReception(BaseModel):
     clients = db.relationship('Client', secondary=rawmaterialreception_client, 
                               backref=db.backref('raw_material_receptions', lazy='dynamic'))
 
+# Source of new lot numbers on PostgreSQL; SQLite ignores sequences and uses LotNumberCounter.
+lot_number_seq = db.Sequence('lot_number_seq', metadata=db.metadata)
+
+class LotNumberCounter(db.Model):
+    __tablename__ = 'lotnumbercounters'
+    name = db.Column(db.String(32), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
 class Lot(BaseModel):
     __tablename__ = 'lots'
     __table_args__ = (
@@ -198,8 +206,28 @@ class FullTruckWeight(BaseModel):
     loaded_truck_weight = db.Column(db.Float, nullable=False)
     empty_truck_weight = db.Column(db.Float, nullable=False, default=0)
 
-    # One-to-One relationship
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), index=True)
+    # One-to-One relationship; the unique index is the conflict target of the bulk weight upsert.
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), index=True, unique=True)
+
+class ScaleReading(BaseModel):
+    __tablename__ = 'scalereadings'
+    __table_args__ = (
+        db.CheckConstraint("kind IN ('loaded', 'empty')", name='ck_scalereadings_kind_valid'),
+        db.CheckConstraint("status IN ('pending', 'applied', 'rejected', 'unmatched')", name='ck_scalereadings_status_valid'),
+        db.CheckConstraint('weight >= 0', name='ck_scalereadings_weight_non_negative'),
+        db.Index('ix_scalereadings_status_id', 'status', 'id'),
+    )
+    # Replays of the same reading collide on this key and are ignored.
+    reading_key = db.Column(db.String(64), unique=True, nullable=False)
+    truck_plate = db.Column(db.String(16), nullable=False)
+    read_at = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.String(6), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    lot_number = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(9), default='pending', nullable=False)
+    error = db.Column(db.String(255), nullable=True)
+
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=True, index=True)
 
 class LotQC(BaseModel, QCMixin):
     __tablename__ = 'lotsqc'
@@ -234,6 +262,93 @@ class SampleQC(BaseModel, QCMixin):
     brought_by = db.Column(db.String(64), unique=False, nullable=True)
     analyst = db.Column(db.String(64), unique=False, nullable=True)
 
+class QCRollup(BaseModel):
+    __tablename__ = 'qcrollups'
+    __table_args__ = (
+        db.CheckConstraint("source IN ('lot', 'sample')", name='ck_qcrollups_source_valid'),
+        db.CheckConstraint("dimension IN ('all', 'grower', 'variety', 'client')", name='ck_qcrollups_dimension_valid'),
+        # Conflict target of the incremental upsert.
+        db.UniqueConstraint('day', 'source', 'dimension', 'dimension_id', 'metric', name='uq_qcrollups_bucket'),
+        db.Index('ix_qcrollups_source_dimension_day', 'source', 'dimension', 'day'),
+    )
+    day = db.Column(db.Date, nullable=False)
+    source = db.Column(db.String(6), nullable=False)
+    dimension = db.Column(db.String(7), nullable=False)
+    # Grower, variety or client id; 0 for the plant-wide 'all' bucket.
+    dimension_id = db.Column(db.Integer, nullable=False, default=0)
+    metric = db.Column(db.String(24), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    total_sq = db.Column(db.Float, nullable=False, default=0)
+
+class ReceptionDailyFact(BaseModel):
+    __tablename__ = 'receptiondailyfacts'
+    __table_args__ = (
+        # Conflict target of the incremental upsert.
+        db.UniqueConstraint(
+            'day', 'client_id', 'grower_id', 'variety_id', 'rawmaterialpackaging_id', name='uq_receptiondailyfacts_key'
+        ),
+        db.Index('ix_receptiondailyfacts_day', 'day'),
+    )
+    # Reception date; client/grower 0 when the reception has none. Lots of a reception with several
+    # clients or growers are split evenly across each pair, so totals over any key add up to the plant.
+    day = db.Column(db.Date, nullable=False)
+    client_id = db.Column(db.Integer, nullable=False, default=0)
+    grower_id = db.Column(db.Integer, nullable=False, default=0)
+    variety_id = db.Column(db.Integer, nullable=False)
+    rawmaterialpackaging_id = db.Column(db.Integer, nullable=False)
+    lots = db.Column(db.Float, nullable=False, default=0)
+    bins = db.Column(db.Float, nullable=False, default=0)
+    net_kg = db.Column(db.Float, nullable=False, default=0)
+
+class QCControlChart(BaseModel):
+    __tablename__ = 'qccontrolcharts'
+    __table_args__ = (
+        db.CheckConstraint("scope IN ('variety', 'analyst')", name='ck_qccontrolcharts_scope_valid'),
+        db.CheckConstraint("kind IN ('xbar', 'p')", name='ck_qccontrolcharts_kind_valid'),
+        db.UniqueConstraint('scope', 'scope_key', 'metric', name='uq_qccontrolcharts_scope_metric'),
+    )
+    scope = db.Column(db.String(8), nullable=False)
+    # Variety id or analyst name.
+    scope_key = db.Column(db.String(64), nullable=False)
+    metric = db.Column(db.String(24), nullable=False)
+    kind = db.Column(db.String(4), nullable=False)
+    subgroup_size = db.Column(db.Integer, nullable=False, default=1)
+    # Welford running mean and sum of squared deviations of the individual values.
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0)
+    m2 = db.Column(db.Float, nullable=False, default=0)
+    # Completed subgroups (X-bar/R) or samples (p), with the running averages behind the limits.
+    subgroups = db.Column(db.Integer, nullable=False, default=0)
+    xbar_mean = db.Column(db.Float, nullable=False, default=0)
+    range_mean = db.Column(db.Float, nullable=False, default=0)
+    defective = db.Column(db.Integer, nullable=False, default=0)
+    inspected = db.Column(db.Integer, nullable=False, default=0)
+    # Subgroup still being filled.
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+    open_sum = db.Column(db.Float, nullable=False, default=0)
+    open_min = db.Column(db.Float, nullable=True)
+    open_max = db.Column(db.Float, nullable=True)
+
+class QCControlPoint(BaseModel):
+    __tablename__ = 'qccontrolpoints'
+    __table_args__ = (
+        db.UniqueConstraint('chart_id', 'sequence', name='uq_qccontrolpoints_chart_sequence'),
+    )
+    chart_id = db.Column(db.Integer, db.ForeignKey('qccontrolcharts.id'), nullable=False)
+    sequence = db.Column(db.Integer, nullable=False)
+    # Last QC of the subgroup.
+    lotqc_id = db.Column(db.Integer, db.ForeignKey('lotsqc.id'), nullable=True)
+    value = db.Column(db.Float, nullable=False)
+    range = db.Column(db.Float, nullable=True)
+    # Limits in force when the point arrived; empty until the chart has enough history.
+    center = db.Column(db.Float, nullable=True)
+    lcl = db.Column(db.Float, nullable=True)
+    ucl = db.Column(db.Float, nullable=True)
+    range_lcl = db.Column(db.Float, nullable=True)
+    range_ucl = db.Column(db.Float, nullable=True)
+    out_of_control = db.Column(db.Boolean, nullable=False, default=False)
+
 fumigation_lot = db.Table('fumigation_lot',
     db.Column('fumigation_id', db.Integer, db.ForeignKey('fumigations.id'), primary_key=True),
     db.Column('lot_id', db.Integer, db.ForeignKey('lots.id'), primary_key=True, index=True)
@@ -241,7 +356,18 @@ fumigation_lot = db.Table('fumigation_lot',
 
 class Fumigation(BaseModel):
     __tablename__ = 'fumigations'
+    __table_args__ = (
+        db.CheckConstraint("status IN ('2', '3', '4')", name='ck_fumigations_status_valid'),
+        db.Index('ix_fumigations_status_created_at', 'status', 'created_at'),
+    )
     work_order = db.Column(db.String(64), unique=True, nullable=False)
+    # Lot fumigation state shared by the whole work order, with lot counts per state and the lots'
+    # net kg, kept by FumigationService so lists need not load the lots.
+    status = db.Column(db.String(1), default='2', nullable=False)
+    assigned_lots = db.Column(db.Integer, default=0, nullable=False)
+    started_lots = db.Column(db.Integer, default=0, nullable=False)
+    completed_lots = db.Column(db.Integer, default=0, nullable=False)
+    net_weight = db.Column(db.Float, default=0, nullable=False)
     real_start_date = db.Column(db.Date, nullable=True)
     real_start_time = db.Column(db.Time, nullable=True)
     real_end_date = db.Column(db.Date, nullable=True)
@@ -252,3 +378,41 @@ class Fumigation(BaseModel):
 
     # Many-to-Many relationships
     lots = db.relationship('Lot', secondary=fumigation_lot, backref=db.backref('fumigations', lazy='dynamic'))
+
+class LotEvent(BaseModel):
+    """Append-only journal of lot state changes; ``id`` is the offset projections resume from."""
+    __tablename__ = 'lotevents'
+    __table_args__ = (
+        db.Index('ix_lotevents_lot_id_id', 'lot_id', 'id'),
+        db.Index('ix_lotevents_kind_id', 'kind', 'id'),
+    )
+    kind = db.Column(db.String(32), nullable=False)
+    # Reception-level events (reception_closed) carry no lot.
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=True)
+    rawmaterialreception_id = db.Column(db.Integer, db.ForeignKey('rawmaterialreceptions.id'), nullable=True)
+    data = db.Column(db.JSON, nullable=False, default=dict)
+
+class ProjectionOffset(db.Model):
+    __tablename__ = 'projectionoffsets'
+    name = db.Column(db.String(32), primary_key=True)
+    # Id of the last LotEvent applied.
+    position = db.Column(db.Integer, nullable=False, default=0)
+    # Runs of event ids missing from the journal, "first-last" -> epoch seconds when first seen missing.
+    gaps = db.Column(db.JSON, nullable=False, default=dict)
+
+class ProjectionValue(BaseModel):
+    __tablename__ = 'projectionvalues'
+    __table_args__ = (
+        # Conflict target of the incremental upsert.
+        db.UniqueConstraint('projection', 'key', name='uq_projectionvalues_key'),
+    )
+    projection = db.Column(db.String(32), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+class LotStateClock(BaseModel):
+    """Fumigation state each lot is in and since when, kept by the time-in-state projection."""
+    __tablename__ = 'lotstateclocks'
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), unique=True, nullable=False)
+    state = db.Column(db.String(1), nullable=False)
+    entered_at = db.Column(db.DateTime, nullable=False)
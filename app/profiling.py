@@ -0,0 +1,212 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from flask import current_app, g, request
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from app.permissions import is_admin
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_QUERY_FLAG = "_profile"
+
+_PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,160}$")
+_TOKEN_SALT = "petru-request-profile"
+
+# cProfile and tracemalloc both hook the whole interpreter, so one request per process is profiled at
+# a time; requests triggered while it runs are served without a profile.
+_profile_lock = threading.Lock()
+
+
+def _token_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=_TOKEN_SALT)
+
+
+def generate_profile_token():
+    """Signed value for the ``X-Profile-Token`` header; valid for ``PROFILING_TOKEN_MAX_AGE`` seconds."""
+    return _token_serializer().dumps({"profile": True})
+
+
+def _valid_profile_token(token):
+    if not token:
+        return False
+    max_age = int(current_app.config.get("PROFILING_TOKEN_MAX_AGE", 3600))
+    try:
+        payload = _token_serializer().loads(token, max_age=max_age)
+    except BadSignature:
+        return False
+    return isinstance(payload, dict) and payload.get("profile") is True
+
+
+def _profile_trigger():
+    if _valid_profile_token(request.headers.get(PROFILE_HEADER)):
+        return "header"
+    # Loading the user costs a query, so only do it when the flag is present.
+    if request.args.get(PROFILE_QUERY_FLAG) == "1" and is_admin(current_user):
+        return "query"
+    sample_rate = int(current_app.config.get("PROFILING_SAMPLE_RATE", 0) or 0)
+    if sample_rate > 0 and random.randrange(sample_rate) == 0:
+        return "sample"
+    return None
+
+
+def start_request_profile():
+    if not current_app.config.get("PROFILING_ENABLED", True):
+        return
+    trigger = _profile_trigger()
+    if trigger is None or not _profile_lock.acquire(blocking=False):
+        return
+    # Leave tracing alone if someone else (python -X tracemalloc, say) already started it.
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    g.request_profile = {
+        "profiler": profiler,
+        "trigger": trigger,
+        "started_at": time.perf_counter(),
+        "started_tracing": started_tracing,
+    }
+    profiler.enable()
+
+
+def record_profile_status(response):
+    profile = g.get("request_profile")
+    if profile is not None:
+        profile["status"] = response.status_code
+    return response
+
+
+def _profile_id(request_id):
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    safe_request_id = request_id[:64] if _PROFILE_ID_PATTERN.match(request_id or "") else "request"
+    return f"{timestamp}_{safe_request_id}"
+
+
+def _top_functions(profiler, limit):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, lineno, function_name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{os.path.basename(filename)}:{lineno}({function_name})",
+                "calls": calls,
+                "total_ms": round(total * 1000.0, 2),
+                "cumulative_ms": round(cumulative * 1000.0, 2),
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _top_allocations(snapshot, limit):
+    return [
+        {
+            "location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024.0, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def finish_request_profile(_exc=None):
+    profile = g.pop("request_profile", None)
+    if profile is None:
+        return
+    profiler = profile["profiler"]
+    try:
+        profiler.disable()
+        duration = time.perf_counter() - profile["started_at"]
+        # Memory is traced for the whole process: other threads' allocations count too.
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        if profile["started_tracing"]:
+            tracemalloc.stop()
+        _profile_lock.release()
+
+    profile_dir = current_app.config["PROFILING_DIR"]
+    os.makedirs(profile_dir, exist_ok=True)
+    profile_id = _profile_id(g.get("request_id"))
+    profiler.dump_stats(os.path.join(profile_dir, f"{profile_id}.prof"))
+    summary = {
+        "profile_id": profile_id,
+        "request_id": g.get("request_id", "-"),
+        "captured_at": datetime.now(timezone.utc).isoformat(),
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint or "-",
+        "status": profile.get("status", 500),
+        "trigger": profile["trigger"],
+        "duration_ms": round(duration * 1000.0, 1),
+        "peak_memory_kb": round(peak / 1024.0, 1),
+        "top_functions": _top_functions(profiler, 40),
+        "top_allocations": _top_allocations(snapshot, 15),
+    }
+    with open(os.path.join(profile_dir, f"{profile_id}.json"), "w", encoding="utf-8") as summary_file:
+        json.dump(summary, summary_file, ensure_ascii=False)
+    _prune_profiles(profile_dir, int(current_app.config.get("PROFILING_MAX_PROFILES", 200)))
+    current_app.logger.info(
+        "request_profiled profile_id=%s endpoint=%s trigger=%s duration_ms=%.1f peak_memory_kb=%.1f",
+        profile_id,
+        summary["endpoint"],
+        summary["trigger"],
+        summary["duration_ms"],
+        summary["peak_memory_kb"],
+    )
+
+
+def _prune_profiles(profile_dir, keep):
+    summaries = sorted(name for name in os.listdir(profile_dir) if name.endswith(".json"))
+    for name in summaries[:-keep] if keep > 0 else []:
+        stem = name[: -len(".json")]
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(profile_dir, stem + suffix))
+            except OSError:
+                continue
+
+
+def install_request_profiler(flask_app):
+    """Register the profiler hooks; call before other request hooks so it wraps them."""
+    flask_app.before_request(start_request_profile)
+    flask_app.after_request(record_profile_status)
+    flask_app.teardown_request(finish_request_profile)
+
+
+def list_profiles(profile_dir):
+    """Return stored profile summaries, newest first."""
+    if not profile_dir or not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(profile_dir), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(profile_dir, name), encoding="utf-8") as summary_file:
+                profiles.append(json.load(summary_file))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_paths(profile_dir, profile_id):
+    """Return ``(summary_path, pstats_path)`` for a stored profile, or ``None`` for unknown ids."""
+    if not _PROFILE_ID_PATTERN.match(profile_id or ""):
+        return None
+    summary_path = os.path.join(profile_dir, f"{profile_id}.json")
+    if not os.path.exists(summary_path):
+        return None
+    return summary_path, os.path.join(profile_dir, f"{profile_id}.prof")
@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a view runs more SQL statements than its declared budget."""
+
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+_local = threading.local()
+_statement_observers = []
+
+
+def statement_fingerprint(statement):
+    normalized = _WHITESPACE.sub(" ", str(statement or "")).strip()
+    normalized = _STRING_LITERAL.sub("'?'", normalized)
+    normalized = _NUMBER_LITERAL.sub("N", normalized)
+    # Expanded IN lists change length per call; collapse them so batches share one fingerprint.
+    return _PLACEHOLDER_LIST.sub("(?)", normalized)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000.0
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[statement_fingerprint(statement)] += 1
+
+    def repeated_statements(self, threshold):
+        return [
+            (fingerprint, repeats)
+            for fingerprint, repeats in self.fingerprints.most_common()
+            if repeats >= threshold
+        ]
+
+
+def _active_collectors():
+    collectors = list(getattr(_local, "collectors", ()))
+    if has_request_context():
+        request_stats = g.get("query_stats")
+        if request_stats is not None:
+            collectors.append(request_stats)
+    return collectors
+
+
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, _cursor, statement, parameters, _context, executemany):
+    started = conn.info.get("query_started_at")
+    if not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    for stats in _active_collectors():
+        stats.record(statement, duration)
+    for observer in _statement_observers:
+        observer(conn, statement, parameters, executemany, duration)
+
+
+def register_statement_observer(observer):
+    """Call ``observer(conn, statement, parameters, executemany, duration)`` after every statement."""
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+
+
+def install_engine_listeners():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def collect_queries():
+    """Count statements issued inside the block, independently of any request."""
+    stats = QueryStats()
+    collectors = getattr(_local, "collectors", None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+def start_request_query_stats():
+    g.query_stats = QueryStats()
+
+
+def current_query_stats():
+    if not has_request_context():
+        return None
+    return g.get("query_stats")
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view may run per request.
+
+    Place it directly under the route decorator so the attribute lands on the
+    registered view function.
+    """
+
+    def decorator(f):
+        f.query_budget = int(max_queries)
+        return f
+
+    return decorator
+
+
+def _view_query_budget():
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    return getattr(view, "query_budget", None)
+
+
+def check_query_budget(stats):
+    budget = _view_query_budget()
+    if budget is None or stats is None or stats.count <= budget:
+        return
+    message = f"endpoint={request.endpoint} queries={stats.count} budget={budget}"
+    if current_app.config.get("SQL_QUERY_BUDGET_STRICT", False):
+        raise QueryBudgetExceeded(f"Query budget exceeded: {message}")
+    current_app.logger.warning("query_budget_exceeded %s", message)
+
+
+def report_repeated_statements(stats):
+    threshold = int(current_app.config.get("SQL_N_PLUS_ONE_THRESHOLD", 0) or 0)
+    if stats is None or threshold <= 0:
+        return
+    for fingerprint, repeats in stats.repeated_statements(threshold):
+        current_app.logger.warning(
+            "n_plus_one_suspected endpoint=%s repeats=%s statement=%s",
+            request.endpoint or "-",
+            repeats,
+            fingerprint[:300],
+        )
+
+
+def server_timing_header(stats, total_duration):
+    parts = []
+    if stats is not None:
+        parts.append(f'db;desc="{stats.count} queries";dur={stats.duration_ms:.1f}')
+    if total_duration is not None:
+        parts.append(f"app;dur={total_duration * 1000.0:.1f}")
+    return ", ".join(parts)
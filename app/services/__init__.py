@@ -1,18 +1,73 @@
-from .fumigation_service import FumigationService, VALID_TRANSITIONS, can_transition, transition_fumigation_status
-from .lot_service import LotService, LotValidationError
-from .pdf_cache_service import get_cached_pdf, save_pdf_to_cache, invalidate_cached_pdf
-from .qc_service import QCService, QCValidationError
+from .fumigation_service import (
+    FumigationService,
+    FumigationTransitionError,
+    VALID_TRANSITIONS,
+    can_transition,
+    transition_fumigation_status,
+)
+from .fumigation_plan_service import (
+    FUMIGATION_PLAN_UNITS,
+    FumigationPlan,
+    FumigationPlanError,
+    FumigationPlanService,
+    parse_capacities,
+)
+from .lot_event_service import LOT_EVENT_KINDS, LotEventService
+from .lot_number_service import LotNumberAllocator
+from .lot_service import LotService, LotSpec, LotValidationError, TruckWeightEntry
+from .pdf_cache_service import get_cached_pdf, save_pdf_to_cache, invalidate_cached_pdf, invalidate_cached_pdfs
+from .pdf_render_service import qr_data_uri, qr_png, render_pdf
+from .projection_service import PROJECTIONS, Projection, ProjectionService
+from .qc_import_service import QC_IMPORT_COLUMNS, QCImportResult, QCImportService
+from .qc_rollup_service import QC_ROLLUP_METRICS, QCRollupService
+from .qc_service import QC_MEASUREMENT_LABELS, QCService, QCValidationError
+from .spc_service import SPC_METRICS, SPCError, SPCService
+from .throughput_service import THROUGHPUT_DIMENSIONS, ThroughputService, season_start
+from .scale_service import ScaleReadingError, ScaleService, scale_reading_applier
 
 __all__ = [
     "FumigationService",
+    "FumigationTransitionError",
     "VALID_TRANSITIONS",
     "can_transition",
     "transition_fumigation_status",
+    "FUMIGATION_PLAN_UNITS",
+    "FumigationPlan",
+    "FumigationPlanError",
+    "FumigationPlanService",
+    "parse_capacities",
+    "LOT_EVENT_KINDS",
+    "LotEventService",
+    "LotNumberAllocator",
     "LotService",
+    "LotSpec",
     "LotValidationError",
+    "TruckWeightEntry",
     "get_cached_pdf",
     "save_pdf_to_cache",
     "invalidate_cached_pdf",
+    "invalidate_cached_pdfs",
+    "qr_data_uri",
+    "qr_png",
+    "render_pdf",
+    "PROJECTIONS",
+    "Projection",
+    "ProjectionService",
+    "QC_IMPORT_COLUMNS",
+    "QCImportResult",
+    "QCImportService",
+    "QC_ROLLUP_METRICS",
+    "QCRollupService",
+    "QC_MEASUREMENT_LABELS",
     "QCService",
     "QCValidationError",
+    "SPC_METRICS",
+    "SPCError",
+    "SPCService",
+    "ScaleReadingError",
+    "ScaleService",
+    "scale_reading_applier",
+    "THROUGHPUT_DIMENSIONS",
+    "ThroughputService",
+    "season_start",
 ]
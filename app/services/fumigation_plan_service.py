@@ -0,0 +1,147 @@
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Lot
+
+# Chamber capacity units and the lot column each one measures.
+FUMIGATION_PLAN_UNITS = {
+    "kg": "net_weight",
+    "bins": "packagings_quantity",
+}
+_MAX_CHAMBERS = 20
+
+
+class FumigationPlanError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class WaitingLot:
+    id: int
+    lot_number: int
+    net_weight: float
+    packagings_quantity: int
+    created_at: datetime
+
+
+@dataclass
+class ChamberLoad:
+    # 1-based position of the chamber in the capacities given to the planner.
+    chamber: int
+    capacity: float
+    lots: list = field(default_factory=list)
+    load: float = 0.0
+
+    @property
+    def fill(self):
+        return self.load / self.capacity
+
+    @property
+    def lot_ids(self):
+        return [lot.id for lot in self.lots]
+
+    @property
+    def net_weight(self):
+        return sum(lot.net_weight for lot in self.lots)
+
+    @property
+    def packagings_quantity(self):
+        return sum(lot.packagings_quantity for lot in self.lots)
+
+
+@dataclass
+class FumigationPlan:
+    unit: str
+    loads: list
+    # Lots that fit a chamber but not this round, oldest first.
+    waiting: list
+    # Lots no chamber can take: unweighed lots when planning by kg, or larger than every chamber.
+    skipped: list
+
+
+def parse_capacities(text):
+    """Chamber capacities from a comma, semicolon or space separated list such as ``"24000, 18000"``."""
+    capacities = []
+    for part in str(text or "").replace(";", ",").replace(" ", ",").split(","):
+        if not part:
+            continue
+        try:
+            capacity = float(part)
+        except ValueError:
+            raise FumigationPlanError(f"Capacidad de cámara no válida: {part}.")
+        # float() also reads "nan" and "inf", which no chamber holds.
+        if not math.isfinite(capacity):
+            raise FumigationPlanError(f"Capacidad de cámara no válida: {part}.")
+        if capacity <= 0:
+            raise FumigationPlanError("Las capacidades de cámara deben ser mayores que cero.")
+        capacities.append(capacity)
+    if not capacities:
+        raise FumigationPlanError("Indique la capacidad de al menos una cámara.")
+    if len(capacities) > _MAX_CHAMBERS:
+        raise FumigationPlanError(f"Se pueden planificar hasta {_MAX_CHAMBERS} cámaras a la vez.")
+    return capacities
+
+
+class FumigationPlanService:
+    """Proposes fumigation work orders that fill the chambers with the lots waiting longest.
+
+    Chambers are filled in the order given. Each one scans the waiting lots oldest first and takes
+    every lot that still fits (first fit), so the oldest lot always goes in and younger, smaller lots
+    fill the space the next old lot would not. One pass per chamber over a column-only query keeps
+    thousands of waiting lots in the milliseconds.
+    """
+
+    @staticmethod
+    def waiting_lots():
+        """Lots not yet assigned to a fumigation (``fumigation_status='1'``), oldest first."""
+        rows = db.session.execute(
+            select(Lot.id, Lot.lot_number, Lot.net_weight, Lot.packagings_quantity, Lot.created_at)
+            .where(Lot.fumigation_status == "1")
+            .order_by(Lot.created_at, Lot.lot_number)
+        )
+        return [
+            WaitingLot(lot_id, lot_number, net_weight or 0.0, packagings_quantity, created_at)
+            for lot_id, lot_number, net_weight, packagings_quantity, created_at in rows
+        ]
+
+    @staticmethod
+    def plan(lots, capacities, unit="kg"):
+        """Split ``lots`` into one ``ChamberLoad`` per chamber with room for at least one lot."""
+        if unit not in FUMIGATION_PLAN_UNITS:
+            raise FumigationPlanError(f"Unidad de capacidad no válida: {unit}.")
+        column = FUMIGATION_PLAN_UNITS[unit]
+        largest = max(capacities)
+        queue, skipped = [], []
+        for lot in sorted(lots, key=lambda lot: (lot.created_at or datetime.min, lot.lot_number)):
+            size = getattr(lot, column)
+            (queue if 0 < size <= largest else skipped).append(lot)
+
+        loads = []
+        for chamber, capacity in enumerate(capacities, 1):
+            if not queue:
+                break
+            load = ChamberLoad(chamber, capacity)
+            smallest = min(getattr(lot, column) for lot in queue)
+            remaining = []
+            for position, lot in enumerate(queue):
+                if capacity - load.load < smallest:
+                    remaining.extend(queue[position:])
+                    break
+                size = getattr(lot, column)
+                if load.load + size <= capacity:
+                    load.lots.append(lot)
+                    load.load += size
+                else:
+                    remaining.append(lot)
+            queue = remaining
+            if load.lots:
+                loads.append(load)
+        return FumigationPlan(unit=unit, loads=loads, waiting=queue, skipped=skipped)
+
+    @classmethod
+    def plan_waiting_lots(cls, capacities, unit="kg"):
+        return cls.plan(cls.waiting_lots(), capacities, unit)
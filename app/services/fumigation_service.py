@@ -1,5 +1,10 @@
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func, insert, select, update
+
 from app import db
-from app.models import Fumigation, Lot
+from app.models import Fumigation, Lot, fumigation_lot
+from app.services.lot_event_service import LotEventService
 
 
 VALID_TRANSITIONS = {
@@ -9,6 +14,13 @@ VALID_TRANSITIONS = {
     4: [],
 }
 
+# Fumigation column counting the work order's lots in each lot state.
+_LOT_COUNT_COLUMNS = {
+    "2": "assigned_lots",
+    "3": "started_lots",
+    "4": "completed_lots",
+}
+
 
 def _coerce_state(state_value, field_label):
     try:
@@ -36,6 +48,29 @@ def transition_fumigation_status(lot, new_state):
     return lot
 
 
+class FumigationTransitionError(ValueError):
+    """Some lots could not take a transition; ``blocked`` holds ``(lot_id, lot_number, state)`` for each.
+
+    ``lot_number`` and ``state`` are ``None`` for lots that do not exist.
+    """
+
+    def __init__(self, target_state, blocked):
+        self.target_state = target_state
+        self.blocked = blocked
+        shown = ", ".join(
+            f"lote {lot_number} (estado {state})" if lot_number is not None else f"lote id {lot_id} (no existe)"
+            for lot_id, lot_number, state in blocked[:10]
+        )
+        more = f" y {len(blocked) - 10} más" if len(blocked) > 10 else ""
+        super().__init__(f"No se puede pasar a estado {target_state}: {shown}{more}.")
+
+
+def source_states(new_state):
+    """States from which ``VALID_TRANSITIONS`` allows moving to ``new_state``, as stored on ``lots``."""
+    target_state = _coerce_state(new_state, "nuevo")
+    return [str(state) for state, allowed in VALID_TRANSITIONS.items() if target_state in allowed]
+
+
 def can_transition(lot, new_state):
     try:
         current_state = _coerce_state(lot.fumigation_status, "actual")
@@ -56,14 +91,86 @@ class FumigationService:
     COMPLETED = 4
 
     @staticmethod
-    def _load_lots_for_update(lot_ids):
-        lots = (
-            Lot.query.filter(Lot.id.in_(lot_ids))
-            .order_by(Lot.id.asc())
-            .with_for_update()
-            .all()
+    def _record_transition(fumigation, new_state, moved):
+        """Move ``moved`` lots between the per-state counters and set the work order status."""
+        previous_column = _LOT_COUNT_COLUMNS[fumigation.status]
+        target_column = _LOT_COUNT_COLUMNS[str(new_state)]
+        setattr(fumigation, previous_column, getattr(fumigation, previous_column) - moved)
+        setattr(fumigation, target_column, getattr(fumigation, target_column) + moved)
+        fumigation.status = str(new_state)
+
+    @staticmethod
+    def record_net_weight_changes(changes):
+        """Add ``(lot, kg_delta)`` pairs from weight registration to the work orders holding those lots."""
+        deltas = {lot.id: delta for lot, delta in changes if delta}
+        if not deltas:
+            return
+        totals = defaultdict(float)
+        links = db.session.execute(
+            select(fumigation_lot.c.fumigation_id, fumigation_lot.c.lot_id).where(fumigation_lot.c.lot_id.in_(deltas))
+        )
+        for fumigation_id, lot_id in links:
+            totals[fumigation_id] += deltas[lot_id]
+        if not totals:
+            return
+        table = Fumigation.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("fumigation_id"))
+            .values(net_weight=table.c.net_weight + bindparam("delta")),
+            [{"fumigation_id": fumigation_id, "delta": delta} for fumigation_id, delta in totals.items()],
         )
-        return lots
+
+    @staticmethod
+    def fumigation_lot_ids(fumigation):
+        return db.session.scalars(
+            select(fumigation_lot.c.lot_id).where(fumigation_lot.c.fumigation_id == fumigation.id)
+        ).all()
+
+    @staticmethod
+    def blocked_lots(lot_ids, new_state):
+        """``(lot_id, lot_number, state)`` of the lots that cannot move to ``new_state``, from one query."""
+        lot_ids = set(lot_ids)
+        sources = source_states(new_state)
+        rows = db.session.execute(
+            select(Lot.id, Lot.lot_number, Lot.fumigation_status).where(Lot.id.in_(lot_ids))
+        ).all()
+        blocked = [(lot_id, lot_number, state) for lot_id, lot_number, state in rows if state not in sources]
+        blocked.extend((lot_id, None, None) for lot_id in sorted(lot_ids - {row[0] for row in rows}))
+        return sorted(blocked, key=lambda row: (row[1] is None, row[1] or 0, row[0]))
+
+    @classmethod
+    def transition_lots(cls, lot_ids, new_state, fumigation_id=None):
+        """Move every lot in ``lot_ids`` to ``new_state`` with one guarded UPDATE.
+
+        The UPDATE only matches lots in a state ``VALID_TRANSITIONS`` allows leaving for ``new_state``;
+        if it matches fewer rows than requested it is rolled back and ``FumigationTransitionError``
+        names the lots that blocked it. Each moved lot gets a ``fumigation_status_changed`` journal
+        event. Returns the number of lots updated.
+        """
+        lot_ids = set(lot_ids)
+        target_state = _coerce_state(new_state, "nuevo")
+        sources = source_states(target_state)
+        with cls._transaction_context():
+            updated = db.session.scalars(
+                update(Lot)
+                .where(Lot.id.in_(lot_ids), Lot.fumigation_status.in_(sources))
+                .values(fumigation_status=str(target_state))
+                .returning(Lot.id)
+            ).all()
+            if len(updated) != len(lot_ids):
+                updated = set(updated)
+                blocked = [row for row in cls.blocked_lots(lot_ids, target_state) if row[0] not in updated]
+                raise FumigationTransitionError(target_state, blocked)
+            # VALID_TRANSITIONS is linear, so every target state has a single source.
+            LotEventService.record(
+                "fumigation_status_changed",
+                [
+                    (lot_id, {"from": sources[0], "to": str(target_state), "fumigation_id": fumigation_id})
+                    for lot_id in sorted(updated)
+                ],
+            )
+        return len(updated)
 
     @staticmethod
     def _transaction_context():
@@ -79,18 +186,17 @@ class FumigationService:
             raise ValueError("La Orden de Fumigación ya existe. Por favor, use otra.")
 
         with cls._transaction_context():
-            lots = cls._load_lots_for_update(lot_ids)
-            if len(lots) != len(set(lot_ids)):
-                raise ValueError("Uno o más lotes seleccionados no existen.")
-
-            fumigation = Fumigation(work_order=work_order)
+            fumigation = Fumigation(work_order=work_order, status=str(cls.ASSIGNED))
             db.session.add(fumigation)
-
-            for lot in lots:
-                transition_fumigation_status(lot, cls.ASSIGNED)
-                fumigation.lots.append(lot)
-
             db.session.flush()
+            fumigation.assigned_lots = cls.transition_lots(lot_ids, cls.ASSIGNED, fumigation.id)
+            fumigation.net_weight = db.session.scalar(
+                select(func.coalesce(func.sum(Lot.net_weight), 0.0)).where(Lot.id.in_(set(lot_ids)))
+            )
+            db.session.execute(
+                insert(fumigation_lot),
+                [{"fumigation_id": fumigation.id, "lot_id": lot_id} for lot_id in sorted(set(lot_ids))],
+            )
         return fumigation
 
     @classmethod
@@ -106,8 +212,8 @@ class FumigationService:
             raise ValueError("Esta fumigación ya fue completada.")
 
         with cls._transaction_context():
-            for lot in fumigation.lots:
-                transition_fumigation_status(lot, cls.STARTED)
+            started = cls.transition_lots(cls.fumigation_lot_ids(fumigation), cls.STARTED, fumigation.id)
+            cls._record_transition(fumigation, cls.STARTED, started)
 
             fumigation.real_start_date = real_start_date
             fumigation.real_start_time = real_start_time
@@ -125,8 +231,8 @@ class FumigationService:
             raise ValueError("Esta fumigación ya fue completada.")
 
         with cls._transaction_context():
-            for lot in fumigation.lots:
-                transition_fumigation_status(lot, cls.COMPLETED)
+            completed = cls.transition_lots(cls.fumigation_lot_ids(fumigation), cls.COMPLETED, fumigation.id)
+            cls._record_transition(fumigation, cls.COMPLETED, completed)
 
             fumigation.real_end_date = real_end_date
             fumigation.real_end_time = real_end_time
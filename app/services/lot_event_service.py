@@ -0,0 +1,163 @@
+from collections import defaultdict
+
+from sqlalchemy import exists, insert, select
+
+from app import db
+from app.basemodel import _utcnow_naive
+from app.models import Lot, LotEvent
+
+# Every kind of journal event and what its ``data`` holds.
+LOT_EVENT_KINDS = {
+    "lot_created": "lot_number, packagings_quantity, variety_id, rawmaterialpackaging_id",
+    "lot_weighed": "net_weight and its change (delta) in kg",
+    "qc_recorded": "lotqc_id and yieldpercentage",
+    "fumigation_status_changed": "from and to states, fumigation_id",
+    "reception_closed": "nothing; the event carries the reception id",
+    # State of a lot that existed before the journal, written once by backfill().
+    "lot_snapshot": "lot_number, packagings_quantity, net_weight, has_qc, fumigation_status",
+}
+
+# Events that open a lot's history; a lot has exactly one of them.
+_LOT_START_KINDS = ("lot_created", "lot_snapshot")
+
+
+class LotEventService:
+    """Appends to the lot event journal inside the caller's transaction; events are never changed.
+
+    Services that change lot state (``LotService``, ``QCService``, ``QCImportService`` and
+    ``FumigationService``) write one event per lot with a single INSERT per call, so the journal
+    commits or rolls back together with the change it describes.
+    """
+
+    @staticmethod
+    def record(kind, entries, occurred_at=None):
+        """Append one ``kind`` event per ``(lot_id, data)`` entry, or ``(lot_id, reception_id, data)``."""
+        if kind not in LOT_EVENT_KINDS:
+            raise ValueError(f"Unknown lot event kind: {kind}")
+        now = occurred_at or _utcnow_naive()
+        rows = []
+        for entry in entries:
+            lot_id, reception_id, data = entry if len(entry) == 3 else (entry[0], None, entry[1])
+            rows.append(
+                {
+                    "kind": kind,
+                    "lot_id": lot_id,
+                    "rawmaterialreception_id": reception_id,
+                    "data": data,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+        if rows:
+            db.session.execute(insert(LotEvent), rows)
+
+    @staticmethod
+    def record_lots_created(lots):
+        LotEventService.record(
+            "lot_created",
+            [
+                (
+                    lot.id,
+                    lot.rawmaterialreception_id,
+                    {
+                        "lot_number": lot.lot_number,
+                        "packagings_quantity": lot.packagings_quantity,
+                        "variety_id": lot.variety_id,
+                        "rawmaterialpackaging_id": lot.rawmaterialpackaging_id,
+                    },
+                )
+                for lot in lots
+            ],
+        )
+
+    @staticmethod
+    def record_weighings(weighings):
+        """``(lot, new_net_weight, delta)`` triples from weight registration."""
+        LotEventService.record(
+            "lot_weighed",
+            [(lot.id, {"net_weight": net_weight, "delta": delta}) for lot, net_weight, delta in weighings],
+        )
+
+    @staticmethod
+    def record_lot_qcs(lot_qcs):
+        LotEventService.record(
+            "qc_recorded",
+            [(lot_qc.lot_id, {"lotqc_id": lot_qc.id, "yieldpercentage": lot_qc.yieldpercentage}) for lot_qc in lot_qcs],
+        )
+
+    @staticmethod
+    def record_reception_closed(reception):
+        LotEventService.record("reception_closed", [(None, reception.id, {})])
+
+    @staticmethod
+    def _state_before_events(lot, events):
+        """``(net_weight, has_qc, fumigation_status)`` of ``lot`` before its first journal event."""
+        net_weight = (lot.net_weight or 0.0) - sum(data["delta"] for kind, data in events if kind == "lot_weighed")
+        has_qc = lot.has_qc and not any(kind == "qc_recorded" for kind, _data in events)
+        moves = [data for kind, data in events if kind == "fumigation_status_changed"]
+        fumigation_status = moves[0]["from"] if moves else lot.fumigation_status
+        return round(net_weight, 2), has_qc, fumigation_status
+
+    @staticmethod
+    def backfill(batch_size=1000):
+        """Journal a ``lot_snapshot`` of every lot without a start event; returns how many were written.
+
+        Lots weighed, analysed or moved between deploying the journal and running the backfill already
+        have events, so the snapshot holds the state from before the first of them and the projections,
+        which add up every event, end at the lot's current state. Lot rows are locked batch by batch
+        while their events are read, so a writer cannot slip an event in between. Snapshots are dated
+        with the lot's ``created_at``, placing lots from before the journal on the day they were created.
+        """
+        started = exists().where(LotEvent.lot_id == Lot.id, LotEvent.kind.in_(_LOT_START_KINDS))
+        lot_ids = db.session.execute(
+            select(Lot.id).where(~started).order_by(Lot.created_at, Lot.id)
+        ).scalars().all()
+        now = _utcnow_naive()
+        written = 0
+        for start in range(0, len(lot_ids), batch_size):
+            chunk = lot_ids[start:start + batch_size]
+            lots = db.session.execute(
+                select(
+                    Lot.id,
+                    Lot.rawmaterialreception_id,
+                    Lot.lot_number,
+                    Lot.packagings_quantity,
+                    Lot.net_weight,
+                    Lot.has_qc,
+                    Lot.fumigation_status,
+                    Lot.created_at,
+                )
+                .where(Lot.id.in_(chunk), ~started)
+                .order_by(Lot.id)
+                .with_for_update()
+            ).all()
+            events = defaultdict(list)
+            for lot_id, kind, data in db.session.execute(
+                select(LotEvent.lot_id, LotEvent.kind, LotEvent.data)
+                .where(LotEvent.lot_id.in_(chunk))
+                .order_by(LotEvent.id)
+            ):
+                events[lot_id].append((kind, data))
+            rows = []
+            for lot in sorted(lots, key=lambda lot: (lot.created_at or now, lot.id)):
+                net_weight, has_qc, fumigation_status = LotEventService._state_before_events(lot, events[lot.id])
+                rows.append(
+                    {
+                        "kind": "lot_snapshot",
+                        "lot_id": lot.id,
+                        "rawmaterialreception_id": lot.rawmaterialreception_id,
+                        "data": {
+                            "lot_number": lot.lot_number,
+                            "packagings_quantity": lot.packagings_quantity,
+                            "net_weight": net_weight,
+                            "has_qc": has_qc,
+                            "fumigation_status": fumigation_status,
+                        },
+                        "created_at": lot.created_at or now,
+                        "updated_at": lot.created_at or now,
+                    }
+                )
+            if rows:
+                db.session.execute(insert(LotEvent), rows)
+            written += len(rows)
+        return written
@@ -0,0 +1,115 @@
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import sqlite
+
+from app import db
+from app.models import Lot, LotNumberCounter
+
+LOT_NUMBER_COUNTER = "lot_number"
+# Advisory lock taken shared by reservations and exclusively to move ``lot_number_seq`` forward.
+LOT_NUMBER_SEQ_LOCK = 7_410_301
+
+
+class LotNumberAllocator:
+    """Hand out lot numbers without looking at ``lots`` first.
+
+    PostgreSQL draws them from the ``lot_number_seq`` sequence. SQLite keeps the next number in
+    ``lotnumbercounters`` and bumps it with a single upsert, which holds the database write lock
+    until the surrounding transaction ends, so two operators never receive the same number.
+
+    Moving the PostgreSQL sequence past a number typed by hand reads it and sets it in two steps;
+    reservations hold ``LOT_NUMBER_SEQ_LOCK`` shared until they commit so no ``nextval`` runs in
+    between and the sequence is never set back below a number already handed out.
+    """
+
+    @staticmethod
+    def _is_postgresql():
+        return db.engine.dialect.name == "postgresql"
+
+    @staticmethod
+    def _sequence_position():
+        """Highest number ``lot_number_seq`` has handed out (its start minus one before first use)."""
+        return db.session.execute(
+            text("SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM lot_number_seq")
+        ).scalar_one()
+
+    @staticmethod
+    def _bump_counter(initial_value, on_conflict_value):
+        """Upsert the SQLite counter row and return its new ``next_value``.
+
+        The row is created on first use just past the highest lot number already stored.
+        """
+        counter = LotNumberCounter.__table__
+        first_free = select(func.coalesce(func.max(Lot.lot_number), 0) + 1).scalar_subquery()
+        statement = (
+            sqlite.insert(counter)
+            .values(name=LOT_NUMBER_COUNTER, next_value=initial_value(first_free))
+            .on_conflict_do_update(
+                index_elements=[counter.c.name],
+                set_={"next_value": on_conflict_value(counter.c.next_value)},
+            )
+            .returning(counter.c.next_value)
+        )
+        return db.session.execute(statement).scalar_one()
+
+    @staticmethod
+    def reserve(count=1, advancing=False):
+        """Reserve ``count`` lot numbers for the current transaction, in increasing order.
+
+        On SQLite the block is consecutive and is released again if the transaction rolls back.
+        On PostgreSQL numbers drawn by a rolled back transaction are skipped, and a block may
+        interleave with one reserved at the same moment by another operator. Pass ``advancing``
+        when the transaction calls ``advance_past`` afterwards, so it takes the lock exclusively
+        up front instead of upgrading it and deadlocking with another such transaction.
+        """
+        if count < 1:
+            return []
+        if LotNumberAllocator._is_postgresql():
+            lock = "pg_advisory_xact_lock" if advancing else "pg_advisory_xact_lock_shared"
+            db.session.execute(text(f"SELECT {lock}(:key)"), {"key": LOT_NUMBER_SEQ_LOCK})
+            return sorted(
+                db.session.execute(
+                    text("SELECT nextval('lot_number_seq') FROM generate_series(1, :count)"),
+                    {"count": count},
+                ).scalars()
+            )
+        next_value = LotNumberAllocator._bump_counter(
+            lambda first_free: first_free + count,
+            lambda current: current + count,
+        )
+        return list(range(next_value - count, next_value))
+
+    @staticmethod
+    def advance_past(lot_number):
+        """Keep future reservations above a lot number the operator typed by hand.
+
+        On PostgreSQL the sequence is only moved forward, under the exclusive lock, which waits
+        for every other transaction holding a reservation's shared lock.
+        """
+        if LotNumberAllocator._is_postgresql():
+            # Most numbers typed by hand are old ones, already below the sequence.
+            if lot_number <= LotNumberAllocator._sequence_position():
+                return
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOT_NUMBER_SEQ_LOCK})
+            if lot_number > LotNumberAllocator._sequence_position():
+                db.session.execute(text("SELECT setval('lot_number_seq', :lot_number)"), {"lot_number": lot_number})
+            return
+        LotNumberAllocator._bump_counter(
+            lambda first_free: func.max(first_free, lot_number + 1),
+            lambda current: func.max(current, lot_number + 1),
+        )
+
+    @staticmethod
+    def suggest_next():
+        """Next number a reservation would hand out, without reserving it."""
+        if LotNumberAllocator._is_postgresql():
+            return LotNumberAllocator._sequence_position() + 1
+        return db.session.execute(
+            select(
+                func.coalesce(
+                    select(LotNumberCounter.next_value)
+                    .where(LotNumberCounter.name == LOT_NUMBER_COUNTER)
+                    .scalar_subquery(),
+                    select(func.coalesce(func.max(Lot.lot_number), 0) + 1).scalar_subquery(),
+                )
+            )
+        ).scalar_one()
@@ -1,14 +1,40 @@
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
 
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
 from app import db
+from app.basemodel import _utcnow_naive, dialect_insert
 from app.models import FullTruckWeight, Lot
+from app.services.fumigation_service import FumigationService
+from app.services.lot_event_service import LotEventService
+from app.services.lot_number_service import LotNumberAllocator
+from app.services.throughput_service import ThroughputService
 
 
 class LotValidationError(ValueError):
     pass
 
 
+@dataclass
+class LotSpec:
+    variety_id: int
+    rawmaterialpackaging_id: int
+    packagings_quantity: int
+    # None lets the allocator number the lot.
+    lot_number: int | None = None
+
+
+@dataclass
+class TruckWeightEntry:
+    lot_id: int
+    loaded_truck_weight: float
+    empty_truck_weight: float
+
+
 @dataclass
 class NetWeightComputation:
     net_weight: float
@@ -50,9 +76,24 @@ class LotService:
             packaging_tare=packaging.tare,
         )
 
+    @staticmethod
+    def _locked_net_weights(lot_ids):
+        """Stored net weights of ``lot_ids``, read under a row lock held until the transaction ends.
+
+        Weight deltas for the reception facts, work orders and lot events are taken against these
+        values, not the ones loaded before the transaction, so two weighings of the same lot queue
+        up instead of both subtracting the same old weight.
+        """
+        return dict(
+            db.session.execute(
+                select(Lot.id, Lot.net_weight).where(Lot.id.in_(lot_ids)).order_by(Lot.id).with_for_update()
+            ).all()
+        )
+
     @staticmethod
     def register_full_truck_weight(lot, loaded_truck_weight, empty_truck_weight):
         with LotService._transaction_context():
+            previous = LotService._locked_net_weights([lot.id])[lot.id]
             computation = LotService.compute_net_weight(
                 lot=lot,
                 loaded_truck_weight=loaded_truck_weight,
@@ -67,6 +108,10 @@ class LotService:
             full_truck_weight.loaded_truck_weight = loaded_truck_weight
             full_truck_weight.empty_truck_weight = empty_truck_weight
 
+            delta = computation.net_weight - (previous or 0)
+            ThroughputService.record_net_weight_changes([(lot, delta)])
+            FumigationService.record_net_weight_changes([(lot, delta)])
+            LotEventService.record_weighings([(lot, computation.net_weight, delta)])
             # Compute-on-write: keep stored net weight in sync with source weights and tare.
             lot.net_weight = computation.net_weight
             db.session.add(lot)
@@ -79,25 +124,197 @@ class LotService:
         variety_id,
         rawmaterialpackaging_id,
         packagings_quantity,
-        lot_number,
+        lot_number=None,
         close_reception=False,
     ):
-        if Lot.query.filter_by(lot_number=lot_number).first():
-            raise LotValidationError(f"El Lote {lot_number:03} ya existe. Por favor, use un Lote distinto.")
+        """Create one lot with a single insert; without ``lot_number`` the next free number is used."""
+        try:
+            with LotService._transaction_context():
+                manual_number = lot_number is not None
+                if not manual_number:
+                    lot_number = LotNumberAllocator.reserve()[0]
+                lot = Lot(
+                    rawmaterialreception_id=reception.id,
+                    variety_id=variety_id,
+                    rawmaterialpackaging_id=rawmaterialpackaging_id,
+                    packagings_quantity=packagings_quantity,
+                    lot_number=lot_number,
+                )
+                db.session.add(lot)
+                db.session.flush()
+                ThroughputService.record_lots([lot])
+                LotEventService.record_lots_created([lot])
+                if manual_number:
+                    LotNumberAllocator.advance_past(lot_number)
 
-        with LotService._transaction_context():
-            lot = Lot(
-                rawmaterialreception_id=reception.id,
-                variety_id=variety_id,
-                rawmaterialpackaging_id=rawmaterialpackaging_id,
-                packagings_quantity=packagings_quantity,
-                lot_number=lot_number,
+                if close_reception:
+                    reception.is_open = False
+                    db.session.add(reception)
+                    LotEventService.record_reception_closed(reception)
+        except IntegrityError:
+            LotService._raise_if_lot_numbers_taken([lot_number])
+            raise
+
+        return lot
+
+    @staticmethod
+    def _format_lot_numbers(lot_numbers):
+        return ", ".join(f"{lot_number:03}" for lot_number in sorted(lot_numbers))
+
+    @staticmethod
+    def _raise_if_lot_numbers_taken(lot_numbers):
+        # Only runs after the unique constraint rejected an insert, to name the offending numbers.
+        existing = db.session.execute(select(Lot.lot_number).where(Lot.lot_number.in_(lot_numbers))).scalars().all()
+        if len(existing) == 1:
+            raise LotValidationError(f"El Lote {existing[0]:03} ya existe. Por favor, use un Lote distinto.")
+        if existing:
+            raise LotValidationError(
+                f"Los Lotes {LotService._format_lot_numbers(existing)} ya existen. Por favor, use Lotes distintos."
             )
-            db.session.add(lot)
-            db.session.flush()
 
-            if close_reception:
-                reception.is_open = False
-                db.session.add(reception)
+    @staticmethod
+    def create_lots(reception, lot_specs, close_reception=False):
+        """Create every lot of a truck in one transaction and return them ordered by lot number.
+
+        Specs without a lot number receive one block from ``LotNumberAllocator`` and all rows are
+        inserted in one executemany. Numbers typed by hand are not looked up beforehand: the
+        unique constraint rejects taken ones, and nothing is written when any spec is invalid.
+        """
+        lot_specs = list(lot_specs)
+        if not lot_specs:
+            raise LotValidationError("Debe ingresar al menos un lote.")
+        if not reception.is_open:
+            raise LotValidationError("Esta recepción ya está cerrada y no acepta más lotes.")
 
-        return lot
+        manual_numbers = [spec.lot_number for spec in lot_specs if spec.lot_number is not None]
+        repeated = {lot_number for lot_number in manual_numbers if manual_numbers.count(lot_number) > 1}
+        if repeated:
+            if len(repeated) == 1:
+                raise LotValidationError(f"El Lote {repeated.pop():03} está repetido en el ingreso.")
+            raise LotValidationError(
+                f"Los Lotes {LotService._format_lot_numbers(repeated)} están repetidos en el ingreso."
+            )
+        if any(spec.packagings_quantity is None or spec.packagings_quantity <= 0 for spec in lot_specs):
+            raise LotValidationError("La cantidad de envases debe ser mayor que 0.")
+
+        try:
+            with LotService._transaction_context():
+                allocated = iter(
+                    LotNumberAllocator.reserve(len(lot_specs) - len(manual_numbers), advancing=bool(manual_numbers))
+                )
+                lots = db.session.scalars(
+                    insert(Lot).returning(Lot),
+                    [
+                        {
+                            "rawmaterialreception_id": reception.id,
+                            "variety_id": spec.variety_id,
+                            "rawmaterialpackaging_id": spec.rawmaterialpackaging_id,
+                            "packagings_quantity": spec.packagings_quantity,
+                            "lot_number": spec.lot_number if spec.lot_number is not None else next(allocated),
+                        }
+                        for spec in lot_specs
+                    ],
+                ).all()
+                ThroughputService.record_lots(lots)
+                LotEventService.record_lots_created(lots)
+                if manual_numbers:
+                    LotNumberAllocator.advance_past(max(manual_numbers))
+
+                if close_reception:
+                    reception.is_open = False
+                    db.session.add(reception)
+                    LotEventService.record_reception_closed(reception)
+        except IntegrityError:
+            LotService._raise_if_lot_numbers_taken(manual_numbers)
+            raise
+
+        return sorted(lots, key=lambda lot: lot.lot_number)
+
+    @staticmethod
+    def _upsert_full_truck_weights(rows):
+        statement = dialect_insert(FullTruckWeight.__table__).values(rows)
+        excluded = statement.excluded
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[FullTruckWeight.lot_id],
+                set_={
+                    "loaded_truck_weight": excluded.loaded_truck_weight,
+                    "empty_truck_weight": excluded.empty_truck_weight,
+                    "updated_at": excluded.updated_at,
+                },
+            )
+        )
+
+    @staticmethod
+    def register_full_truck_weights(entries):
+        """Weigh many lots at once; returns ``{lot_id: NetWeightComputation}``.
+
+        Lots and their packaging tares are loaded in one query, every row is validated before
+        anything is written, weights are upserted in one statement and net weights are updated
+        in one executemany.
+        """
+        entries = list(entries)
+        if not entries:
+            raise LotValidationError("Debe ingresar al menos un peso.")
+
+        lot_ids = [entry.lot_id for entry in entries]
+        if len(set(lot_ids)) != len(lot_ids):
+            raise LotValidationError("Cada lote puede pesarse una sola vez por registro.")
+        lots = {
+            lot.id: lot
+            for lot in Lot.query.options(joinedload(Lot.raw_material_packaging)).filter(Lot.id.in_(lot_ids)).all()
+        }
+        if len(lots) != len(lot_ids):
+            raise LotValidationError("Uno o más lotes seleccionados no existen.")
+
+        computations = {}
+        errors = []
+        for entry in entries:
+            lot = lots[entry.lot_id]
+            try:
+                computations[lot.id] = LotService.compute_net_weight(
+                    lot=lot,
+                    loaded_truck_weight=entry.loaded_truck_weight,
+                    empty_truck_weight=entry.empty_truck_weight,
+                )
+            except LotValidationError as exc:
+                errors.append(f"Lote {lot.lot_number:03}: {exc}")
+        if errors:
+            raise LotValidationError(" ".join(errors))
+
+        now = _utcnow_naive()
+        with LotService._transaction_context():
+            previous = LotService._locked_net_weights(lot_ids)
+            net_weight_changes = [
+                (lots[lot_id], computation.net_weight - (previous[lot_id] or 0))
+                for lot_id, computation in computations.items()
+            ]
+            ThroughputService.record_net_weight_changes(net_weight_changes)
+            FumigationService.record_net_weight_changes(net_weight_changes)
+            LotEventService.record_weighings(
+                (lot, computations[lot.id].net_weight, delta) for lot, delta in net_weight_changes
+            )
+            LotService._upsert_full_truck_weights(
+                [
+                    {
+                        "lot_id": entry.lot_id,
+                        "loaded_truck_weight": entry.loaded_truck_weight,
+                        "empty_truck_weight": entry.empty_truck_weight,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for entry in entries
+                ]
+            )
+            # Compute-on-write, as in register_full_truck_weight, for all lots in one executemany.
+            db.session.execute(
+                update(Lot),
+                [
+                    {"id": lot_id, "net_weight": computation.net_weight, "updated_at": now}
+                    for lot_id, computation in computations.items()
+                ],
+            )
+        for lot_id, computation in computations.items():
+            set_committed_value(lots[lot_id], "net_weight", computation.net_weight)
+            set_committed_value(lots[lot_id], "updated_at", now)
+        return computations
@@ -2,6 +2,8 @@ import hashlib
 import os
 from pathlib import Path
 
+from app.metrics import inc_counter
+
 
 def _cache_dir():
     return Path(os.environ.get("PDF_CACHE_DIR", "app/static/pdf_cache"))
@@ -33,7 +35,11 @@ def _cache_file_path(entity_type, entity_id, updated_at):
 
 def get_cached_pdf(entity_type, entity_id, updated_at):
     cache_path = _cache_file_path(entity_type, entity_id, updated_at)
-    return str(cache_path) if cache_path.exists() else None
+    if cache_path.exists():
+        inc_counter("petru_pdf_cache_requests_total", kind=entity_type, result="hit")
+        return str(cache_path)
+    inc_counter("petru_pdf_cache_requests_total", kind=entity_type, result="miss")
+    return None
 
 
 def save_pdf_to_cache(entity_type, entity_id, updated_at, pdf_bytes):
@@ -56,3 +62,24 @@ def invalidate_cached_pdf(entity_type, entity_id):
             file_path.unlink()
         except OSError:
             continue
+
+
+def invalidate_cached_pdfs(entity_type, entity_ids):
+    """Drop cached PDFs of many entities with a single directory scan."""
+    cache_root = _cache_dir()
+    if not cache_root.exists():
+        return
+
+    prefix = f"{_sanitize(entity_type)}_"
+    safe_entity_ids = {_sanitize(entity_id) for entity_id in entity_ids}
+    with os.scandir(cache_root) as entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix) or not entry.name.endswith(".pdf"):
+                continue
+            entity_id, _, _token = entry.name[len(prefix):].partition("_")
+            if entity_id not in safe_entity_ids:
+                continue
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
@@ -0,0 +1,34 @@
+import base64
+from io import BytesIO
+
+from app.metrics import timed
+
+# WeasyPrint (Pango, fonts, CSS engine) and qrcode/Pillow are imported on first
+# use so workers, tests and CLI scripts that never render a PDF do not load them.
+
+
+def render_pdf(html, base_url, kind):
+    """Render ``html`` to PDF bytes, timing it under ``petru_pdf_render_seconds``."""
+    from weasyprint import HTML
+
+    with timed("petru_pdf_render_seconds", kind=kind):
+        return HTML(string=html, base_url=base_url).write_pdf()
+
+
+def qr_png(data, box_size=10, border=4):
+    """Return a PNG QR code for ``data`` as a rewound ``BytesIO``."""
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=box_size, border=border)  # type: ignore
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    img_io = BytesIO()
+    img.save(img_io, 'PNG')
+    img_io.seek(0)
+    return img_io
+
+
+def qr_data_uri(data, box_size=4, border=2):
+    png = qr_png(data, box_size=box_size, border=border)
+    return f"data:image/png;base64,{base64.b64encode(png.read()).decode('ascii')}"
@@ -0,0 +1,402 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import delete, func, or_, select
+
+from app import db
+from app.basemodel import _utcnow_naive, dialect_insert
+from app.models import LotEvent, LotStateClock, ProjectionOffset, ProjectionValue
+from app.services.lot_event_service import _LOT_START_KINDS
+
+
+class Projection:
+    """Read model maintained from the lot event journal.
+
+    Subclasses name the event ``kinds`` they consume and fold batches of them into their tables in
+    ``apply``; ``ProjectionService`` feeds them in journal order from their stored offset. The base
+    class keeps named counters in ``projectionvalues``.
+    """
+
+    name = None
+    kinds = ()
+
+    def apply(self, events):
+        raise NotImplementedError
+
+    def reset(self):
+        db.session.execute(delete(ProjectionValue).where(ProjectionValue.projection == self.name))
+
+    def values(self):
+        return dict(
+            db.session.execute(
+                select(ProjectionValue.key, ProjectionValue.value).where(ProjectionValue.projection == self.name)
+            ).all()
+        )
+
+    def read(self):
+        return self.values()
+
+    def _add(self, deltas):
+        """Add ``{key: delta}`` to the projection's counters with one upsert.
+
+        Keys whose deltas cancel out are still written, so the keys present do not depend on how
+        the journal was split into batches.
+        """
+        if not deltas:
+            return
+        table = ProjectionValue.__table__
+        statement = dialect_insert(table)
+        now = _utcnow_naive()
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["projection", "key"],
+                set_={"value": table.c.value + statement.excluded.value, "updated_at": statement.excluded.updated_at},
+            ),
+            [
+                {"projection": self.name, "key": key, "value": delta, "created_at": now, "updated_at": now}
+                for key, delta in deltas.items()
+            ],
+        )
+
+
+class LotCountersProjection(Projection):
+    """Dashboard counters: lots, net kg, lots per fumigation state, lots pending QC, closed receptions."""
+
+    name = "lot_counters"
+    kinds = (*_LOT_START_KINDS, "lot_weighed", "qc_recorded", "fumigation_status_changed", "reception_closed")
+
+    def apply(self, events):
+        deltas = defaultdict(float)
+        for event in events:
+            data = event.data
+            if event.kind in _LOT_START_KINDS:
+                deltas["lots"] += 1
+                deltas["net_kg"] += data.get("net_weight") or 0
+                deltas[f"fumigation_status:{data.get('fumigation_status', '1')}"] += 1
+                if not data.get("has_qc"):
+                    deltas["pending_qc"] += 1
+            elif event.kind == "lot_weighed":
+                deltas["net_kg"] += data["delta"]
+            elif event.kind == "qc_recorded":
+                deltas["pending_qc"] -= 1
+            elif event.kind == "fumigation_status_changed":
+                deltas[f"fumigation_status:{data['from']}"] -= 1
+                deltas[f"fumigation_status:{data['to']}"] += 1
+            elif event.kind == "reception_closed":
+                deltas["receptions_closed"] += 1
+        self._add(deltas)
+
+    def read(self):
+        return {key: round(value, 2) for key, value in sorted(self.values().items())}
+
+
+class TimeInStateProjection(Projection):
+    """Hours lots spend in each fumigation state, from the state clock kept per lot in ``lotstateclocks``."""
+
+    name = "time_in_state"
+    kinds = (*_LOT_START_KINDS, "fumigation_status_changed")
+
+    def reset(self):
+        super().reset()
+        db.session.execute(delete(LotStateClock))
+
+    def apply(self, events):
+        lot_ids = {event.lot_id for event in events}
+        clocks = {
+            lot_id: (state, entered_at)
+            for lot_id, state, entered_at in db.session.execute(
+                select(LotStateClock.lot_id, LotStateClock.state, LotStateClock.entered_at).where(
+                    LotStateClock.lot_id.in_(lot_ids)
+                )
+            )
+        }
+        changed = set()
+        deltas = defaultdict(float)
+        for event in events:
+            if event.kind in _LOT_START_KINDS:
+                # A backfilled snapshot can land after the lot's first moves; the clock they set is newer.
+                if event.lot_id not in clocks:
+                    clocks[event.lot_id] = (event.data.get("fumigation_status", "1"), event.created_at)
+            else:
+                clock = clocks.get(event.lot_id)
+                if clock is not None and event.created_at < clock[1]:
+                    # A late event, applied after a newer move of the lot; the clock stays as it is.
+                    continue
+                if clock is not None:
+                    deltas[f"{clock[0]}:seconds"] += (event.created_at - clock[1]).total_seconds()
+                    deltas[f"{clock[0]}:lots"] += 1
+                clocks[event.lot_id] = (event.data["to"], event.created_at)
+            changed.add(event.lot_id)
+        self._add(deltas)
+
+        if changed:
+            table = LotStateClock.__table__
+            statement = dialect_insert(table)
+            now = _utcnow_naive()
+            db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["lot_id"],
+                    set_={
+                        "state": statement.excluded.state,
+                        "entered_at": statement.excluded.entered_at,
+                        "updated_at": statement.excluded.updated_at,
+                    },
+                ),
+                [
+                    {
+                        "lot_id": lot_id,
+                        "state": clocks[lot_id][0],
+                        "entered_at": clocks[lot_id][1],
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for lot_id in sorted(changed)
+                ],
+            )
+
+    def read(self):
+        """``{state: {"lots", "average_hours"}}`` over the lots that have left each state."""
+        values = self.values()
+        states = sorted({key.split(":")[0] for key in values})
+        result = {}
+        for state in states:
+            lots = values.get(f"{state}:lots", 0)
+            seconds = values.get(f"{state}:seconds", 0)
+            result[state] = {"lots": int(lots), "average_hours": round(seconds / lots / 3600, 2) if lots else None}
+        return result
+
+
+class DailyActivityProjection(Projection):
+    """Lots created, bins, net kg weighed and QCs recorded per day the events happened."""
+
+    name = "daily_activity"
+    kinds = (*_LOT_START_KINDS, "lot_weighed", "qc_recorded")
+
+    def apply(self, events):
+        deltas = defaultdict(float)
+        for event in events:
+            day = event.created_at.date().isoformat()
+            if event.kind in _LOT_START_KINDS:
+                deltas[f"{day}:lots"] += 1
+                deltas[f"{day}:bins"] += event.data.get("packagings_quantity") or 0
+                deltas[f"{day}:net_kg"] += event.data.get("net_weight") or 0
+            elif event.kind == "lot_weighed":
+                deltas[f"{day}:net_kg"] += event.data["delta"]
+            elif event.kind == "qc_recorded":
+                deltas[f"{day}:qcs"] += 1
+        self._add(deltas)
+
+    def read(self):
+        days = defaultdict(lambda: {"lots": 0.0, "bins": 0.0, "net_kg": 0.0, "qcs": 0.0})
+        for key, value in self.values().items():
+            day, measure = key.split(":")
+            days[day][measure] = round(value, 2)
+        return dict(sorted(days.items()))
+
+
+PROJECTIONS = {
+    projection.name: projection
+    for projection in (LotCountersProjection(), TimeInStateProjection(), DailyActivityProjection())
+}
+
+
+class ProjectionService:
+    """Feeds the lot event journal to each projection from the offset it last reached.
+
+    An offset is the id of the last event applied. Ids are handed out before commit, so a gap in
+    the ids may be a transaction still in flight. Each run of missing ids is recorded on the offset
+    row as a range with the time catching up first saw it (``gaps``), so a large rolled back insert
+    is one entry. Catching up stops at a gap until it has been open for ``settle_seconds``, then
+    moves past it. The skipped range is looked up again on every later catch-up for
+    ``recheck_seconds`` and events that finally committed in it are applied. Commit delays and
+    clock skew between workers therefore cannot lose an event; they only delay it. Gaps followed
+    by events older than ``recheck_seconds`` are rollbacks from long ago (on a rebuild, say) and
+    are passed without waiting.
+
+    Catching up first checks, without locks, whether there is anything to apply, so polling a
+    projection that is up to date neither locks nor writes its offset row.
+    """
+
+    _EVENT_COLUMNS = (
+        LotEvent.id,
+        LotEvent.kind,
+        LotEvent.lot_id,
+        LotEvent.rawmaterialreception_id,
+        LotEvent.data,
+        LotEvent.created_at,
+    )
+
+    @staticmethod
+    def _transaction_context():
+        session = db.session()
+        return session.begin_nested() if session.in_transaction() else session.begin()
+
+    @staticmethod
+    def _locked_offset(name):
+        db.session.execute(
+            dialect_insert(ProjectionOffset.__table__)
+            .values(name=name, position=0, gaps={})
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        return db.session.execute(
+            select(ProjectionOffset).where(ProjectionOffset.name == name).with_for_update()
+        ).scalar_one()
+
+    @staticmethod
+    def _gap_ranges(gaps):
+        """``(first, last, first_seen)`` of each recorded gap, keyed ``"first-last"`` in ``gaps``."""
+        ranges = []
+        for key, first_seen in gaps.items():
+            first, last = key.split("-")
+            ranges.append((int(first), int(last), first_seen))
+        return ranges
+
+    @staticmethod
+    def _recheck_filter(ranges):
+        return or_(*(LotEvent.id.between(first, last) for first, last, _ in ranges))
+
+    @staticmethod
+    def _has_news(name, recheck_seconds):
+        """Whether catching up would apply anything: events past the offset or late ones in its gaps."""
+        offset = db.session.execute(
+            select(ProjectionOffset.position, ProjectionOffset.gaps).where(ProjectionOffset.name == name)
+        ).first()
+        if offset is None:
+            return True
+        last_id = db.session.execute(select(func.max(LotEvent.id))).scalar()
+        if (last_id or 0) > offset.position:
+            return True
+        now = time.time()
+        ranges = [
+            (first, last, first_seen)
+            for first, last, first_seen in ProjectionService._gap_ranges(offset.gaps or {})
+            if now - first_seen <= recheck_seconds
+        ]
+        return bool(ranges) and db.session.execute(
+            select(LotEvent.id).where(ProjectionService._recheck_filter(ranges)).limit(1)
+        ).first() is not None
+
+    @staticmethod
+    def _settled(events, position, gaps, settle_seconds, recheck_seconds):
+        """Leading ``events`` that no gap younger than ``settle_seconds`` holds back; records new gaps."""
+        now = time.time()
+        stale_before = _utcnow_naive() - timedelta(seconds=recheck_seconds)
+        ranges = ProjectionService._gap_ranges(gaps)
+        waiting = [(first, last, first_seen) for first, last, first_seen in ranges if first > position]
+        recorded = {}
+        settled = []
+        expected = examined = position + 1
+        for event in events:
+            examined = event.id
+            if event.id != expected and event.created_at >= stale_before:
+                # Part of a gap seen on an earlier pass keeps the time it was first seen.
+                first_seen = min(
+                    (seen for first, last, seen in waiting if first < event.id and last >= expected), default=now
+                )
+                recorded[f"{expected}-{event.id - 1}"] = first_seen
+                if now - first_seen < settle_seconds:
+                    break
+            settled.append(event)
+            expected = event.id + 1
+        kept = {f"{first}-{last}": seen for first, last, seen in ranges if last <= position or first > examined}
+        gaps.clear()
+        gaps.update(kept)
+        gaps.update(recorded)
+        return settled
+
+    @staticmethod
+    def _late_events(gaps, position, recheck_seconds):
+        """Events that have committed since their ids were skipped; expired gaps are forgotten."""
+        now = time.time()
+        skipped = [(first, last, seen) for first, last, seen in ProjectionService._gap_ranges(gaps) if last <= position]
+        if not skipped:
+            return []
+        late = db.session.execute(
+            select(*ProjectionService._EVENT_COLUMNS)
+            .where(ProjectionService._recheck_filter(skipped))
+            .order_by(LotEvent.id)
+        ).all()
+        late_ids = [event.id for event in late]
+        for first, last, first_seen in skipped:
+            del gaps[f"{first}-{last}"]
+            if now - first_seen > recheck_seconds:
+                continue
+            # What is still missing of the range stays recorded, split around the late events.
+            start = first
+            for event_id in late_ids:
+                if first <= event_id <= last:
+                    if event_id > start:
+                        gaps[f"{start}-{event_id - 1}"] = first_seen
+                    start = event_id + 1
+            if start <= last:
+                gaps[f"{start}-{last}"] = first_seen
+        return late
+
+    @staticmethod
+    def _apply(projection, events):
+        relevant = [event for event in events if event.kind in projection.kinds]
+        if relevant:
+            projection.apply(relevant)
+        return len(relevant)
+
+    @staticmethod
+    def catch_up(name, batch_size=1000, settle_seconds=5, recheck_seconds=3600):
+        """Apply the events past the projection's offset, and late ones it skipped; returns how many."""
+        projection = PROJECTIONS[name]
+        if not ProjectionService._has_news(name, recheck_seconds):
+            return 0
+        with ProjectionService._transaction_context():
+            offset = ProjectionService._locked_offset(name)
+            gaps = dict(offset.gaps or {})
+            late = ProjectionService._late_events(gaps, offset.position, recheck_seconds)
+            applied = ProjectionService._apply(projection, late)
+            position = offset.position
+            while True:
+                events = db.session.execute(
+                    select(*ProjectionService._EVENT_COLUMNS)
+                    .where(LotEvent.id > position)
+                    .order_by(LotEvent.id)
+                    .limit(batch_size)
+                ).all()
+                settled = ProjectionService._settled(events, position, gaps, settle_seconds, recheck_seconds)
+                applied += ProjectionService._apply(projection, settled)
+                if settled:
+                    position = settled[-1].id
+                if len(settled) < batch_size:
+                    break
+            if position != offset.position:
+                offset.position = position
+            if gaps != offset.gaps:
+                # A new dict, so the JSON column is seen as changed.
+                offset.gaps = gaps
+            db.session.flush()
+        return applied
+
+    @staticmethod
+    def catch_up_all(batch_size=1000, settle_seconds=5, recheck_seconds=3600):
+        return {
+            name: ProjectionService.catch_up(name, batch_size, settle_seconds, recheck_seconds) for name in PROJECTIONS
+        }
+
+    @staticmethod
+    def rebuild(name, batch_size=1000, settle_seconds=5, recheck_seconds=3600):
+        """Drop a projection's read model and replay the whole journal into it."""
+        with ProjectionService._transaction_context():
+            PROJECTIONS[name].reset()
+            offset = ProjectionService._locked_offset(name)
+            offset.position = 0
+            offset.gaps = {}
+            db.session.flush()
+            return ProjectionService.catch_up(name, batch_size, settle_seconds, recheck_seconds)
+
+    @staticmethod
+    def read(name, batch_size=1000, settle_seconds=5, recheck_seconds=3600):
+        """Catch the projection up, then return its read model."""
+        ProjectionService.catch_up(name, batch_size, settle_seconds, recheck_seconds)
+        offset = db.session.get(ProjectionOffset, name)
+        return {
+            "name": name,
+            "position": offset.position if offset is not None else 0,
+            "values": PROJECTIONS[name].read(),
+        }
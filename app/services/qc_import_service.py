@@ -0,0 +1,266 @@
+import math
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.imports import TableImportError
+from app.models import Lot, LotQC, RawMaterialReception, SampleQC
+from app.services.lot_event_service import LotEventService
+from app.services.qc_rollup_service import QCRollupService
+from app.services.qc_service import QC_MEASUREMENT_LABELS, QCService
+from app.services.spc_service import SPCService
+
+# Computed by QCService; present in exported sheets but ignored on import.
+_COMPUTED_FIELDS = ("units", "shelled_weight", "yieldpercentage")
+_INTEGER_FIELDS = {
+    "lessthan30", "between3032", "between3234", "between3436", "morethan36", "broken_walnut", "split_walnut",
+    "light_stain", "serious_stain", "adhered_hull", "shrivel", "empty", "insect_damage", "inactive_fungus",
+    "active_fungus",
+}
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+
+def _normalize_title(title):
+    text = unicodedata.normalize("NFKD", str(title)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _parse_date(value):
+    if isinstance(value, (int, float)):
+        return _EXCEL_EPOCH + timedelta(days=int(value))
+    for pattern in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, pattern).date()
+        except ValueError:
+            continue
+    raise ValueError("fecha no válida (use AAAA-MM-DD)")
+
+
+def _parse_time(value):
+    if isinstance(value, (int, float)):
+        seconds = round((value % 1) * 86400)
+        return time(seconds // 3600 % 24, seconds // 60 % 60, seconds % 60)
+    for pattern in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, pattern).time()
+        except ValueError:
+            continue
+    raise ValueError("hora no válida (use HH:MM)")
+
+
+def _parse_float(value):
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        try:
+            number = float(value.replace(",", "."))
+        except ValueError:
+            raise ValueError("debe ser numérico")
+    # float() also reads "nan" and "inf", which the QC rules cannot work with.
+    if not math.isfinite(number):
+        raise ValueError("debe ser numérico")
+    return number
+
+
+def _parse_int(value):
+    number = _parse_float(value)
+    if not number.is_integer():
+        raise ValueError("debe ser un número entero")
+    return int(number)
+
+
+def _parse_text(value):
+    # XLSX cells typed as numbers (an analyst code, for instance) arrive as int or float.
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value)
+    if len(value) > 64:
+        raise ValueError("admite hasta 64 caracteres")
+    return value
+
+
+# (field, label as on the QC forms, parser) of every column an import reads.
+_COMMON_COLUMNS = (
+    ("analyst", "Analista", _parse_text),
+    ("date", "Fecha", _parse_date),
+    ("time", "Hora", _parse_time),
+) + tuple(
+    (name, label, _parse_int if name in _INTEGER_FIELDS else _parse_float)
+    for name, label in QC_MEASUREMENT_LABELS
+    if name not in _COMPUTED_FIELDS
+)
+QC_IMPORT_COLUMNS = {
+    "lot": (("lot_number", "Lote", _parse_int),) + _COMMON_COLUMNS,
+    "sample": (
+        ("grower", "Productor", _parse_text),
+        ("brought_by", "Muestra traida por", _parse_text),
+    ) + _COMMON_COLUMNS,
+}
+
+
+@dataclass
+class QCImportResult:
+    total: int = 0
+    created_ids: list = field(default_factory=list)
+    lot_ids: list = field(default_factory=list)
+    # (line number in the file, message), in file order.
+    errors: list = field(default_factory=list)
+
+
+class QCImportService:
+    """Bulk load of lot or sample QCs from a lab spreadsheet.
+
+    Columns are parsed and checked one at a time over every row, the QC rules run once over all
+    rows through ``QCService.build_metrics``, and lots are looked up in one query. Valid rows are
+    inserted in one statement and their lots flagged in one UPDATE; the rest come back as
+    row-level errors.
+    """
+
+    @staticmethod
+    def _column_positions(kind, header):
+        positions = {}
+        for index, title in enumerate(header):
+            positions.setdefault(_normalize_title(title), index)
+        columns = {}
+        missing = []
+        for name, label, _parser in QC_IMPORT_COLUMNS[kind]:
+            index = positions.get(_normalize_title(label), positions.get(name))
+            if index is None:
+                missing.append(label)
+            columns[name] = index
+        if missing:
+            raise TableImportError(f"Faltan columnas: {', '.join(missing)}.")
+        return columns
+
+    @staticmethod
+    def _parse_columns(kind, header, rows, errors):
+        """``{field: [value or None, ...]}`` aligned with ``rows``; unreadable cells are added to ``errors``."""
+        columns = QCImportService._column_positions(kind, header)
+        parsed = {}
+        for name, label, parser in QC_IMPORT_COLUMNS[kind]:
+            index = columns[name]
+            values = []
+            for position, (_line, cells) in enumerate(rows):
+                raw = cells[index] if index < len(cells) else ""
+                raw = raw.strip() if isinstance(raw, str) else raw
+                if raw == "" or raw is None:
+                    errors[position].append(f"{label}: es obligatorio")
+                    values.append(None)
+                    continue
+                try:
+                    values.append(parser(raw))
+                except ValueError as exc:
+                    errors[position].append(f"{label}: {exc}")
+                    values.append(None)
+            parsed[name] = values
+        return parsed
+
+    @staticmethod
+    def _check_lots(lot_numbers, errors):
+        """Resolve lot numbers in one query; unknown, already analysed and repeated lots are errors."""
+        wanted = {number for number in lot_numbers if number is not None}
+        lots = {
+            lot.lot_number: lot
+            for lot in Lot.query.options(
+                joinedload(Lot.raw_material_reception).selectinload(RawMaterialReception.growers),
+                joinedload(Lot.raw_material_reception).selectinload(RawMaterialReception.clients),
+            ).filter(Lot.lot_number.in_(wanted))
+        } if wanted else {}
+        seen = set()
+        for position, number in enumerate(lot_numbers):
+            if number is None:
+                continue
+            lot = lots.get(number)
+            if lot is None:
+                errors[position].append(f"El Lote {number:03} no existe.")
+            elif lot.has_qc:
+                errors[position].append(f"El Lote {number:03} ya tiene un registro QC.")
+            elif number in seen:
+                errors[position].append(f"El Lote {number:03} está repetido en el archivo.")
+            seen.add(number)
+        return lots
+
+    @staticmethod
+    def _flag_lots(lot_ids, lots_by_id):
+        """Mark the lots ``has_qc`` only where it is still false; any other lot aborts the import.
+
+        ``has_qc`` was checked before the transaction, so a QC saved meanwhile from the form or another
+        import shows up as a lot the guarded UPDATE did not match.
+        """
+        flagged = set(
+            db.session.execute(
+                update(Lot).where(Lot.id.in_(lot_ids), Lot.has_qc.is_(False)).values(has_qc=True).returning(Lot.id)
+            ).scalars()
+        )
+        taken = sorted(lots_by_id[lot_id].lot_number for lot_id in lot_ids if lot_id not in flagged)
+        if taken:
+            raise TableImportError(
+                f"Los Lotes {', '.join(f'{number:03}' for number in taken)} recibieron un registro QC durante la "
+                "importación. No se importó ninguna fila; vuelva a cargar el archivo."
+            )
+
+    @staticmethod
+    def import_rows(kind, header, rows, max_rows=2000):
+        """Validate every row, insert the valid ones and return a ``QCImportResult``."""
+        if kind not in QC_IMPORT_COLUMNS:
+            raise TableImportError(f"Tipo de QC no válido: {kind}.")
+        if len(rows) > max_rows:
+            raise TableImportError(f"El archivo tiene {len(rows)} filas; el máximo por importación es {max_rows}.")
+        result = QCImportResult(total=len(rows))
+        errors = [[] for _row in rows]
+        parsed = QCImportService._parse_columns(kind, header, rows, errors)
+        lots = QCImportService._check_lots(parsed["lot_number"], errors) if kind == "lot" else {}
+
+        payloads = [
+            {name: values[position] for name, values in parsed.items()}
+            for position in range(len(rows))
+        ]
+        # Rules also run on rows with a lot problem, so each row reports everything wrong with it.
+        readable = [
+            position
+            for position in range(len(rows))
+            if all(values[position] is not None for values in parsed.values())
+        ]
+        metrics, rule_errors = QCService.build_metrics([payloads[position] for position in readable])
+        computed = {}
+        for position, row_metrics, rule_error in zip(readable, metrics, rule_errors):
+            if rule_error:
+                errors[position].append(rule_error)
+            elif not errors[position]:
+                computed[position] = row_metrics
+
+        result.errors = [
+            (rows[position][0], " ".join(row_errors)) for position, row_errors in enumerate(errors) if row_errors
+        ]
+        if not computed:
+            return result
+
+        records = []
+        for position, row_metrics in computed.items():
+            record = {**payloads[position], **row_metrics}
+            if kind == "lot":
+                record["lot_id"] = lots[record.pop("lot_number")].id
+            records.append(record)
+
+        with QCService._transaction_context():
+            if kind == "lot":
+                lots_by_id = {lot.id: lot for lot in lots.values()}
+                QCImportService._flag_lots([record["lot_id"] for record in records], lots_by_id)
+                created = db.session.scalars(insert(LotQC).returning(LotQC), records).all()
+                result.lot_ids = [qc.lot_id for qc in created]
+                pairs = sorted(
+                    ((qc, lots_by_id[qc.lot_id]) for qc in created), key=lambda pair: (pair[0].date, pair[0].time)
+                )
+                QCRollupService.record_lot_qcs(pairs)
+                SPCService.record_lot_qcs(pairs)
+                LotEventService.record_lot_qcs(created)
+            else:
+                created = db.session.scalars(insert(SampleQC).returning(SampleQC), records).all()
+                QCRollupService.record_sample_qcs(created)
+        result.created_ids = [qc.id for qc in created]
+        return result
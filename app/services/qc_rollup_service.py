@@ -0,0 +1,220 @@
+import math
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.basemodel import _utcnow_naive, dialect_insert
+from app.models import Client, Grower, Lot, LotQC, QCRollup, RawMaterialReception, SampleQC, Variety
+
+# Every QC measurement that is rolled up; ``units`` is always 100 and is left out.
+QC_ROLLUP_METRICS = (
+    "yieldpercentage",
+    "inshell_weight",
+    "shelled_weight",
+    "lessthan30",
+    "between3032",
+    "between3234",
+    "between3436",
+    "morethan36",
+    "broken_walnut",
+    "split_walnut",
+    "light_stain",
+    "serious_stain",
+    "adhered_hull",
+    "shrivel",
+    "empty",
+    "insect_damage",
+    "inactive_fungus",
+    "active_fungus",
+    "extra_light",
+    "light",
+    "light_amber",
+    "amber",
+    "yellow",
+)
+QC_ROLLUP_DIMENSIONS = {"all": None, "grower": Grower, "variety": Variety, "client": Client}
+
+
+class QCRollupService:
+    """Daily count/sum/sum-of-squares buckets of every QC metric.
+
+    A lot QC lands in the plant-wide bucket and in the buckets of its variety and of every
+    grower and client of its reception; sample QCs only carry a free-text grower, so they
+    only feed the plant-wide bucket. Means and standard deviations over any date range are
+    derived from the summed buckets, without reading ``lotsqc`` or ``samplesqc``.
+    """
+
+    @staticmethod
+    def _lot_buckets(lot):
+        reception = lot.raw_material_reception
+        buckets = [("all", 0), ("variety", lot.variety_id)]
+        buckets.extend(("grower", grower.id) for grower in reception.growers)
+        buckets.extend(("client", client.id) for client in reception.clients)
+        return buckets
+
+    @staticmethod
+    def _accumulate(totals, day, source, buckets, record):
+        for metric in QC_ROLLUP_METRICS:
+            value = float(getattr(record, metric) or 0)
+            for dimension, dimension_id in buckets:
+                bucket = totals[(day, source, dimension, dimension_id, metric)]
+                bucket[0] += 1
+                bucket[1] += value
+                bucket[2] += value * value
+
+    @staticmethod
+    def _rows(totals):
+        now = _utcnow_naive()
+        return [
+            {
+                "day": day,
+                "source": source,
+                "dimension": dimension,
+                "dimension_id": dimension_id,
+                "metric": metric,
+                "count": count,
+                "total": total,
+                "total_sq": total_sq,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (day, source, dimension, dimension_id, metric), (count, total, total_sq) in totals.items()
+        ]
+
+    @staticmethod
+    def _upsert(totals):
+        statement = dialect_insert(QCRollup.__table__)
+        excluded = statement.excluded
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["day", "source", "dimension", "dimension_id", "metric"],
+                set_={
+                    "count": QCRollup.__table__.c.count + excluded.count,
+                    "total": QCRollup.__table__.c.total + excluded.total,
+                    "total_sq": QCRollup.__table__.c.total_sq + excluded.total_sq,
+                    "updated_at": excluded.updated_at,
+                },
+            ),
+            QCRollupService._rows(totals),
+        )
+
+    @staticmethod
+    def record_lot_qcs(pairs):
+        """Add ``(lot_qc, lot)`` pairs to their buckets in one upsert; runs inside the transaction that creates them."""
+        totals = defaultdict(lambda: [0, 0.0, 0.0])
+        for lot_qc, lot in pairs:
+            # The QC date column defaults to today only at flush time.
+            day = lot_qc.date or date.today()
+            QCRollupService._accumulate(totals, day, "lot", QCRollupService._lot_buckets(lot), lot_qc)
+        if totals:
+            QCRollupService._upsert(totals)
+
+    @staticmethod
+    def record_lot_qc(lot_qc, lot):
+        QCRollupService.record_lot_qcs([(lot_qc, lot)])
+
+    @staticmethod
+    def record_sample_qcs(sample_qcs):
+        totals = defaultdict(lambda: [0, 0.0, 0.0])
+        for sample_qc in sample_qcs:
+            QCRollupService._accumulate(totals, sample_qc.date or date.today(), "sample", [("all", 0)], sample_qc)
+        if totals:
+            QCRollupService._upsert(totals)
+
+    @staticmethod
+    def record_sample_qc(sample_qc):
+        QCRollupService.record_sample_qcs([sample_qc])
+
+    @staticmethod
+    def rebuild(yield_per=500):
+        """Recompute every bucket from the QC tables; returns the number of QC records read."""
+        totals = defaultdict(lambda: [0, 0.0, 0.0])
+        records = 0
+        lot_qcs = LotQC.query.options(
+            joinedload(LotQC.lot)
+            .joinedload(Lot.raw_material_reception)
+            .selectinload(RawMaterialReception.growers),
+            joinedload(LotQC.lot)
+            .joinedload(Lot.raw_material_reception)
+            .selectinload(RawMaterialReception.clients),
+        ).filter(LotQC.lot_id.isnot(None))
+        for lot_qc in lot_qcs.yield_per(yield_per):
+            QCRollupService._accumulate(totals, lot_qc.date, "lot", QCRollupService._lot_buckets(lot_qc.lot), lot_qc)
+            records += 1
+        for sample_qc in SampleQC.query.yield_per(yield_per):
+            QCRollupService._accumulate(totals, sample_qc.date, "sample", [("all", 0)], sample_qc)
+            records += 1
+
+        db.session.execute(delete(QCRollup))
+        rows = QCRollupService._rows(totals)
+        for start in range(0, len(rows), 1000):
+            db.session.execute(insert(QCRollup), rows[start:start + 1000])
+        return records
+
+    @staticmethod
+    def _summary(count, total, total_sq):
+        mean = total / count
+        # Sample standard deviation from the running sums; rounding can leave a tiny negative.
+        variance = (total_sq - total * total / count) / (count - 1) if count > 1 else 0.0
+        return {"count": count, "mean": mean, "std": math.sqrt(max(variance, 0.0))}
+
+    @staticmethod
+    def _filters(source, dimension, date_from, date_to):
+        filters = [QCRollup.source == source, QCRollup.dimension == dimension]
+        if date_from:
+            filters.append(QCRollup.day >= date_from)
+        if date_to:
+            filters.append(QCRollup.day <= date_to)
+        return filters
+
+    @staticmethod
+    def summarize(dimension="all", source="lot", date_from=None, date_to=None, metrics=QC_ROLLUP_METRICS):
+        """Per-member statistics for a dimension, largest members first.
+
+        Returns ``[{"id", "name", "count", "metrics": {metric: {"count", "mean", "std"}}}]``
+        from one ``GROUP BY`` over the rollups plus one name lookup.
+        """
+        if dimension not in QC_ROLLUP_DIMENSIONS:
+            raise ValueError(f"Unknown QC rollup dimension: {dimension}")
+        rows = db.session.execute(
+            select(
+                QCRollup.dimension_id,
+                QCRollup.metric,
+                func.sum(QCRollup.count),
+                func.sum(QCRollup.total),
+                func.sum(QCRollup.total_sq),
+            )
+            .where(*QCRollupService._filters(source, dimension, date_from, date_to), QCRollup.metric.in_(metrics))
+            .group_by(QCRollup.dimension_id, QCRollup.metric)
+        ).all()
+
+        members = {}
+        for dimension_id, metric, count, total, total_sq in rows:
+            member = members.setdefault(dimension_id, {"id": dimension_id, "count": 0, "metrics": {}})
+            member["metrics"][metric] = QCRollupService._summary(count, total, total_sq)
+            member["count"] = max(member["count"], count)
+
+        model = QC_ROLLUP_DIMENSIONS[dimension]
+        names = {}
+        if model is not None and members:
+            names = dict(db.session.execute(select(model.id, model.name).where(model.id.in_(members))).all())
+        for member in members.values():
+            member["name"] = names.get(member["id"], "Planta" if model is None else f"#{member['id']}")
+        return sorted(members.values(), key=lambda member: (-member["count"], member["name"]))
+
+    @staticmethod
+    def daily(metric, dimension="all", dimension_id=0, source="lot", date_from=None, date_to=None):
+        """``[(day, {"count", "mean", "std"})]`` for one metric and dimension member, oldest first."""
+        rows = db.session.execute(
+            select(QCRollup.day, QCRollup.count, QCRollup.total, QCRollup.total_sq)
+            .where(
+                *QCRollupService._filters(source, dimension, date_from, date_to),
+                QCRollup.dimension_id == dimension_id,
+                QCRollup.metric == metric,
+            )
+            .order_by(QCRollup.day)
+        ).all()
+        return [(day, QCRollupService._summary(count, total, total_sq)) for day, count, total, total_sq in rows]
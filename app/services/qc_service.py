@@ -2,6 +2,41 @@ from decimal import Decimal, ROUND_HALF_UP
 
 from app import db
 from app.models import Lot, LotQC, SampleQC
+from app.services.lot_event_service import LotEventService
+from app.services.qc_rollup_service import QCRollupService
+from app.services.spc_service import SPCService
+
+
+# Size classes that must add up to the 100 units analysed, and the colour fractions that make up the shelled weight.
+QC_SIZE_FIELDS = ("lessthan30", "between3032", "between3234", "between3436", "morethan36")
+QC_SHELLED_FIELDS = ("extra_light", "light", "light_amber", "amber")
+# Every measurement of a QC record with its label on the QC forms, in form order.
+QC_MEASUREMENT_LABELS = (
+    ("units", "Unidades Analizadas"),
+    ("inshell_weight", "Peso Con Cáscara"),
+    ("shelled_weight", "Peso de Pulpa"),
+    ("yieldpercentage", "Porcentaje de Pulpa"),
+    ("lessthan30", "Menos de 30"),
+    ("between3032", "30/32"),
+    ("between3234", "32/34"),
+    ("between3436", "34/36"),
+    ("morethan36", "Más de 36"),
+    ("broken_walnut", "Cáscara Partida"),
+    ("split_walnut", "Casco Abierto"),
+    ("light_stain", "Mancha Leve"),
+    ("serious_stain", "Mancha Grave"),
+    ("adhered_hull", "Pelón Adherido"),
+    ("shrivel", "Nuez Reseca"),
+    ("empty", "Nuez Vana"),
+    ("insect_damage", "Daño de Insecto"),
+    ("inactive_fungus", "Hongo Inactivo"),
+    ("active_fungus", "Hongo Activo"),
+    ("extra_light", "Extra Light"),
+    ("light", "Light"),
+    ("light_amber", "Light Amber"),
+    ("amber", "Amber"),
+    ("yellow", "Amarilla"),
+)
 
 
 class QCValidationError(ValueError):
@@ -18,39 +53,50 @@ class QCService:
     def _to_decimal(value):
         return Decimal(str(value or 0))
 
+    @staticmethod
+    def build_metrics(payloads):
+        """Apply the QC rules column by column to many payloads at once.
+
+        Returns ``(metrics, errors)`` aligned with ``payloads``: the computed units, shelled weight
+        and yield of each payload, or ``None`` and the first rule it breaks.
+        """
+        to_decimal = QCService._to_decimal
+        units = [sum(row) for row in zip(*([int(p[field]) for p in payloads] for field in QC_SIZE_FIELDS))]
+        inshell = [to_decimal(p["inshell_weight"]) for p in payloads]
+        shelled = [sum(row) for row in zip(*([to_decimal(p[field]) for p in payloads] for field in QC_SHELLED_FIELDS))]
+
+        metrics, errors = [], []
+        for row_units, row_inshell, row_shelled in zip(units, inshell, shelled):
+            if row_units != 100:
+                error = "Las unidades analizadas deben sumar exactamente 100."
+            elif row_inshell <= 0:
+                error = "El peso con cáscara debe ser mayor que 0."
+            elif row_shelled <= 0:
+                error = "El peso de pulpa calculado debe ser mayor que 0."
+            else:
+                error = None
+            errors.append(error)
+            if error:
+                metrics.append(None)
+                continue
+            yieldpercentage = ((row_shelled / row_inshell) * Decimal("100")).quantize(
+                Decimal("0.01"), rounding=ROUND_HALF_UP
+            )
+            metrics.append(
+                {
+                    "units": row_units,
+                    "shelled_weight": float(row_shelled),
+                    "yieldpercentage": float(yieldpercentage),
+                }
+            )
+        return metrics, errors
+
     @staticmethod
     def _build_qc_metrics(payload):
-        units = (
-            int(payload["lessthan30"])
-            + int(payload["between3032"])
-            + int(payload["between3234"])
-            + int(payload["between3436"])
-            + int(payload["morethan36"])
-        )
-        if units != 100:
-            raise QCValidationError("Las unidades analizadas deben sumar exactamente 100.")
-
-        inshell_weight = QCService._to_decimal(payload["inshell_weight"])
-        if inshell_weight <= 0:
-            raise QCValidationError("El peso con cáscara debe ser mayor que 0.")
-
-        shelled_weight = (
-            QCService._to_decimal(payload["extra_light"])
-            + QCService._to_decimal(payload["light"])
-            + QCService._to_decimal(payload["light_amber"])
-            + QCService._to_decimal(payload["amber"])
-        )
-        if shelled_weight <= 0:
-            raise QCValidationError("El peso de pulpa calculado debe ser mayor que 0.")
-
-        yieldpercentage = ((shelled_weight / inshell_weight) * Decimal("100")).quantize(
-            Decimal("0.01"), rounding=ROUND_HALF_UP
-        )
-        return {
-            "units": units,
-            "shelled_weight": float(shelled_weight),
-            "yieldpercentage": float(yieldpercentage),
-        }
+        metrics, errors = QCService.build_metrics([payload])
+        if errors[0]:
+            raise QCValidationError(errors[0])
+        return metrics[0]
 
     @staticmethod
     def validate_payload(payload):
@@ -101,6 +147,9 @@ class QCService:
             db.session.add(lot_qc)
             lot.has_qc = True
             db.session.add(lot)
+            QCRollupService.record_lot_qc(lot_qc, lot)
+            SPCService.record_lot_qc(lot_qc, lot)
+            LotEventService.record_lot_qcs([lot_qc])
 
         return lot_qc
 
@@ -143,5 +192,6 @@ class QCService:
                 shelled_image_path=shelled_image_path,
             )
             db.session.add(sample_qc)
+            QCRollupService.record_sample_qc(sample_qc)
 
         return sample_qc
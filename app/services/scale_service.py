@@ -0,0 +1,338 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.basemodel import _utcnow_naive, dialect_insert
+from app.metrics import inc_counter
+from app.models import Lot, RawMaterialReception, ScaleReading
+from app.services.lot_service import LotService, LotValidationError, TruckWeightEntry
+from app.services.pdf_cache_service import invalidate_cached_pdfs
+
+logger = logging.getLogger(__name__)
+
+READING_KINDS = {"loaded", "empty"}
+_PLATE_CLEANUP = re.compile(r"[^A-Z0-9]")
+
+
+class ScaleReadingError(ValueError):
+    pass
+
+
+def normalize_plate(plate):
+    return _PLATE_CLEANUP.sub("", str(plate or "").upper())
+
+
+def _parse_read_at(raw):
+    if isinstance(raw, datetime):
+        read_at = raw
+    else:
+        try:
+            read_at = datetime.fromisoformat(str(raw or "").strip().replace("Z", "+00:00"))
+        except ValueError:
+            raise ScaleReadingError("timestamp inválido; use ISO 8601.")
+    if read_at.tzinfo is not None:
+        # Receptions are dated in plant-local time, like the rest of the app.
+        read_at = read_at.astimezone().replace(tzinfo=None)
+    return read_at
+
+
+def parse_scale_reading(record):
+    """Validate one reading (a dict from JSON or CSV) into ``ScaleReading`` column values."""
+    if not isinstance(record, dict):
+        raise ScaleReadingError("cada lectura debe ser un objeto.")
+    plate = normalize_plate(record.get("plate") or record.get("truck_plate"))
+    if not plate or len(plate) > 16:
+        raise ScaleReadingError("patente inválida.")
+    kind = str(record.get("kind") or "").strip().lower()
+    if kind not in READING_KINDS:
+        raise ScaleReadingError("kind debe ser 'loaded' o 'empty'.")
+    try:
+        weight = float(str(record.get("weight")).replace(",", "."))
+    except (TypeError, ValueError):
+        raise ScaleReadingError("weight debe ser numérico.")
+    # float() also reads "nan" and "inf", which no lot weight can be computed from.
+    if not math.isfinite(weight):
+        raise ScaleReadingError("weight debe ser numérico.")
+    if weight < 0:
+        raise ScaleReadingError("weight no puede ser negativo.")
+    lot_number = record.get("lot_number")
+    if lot_number in (None, ""):
+        lot_number = None
+    else:
+        try:
+            lot_number = int(lot_number)
+        except (TypeError, ValueError):
+            raise ScaleReadingError("lot_number debe ser entero.")
+    read_at = _parse_read_at(record.get("timestamp") or record.get("read_at"))
+
+    reading_id = str(record.get("reading_id") or "").strip()
+    if reading_id:
+        reading_key = reading_id[:64]
+    else:
+        # Without an id from the scale, identical readings are the same reading.
+        fingerprint = f"{plate}|{read_at.isoformat()}|{kind}|{weight:.3f}|{lot_number or ''}"
+        reading_key = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    return {
+        "reading_key": reading_key,
+        "truck_plate": plate,
+        "read_at": read_at,
+        "kind": kind,
+        "weight": weight,
+        "lot_number": lot_number,
+    }
+
+
+def iter_json_lines(lines):
+    """Yield ``(line_number, record_or_error)`` from JSON lines (bytes or str)."""
+    for line_number, raw_line in enumerate(lines, start=1):
+        line = raw_line.decode("utf-8-sig") if isinstance(raw_line, bytes) else raw_line
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, ScaleReadingError("JSON inválido.")
+
+
+def iter_csv_rows(binary_stream):
+    """Yield ``(line_number, row)`` from CSV with a header row."""
+    reader = csv.DictReader(io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield reader.line_num, {key.strip().lower(): value for key, value in row.items() if key}
+
+
+class ScaleService:
+    @staticmethod
+    def _insert_new(rows):
+        now = _utcnow_naive()
+        for row in rows:
+            row.update(status="pending", created_at=now, updated_at=now)
+        result = db.session.execute(
+            dialect_insert(ScaleReading.__table__).values(rows).on_conflict_do_nothing(
+                index_elements=[ScaleReading.reading_key]
+            )
+        )
+        return result.rowcount
+
+    @staticmethod
+    def store_readings(numbered_records, chunk_size=500, max_errors=20):
+        """Persist readings as ``pending`` in chunks, ignoring ones already stored.
+
+        Takes ``(line_number, record)`` pairs so a stream is consumed as it arrives; each chunk
+        is one ``INSERT ... ON CONFLICT DO NOTHING`` and is committed on its own.
+        """
+        summary = {"accepted": 0, "duplicates": 0, "invalid": 0, "errors": []}
+        chunk = {}
+
+        def flush():
+            if not chunk:
+                return
+            inserted = ScaleService._insert_new(list(chunk.values()))
+            db.session.commit()
+            summary["accepted"] += inserted
+            summary["duplicates"] += len(chunk) - inserted
+            chunk.clear()
+
+        for line_number, record in numbered_records:
+            try:
+                if isinstance(record, ScaleReadingError):
+                    raise record
+                row = parse_scale_reading(record)
+            except ScaleReadingError as exc:
+                summary["invalid"] += 1
+                if len(summary["errors"]) < max_errors:
+                    summary["errors"].append({"line": line_number, "error": str(exc)})
+                continue
+            if row["reading_key"] in chunk:
+                summary["duplicates"] += 1
+                continue
+            chunk[row["reading_key"]] = row
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+
+        for result in ("accepted", "duplicates", "invalid"):
+            if summary[result]:
+                inc_counter("petru_scale_readings_total", summary[result], result=result)
+        return summary
+
+    @staticmethod
+    def _targets_by_reading(readings):
+        dates = {reading.read_at.date() for reading in readings}
+        receptions = (
+            RawMaterialReception.query.options(
+                selectinload(RawMaterialReception.lots).joinedload(Lot.raw_material_packaging)
+            )
+            .filter(RawMaterialReception.date.in_(dates))
+            .all()
+        )
+        receptions_by_key = defaultdict(list)
+        for reception in receptions:
+            receptions_by_key[(normalize_plate(reception.truck_plate), reception.date)].append(reception)
+
+        targets = {}
+        for reading in readings:
+            matched = receptions_by_key.get((reading.truck_plate, reading.read_at.date()), [])
+            lots = [lot for reception in matched for lot in reception.lots]
+            if reading.lot_number is not None:
+                lots = [lot for lot in lots if lot.lot_number == reading.lot_number]
+            else:
+                # A truck still being weighed is one whose lots have no net weight yet.
+                lots = [lot for lot in lots if lot.net_weight is None or lot.net_weight <= 0]
+            if len(lots) == 1:
+                targets[reading.id] = lots[0]
+            elif len(lots) > 1:
+                reading.error = "Lectura ambigua: la recepción tiene varios lotes pendientes; indique lot_number."
+            else:
+                reading.error = "No hay recepción ni lote pendiente para esta patente y fecha."
+        return targets
+
+    @staticmethod
+    def _apply_batch(readings, unmatched_before):
+        summary = defaultdict(int)
+        targets = ScaleService._targets_by_reading(readings)
+
+        readings_by_lot = defaultdict(list)
+        for reading in readings:
+            lot = targets.get(reading.id)
+            if lot is not None:
+                readings_by_lot[lot.id].append(reading)
+            elif reading.read_at < unmatched_before:
+                reading.status = "unmatched"
+                summary["unmatched"] += 1
+
+        entries = []
+        applied_readings = []
+        for lot_id, lot_readings in readings_by_lot.items():
+            latest = {}
+            for reading in sorted(lot_readings, key=lambda item: (item.read_at, item.id)):
+                latest[reading.kind] = reading
+            if set(latest) != READING_KINDS:
+                # Waits for the other weighing of the truck, within the matching window.
+                if all(reading.read_at < unmatched_before for reading in lot_readings):
+                    for reading in lot_readings:
+                        reading.status, reading.error = "unmatched", "Falta la lectura de camión cargado o vacío."
+                    summary["unmatched"] += len(lot_readings)
+                continue
+            lot = targets[latest["loaded"].id]
+            try:
+                LotService.compute_net_weight(lot, latest["loaded"].weight, latest["empty"].weight)
+            except (LotValidationError, ArithmeticError) as exc:
+                # Rejecting the lot's readings keeps one bad pair from failing the whole batch.
+                for reading in lot_readings:
+                    reading.status, reading.error, reading.lot_id = "rejected", str(exc)[:255], lot_id
+                summary["rejected"] += len(lot_readings)
+                continue
+            entries.append(TruckWeightEntry(lot_id, latest["loaded"].weight, latest["empty"].weight))
+            applied_readings.extend((reading, lot_id) for reading in lot_readings)
+
+        if entries:
+            LotService.register_full_truck_weights(entries)
+        for reading, lot_id in applied_readings:
+            reading.status, reading.error, reading.lot_id = "applied", None, lot_id
+            summary["applied"] += 1
+        return summary, [entry.lot_id for entry in entries]
+
+    @staticmethod
+    def _pending_batch(last_id, batch_size):
+        """Pending readings after ``last_id``, claimed with row locks until the batch commits.
+
+        Every worker runs its own applier; ``SKIP LOCKED`` makes a second one pass over readings
+        another is applying instead of weighing the same lots twice. SQLite has no row locks and
+        serializes writers instead.
+        """
+        return (
+            select(ScaleReading)
+            .where(ScaleReading.status == "pending", ScaleReading.id > last_id)
+            .order_by(ScaleReading.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+    @staticmethod
+    def apply_pending_readings(batch_size=500, match_window_hours=48):
+        """Match pending readings to lots and register complete loaded/empty pairs in bulk.
+
+        Readings whose truck is not known yet stay ``pending`` so a reception created later
+        still picks them up; after ``match_window_hours`` they are marked ``unmatched``.
+        Applied readings never run again, so replays and repeated runs are harmless.
+        """
+        unmatched_before = datetime.now() - timedelta(hours=match_window_hours)
+        summary = defaultdict(int)
+        last_id = 0
+        while True:
+            readings = db.session.scalars(ScaleService._pending_batch(last_id, batch_size)).all()
+            if not readings:
+                break
+            last_id = readings[-1].id
+            batch_summary, weighed_lot_ids = ScaleService._apply_batch(readings, unmatched_before)
+            db.session.commit()
+            if weighed_lot_ids:
+                invalidate_cached_pdfs("lot_labels", weighed_lot_ids)
+            for result, count in batch_summary.items():
+                summary[result] += count
+                inc_counter("petru_scale_readings_applied_total", count, result=result)
+        return dict(summary)
+
+
+class ScaleReadingApplier:
+    """Apply stored readings on a background thread so ingestion requests return at once.
+
+    One thread per process, started on first use (and again in a forked worker); bursts
+    of ingestion calls coalesce into the next pass instead of queueing work.
+    """
+
+    def __init__(self, idle_seconds=60):
+        self.idle_seconds = idle_seconds
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._app = None
+        self._start_lock = threading.Lock()
+
+    def notify(self, flask_app=None):
+        self._app = flask_app or current_app._get_current_object()
+        if self._thread_pid != os.getpid():
+            with self._start_lock:
+                if self._thread_pid != os.getpid():
+                    self._thread = threading.Thread(target=self._run, name="scale-reading-applier", daemon=True)
+                    self._thread.start()
+                    self._thread_pid = os.getpid()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.idle_seconds)
+            self._wake.clear()
+            self.run_once()
+
+    def run_once(self):
+        flask_app = self._app
+        with flask_app.app_context():
+            try:
+                return ScaleService.apply_pending_readings(
+                    batch_size=int(flask_app.config.get("SCALE_APPLY_BATCH_SIZE", 500)),
+                    match_window_hours=int(flask_app.config.get("SCALE_MATCH_WINDOW_HOURS", 48)),
+                )
+            except Exception:
+                db.session.rollback()
+                logger.exception("scale_readings_apply_failed")
+                return None
+            finally:
+                db.session.remove()
+
+
+scale_reading_applier = ScaleReadingApplier()
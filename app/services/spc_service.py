@@ -0,0 +1,265 @@
+import math
+
+from flask import current_app
+from sqlalchemy import delete, or_, select
+
+from app import db
+from app.basemodel import dialect_insert
+from app.metrics import inc_counter
+from app.models import Lot, LotQC, QCControlChart, QCControlPoint
+
+# Charted QC metrics: yield as X-bar/R over subgroups, defects as p-charts of defective units out of ``units``.
+SPC_METRICS = {"yieldpercentage": "xbar", "insect_damage": "p", "active_fungus": "p"}
+SPC_SCOPES = ("variety", "analyst")
+
+# Shewhart constants (A2, D3, D4) by subgroup size.
+_XBAR_R_CONSTANTS = {
+    2: (1.880, 0.0, 3.267),
+    3: (1.023, 0.0, 2.574),
+    4: (0.729, 0.0, 2.282),
+    5: (0.577, 0.0, 2.114),
+    6: (0.483, 0.0, 2.004),
+    7: (0.419, 0.076, 1.924),
+    8: (0.373, 0.136, 1.864),
+    9: (0.337, 0.184, 1.816),
+    10: (0.308, 0.223, 1.777),
+}
+
+
+class SPCError(ValueError):
+    pass
+
+
+def _subgroup_size(value):
+    return min(max(int(value), 2), 10)
+
+
+class SPCService:
+    """Control charts kept up to date as lot QCs arrive.
+
+    Each chart row holds Welford running statistics plus the running averages that define its
+    limits, so adding a QC and reading a chart are single-row operations whatever the length of
+    the season. Points are judged against the limits in force before they arrived, and only once
+    the chart has ``SPC_MIN_SUBGROUPS`` subgroups behind it.
+    """
+
+    @staticmethod
+    def _scope_keys(lot_qc, lot):
+        keys = [("variety", str(lot.variety_id))]
+        analyst = (lot_qc.analyst or "").strip()
+        if analyst:
+            keys.append(("analyst", analyst[:64]))
+        return keys
+
+    @staticmethod
+    def limits(chart, sample_size=None):
+        """Current control limits, or ``None`` while the chart has no completed subgroup."""
+        if not chart.subgroups:
+            return None
+        if chart.kind == "p":
+            p_bar = chart.defective / chart.inspected if chart.inspected else 0.0
+            n = sample_size or chart.inspected / chart.subgroups
+            spread = 3 * math.sqrt(p_bar * (1 - p_bar) / n) if n else 0.0
+            return {"center": p_bar, "lcl": max(p_bar - spread, 0.0), "ucl": min(p_bar + spread, 1.0)}
+        a2, d3, d4 = _XBAR_R_CONSTANTS[_subgroup_size(chart.subgroup_size)]
+        return {
+            "center": chart.xbar_mean,
+            "lcl": chart.xbar_mean - a2 * chart.range_mean,
+            "ucl": chart.xbar_mean + a2 * chart.range_mean,
+            "range_center": chart.range_mean,
+            "range_lcl": d3 * chart.range_mean,
+            "range_ucl": d4 * chart.range_mean,
+        }
+
+    @staticmethod
+    def _point(chart, value, spread, sample_size, min_subgroups):
+        limits = SPCService.limits(chart, sample_size) if chart.subgroups >= min_subgroups else None
+        point = QCControlPoint(chart_id=chart.id, sequence=chart.subgroups + 1, value=value, range=spread)
+        if limits:
+            point.center, point.lcl, point.ucl = limits["center"], limits["lcl"], limits["ucl"]
+            point.range_lcl, point.range_ucl = limits.get("range_lcl"), limits.get("range_ucl")
+            point.out_of_control = not point.lcl <= value <= point.ucl or (
+                spread is not None and not point.range_lcl <= spread <= point.range_ucl
+            )
+        return point
+
+    @staticmethod
+    def observe(chart, lot_qc, min_subgroups):
+        """Fold one QC into ``chart``; returns the new chart point, or ``None`` mid-subgroup."""
+        value = float(getattr(lot_qc, chart.metric) or 0)
+        chart.count += 1
+        delta = value - chart.mean
+        chart.mean += delta / chart.count
+        chart.m2 += delta * (value - chart.mean)
+
+        if chart.kind == "p":
+            units = int(lot_qc.units or 0)
+            if units <= 0:
+                return None
+            point = SPCService._point(chart, value / units, None, units, min_subgroups)
+            chart.defective += int(value)
+            chart.inspected += units
+        else:
+            chart.open_count += 1
+            chart.open_sum += value
+            chart.open_min = value if chart.open_min is None else min(chart.open_min, value)
+            chart.open_max = value if chart.open_max is None else max(chart.open_max, value)
+            if chart.open_count < chart.subgroup_size:
+                return None
+            xbar = chart.open_sum / chart.open_count
+            spread = chart.open_max - chart.open_min
+            point = SPCService._point(chart, xbar, spread, None, min_subgroups)
+            chart.xbar_mean += (xbar - chart.xbar_mean) / (chart.subgroups + 1)
+            chart.range_mean += (spread - chart.range_mean) / (chart.subgroups + 1)
+            chart.open_count, chart.open_sum, chart.open_min, chart.open_max = 0, 0.0, None, None
+
+        chart.subgroups += 1
+        point.lotqc_id = lot_qc.id
+        return point
+
+    @staticmethod
+    def _chart_values(scope, scope_key, metric, kind, subgroup_size):
+        return {
+            "scope": scope,
+            "scope_key": scope_key,
+            "metric": metric,
+            "kind": kind,
+            "subgroup_size": subgroup_size if kind == "xbar" else 1,
+        }
+
+    @staticmethod
+    def _locked_charts(keys, subgroup_size):
+        """Create missing charts, then lock every chart the QC feeds for the rest of the transaction."""
+        rows = [
+            SPCService._chart_values(scope, scope_key, metric, kind, subgroup_size)
+            for scope, scope_key in keys
+            for metric, kind in SPC_METRICS.items()
+        ]
+        statement = dialect_insert(QCControlChart.__table__)
+        db.session.execute(
+            statement.on_conflict_do_nothing(index_elements=["scope", "scope_key", "metric"]),
+            rows,
+        )
+        conditions = [
+            (QCControlChart.scope == scope) & (QCControlChart.scope_key == scope_key) for scope, scope_key in keys
+        ]
+        return db.session.scalars(
+            select(QCControlChart)
+            .where(or_(*conditions))
+            .order_by(QCControlChart.id)
+            .with_for_update()
+        ).all()
+
+    @staticmethod
+    def record_lot_qcs(pairs):
+        """Add ``(lot_qc, lot)`` pairs, in order, to the charts of their variety and analyst.
+
+        Runs inside the transaction that creates the QCs; every chart involved is locked once.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        config = current_app.config
+        subgroup_size = _subgroup_size(config.get("SPC_SUBGROUP_SIZE", 5))
+        min_subgroups = int(config.get("SPC_MIN_SUBGROUPS", 5))
+        db.session.flush()
+        keys = list(dict.fromkeys(key for lot_qc, lot in pairs for key in SPCService._scope_keys(lot_qc, lot)))
+        charts = {
+            (chart.scope, chart.scope_key, chart.metric): chart
+            for chart in SPCService._locked_charts(keys, subgroup_size)
+        }
+        for lot_qc, lot in pairs:
+            for scope, scope_key in SPCService._scope_keys(lot_qc, lot):
+                for metric in SPC_METRICS:
+                    chart = charts[(scope, scope_key, metric)]
+                    point = SPCService.observe(chart, lot_qc, min_subgroups)
+                    if point is None:
+                        continue
+                    db.session.add(point)
+                    if point.out_of_control:
+                        inc_counter("petru_spc_out_of_control_total", metric=chart.metric, scope=chart.scope)
+
+    @staticmethod
+    def record_lot_qc(lot_qc, lot):
+        SPCService.record_lot_qcs([(lot_qc, lot)])
+
+    @staticmethod
+    def rebuild(subgroup_size=5, min_subgroups=5, yield_per=500):
+        """Replay every lot QC in date order into fresh charts; returns the number of QC records read."""
+        db.session.execute(delete(QCControlPoint))
+        db.session.execute(delete(QCControlChart))
+        subgroup_size = _subgroup_size(subgroup_size)
+        charts = {}
+        records = 0
+        lot_qcs = (
+            db.session.query(LotQC, Lot)
+            .join(Lot, Lot.id == LotQC.lot_id)
+            .order_by(LotQC.date, LotQC.time, LotQC.id)
+        )
+        for lot_qc, lot in lot_qcs.yield_per(yield_per):
+            for scope, scope_key in SPCService._scope_keys(lot_qc, lot):
+                for metric, kind in SPC_METRICS.items():
+                    chart = charts.get((scope, scope_key, metric))
+                    if chart is None:
+                        chart = QCControlChart(**SPCService._chart_values(scope, scope_key, metric, kind, subgroup_size))
+                        db.session.add(chart)
+                        db.session.flush()
+                        charts[(scope, scope_key, metric)] = chart
+                    point = SPCService.observe(chart, lot_qc, min_subgroups)
+                    if point is not None:
+                        db.session.add(point)
+            records += 1
+            if records % yield_per == 0:
+                db.session.flush()
+        db.session.flush()
+        return records
+
+    @staticmethod
+    def chart_data(scope, scope_key, metric, points=50):
+        """Chart state and its latest ``points`` points: one unique-key lookup and one bounded index scan."""
+        if scope not in SPC_SCOPES:
+            raise SPCError(f"Ámbito de carta no válido: {scope}.")
+        if metric not in SPC_METRICS:
+            raise SPCError(f"Métrica sin carta de control: {metric}.")
+        chart = db.session.scalar(
+            select(QCControlChart).where(
+                QCControlChart.scope == scope,
+                QCControlChart.scope_key == str(scope_key),
+                QCControlChart.metric == metric,
+            )
+        )
+        if chart is None:
+            return None
+        recent = db.session.scalars(
+            select(QCControlPoint)
+            .where(QCControlPoint.chart_id == chart.id)
+            .order_by(QCControlPoint.sequence.desc())
+            .limit(points)
+        ).all()
+        return {
+            "scope": chart.scope,
+            "key": chart.scope_key,
+            "metric": chart.metric,
+            "chart": chart.kind,
+            "subgroup_size": chart.subgroup_size,
+            "observations": chart.count,
+            "subgroups": chart.subgroups,
+            "mean": chart.mean,
+            "std": math.sqrt(chart.m2 / (chart.count - 1)) if chart.count > 1 else 0.0,
+            "limits": SPCService.limits(chart),
+            "points": [
+                {
+                    "sequence": point.sequence,
+                    "lot_qc_id": point.lotqc_id,
+                    "value": point.value,
+                    "range": point.range,
+                    "center": point.center,
+                    "lcl": point.lcl,
+                    "ucl": point.ucl,
+                    "range_lcl": point.range_lcl,
+                    "range_ucl": point.range_ucl,
+                    "out_of_control": point.out_of_control,
+                }
+                for point in reversed(recent)
+            ],
+        }
@@ -0,0 +1,258 @@
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select
+
+from app import db
+from app.basemodel import _utcnow_naive, dialect_insert
+from app.models import (
+    Client,
+    Grower,
+    Lot,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    ReceptionDailyFact,
+    Variety,
+    rawmaterialreception_client,
+    rawmaterialreception_grower,
+)
+
+# Report groupings: fact column and the model that names its members (``day`` has none).
+THROUGHPUT_DIMENSIONS = {
+    "day": (ReceptionDailyFact.day, None),
+    "client": (ReceptionDailyFact.client_id, Client),
+    "grower": (ReceptionDailyFact.grower_id, Grower),
+    "variety": (ReceptionDailyFact.variety_id, Variety),
+    "packaging": (ReceptionDailyFact.rawmaterialpackaging_id, RawMaterialPackaging),
+}
+
+
+def season_start(today, start_month=3):
+    """First day of the season that ``today`` belongs to."""
+    year = today.year if today.month >= start_month else today.year - 1
+    return date(year, start_month, 1)
+
+
+def _shift_year(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # 29 February.
+        return day.replace(year=day.year + years, day=28)
+
+
+class ThroughputService:
+    """Daily reception facts (lots, bins and net kg) keyed by client, grower, variety and packaging.
+
+    Lot creation adds lots and bins and weight registration adds the change in net weight, in the
+    same transaction, so reports read a few hundred fact rows instead of joining ``lots`` with the
+    receptions and their association tables.
+    """
+
+    @staticmethod
+    def _reception_pairs(reception_ids=None):
+        """``{reception_id: (date, [(client_id, grower_id), ...])}`` from one query over both associations."""
+        query = (
+            select(
+                RawMaterialReception.id,
+                RawMaterialReception.date,
+                rawmaterialreception_client.c.client_id,
+                rawmaterialreception_grower.c.grower_id,
+            )
+            .outerjoin(
+                rawmaterialreception_client,
+                rawmaterialreception_client.c.reception_id == RawMaterialReception.id,
+            )
+            .outerjoin(
+                rawmaterialreception_grower,
+                rawmaterialreception_grower.c.reception_id == RawMaterialReception.id,
+            )
+        )
+        if reception_ids is not None:
+            query = query.where(RawMaterialReception.id.in_(reception_ids))
+        pairs = {}
+        for reception_id, day, client_id, grower_id in db.session.execute(query):
+            pairs.setdefault(reception_id, (day, []))[1].append((client_id or 0, grower_id or 0))
+        return pairs
+
+    @staticmethod
+    def _accumulate(totals, pairs, reception_id, variety_id, packaging_id, lots=0.0, bins=0.0, net_kg=0.0):
+        day, members = pairs[reception_id]
+        share = 1.0 / len(members)
+        for client_id, grower_id in members:
+            bucket = totals[(day, client_id, grower_id, variety_id, packaging_id)]
+            bucket[0] += lots * share
+            bucket[1] += bins * share
+            bucket[2] += net_kg * share
+
+    @staticmethod
+    def _rows(totals):
+        now = _utcnow_naive()
+        return [
+            {
+                "day": day,
+                "client_id": client_id,
+                "grower_id": grower_id,
+                "variety_id": variety_id,
+                "rawmaterialpackaging_id": packaging_id,
+                "lots": lots,
+                "bins": bins,
+                "net_kg": net_kg,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (day, client_id, grower_id, variety_id, packaging_id), (lots, bins, net_kg) in totals.items()
+        ]
+
+    @staticmethod
+    def _upsert(totals):
+        if not totals:
+            return
+        table = ReceptionDailyFact.__table__
+        statement = dialect_insert(table)
+        excluded = statement.excluded
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["day", "client_id", "grower_id", "variety_id", "rawmaterialpackaging_id"],
+                set_={
+                    "lots": table.c.lots + excluded.lots,
+                    "bins": table.c.bins + excluded.bins,
+                    "net_kg": table.c.net_kg + excluded.net_kg,
+                    "updated_at": excluded.updated_at,
+                },
+            ),
+            ThroughputService._rows(totals),
+        )
+
+    @staticmethod
+    def record_lots(lots):
+        """Add newly created lots; runs inside the transaction that inserts them."""
+        lots = list(lots)
+        if not lots:
+            return
+        pairs = ThroughputService._reception_pairs({lot.rawmaterialreception_id for lot in lots})
+        totals = defaultdict(lambda: [0.0, 0.0, 0.0])
+        for lot in lots:
+            ThroughputService._accumulate(
+                totals,
+                pairs,
+                lot.rawmaterialreception_id,
+                lot.variety_id,
+                lot.rawmaterialpackaging_id,
+                lots=1,
+                bins=lot.packagings_quantity,
+                net_kg=lot.net_weight or 0,
+            )
+        ThroughputService._upsert(totals)
+
+    @staticmethod
+    def record_net_weight_changes(changes):
+        """Add ``(lot, kg_delta)`` pairs from weight registration; a reweighed lot only adds its difference."""
+        changes = [(lot, delta) for lot, delta in changes if delta]
+        if not changes:
+            return
+        pairs = ThroughputService._reception_pairs({lot.rawmaterialreception_id for lot, _delta in changes})
+        totals = defaultdict(lambda: [0.0, 0.0, 0.0])
+        for lot, delta in changes:
+            ThroughputService._accumulate(
+                totals, pairs, lot.rawmaterialreception_id, lot.variety_id, lot.rawmaterialpackaging_id, net_kg=delta
+            )
+        ThroughputService._upsert(totals)
+
+    @staticmethod
+    def rebuild(yield_per=1000):
+        """Recompute every fact from ``lots``; returns the number of lots read."""
+        pairs = ThroughputService._reception_pairs()
+        totals = defaultdict(lambda: [0.0, 0.0, 0.0])
+        records = 0
+        lot_rows = db.session.execute(
+            select(
+                Lot.rawmaterialreception_id,
+                Lot.variety_id,
+                Lot.rawmaterialpackaging_id,
+                Lot.packagings_quantity,
+                Lot.net_weight,
+            ).execution_options(yield_per=yield_per)
+        )
+        for reception_id, variety_id, packaging_id, packagings_quantity, net_weight in lot_rows:
+            ThroughputService._accumulate(
+                totals,
+                pairs,
+                reception_id,
+                variety_id,
+                packaging_id,
+                lots=1,
+                bins=packagings_quantity,
+                net_kg=net_weight or 0,
+            )
+            records += 1
+
+        db.session.execute(delete(ReceptionDailyFact))
+        rows = ThroughputService._rows(totals)
+        for start in range(0, len(rows), 1000):
+            db.session.execute(insert(ReceptionDailyFact), rows[start:start + 1000])
+        return records
+
+    @staticmethod
+    def totals(date_from, date_to, dimension=None):
+        """Lots, bins and net kg between two reception dates, optionally grouped by a dimension.
+
+        Returns ``{key: {"lots", "bins", "net_kg"}}``; the key is ``None`` without a dimension.
+        """
+        sums = (
+            func.coalesce(func.sum(ReceptionDailyFact.lots), 0.0),
+            func.coalesce(func.sum(ReceptionDailyFact.bins), 0.0),
+            func.coalesce(func.sum(ReceptionDailyFact.net_kg), 0.0),
+        )
+        columns = sums if dimension is None else (THROUGHPUT_DIMENSIONS[dimension][0], *sums)
+        query = select(*columns).where(ReceptionDailyFact.day >= date_from, ReceptionDailyFact.day <= date_to)
+        if dimension is not None:
+            query = query.group_by(columns[0])
+        result = {}
+        for row in db.session.execute(query):
+            key, values = (None, row) if dimension is None else (row[0], row[1:])
+            lots, bins, net_kg = values
+            result[key] = {"lots": round(lots, 2), "bins": round(bins, 2), "net_kg": round(net_kg, 2)}
+        return result
+
+    @staticmethod
+    def year_over_year(date_from, date_to, dimension=None):
+        """Totals for a date range next to the same range one year earlier, largest members first."""
+        if dimension is not None and dimension not in THROUGHPUT_DIMENSIONS:
+            raise ValueError(f"Unknown throughput dimension: {dimension}")
+        previous_from, previous_to = _shift_year(date_from, -1), _shift_year(date_to, -1)
+        current = ThroughputService.totals(date_from, date_to, dimension)
+        previous = ThroughputService.totals(previous_from, previous_to, dimension)
+        if dimension == "day":
+            # Line each day up with the same calendar day of the previous season.
+            previous = {_shift_year(key, 1): values for key, values in previous.items()}
+
+        empty = {"lots": 0.0, "bins": 0.0, "net_kg": 0.0}
+        keys = list(current) + [key for key in previous if key not in current]
+        model = THROUGHPUT_DIMENSIONS[dimension][1] if dimension else None
+        names = {}
+        named_ids = [key for key in keys if key]
+        if model is not None and named_ids:
+            names = dict(db.session.execute(select(model.id, model.name).where(model.id.in_(named_ids))).all())
+
+        rows = []
+        for key in keys:
+            row = {**current.get(key, empty), "previous": previous.get(key, empty)}
+            if dimension == "day":
+                row["day"] = key.isoformat()
+            elif dimension is not None:
+                row["id"] = key
+                row["name"] = names.get(key, "Sin asignar" if not key else f"#{key}")
+            rows.append(row)
+        if dimension == "day":
+            rows.sort(key=lambda row: row["day"])
+        elif dimension is not None:
+            rows.sort(key=lambda row: (-row["net_kg"], -row["lots"], row["name"]))
+        return {
+            "date_from": date_from.isoformat(),
+            "date_to": date_to.isoformat(),
+            "previous_date_from": previous_from.isoformat(),
+            "previous_date_to": previous_to.isoformat(),
+            "dimension": dimension,
+            "rows": rows,
+        }
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, g, has_app_context, has_request_context, request
+
+from app.query_instrumentation import register_statement_observer, statement_fingerprint
+
+_EXPLAINABLE_PREFIXES = ("select", "with")
+
+_logger = logging.getLogger("petru.slow_queries")
+_logger.propagate = False
+_handler_lock = threading.Lock()
+_explained_fingerprints = set()
+_explained_lock = threading.Lock()
+
+
+def _slow_query_logger(log_path):
+    with _handler_lock:
+        current = next(iter(_logger.handlers), None)
+        if current is not None and getattr(current, "baseFilename", None) == os.path.abspath(log_path):
+            return _logger
+
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        handler = RotatingFileHandler(
+            log_path,
+            maxBytes=int(current_app.config.get("SLOW_QUERY_LOG_MAX_BYTES", 5 * 1024 * 1024)),
+            backupCount=int(current_app.config.get("SLOW_QUERY_LOG_BACKUPS", 5)),
+            encoding="utf-8",
+            delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+        return _logger
+
+
+def _fingerprint_id(fingerprint):
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+
+def _value_shape(value):
+    return type(value).__name__
+
+
+def bind_shape(parameters, executemany=False):
+    """Describe bind parameters by type only, so no row values reach the log."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return {"executemany": len(parameters), "row": bind_shape(first)}
+    if isinstance(parameters, dict):
+        return {str(name): _value_shape(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _claim_first_occurrence(fingerprint_id):
+    with _explained_lock:
+        if fingerprint_id in _explained_fingerprints:
+            return False
+        _explained_fingerprints.add(fingerprint_id)
+        return True
+
+
+def _explain_statement(conn, statement, parameters):
+    if not statement.lstrip().lower().startswith(_EXPLAINABLE_PREFIXES):
+        return None
+
+    dialect_name = conn.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect_name == "sqlite" else "EXPLAIN "
+    # Run on the statement's own connection: a second pooled connection per slow query can exhaust
+    # the pool while requests hold theirs. A fresh raw DBAPI cursor leaves the caller's unfetched rows
+    # alone and bypasses the engine events that brought us here. On PostgreSQL a failed statement
+    # aborts the transaction, so the EXPLAIN runs inside a savepoint.
+    savepoint = dialect_name == "postgresql"
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(prefix + statement, parameters if parameters is not None else ())
+                rows = cursor.fetchall()
+            except Exception:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            finally:
+                if savepoint:
+                    cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            cursor.close()
+    except Exception as exc:
+        return [f"EXPLAIN failed: {exc}"]
+
+    if dialect_name == "sqlite":
+        return [str(row[-1]) for row in rows]
+    return [str(row[0]) for row in rows]
+
+
+def _observe_statement(conn, statement, parameters, executemany, duration):
+    if not has_app_context():
+        return
+    threshold_ms = float(current_app.config.get("SLOW_QUERY_THRESHOLD_MS", 0) or 0)
+    duration_ms = duration * 1000.0
+    if threshold_ms <= 0 or duration_ms < threshold_ms:
+        return
+
+    fingerprint = statement_fingerprint(statement)
+    fingerprint_id = _fingerprint_id(fingerprint)
+    explain = None
+    if (
+        current_app.config.get("SLOW_QUERY_EXPLAIN", True)
+        and not executemany
+        and _claim_first_occurrence(fingerprint_id)
+    ):
+        explain = _explain_statement(conn, statement, parameters)
+
+    entry = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration_ms, 2),
+        "fingerprint": fingerprint_id,
+        "sql": statement,
+        "bind_shape": bind_shape(parameters, executemany),
+        "request_id": g.get("request_id", "-") if has_request_context() else "-",
+        "endpoint": (request.endpoint or "-") if has_request_context() else "-",
+        "pid": os.getpid(),
+        "explain": explain,
+    }
+    _slow_query_logger(current_app.config["SLOW_QUERY_LOG_PATH"]).info(
+        json.dumps(entry, ensure_ascii=False, default=str)
+    )
+
+
+def install_slow_query_log():
+    register_statement_observer(_observe_statement)
+
+
+def read_slow_query_entries(log_path, limit=500):
+    """Return the most recent slow-query entries, newest first."""
+    if not log_path or not os.path.exists(log_path):
+        return []
+    with open(log_path, encoding="utf-8") as log_file:
+        tail = deque(log_file, maxlen=limit)
+
+    entries = []
+    for line in reversed(tail):
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def summarize_slow_queries(entries):
+    """Group entries by statement fingerprint, keeping the captured plan of each group."""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry.get("fingerprint"))
+        if group is None:
+            group = groups[entry.get("fingerprint")] = {
+                "fingerprint": entry.get("fingerprint"),
+                "sql": entry.get("sql"),
+                "bind_shape": entry.get("bind_shape"),
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "endpoints": set(),
+                "last_seen": entry.get("recorded_at"),
+                "last_request_id": entry.get("request_id"),
+                "explain": None,
+            }
+        duration_ms = float(entry.get("duration_ms") or 0)
+        group["count"] += 1
+        group["total_ms"] += duration_ms
+        group["max_ms"] = max(group["max_ms"], duration_ms)
+        group["endpoints"].add(entry.get("endpoint") or "-")
+        if group["explain"] is None and entry.get("explain"):
+            group["explain"] = entry["explain"]
+
+    summaries = []
+    for group in groups.values():
+        group["avg_ms"] = round(group["total_ms"] / group["count"], 2)
+        group["endpoints"] = sorted(group["endpoints"])
+        summaries.append(group)
+    summaries.sort(key=lambda group: group["total_ms"], reverse=True)
+    return summaries
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+
+from flask import abort, current_app, send_from_directory, url_for
+
+ASSET_ENDPOINT = "asset"
+FINGERPRINTED_EXTENSIONS = {".css", ".js", ".ico", ".png", ".jpg", ".jpeg", ".svg", ".woff", ".woff2"}
+_DIGEST_LENGTH = 12
+
+
+class AssetManifest:
+    """Content digests of static files, keyed by their path relative to the static folder.
+
+    Built once at startup; with ``auto_reload`` (development) an entry is rehashed when its
+    file's mtime or size changes, so edits show up without restarting.
+    """
+
+    def __init__(self, static_folder, skip_dirs=(), auto_reload=False):
+        self.static_folder = os.path.abspath(static_folder)
+        self.skip_dirs = {os.path.abspath(path) for path in skip_dirs}
+        self.auto_reload = auto_reload
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._build()
+
+    def _build(self):
+        for root, dirs, files in os.walk(self.static_folder):
+            dirs[:] = [name for name in dirs if os.path.abspath(os.path.join(root, name)) not in self.skip_dirs]
+            for name in files:
+                if os.path.splitext(name)[1].lower() in FINGERPRINTED_EXTENSIONS:
+                    relative = os.path.relpath(os.path.join(root, name), self.static_folder).replace(os.sep, "/")
+                    self._hash(relative)
+
+    def _hash(self, filename):
+        path = os.path.join(self.static_folder, *filename.split("/"))
+        try:
+            stat = os.stat(path)
+            with open(path, "rb") as asset_file:
+                digest = hashlib.sha256(asset_file.read()).hexdigest()[:_DIGEST_LENGTH]
+        except OSError:
+            return None
+        with self._lock:
+            self._entries[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def digest(self, filename):
+        """Return the digest for ``filename``, or ``None`` when it is not a fingerprinted asset."""
+        if os.path.splitext(filename)[1].lower() not in FINGERPRINTED_EXTENSIONS:
+            return None
+        entry = self._entries.get(filename)
+        if entry is not None and not self.auto_reload:
+            return entry[2]
+        if entry is not None:
+            try:
+                stat = os.stat(os.path.join(self.static_folder, *filename.split("/")))
+            except OSError:
+                return None
+            if (stat.st_mtime_ns, stat.st_size) == entry[:2]:
+                return entry[2]
+        # Not seen at startup (or changed in debug): hash it now, unless it escapes the static folder.
+        path = os.path.abspath(os.path.join(self.static_folder, *filename.split("/")))
+        if not path.startswith(self.static_folder + os.sep):
+            return None
+        if any(path.startswith(skip_dir + os.sep) for skip_dir in self.skip_dirs):
+            return None
+        return self._hash(filename)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def asset_url(filename, **values):
+    """``url_for('static', filename=...)`` replacement that emits a content-hashed, immutable URL."""
+    manifest = current_app.extensions.get("asset_manifest")
+    digest = manifest.digest(filename) if manifest is not None else None
+    if digest is None:
+        return url_for("static", filename=filename, **values)
+    return url_for(ASSET_ENDPOINT, digest=digest, filename=filename, **values)
+
+
+def serve_fingerprinted_asset(digest, filename):
+    manifest = current_app.extensions["asset_manifest"]
+    current_digest = manifest.digest(filename)
+    if current_digest is None:
+        abort(404)
+    response = send_from_directory(current_app.static_folder, filename, max_age=0, conditional=True)
+    if digest == current_digest:
+        response.cache_control.max_age = int(current_app.config.get("STATIC_ASSET_MAX_AGE", 31536000))
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # A page rendered before a deploy asks for the old digest: serve the current file, but never pin it.
+        response.cache_control.no_cache = True
+    return response
+
+
+def install_static_assets(flask_app):
+    """Hash static assets at startup and register ``asset_url`` plus the ``/assets/`` route."""
+    static_folder = flask_app.static_folder
+    pdf_cache_dir = flask_app.config.get("PDF_CACHE_DIR")
+    flask_app.extensions["asset_manifest"] = AssetManifest(
+        static_folder,
+        skip_dirs=[pdf_cache_dir] if pdf_cache_dir else [],
+        auto_reload=bool(flask_app.config.get("STATIC_ASSET_AUTO_RELOAD")) or flask_app.debug,
+    )
+    flask_app.add_url_rule(
+        "/assets/<digest>/<path:filename>", endpoint=ASSET_ENDPOINT, view_func=serve_fingerprinted_asset
+    )
+    flask_app.jinja_env.globals["asset_url"] = asset_url
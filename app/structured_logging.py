@@ -0,0 +1,178 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+from app.metrics import inc_counter
+
+TEXT_LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s request_id=%(request_id)s %(message)s"
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request id and endpoint while still in the request thread."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, "request_id", "-")
+            record.endpoint = request.endpoint or "-"
+        else:
+            record.request_id = "-"
+            record.endpoint = "-"
+        return True
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line; ``extra={"event": ..., "log_fields": {...}}`` become top-level keys."""
+
+    def format(self, record):
+        event = getattr(record, "event", None)
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "endpoint": getattr(record, "endpoint", "-"),
+            "message": event or record.getMessage(),
+        }
+        payload.update(getattr(record, "log_fields", None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Shutdown may wait for room: everything queued before stop() is still written.
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Hand records to a listener thread so request threads never wait on log I/O.
+
+    The listener is started on first use in each process: after a preload fork the
+    parent's thread is gone, so the child gets a fresh queue and its own listener.
+    When the queue is full the record is dropped and counted instead of blocking.
+    """
+
+    def __init__(self, handlers, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.target_handlers = list(handlers)
+        self._maxsize = maxsize
+        self._listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            if self._listener_pid is not None:
+                self.queue = queue.Queue(self._maxsize)
+            self._listener = _DrainingQueueListener(self.queue, *self.target_handlers, respect_handler_level=True)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+            atexit.register(self.stop_listener)
+
+    def stop_listener(self):
+        """Drain queued records and stop the listener thread of this process."""
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+
+    def prepare(self, record):
+        # Resolve message arguments and tracebacks here: they may reference request-bound objects.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            inc_counter("petru_log_records_dropped_total")
+
+
+def install_logging_pipeline(flask_app):
+    """Route ``flask_app.logger`` through a background queue with JSON or text output."""
+    level_name = str(flask_app.config.get("LOG_LEVEL", "INFO")).upper()
+    level = getattr(logging, level_name, logging.INFO)
+    if str(flask_app.config.get("LOG_FORMAT", "json")).lower() == "text":
+        formatter = logging.Formatter(TEXT_LOG_FORMAT)
+    else:
+        formatter = JsonLogFormatter()
+
+    target_handlers = []
+    for handler in list(flask_app.logger.handlers):
+        flask_app.logger.removeHandler(handler)
+        if isinstance(handler, BackgroundQueueHandler):
+            handler.stop_listener()
+            target_handlers.extend(handler.target_handlers)
+        else:
+            target_handlers.append(handler)
+    if not target_handlers:
+        target_handlers.append(logging.StreamHandler())
+    for handler in target_handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = BackgroundQueueHandler(target_handlers, int(flask_app.config.get("LOG_QUEUE_SIZE", 10000)))
+    queue_handler.addFilter(RequestContextFilter())
+    flask_app.logger.addHandler(queue_handler)
+    flask_app.logger.setLevel(level)
+    return queue_handler
+
+
+@lru_cache(maxsize=8)
+def parse_sample_rules(raw_rules):
+    """Parse ``"target[:status]=rate,..."`` where target is an endpoint name or a path."""
+    rules = []
+    for raw_rule in (raw_rules or "").split(","):
+        target, _, raw_rate = raw_rule.strip().partition("=")
+        if not target or not raw_rate:
+            continue
+        status = None
+        path_or_endpoint, separator, raw_status = target.rpartition(":")
+        if separator and raw_status.isdigit():
+            target, status = path_or_endpoint, int(raw_status)
+        try:
+            rate = min(1.0, max(0.0, float(raw_rate)))
+        except ValueError:
+            continue
+        rules.append((target.strip(), status, rate))
+    return tuple(rules)
+
+
+def request_log_sample_rate(raw_rules, endpoint, path, status):
+    """Fraction of matching request logs to keep; errors are kept unless a rule names their status."""
+    for target, rule_status, rate in parse_sample_rules(raw_rules):
+        if target not in (endpoint, path):
+            continue
+        if rule_status is None and status >= 400:
+            continue
+        if rule_status is not None and rule_status != status:
+            continue
+        return rate
+    return 1.0
+
+
+def should_log_request(sample_rate):
+    return sample_rate >= 1.0 or random.random() < sample_rate
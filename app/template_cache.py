@@ -0,0 +1,66 @@
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+from app.metrics import set_gauge
+
+TEMPLATE_EXTENSIONS = (".html", ".txt", ".xml")
+_CACHE_FILE_PATTERN = "petru-%s.cache"
+
+
+def install_template_cache(flask_app):
+    """Share compiled template bytecode between workers through ``TEMPLATE_CACHE_DIR``.
+
+    Jinja keys each entry by template name and source checksum and writes it atomically,
+    so several workers can fill the directory at once and a deploy invalidates stale entries.
+    """
+    if not flask_app.config.get("TEMPLATE_BYTECODE_CACHE", True):
+        return None
+    cache_dir = flask_app.config["TEMPLATE_CACHE_DIR"]
+    os.makedirs(cache_dir, exist_ok=True)
+    bytecode_cache = FileSystemBytecodeCache(cache_dir, _CACHE_FILE_PATTERN)
+    flask_app.jinja_env.bytecode_cache = bytecode_cache
+    return bytecode_cache
+
+
+def warm_templates(flask_app):
+    """Compile every template once so the first requests of a worker do not pay for it.
+
+    Returns ``{"templates", "seconds", "slowest", "errors"}``; the result is kept in
+    ``app.extensions["template_warmup"]`` and published as startup gauges.
+    """
+    env = flask_app.jinja_env
+    timings = []
+    errors = []
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=[extension.lstrip(".") for extension in TEMPLATE_EXTENSIONS]):
+        template_started = time.perf_counter()
+        try:
+            env.get_template(name)
+        except TemplateError as exc:
+            errors.append(name)
+            flask_app.logger.warning("template_warmup_failed template=%s error=%s", name, exc)
+            continue
+        timings.append((name, (time.perf_counter() - template_started) * 1000.0))
+    result = {
+        "templates": len(timings),
+        "seconds": time.perf_counter() - started,
+        "slowest": [(name, round(ms, 2)) for name, ms in sorted(timings, key=lambda item: item[1], reverse=True)[:5]],
+        "errors": errors,
+    }
+    flask_app.extensions["template_warmup"] = result
+    record_template_warmup_metrics(flask_app)
+    flask_app.logger.info(
+        "templates_precompiled count=%s seconds=%.3f errors=%s", result["templates"], result["seconds"], len(errors)
+    )
+    return result
+
+
+def record_template_warmup_metrics(flask_app):
+    """Publish the last warm-up as gauges; called again after fork because workers start with empty metrics."""
+    result = flask_app.extensions.get("template_warmup")
+    if result is None:
+        return
+    set_gauge("petru_template_warmup_seconds", result["seconds"])
+    set_gauge("petru_templates_precompiled", result["templates"])
@@ -2,10 +2,13 @@ import os
 import secrets
 import shlex
 import subprocess
+import time
 from pathlib import Path
 
 from flask import current_app
 
+from app.metrics import observe
+
 
 class UploadValidationError(ValueError):
     """Raised when an uploaded file does not pass security validation."""
@@ -72,6 +75,7 @@ def _run_virus_scan(file_path):
     if not command_parts:
         raise UploadValidationError("Comando de antivirus inválido.")
 
+    started = time.perf_counter()
     try:
         completed = subprocess.run(
             [*command_parts, str(file_path)],
@@ -81,9 +85,16 @@ def _run_virus_scan(file_path):
             check=False,
         )
     except (OSError, subprocess.TimeoutExpired) as exc:
+        observe("petru_upload_scan_seconds", time.perf_counter() - started, result="error")
         current_app.logger.error("Error en escaneo antivirus: %s", exc)
         raise UploadValidationError("No se pudo completar el escaneo antivirus.") from exc
 
+    observe(
+        "petru_upload_scan_seconds",
+        time.perf_counter() - started,
+        result="clean" if completed.returncode == 0 else "blocked",
+    )
+
     if completed.returncode != 0:
         current_app.logger.warning(
             "Archivo bloqueado por antivirus. rc=%s stdout=%s stderr=%s",
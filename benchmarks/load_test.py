@@ -0,0 +1,498 @@
+"""Replay the plant's daily workflow against a running server.
+
+Each virtual user loops over trucks: create a reception, create its lots,
+register weights inline, download labels, record lot QC with image uploads
+and, every few lots, assign a fumigation work order. Separate pollers hit the
+dashboard summary APIs like the office screens do. Only the standard library
+is used so it can run from any machine that reaches the server::
+
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8080 --email admin@example.com \\
+        --password secret --users 8 --duration 300 --pollers 4
+
+Point it at a local or staging deployment only: it creates real records.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import unquote, urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from benchmarks.fixtures import tiny_png
+
+_CSRF_INPUT = re.compile(r'<input[^>]*name="csrf_token"[^>]*value="([^"]+)"')
+_RECEPTION_LINK = re.compile(r"/create_lot/(\d+)")
+_LOT_CREATED = re.compile(r"Lote (\d+) creado exitosamente")
+_LABELS_LINK = re.compile(r"/lots/(\d+)/labels\.pdf")
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    # Keep redirects visible: the Location of a POST is part of what we measure and parse.
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class StepFailed(Exception):
+    pass
+
+
+def select_options(html, field_name):
+    """Return ``(value, label)`` pairs of ``<select name=field_name>``, skipping empty values."""
+    match = re.search(rf'<select[^>]*name="{re.escape(field_name)}"[^>]*>(.*?)</select>', html, re.S)
+    if not match:
+        return []
+    options = re.findall(r'<option[^>]*value="([^"]*)"[^>]*>(.*?)</option>', match.group(1), re.S)
+    return [(value, label.strip()) for value, label in options if value]
+
+
+def select_values(html, field_name):
+    return [value for value, _label in select_options(html, field_name)]
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields:
+        lines.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode())
+    for name, (filename, content, content_type) in files.items():
+        lines.append(
+            (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+                f"Content-Type: {content_type}\r\n\r\n"
+            ).encode()
+            + content
+            + b"\r\n"
+        )
+    lines.append(f"--{boundary}--\r\n".encode())
+    return b"".join(lines), f"multipart/form-data; boundary={boundary}"
+
+
+class StepRecorder:
+    """Thread-safe latency samples and error counts per workflow step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._errors = {}
+
+    def record(self, step, duration_ms, ok):
+        with self._lock:
+            self._samples.setdefault(step, []).append(duration_ms)
+            if not ok:
+                self._errors[step] = self._errors.get(step, 0) + 1
+
+    def mark_failed(self, step):
+        """Count an error for a request that returned a 2xx but did not do its job (e.g. a re-rendered form)."""
+        with self._lock:
+            self._errors[step] = self._errors.get(step, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            rows = {}
+            for step, samples in sorted(self._samples.items()):
+                ordered = sorted(samples)
+                errors = self._errors.get(step, 0)
+                rows[step] = {
+                    "count": len(ordered),
+                    "errors": errors,
+                    "error_rate": round(errors / len(ordered), 4),
+                    "p50_ms": round(percentile(ordered, 50), 1),
+                    "p95_ms": round(percentile(ordered, 95), 1),
+                    "p99_ms": round(percentile(ordered, 99), 1),
+                }
+            return rows
+
+
+def percentile(ordered_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered_samples)))
+    return ordered_samples[min(rank, len(ordered_samples)) - 1]
+
+
+class PlantSession:
+    """One logged-in browser: cookie jar, CSRF token and timed requests."""
+
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.recorder = recorder
+        self.timeout = timeout
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), _NoRedirect())
+        self.csrf_token = None
+
+    def request(self, step, path, data=None, content_type=None, expected=(200, 302)):
+        headers = {"User-Agent": "petru-load-test"}
+        if content_type:
+            headers["Content-Type"] = content_type
+        req = Request(urljoin(self.base_url, path.lstrip("/")), data=data, headers=headers)
+        started = time.perf_counter()
+        status, body, location = None, b"", None
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status, body = response.status, response.read()
+        except HTTPError as exc:
+            status, body, location = exc.code, exc.read(), exc.headers.get("Location")
+        except (URLError, OSError) as exc:
+            self.recorder.record(step, (time.perf_counter() - started) * 1000.0, ok=False)
+            raise StepFailed(f"{step}: {exc}") from exc
+        ok = status in expected
+        self.recorder.record(step, (time.perf_counter() - started) * 1000.0, ok=ok)
+        if not ok:
+            raise StepFailed(f"{step}: HTTP {status}")
+        return status, body.decode("utf-8", errors="replace"), location
+
+    def get(self, step, path, **kwargs):
+        status, html, location = self.request(step, path, **kwargs)
+        token = _CSRF_INPUT.search(html)
+        if token:
+            self.csrf_token = token.group(1)
+        return status, html, location
+
+    def post_form(self, step, path, fields, **kwargs):
+        data = urlencode([("csrf_token", self.csrf_token or "")] + list(fields)).encode()
+        return self.request(step, path, data=data, content_type="application/x-www-form-urlencoded", **kwargs)
+
+    def post_multipart(self, step, path, fields, files, **kwargs):
+        data, content_type = encode_multipart([("csrf_token", self.csrf_token or "")] + list(fields), files)
+        return self.request(step, path, data=data, content_type=content_type, **kwargs)
+
+    def login(self, email, password):
+        self.get("login_form", "/login")
+        _status, _html, location = self.post_form(
+            "login", "/login", [("email", email), ("password", password)], expected=(302,)
+        )
+        if not location or "/login" in location:
+            self.recorder.mark_failed("login")
+            raise StepFailed("login: credenciales rechazadas")
+
+
+class TruckWorkflow:
+    def __init__(self, session, options, work_orders, rng):
+        self.session = session
+        self.options = options
+        self.work_orders = work_orders
+        self.rng = rng
+        self.unfumigated_lot_ids = []
+
+    def _think(self):
+        if self.options.think_time > 0:
+            time.sleep(self.rng.uniform(0, self.options.think_time))
+
+    def create_reception(self):
+        _status, html, _location = self.session.get("reception_form", "/create_raw_material_reception")
+        growers = select_values(html, "grower_id")
+        clients = select_values(html, "client_id")
+        if not growers or not clients:
+            raise StepFailed("reception_form: no hay productores/clientes activos")
+        now = datetime.now()
+        _status, html, _location = self.session.post_form(
+            "create_raw_material_reception",
+            "/create_raw_material_reception",
+            [
+                ("waybill", str(self.rng.randint(100_000, 999_999))),
+                ("date", now.strftime("%Y-%m-%d")),
+                ("time", now.strftime("%H:%M")),
+                ("truck_plate", f"LT{self.rng.randint(1000, 9999)}"),
+                ("trucker_name", "Carga"),
+                ("observations", ""),
+                ("grower_id", self.rng.choice(growers)),
+                ("client_id", self.rng.choice(clients)),
+            ],
+        )
+        match = _RECEPTION_LINK.search(html)
+        if not match:
+            self.session.recorder.mark_failed("create_raw_material_reception")
+            raise StepFailed("create_raw_material_reception: formulario rechazado")
+        return int(match.group(1))
+
+    def create_lot(self, reception_id, is_last_lot):
+        """Create a lot numbered by the server; returns ``(lot_number, lot_id)`` with one of them known.
+
+        Other lots re-render the form with the number in the success flash. The last lot redirects
+        to the lot list with its labels link, and so its id, in the Location.
+        """
+        _status, html, _location = self.session.get("lot_form", f"/create_lot/{reception_id}")
+        varieties = select_values(html, "variety_id")
+        packagings = select_values(html, "rawmaterialpackaging_id")
+        if not varieties or not packagings:
+            raise StepFailed("lot_form: no hay variedades/envases activos")
+        fields = [
+            ("reception_id", str(reception_id)),
+            ("variety_id", self.rng.choice(varieties)),
+            ("rawmaterialpackaging_id", self.rng.choice(packagings)),
+            ("packagings_quantity", str(self.rng.randint(8, 30))),
+        ]
+        if is_last_lot:
+            fields.append(("is_last_lot", "y"))
+        status, html, location = self.session.post_form("create_lot", f"/create_lot/{reception_id}", fields)
+        if status == 302:
+            match = _LABELS_LINK.search(unquote(location or ""))
+            if match:
+                return None, int(match.group(1))
+        else:
+            match = _LOT_CREATED.search(html)
+            if match:
+                return int(match.group(1)), None
+        self.session.recorder.mark_failed("create_lot")
+        raise StepFailed("create_lot: formulario rechazado")
+
+    def resolve_lot_ids(self, lot_numbers):
+        # Labels and weights need lot ids; the QC form lists every lot still waiting for QC.
+        _status, html, _location = self.session.get("lot_qc_form", "/create_lot_qc")
+        ids_by_number = {label: int(value) for value, label in select_options(html, "lot_id")}
+        missing = [number for number in lot_numbers if str(number) not in ids_by_number]
+        if missing:
+            raise StepFailed(f"lot_qc_form: lotes {missing} no aparecen en el formulario")
+        return [ids_by_number[str(number)] for number in lot_numbers]
+
+    def register_weight(self, lot_id):
+        empty_weight = round(self.rng.uniform(9_000, 14_000), 1)
+        loaded_weight = round(empty_weight + self.rng.uniform(8_000, 16_000), 1)
+        self.session.post_form(
+            "update_lot_weight_inline",
+            f"/lots/{lot_id}/inline_weight",
+            [("loaded_truck_weight", str(loaded_weight)), ("empty_truck_weight", str(empty_weight))],
+            expected=(302,),
+        )
+
+    def download_labels(self, lot_id):
+        self.session.request("lot_labels_pdf", f"/lots/{lot_id}/labels.pdf", expected=(200,))
+
+    def create_lot_qc(self, lot_id):
+        sizes = [self.rng.randint(5, 25) for _ in range(4)]
+        sizes.append(100 - sum(sizes))
+        colors = [self.rng.randint(50, 200) for _ in range(4)]
+        now = datetime.now()
+        fields = [
+            ("lot_id", str(lot_id)),
+            ("analyst", "Carga"),
+            ("date", now.strftime("%Y-%m-%d")),
+            ("time", now.strftime("%H:%M")),
+            ("units", "100"),
+            ("inshell_weight", "1000"),
+            ("shelled_weight", str(sum(colors))),
+            ("yieldpercentage", str(round(sum(colors) / 10.0, 2))),
+            ("lessthan30", str(sizes[0])),
+            ("between3032", str(sizes[1])),
+            ("between3234", str(sizes[2])),
+            ("between3436", str(sizes[3])),
+            ("morethan36", str(sizes[4])),
+            ("extra_light", str(colors[0])),
+            ("light", str(colors[1])),
+            ("light_amber", str(colors[2])),
+            ("amber", str(colors[3])),
+            ("yellow", "0"),
+        ]
+        for defect in (
+            "broken_walnut", "split_walnut", "light_stain", "serious_stain", "adhered_hull",
+            "shrivel", "empty", "insect_damage", "inactive_fungus", "active_fungus",
+        ):
+            fields.append((defect, str(self.rng.randint(0, 3))))
+        image = tiny_png()
+        self.session.post_multipart(
+            "create_lot_qc",
+            "/create_lot_qc",
+            fields,
+            {
+                "inshell_image": ("inshell.png", image, "image/png"),
+                "shelled_image": ("shelled.png", image, "image/png"),
+            },
+            expected=(302,),
+        )
+
+    def create_fumigation(self):
+        self.session.get("fumigation_form", "/create_fumigation")
+        fields = [("work_order", next(self.work_orders))]
+        fields.extend(("lot_selection", str(lot_id)) for lot_id in self.unfumigated_lot_ids)
+        self.session.post_form("create_fumigation", "/create_fumigation", fields, expected=(302,))
+        self.unfumigated_lot_ids = []
+
+    def run_truck(self):
+        reception_id = self.create_reception()
+        lot_count = self.rng.randint(1, self.options.max_lots_per_truck)
+        created = []
+        for index in range(lot_count):
+            self._think()
+            created.append(self.create_lot(reception_id, is_last_lot=index == lot_count - 1))
+        resolved = iter(self.resolve_lot_ids([lot_number for lot_number, lot_id in created if lot_id is None]))
+        for lot_id in [lot_id if lot_id is not None else next(resolved) for _lot_number, lot_id in created]:
+            self._think()
+            self.register_weight(lot_id)
+            if self.rng.random() < self.options.label_ratio:
+                self.download_labels(lot_id)
+            if self.rng.random() < self.options.qc_ratio:
+                self.create_lot_qc(lot_id)
+            self.unfumigated_lot_ids.append(lot_id)
+        if len(self.unfumigated_lot_ids) >= self.options.fumigation_batch:
+            self.create_fumigation()
+        return lot_count
+
+
+class LoadTest:
+    def __init__(self, options):
+        self.options = options
+        self.recorder = StepRecorder()
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.trucks_completed = 0
+        self.trucks_failed = 0
+        self.lots_created = 0
+        self.failures = []
+        run_id = uuid.uuid4().hex[:6]
+        self.work_orders = (f"LT-{run_id}-{index:05d}" for index in itertools.count(1))
+        self._counter_lock = threading.Lock()
+
+    def _locked(self, iterator):
+        while True:
+            with self._counter_lock:
+                value = next(iterator)
+            yield value
+
+    def _new_session(self):
+        session = PlantSession(self.options.base_url, self.recorder, self.options.timeout)
+        session.login(self.options.email, self.options.password)
+        return session
+
+    def _record_failure(self, exc):
+        with self._lock:
+            self.trucks_failed += 1
+            if len(self.failures) < 20:
+                self.failures.append(str(exc))
+
+    def _truck_user(self, user_index, work_orders):
+        rng = random.Random(self.options.seed + user_index)
+        try:
+            session = self._new_session()
+        except StepFailed as exc:
+            self._record_failure(exc)
+            return
+        workflow = TruckWorkflow(session, self.options, work_orders, rng)
+        while not self.stop_event.is_set():
+            with self._lock:
+                if self.options.trucks and self.trucks_completed + self.trucks_failed >= self.options.trucks:
+                    return
+            try:
+                lots = workflow.run_truck()
+            except StepFailed as exc:
+                self._record_failure(exc)
+                continue
+            with self._lock:
+                self.trucks_completed += 1
+                self.lots_created += lots
+
+    def _poller(self, poller_index):
+        rng = random.Random(self.options.seed + 10_000 + poller_index)
+        try:
+            session = self._new_session()
+        except StepFailed as exc:
+            self._record_failure(exc)
+            return
+        while not self.stop_event.is_set():
+            for step, path in (("dashboard_summary_api", "/api/dashboard/summary"), ("index_summary_api", "/api/index/summary")):
+                try:
+                    session.request(step, path, expected=(200,))
+                except StepFailed:
+                    pass
+            self.stop_event.wait(self.options.poll_interval * rng.uniform(0.8, 1.2))
+
+    def run(self):
+        work_orders = self._locked(self.work_orders)
+        threads = [
+            threading.Thread(target=self._truck_user, args=(index, work_orders), daemon=True)
+            for index in range(self.options.users)
+        ]
+        threads += [
+            threading.Thread(target=self._poller, args=(index,), daemon=True) for index in range(self.options.pollers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        truck_threads = threads[: self.options.users]
+        deadline = started + self.options.duration if self.options.duration else None
+        while any(thread.is_alive() for thread in truck_threads):
+            if deadline and time.perf_counter() >= deadline:
+                break
+            time.sleep(0.2)
+        self.stop_event.set()
+        for thread in threads:
+            thread.join(timeout=self.options.timeout + 1)
+        elapsed = time.perf_counter() - started
+        return {
+            "base_url": self.options.base_url,
+            "users": self.options.users,
+            "pollers": self.options.pollers,
+            "elapsed_s": round(elapsed, 1),
+            "trucks_completed": self.trucks_completed,
+            "trucks_failed": self.trucks_failed,
+            "lots_created": self.lots_created,
+            "trucks_per_hour": round(self.trucks_completed / elapsed * 3600.0, 1) if elapsed else 0.0,
+            "steps": self.recorder.summary(),
+            "sample_failures": self.failures,
+        }
+
+
+def format_report(report):
+    lines = [
+        f"{report['base_url']}  users={report['users']} pollers={report['pollers']} elapsed={report['elapsed_s']}s",
+        f"trucks ok={report['trucks_completed']} failed={report['trucks_failed']} lots={report['lots_created']} "
+        f"throughput={report['trucks_per_hour']} trucks/h",
+        "",
+        f"{'step':32} {'count':>7} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+    ]
+    for step, row in report["steps"].items():
+        lines.append(
+            f"{step:32} {row['count']:>7} {row['error_rate'] * 100:>6.1f} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}"
+        )
+    for failure in report["sample_failures"]:
+        lines.append(f"  ! {failure}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera carga con el flujo diario de la planta contra un servidor local.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--email", default=os.environ.get("LOADTEST_EMAIL"))
+    parser.add_argument("--password", default=os.environ.get("LOADTEST_PASSWORD"))
+    parser.add_argument("--users", type=int, default=4, help="Usuarios concurrentes registrando camiones.")
+    parser.add_argument("--pollers", type=int, default=2, help="Pantallas consultando el dashboard.")
+    parser.add_argument("--poll-interval", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=120.0, help="Segundos de carga (0 = sin límite).")
+    parser.add_argument("--trucks", type=int, default=0, help="Detiene la carga tras N camiones (0 = sin límite).")
+    parser.add_argument("--max-lots-per-truck", type=int, default=4)
+    parser.add_argument("--qc-ratio", type=float, default=0.8, help="Fracción de lotes con QC.")
+    parser.add_argument("--label-ratio", type=float, default=1.0, help="Fracción de lotes con descarga de etiquetas.")
+    parser.add_argument("--fumigation-batch", type=int, default=12, help="Lotes por orden de fumigación.")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pausa aleatoria máxima entre pasos (s).")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--output", help="Guarda el reporte en este archivo JSON.")
+    options = parser.parse_args(argv)
+    if not options.email or not options.password:
+        parser.error("--email y --password (o LOADTEST_EMAIL / LOADTEST_PASSWORD) son obligatorios.")
+    if not options.duration and not options.trucks:
+        parser.error("Defina --duration o --trucks.")
+
+    report = LoadTest(options).run()
+    print(format_report(report))
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    error_steps = [step for step, row in report["steps"].items() if row["errors"]]
+    return 1 if error_steps or report["trucks_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
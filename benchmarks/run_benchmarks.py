@@ -0,0 +1,227 @@
+"""Benchmark hot endpoints and services against a synthetic season.
+
+Example::
+
+    python -m benchmarks.run_benchmarks --database-url sqlite:///C:/tmp/bench_50k.db --scale medium --generate
+    python -m benchmarks.run_benchmarks --database-url sqlite:///C:/tmp/bench_50k.db --write-baseline
+    python -m benchmarks.run_benchmarks --database-url sqlite:///C:/tmp/bench_50k.db
+
+Each case reports median/p95 latency and the SQL statement count. Against a
+baseline file, more statements than before or a median slower than the
+tolerance allows is a regression and the runner exits with status 1.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime, timezone
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Medians within this many milliseconds of the baseline are never flagged; absorbs timer noise on fast cases.
+LATENCY_NOISE_FLOOR_MS = 5.0
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(run_case, repeat, warmup=1):
+    """Run ``run_case`` ``warmup + repeat`` times and summarize the timed runs."""
+    from app.query_instrumentation import collect_queries
+
+    for _ in range(warmup):
+        run_case()
+    durations_ms = []
+    query_counts = []
+    for _ in range(repeat):
+        with collect_queries() as stats:
+            started = time.perf_counter()
+            run_case()
+            durations_ms.append((time.perf_counter() - started) * 1000.0)
+        query_counts.append(stats.count)
+    return {
+        "median_ms": round(statistics.median(durations_ms), 2),
+        "p95_ms": round(_percentile(durations_ms, 0.95), 2),
+        "queries": max(query_counts),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return human-readable regressions of ``results`` against ``baseline`` case results."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: queries {previous['queries']} -> {current['queries']}")
+        allowed_ms = previous["median_ms"] * (1 + tolerance)
+        if current["median_ms"] > allowed_ms and current["median_ms"] - previous["median_ms"] > LATENCY_NOISE_FLOOR_MS:
+            regressions.append(
+                f"{name}: median {previous['median_ms']:.1f} ms -> {current['median_ms']:.1f} ms "
+                f"(tolerance {tolerance:.0%})"
+            )
+    return regressions
+
+
+def _benchmark_cases(client, lot_count):
+    from app import cache
+    from app.blueprints.dashboard.services import _build_dashboard_summary
+    from app.models import Lot, QCControlChart
+    from app.services import invalidate_cached_pdf
+    from app.services.projection_service import PROJECTIONS
+
+    def get(path, expected_status=200):
+        def run_case():
+            response = client.get(path)
+            response.close()
+            if response.status_code != expected_status:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+        return run_case
+
+    def dashboard_summary_api():
+        cache.clear()
+        get("/api/dashboard/summary")()
+
+    last_lot = Lot.query.order_by(Lot.lot_number.desc()).first()
+
+    def lot_labels_pdf():
+        invalidate_cached_pdf("lot_labels", last_lot.id)
+        get(f"/lots/{last_lot.id}/labels.pdf")()
+
+    busiest_chart = (
+        QCControlChart.query.filter_by(scope="variety", metric="yieldpercentage")
+        .order_by(QCControlChart.count.desc())
+        .first()
+    )
+    deep_page = max(1, lot_count // 50 // 2)
+    cases = {
+        "list_lots": get("/list_lots"),
+        "list_lots_filtered": get("/list_lots?status=disponible&sort=created_desc"),
+        "list_lots_deep_page": get(f"/list_lots?page={deep_page}&per_page=50"),
+        "list_rmrs": get("/list_rmrs"),
+        "list_fumigations": get("/list_fumigations"),
+        "dashboard_index": get("/"),
+        "dashboard_summary_api": dashboard_summary_api,
+        "service_build_dashboard_summary": _build_dashboard_summary,
+        "qc_analytics": get("/qc_analytics"),
+        "throughput_report_api": get("/api/reports/throughput"),
+    }
+    for name in PROJECTIONS:
+        cases[f"projection_{name}_api"] = get(f"/api/projections/{name}")
+    if busiest_chart is not None:
+        cases["qc_spc_chart_api"] = get(f"/api/qc/spc?scope=variety&key={busiest_chart.scope_key}")
+    if last_lot is not None:
+        cases["lot_labels_pdf"] = lot_labels_pdf
+    return cases
+
+
+def run_benchmarks(repeat=5, only=None):
+    from app import app, db
+    from app.models import Lot, User
+    from setup_db import ADMIN_EMAIL
+
+    # Keep observability side effects (files, sampling) out of the measurements.
+    app.config.update(
+        SLOW_QUERY_THRESHOLD_MS=0,
+        METRICS_ENABLED=False,
+        PROFILING_ENABLED=False,
+        SQL_QUERY_BUDGET_STRICT=False,
+    )
+    app.logger.setLevel(logging.WARNING)
+    client = app.test_client()
+    results = {}
+    with app.app_context():
+        admin = User.query.filter_by(email=ADMIN_EMAIL).first()
+        if admin is None:
+            raise RuntimeError("No existe el usuario administrador; genere el dataset primero (--generate).")
+        lot_count = db.session.query(db.func.count(Lot.id)).scalar()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(admin.id)
+            session["_fresh"] = True
+
+        for name, run_case in _benchmark_cases(client, lot_count).items():
+            if only and name not in only:
+                continue
+            try:
+                results[name] = measure(run_case, repeat)
+            except Exception as exc:  # e.g. WeasyPrint system libraries missing on this host
+                logging.warning("Benchmark %s skipped: %s", name, exc)
+                results[name] = {"skipped": str(exc)}
+            db.session.remove()
+            logging.info("%s: %s", name, results[name])
+    return lot_count, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide endpoints y servicios críticos contra un baseline.")
+    parser.add_argument("--database-url", help="Base de datos de benchmark (por defecto DATABASE_URL).")
+    parser.add_argument("--generate", action="store_true", help="Regenera el dataset sintético antes de medir.")
+    parser.add_argument("--scale", default="small", help="small, medium o large (con --generate).")
+    parser.add_argument("--lots", type=int, help="Cantidad de lotes a generar (reemplaza --scale).")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--end-date", type=date.fromisoformat)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Limita la corrida a estos casos.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--write-baseline", action="store_true", help="Guarda los resultados como nuevo baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Holgura de latencia sobre el baseline.")
+    parser.add_argument("--output", help="Escribe los resultados en este archivo JSON.")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    if args.generate:
+        from benchmarks.season_data import SCALES, generate_season
+
+        generate_season(args.lots or SCALES[args.scale], seed=args.seed, end_date=args.end_date, reset=True)
+
+    lot_count, results = run_benchmarks(repeat=args.repeat, only=args.only)
+    report = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "lot_count": lot_count,
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        logging.info("Baseline written to %s", args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        logging.warning("No baseline at %s; run with --write-baseline to create one.", args.baseline)
+        return 0
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("lot_count") != lot_count:
+        logging.warning(
+            "Baseline was recorded with %s lots, current dataset has %s; latency comparison may not be meaningful.",
+            baseline.get("lot_count"),
+            lot_count,
+        )
+    regressions = compare_to_baseline(results, baseline.get("results", {}), args.tolerance)
+    for regression in regressions:
+        logging.error("REGRESSION %s", regression)
+    if not regressions:
+        logging.info("No regressions against %s", args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""Deterministic synthetic season generator for benchmarks.
+
+``app`` reads ``DATABASE_URL`` at import time, so set it before importing this
+module (``python -m benchmarks.season_data`` uses the environment as-is; the
+benchmark runner sets it from ``--database-url``).
+"""
+
+import logging
+import os
+import random
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, insert, text
+
+from app import app, db
+from app.models import (
+    Client,
+    Fumigation,
+    FullTruckWeight,
+    Grower,
+    Lot,
+    LotQC,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    SampleQC,
+    Variety,
+    fumigation_lot,
+    rawmaterialreception_client,
+    rawmaterialreception_grower,
+)
+from app.services.lot_event_service import LotEventService
+from app.services.lot_number_service import LotNumberAllocator
+from app.services.projection_service import ProjectionService
+from app.services.qc_rollup_service import QCRollupService
+from app.services.spc_service import SPCService
+from app.services.throughput_service import ThroughputService
+from benchmarks.fixtures import tiny_png
+from setup_db import create_admin_user
+
+SCALES = {
+    "small": 1_000,
+    "medium": 50_000,
+    "large": 250_000,
+}
+
+SEASON_DAYS = 100
+INSERT_CHUNK_SIZE = 5_000
+FUMIGATION_BATCH_SIZE = 12
+
+VARIETIES = ["CHANDLER", "SERR", "HOWARD", "TULARE", "FRANQUETTE"]
+PACKAGINGS = [("Bins Plásticos IFCO", 42.0), ("Maxisaco Polipropileno", 2.5)]
+ANALYSTS = ["M. Rojas", "P. Soto", "C. Fuentes", "J. Herrera"]
+
+# Every synthetic QC record points at the same two uploads.
+INSHELL_IMAGE = "images/benchmark_inshell.png"
+SHELLED_IMAGE = "images/benchmark_shelled.png"
+
+_DOMAIN_MODELS = (FullTruckWeight, LotQC, SampleQC, Fumigation, Lot, RawMaterialReception)
+
+
+def _chunks(rows, size=INSERT_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _bulk_insert(table, rows):
+    for chunk in _chunks(rows):
+        db.session.execute(insert(table), chunk)
+
+
+def _reset_sequences(tables):
+    # Rows are inserted with explicit ids; move PostgreSQL sequences past them.
+    if db.engine.dialect.name != "postgresql":
+        return
+    for table in tables:
+        db.session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+            )
+        )
+
+
+def _ensure_reference_data(rng, grower_count, client_count):
+    create_admin_user()
+
+    for name in VARIETIES:
+        if Variety.query.filter_by(name=name).first() is None:
+            db.session.add(Variety(name=name, is_active=True))
+    for name, tare in PACKAGINGS:
+        if RawMaterialPackaging.query.filter_by(name=name).first() is None:
+            db.session.add(RawMaterialPackaging(name=name, tare=tare, is_active=True))
+    for index in range(1, grower_count + 1):
+        tax_id = f"93{index:08d}"
+        if Grower.query.filter_by(tax_id=tax_id).first() is None:
+            db.session.add(Grower(name=f"AGRICOLA SINTETICA {index:04d} SPA", tax_id=tax_id, csg_code=f"CSG{index:07d}"))
+    for index in range(1, client_count + 1):
+        tax_id = f"94{index:08d}"
+        if Client.query.filter_by(tax_id=tax_id).first() is None:
+            db.session.add(
+                Client(
+                    name=f"EXPORTADORA SINTETICA {index:03d}",
+                    tax_id=tax_id,
+                    address=f"Camino Interior {rng.randint(1, 999)}",
+                    comuna="Rengo",
+                )
+            )
+    db.session.commit()
+
+    varieties = Variety.query.filter(Variety.name.in_(VARIETIES)).order_by(Variety.id).all()
+    packagings = RawMaterialPackaging.query.filter(
+        RawMaterialPackaging.name.in_([name for name, _ in PACKAGINGS])
+    ).order_by(RawMaterialPackaging.id).all()
+    growers = Grower.query.filter(Grower.tax_id.like("93%")).order_by(Grower.id).all()
+    clients = Client.query.filter(Client.tax_id.like("94%")).order_by(Client.id).all()
+    return varieties, packagings, growers, clients
+
+
+def _write_upload_fixtures():
+    upload_root = app.config["UPLOAD_ROOT"]
+    for relative_path in (INSHELL_IMAGE, SHELLED_IMAGE):
+        absolute_path = os.path.join(upload_root, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        with open(absolute_path, "wb") as image_file:
+            image_file.write(tiny_png())
+
+
+def _qc_measurements(rng):
+    sizes = [rng.randint(5, 25) for _ in range(4)]
+    sizes.append(100 - sum(sizes))
+    inshell_weight = round(rng.uniform(900.0, 1100.0), 1)
+    shelled_weight = round(inshell_weight * rng.uniform(0.42, 0.52), 1)
+    colors = [rng.uniform(0, 1) for _ in range(5)]
+    color_total = sum(colors)
+    return {
+        "units": 100,
+        "inshell_weight": inshell_weight,
+        "shelled_weight": shelled_weight,
+        "yieldpercentage": round(shelled_weight / inshell_weight * 100, 2),
+        "lessthan30": sizes[0],
+        "between3032": sizes[1],
+        "between3234": sizes[2],
+        "between3436": sizes[3],
+        "morethan36": sizes[4],
+        "broken_walnut": rng.randint(0, 4),
+        "split_walnut": rng.randint(0, 4),
+        "light_stain": rng.randint(0, 6),
+        "serious_stain": rng.randint(0, 2),
+        "adhered_hull": rng.randint(0, 3),
+        "shrivel": rng.randint(0, 3),
+        "empty": rng.randint(0, 2),
+        "insect_damage": rng.randint(0, 2),
+        "inactive_fungus": rng.randint(0, 2),
+        "active_fungus": rng.randint(0, 1),
+        "extra_light": round(colors[0] / color_total * 100, 1),
+        "light": round(colors[1] / color_total * 100, 1),
+        "light_amber": round(colors[2] / color_total * 100, 1),
+        "amber": round(colors[3] / color_total * 100, 1),
+        "yellow": round(colors[4] / color_total * 100, 1),
+        "inshell_image_path": INSHELL_IMAGE,
+        "shelled_image_path": SHELLED_IMAGE,
+    }
+
+
+def domain_row_counts():
+    return {model.__tablename__: db.session.query(func.count(model.id)).scalar() for model in _DOMAIN_MODELS}
+
+
+def generate_season(lot_count, seed=2024, end_date=None, reset=False):
+    """Insert a season of ``lot_count`` lots with receptions, weights, QC and fumigations.
+
+    The same ``seed``, ``lot_count`` and ``end_date`` always produce the same rows.
+    The domain tables must be empty unless ``reset`` drops and recreates the schema.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=SEASON_DAYS - 1)
+
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+        existing = {table: count for table, count in domain_row_counts().items() if count}
+        if existing:
+            raise RuntimeError(f"La base de datos ya tiene datos operacionales: {existing}. Use --reset.")
+
+        varieties, packagings, growers, clients = _ensure_reference_data(
+            rng,
+            grower_count=max(10, min(400, lot_count // 250)),
+            client_count=max(3, min(40, lot_count // 2000)),
+        )
+        _write_upload_fixtures()
+
+        receptions, reception_growers, reception_clients = [], [], []
+        lots, weights, lot_qcs, lot_fumigations = [], [], [], []
+        reception_id = 0
+        lot_number = 0
+        lots_per_day = lot_count / SEASON_DAYS
+        while lot_number < lot_count:
+            reception_id += 1
+            day_index = min(int(lot_number / lots_per_day), SEASON_DAYS - 1)
+            reception_date = start_date + timedelta(days=day_index)
+            reception_time = time(rng.randint(6, 19), rng.randint(0, 59))
+            received_at = datetime.combine(reception_date, reception_time)
+            is_last_day = day_index == SEASON_DAYS - 1
+            receptions.append(
+                {
+                    "id": reception_id,
+                    "waybill": 100_000 + reception_id,
+                    "date": reception_date,
+                    "time": reception_time,
+                    "truck_plate": f"{rng.choice('BCDFGHJKLPRSTVWXYZ')}{rng.choice('BCDFGHJKLPRSTVWXYZ')}{rng.randint(1000, 9999)}",
+                    "trucker_name": f"Chofer {rng.randint(1, 300)}",
+                    "observations": "",
+                    "is_open": is_last_day and rng.random() < 0.3,
+                    "created_at": received_at,
+                    "updated_at": received_at,
+                }
+            )
+            reception_growers.append({"reception_id": reception_id, "grower_id": rng.choice(growers).id})
+            reception_clients.append({"reception_id": reception_id, "client_id": rng.choice(clients).id})
+
+            for _ in range(min(rng.randint(1, 6), lot_count - lot_number)):
+                lot_number += 1
+                lot_created_at = received_at + timedelta(minutes=rng.randint(5, 90))
+                packaging = rng.choice(packagings)
+                packagings_quantity = rng.randint(8, 30)
+                weighed = not is_last_day or rng.random() < 0.6
+                net_weight = 0
+                if weighed:
+                    empty_weight = round(rng.uniform(9_000, 14_000), 1)
+                    net_weight = round(packagings_quantity * rng.uniform(350.0, 550.0), 2)
+                    loaded_weight = round(empty_weight + net_weight + packaging.tare * packagings_quantity, 2)
+                    weights.append(
+                        {
+                            "id": lot_number,
+                            "lot_id": lot_number,
+                            "loaded_truck_weight": loaded_weight,
+                            "empty_truck_weight": empty_weight,
+                            "created_at": lot_created_at,
+                            "updated_at": lot_created_at,
+                        }
+                    )
+
+                has_qc = weighed and rng.random() < (0.5 if day_index >= SEASON_DAYS - 3 else 0.9)
+                if has_qc:
+                    qc_at = lot_created_at + timedelta(hours=rng.randint(1, 20))
+                    lot_qcs.append(
+                        dict(
+                            _qc_measurements(rng),
+                            id=len(lot_qcs) + 1,
+                            lot_id=lot_number,
+                            analyst=rng.choice(ANALYSTS),
+                            date=qc_at.date(),
+                            time=qc_at.time(),
+                            created_at=qc_at,
+                            updated_at=qc_at,
+                        )
+                    )
+
+                days_left = SEASON_DAYS - 1 - day_index
+                if days_left > 20:
+                    fumigation_status = "4"
+                elif days_left > 10:
+                    fumigation_status = rng.choice("34")
+                elif days_left > 3:
+                    fumigation_status = rng.choice("1234")
+                else:
+                    fumigation_status = "1"
+                if fumigation_status != "1":
+                    lot_fumigations.append((lot_number, fumigation_status, reception_date, net_weight))
+
+                lots.append(
+                    {
+                        "id": lot_number,
+                        "lot_number": lot_number,
+                        "packagings_quantity": packagings_quantity,
+                        "net_weight": net_weight,
+                        "has_qc": has_qc,
+                        "fumigation_status": fumigation_status,
+                        "on_warehouse": fumigation_status != "4" or rng.random() < 0.7,
+                        "rawmaterialreception_id": reception_id,
+                        "variety_id": rng.choice(varieties).id,
+                        "rawmaterialpackaging_id": packaging.id,
+                        "created_at": lot_created_at,
+                        "updated_at": lot_created_at,
+                    }
+                )
+
+        fumigations, fumigation_links = [], []
+        for status in "234":
+            status_lots = [entry for entry in lot_fumigations if entry[1] == status]
+            for start in range(0, len(status_lots), FUMIGATION_BATCH_SIZE):
+                batch = status_lots[start:start + FUMIGATION_BATCH_SIZE]
+                fumigation_id = len(fumigations) + 1
+                started_on = max(entry[2] for entry in batch) + timedelta(days=2)
+                fumigations.append(
+                    {
+                        "id": fumigation_id,
+                        "work_order": f"OT-BENCH-{fumigation_id:06d}",
+                        "real_start_date": started_on if status in "34" else None,
+                        "real_start_time": time(9, 0) if status in "34" else None,
+                        "real_end_date": started_on + timedelta(days=3) if status == "4" else None,
+                        "real_end_time": time(17, 0) if status == "4" else None,
+                        "status": status,
+                        "assigned_lots": len(batch) if status == "2" else 0,
+                        "started_lots": len(batch) if status == "3" else 0,
+                        "completed_lots": len(batch) if status == "4" else 0,
+                        "net_weight": sum(entry[3] for entry in batch),
+                        "created_at": datetime.combine(started_on, time(8, 0)),
+                        "updated_at": datetime.combine(started_on, time(8, 0)),
+                    }
+                )
+                fumigation_links.extend({"fumigation_id": fumigation_id, "lot_id": entry[0]} for entry in batch)
+
+        sample_qcs = []
+        for index in range(1, max(1, lot_count // 10) + 1):
+            sampled_on = start_date + timedelta(days=rng.randrange(SEASON_DAYS))
+            sample_qcs.append(
+                dict(
+                    _qc_measurements(rng),
+                    id=index,
+                    grower=rng.choice(growers).name[:64],
+                    brought_by=f"Productor {rng.randint(1, 200)}",
+                    analyst=rng.choice(ANALYSTS),
+                    date=sampled_on,
+                    time=time(rng.randint(8, 18), rng.randint(0, 59)),
+                    created_at=datetime.combine(sampled_on, time(12, 0)),
+                    updated_at=datetime.combine(sampled_on, time(12, 0)),
+                )
+            )
+
+        _bulk_insert(RawMaterialReception.__table__, receptions)
+        _bulk_insert(rawmaterialreception_grower, reception_growers)
+        _bulk_insert(rawmaterialreception_client, reception_clients)
+        _bulk_insert(Lot.__table__, lots)
+        _bulk_insert(FullTruckWeight.__table__, weights)
+        _bulk_insert(LotQC.__table__, lot_qcs)
+        _bulk_insert(SampleQC.__table__, sample_qcs)
+        _bulk_insert(Fumigation.__table__, fumigations)
+        _bulk_insert(fumigation_lot, fumigation_links)
+        _reset_sequences(
+            [table.__table__ for table in (RawMaterialReception, Lot, FullTruckWeight, LotQC, SampleQC, Fumigation)]
+        )
+        # Lot numbers were inserted explicitly too; keep the allocator past them.
+        if lots:
+            LotNumberAllocator.advance_past(max(row["lot_number"] for row in lots))
+        db.session.commit()
+        _build_derived_tables()
+
+        counts = domain_row_counts()
+        logging.info("Synthetic season generated: %s", counts)
+        return counts
+
+
+def _build_derived_tables():
+    """Fill the tables the reports read, as the ``rebuild-*`` and lot event commands would after a restore."""
+    QCRollupService.rebuild()
+    ThroughputService.rebuild()
+    SPCService.rebuild(
+        subgroup_size=app.config.get("SPC_SUBGROUP_SIZE", 5),
+        min_subgroups=app.config.get("SPC_MIN_SUBGROUPS", 5),
+    )
+    LotEventService.backfill(batch_size=app.config.get("PROJECTION_BATCH_SIZE", 1000))
+    db.session.commit()
+    # Every event is committed by now, so there are no gaps to wait on.
+    ProjectionService.catch_up_all(batch_size=app.config.get("PROJECTION_BATCH_SIZE", 1000), settle_seconds=0)
+    db.session.commit()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera una temporada sintética determinista.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--lots", type=int, help="Cantidad de lotes (reemplaza --scale).")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--end-date", type=date.fromisoformat, help="Último día de la temporada (YYYY-MM-DD).")
+    parser.add_argument("--reset", action="store_true", help="Elimina y recrea el esquema antes de generar.")
+    args = parser.parse_args(argv)
+    generate_season(args.lots or SCALES[args.scale], seed=args.seed, end_date=args.end_date, reset=args.reset)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
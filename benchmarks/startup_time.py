@@ -0,0 +1,161 @@
+"""Measure how long ``import app`` takes and how much memory it leaves resident.
+
+Every gunicorn worker, test run and ``setup_db.py`` invocation pays this cost,
+so each run uses a fresh interpreter::
+
+    python -m benchmarks.startup_time --runs 7
+    python -m benchmarks.startup_time --max-import-ms 1500 --max-rss-mb 150 --importtime
+
+The report also lists heavy optional modules (WeasyPrint, qrcode, Pillow...)
+that got imported; they should only load when a PDF or QR code is rendered.
+
+After the import each run precompiles every template like gunicorn does at
+startup. All runs share one fresh ``TEMPLATE_CACHE_DIR``: the first run shows
+the cold compile time, the following ones the load from the bytecode cache.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ("weasyprint", "qrcode", "PIL", "cffi", "fontTools", "pydyf", "tinycss2", "cssselect2")
+
+_CHILD_SCRIPT = r"""
+import json, sys, time
+started = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - started) * 1000.0
+from app.template_cache import warm_templates
+warmup = warm_templates(app.app)
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t)
+                for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                             "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                             "PagefileUsage", "PeakPagefileUsage")
+            ]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(Counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.PeakWorkingSetSize / 1024.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024.0 if sys.platform == "darwin" else float(peak)
+
+print(json.dumps({
+    "import_ms": import_ms,
+    "peak_rss_kb": peak_rss_kb(),
+    "template_ms": warmup["seconds"] * 1000.0,
+    "templates": warmup["templates"],
+    "modules": len(sys.modules),
+    "heavy_modules": sorted(name for name in HEAVY if name in sys.modules),
+}))
+"""
+
+
+def _child_env(template_cache_dir=None):
+    env = dict(os.environ)
+    env.setdefault("FLASK_ENV", "testing")
+    if template_cache_dir:
+        env["TEMPLATE_CACHE_DIR"] = template_cache_dir
+    return env
+
+
+def measure_startup(runs=5, python=sys.executable):
+    """Import ``app`` in ``runs`` fresh interpreters and summarize time, peak RSS and heavy imports."""
+    script = f"HEAVY = {HEAVY_MODULES!r}\n" + _CHILD_SCRIPT
+    samples = []
+    with tempfile.TemporaryDirectory() as template_cache_dir:
+        for _ in range(runs):
+            completed = subprocess.run(
+                [python, "-c", script], capture_output=True, text=True, env=_child_env(template_cache_dir), check=False
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(f"import app failed:\n{completed.stderr.strip()}")
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    warm_samples = samples[1:] or samples
+    return {
+        "runs": runs,
+        "import_ms_median": round(statistics.median(sample["import_ms"] for sample in samples), 1),
+        "import_ms_max": round(max(sample["import_ms"] for sample in samples), 1),
+        "peak_rss_mb_median": round(statistics.median(sample["peak_rss_kb"] for sample in samples) / 1024.0, 1),
+        "templates": samples[0]["templates"],
+        "template_ms_cold": round(samples[0]["template_ms"], 1),
+        "template_ms_cached_median": round(statistics.median(sample["template_ms"] for sample in warm_samples), 1),
+        "modules": samples[-1]["modules"],
+        "heavy_modules": sorted({name for sample in samples for name in sample["heavy_modules"]}),
+    }
+
+
+def slowest_imports(limit=15, python=sys.executable):
+    """Return the slowest imports made by ``import app`` under ``-X importtime``."""
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", "import app"], capture_output=True, text=True, env=_child_env(), check=False
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        # Nesting is shown as two spaces per level; keep ``app`` and what it imports directly,
+        # deeper imports are already part of their parent's cumulative time.
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        if depth > 1:
+            continue
+        rows.append({"module": module.strip(), "cumulative_ms": round(int(cumulative_us) / 1000.0, 1)})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo y la memoria de 'import app'.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="Falla si la mediana supera este tiempo.")
+    parser.add_argument("--max-rss-mb", type=float, help="Falla si la memoria pico mediana supera este valor.")
+    parser.add_argument(
+        "--max-template-ms", type=float, help="Falla si la precompilación desde la caché supera este tiempo."
+    )
+    parser.add_argument("--importtime", action="store_true", help="Lista los imports más lentos (-X importtime).")
+    parser.add_argument("--output", help="Escribe los resultados en este archivo JSON.")
+    args = parser.parse_args(argv)
+
+    result = measure_startup(runs=args.runs)
+    if args.importtime:
+        result["slowest_imports"] = slowest_imports()
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(result, output_file, indent=2)
+
+    failures = []
+    if result["heavy_modules"]:
+        failures.append(f"heavy modules imported at startup: {', '.join(result['heavy_modules'])}")
+    if args.max_import_ms and result["import_ms_median"] > args.max_import_ms:
+        failures.append(f"import time {result['import_ms_median']} ms > {args.max_import_ms} ms")
+    if args.max_rss_mb and result["peak_rss_mb_median"] > args.max_rss_mb:
+        failures.append(f"peak RSS {result['peak_rss_mb_median']} MB > {args.max_rss_mb} MB")
+    if args.max_template_ms and result["template_ms_cached_median"] > args.max_template_ms:
+        failures.append(f"template warm-up {result['template_ms_cached_median']} ms > {args.max_template_ms} ms")
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
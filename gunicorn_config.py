@@ -1,7 +1,49 @@
+import glob
+import importlib.util
 import os
 
-bind = "0.0.0.0:8080"
-workers = 2
+
+def _load_app_module(filename, module_name):
+    # Load app modules on their own: importing the app package here would build the Flask app while
+    # gunicorn is still reading its settings, before preload_app decides where that should happen.
+    module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", filename)
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_app_config = _load_app_module("config.py", "petru_gunicorn_config")
+_app_metrics = _load_app_module("metrics.py", "petru_gunicorn_metrics")
+
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on Windows/macOS
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8080")
+
+# Threads keep a worker responsive while one request waits on a PDF render, an AV scan or the
+# database; processes scale the CPU-bound work. Both can be overridden per host.
+worker_class = "gthread"
+threads = _app_config._int_from_env("GUNICORN_THREADS", 4)
+workers = _app_config._int_from_env("GUNICORN_WORKERS", min(_available_cpus() + 1, 8))
+
+# Import the app once in the master; workers fork from it and share the loaded code copy-on-write.
+preload_app = _app_config._bool_from_env("GUNICORN_PRELOAD", True)
+
+# Recycle workers periodically to cap WeasyPrint/Pango memory growth; jitter avoids restarting
+# every worker at the same moment.
+max_requests = _app_config._int_from_env("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _app_config._int_from_env("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+timeout = _app_config._int_from_env("GUNICORN_TIMEOUT", 120)
+graceful_timeout = _app_config._int_from_env("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _app_config._int_from_env("GUNICORN_KEEPALIVE", 5)
+
 max_request_body_bytes = int(os.environ.get("MAX_CONTENT_LENGTH_BYTES", str(16 * 1024 * 1024)))
 
 
@@ -17,3 +59,66 @@ def pre_request(worker, req):
     if request_size > max_request_body_bytes:
         worker.log.warning("Rejected request body size %s > %s bytes", request_size, max_request_body_bytes)
         raise RuntimeError("Request body too large")
+
+
+def on_starting(server):
+    # Worker snapshots from a previous run would otherwise be merged into fresh counters.
+    for snapshot_path in glob.glob(os.path.join(_app_config.Config.METRICS_DIR, "metrics_*.json")):
+        try:
+            os.remove(snapshot_path)
+        except OSError:
+            continue
+
+
+def worker_exit(server, worker):
+    # Publish the requests served since the last throttled flush before the worker goes away.
+    from app import app
+    from app.metrics import flush_snapshot
+
+    with app.app_context():
+        flush_snapshot(force=True)
+
+
+def child_exit(server, worker):
+    # Recycled workers would leave one snapshot each; fold it into the retired totals instead.
+    _app_metrics.retire_snapshot(_app_config.Config.METRICS_DIR, worker.pid)
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # Connections opened in the master must not be shared with the children; close=False drops
+    # the pool references without closing the sockets the master still owns.
+    from app import app, db
+
+    from app.template_cache import record_template_warmup_metrics
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # The metrics registry starts empty in each child; republish what the master measured.
+    record_template_warmup_metrics(app)
+    worker.log.info("Worker %s: database pool reset after fork", worker.pid)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # Compiled once in the master, the templates are inherited by every forked worker.
+    _warm_templates(server.log)
+
+
+def post_worker_init(worker):
+    if preload_app:
+        return
+    # Each worker compiles on its own; the shared bytecode cache keeps that to a disk read after the first.
+    _warm_templates(worker.log)
+
+
+def _warm_templates(log):
+    from app import app
+    from app.template_cache import warm_templates
+
+    if not app.config.get("TEMPLATE_WARMUP", True):
+        return
+    result = warm_templates(app)
+    log.info("Precompiled %s templates in %.3fs", result["templates"], result["seconds"])
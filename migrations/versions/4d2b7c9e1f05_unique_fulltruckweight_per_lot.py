@@ -0,0 +1,88 @@
+"""unique full truck weight per lot
+
+Revision ID: 4d2b7c9e1f05
+Revises: bad67861d2bf
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "4d2b7c9e1f05"
+down_revision = "bad67861d2bf"
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = "ix_fulltruckweights_lot_id"
+TABLE_NAME = "fulltruckweights"
+
+
+def _existing_indexes(bind):
+    inspector = sa.inspect(bind)
+    return {index["name"]: index for index in inspector.get_indexes(TABLE_NAME)}
+
+
+def _duplicate_ids(bind):
+    """Ids to delete so each lot keeps the weights its stored net weight was computed from.
+
+    The app used to update whichever row ``filter_by(lot_id=...).first()`` returned, so the row
+    that matches ``lots.net_weight`` is kept; when none matches, the lowest id, which is the one
+    that query usually returned.
+    """
+    rows = bind.execute(
+        sa.text(
+            "SELECT f.id, f.lot_id, f.loaded_truck_weight, f.empty_truck_weight, l.net_weight, "
+            "l.packagings_quantity, p.tare FROM fulltruckweights f "
+            "JOIN lots l ON l.id = f.lot_id "
+            "LEFT JOIN rawmaterialpackagings p ON p.id = l.rawmaterialpackaging_id "
+            "WHERE f.lot_id IN (SELECT lot_id FROM fulltruckweights WHERE lot_id IS NOT NULL "
+            "GROUP BY lot_id HAVING COUNT(*) > 1) "
+            "ORDER BY f.lot_id, f.id"
+        )
+    ).all()
+    by_lot = {}
+    for row in rows:
+        by_lot.setdefault(row.lot_id, []).append(row)
+
+    doomed = []
+    for lot_rows in by_lot.values():
+        kept = lot_rows[0]
+        for row in lot_rows:
+            if row.net_weight is None or row.tare is None:
+                continue
+            computed = row.loaded_truck_weight - row.empty_truck_weight - row.tare * row.packagings_quantity
+            if abs(computed - row.net_weight) < 0.01:
+                kept = row
+                break
+        doomed.extend(row.id for row in lot_rows if row.id != kept.id)
+    return doomed
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Keep one row per lot so the unique index can be built on existing data.
+    doomed = _duplicate_ids(bind)
+    if doomed:
+        bind.execute(
+            sa.text("DELETE FROM fulltruckweights WHERE id IN :ids").bindparams(sa.bindparam("ids", expanding=True)),
+            {"ids": doomed},
+        )
+    existing = _existing_indexes(bind).get(INDEX_NAME)
+    if existing is not None and existing.get("unique"):
+        return
+    if existing is not None:
+        op.drop_index(INDEX_NAME, table_name=TABLE_NAME)
+    op.create_index(INDEX_NAME, TABLE_NAME, ["lot_id"], unique=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    existing = _existing_indexes(bind).get(INDEX_NAME)
+    if existing is not None and not existing.get("unique"):
+        return
+    if existing is not None:
+        op.drop_index(INDEX_NAME, table_name=TABLE_NAME)
+    op.create_index(INDEX_NAME, TABLE_NAME, ["lot_id"], unique=False)
@@ -0,0 +1,50 @@
+"""add scale readings
+
+Revision ID: 9a3e5f7c2b14
+Revises: 4d2b7c9e1f05
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9a3e5f7c2b14"
+down_revision = "4d2b7c9e1f05"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scalereadings",
+        sa.Column("reading_key", sa.String(length=64), nullable=False),
+        sa.Column("truck_plate", sa.String(length=16), nullable=False),
+        sa.Column("read_at", sa.DateTime(), nullable=False),
+        sa.Column("kind", sa.String(length=6), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=False),
+        sa.Column("lot_number", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=9), nullable=False),
+        sa.Column("error", sa.String(length=255), nullable=True),
+        sa.Column("lot_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.CheckConstraint("kind IN ('loaded', 'empty')", name="ck_scalereadings_kind_valid"),
+        sa.CheckConstraint(
+            "status IN ('pending', 'applied', 'rejected', 'unmatched')", name="ck_scalereadings_status_valid"
+        ),
+        sa.CheckConstraint("weight >= 0", name="ck_scalereadings_weight_non_negative"),
+        sa.ForeignKeyConstraint(["lot_id"], ["lots.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("reading_key"),
+    )
+    op.create_index("ix_scalereadings_status_id", "scalereadings", ["status", "id"], unique=False)
+    op.create_index("ix_scalereadings_lot_id", "scalereadings", ["lot_id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_scalereadings_lot_id", table_name="scalereadings")
+    op.drop_index("ix_scalereadings_status_id", table_name="scalereadings")
+    op.drop_table("scalereadings")
@@ -0,0 +1,75 @@
+"""add lot event journal
+
+Revision ID: a6e4d2c81f39
+Revises: f2c8a6d41b57
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a6e4d2c81f39"
+down_revision = "f2c8a6d41b57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing lots are journaled afterwards with `flask backfill-lot-events`.
+    op.create_table(
+        "lotevents",
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("lot_id", sa.Integer(), nullable=True),
+        sa.Column("rawmaterialreception_id", sa.Integer(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["lot_id"], ["lots.id"]),
+        sa.ForeignKeyConstraint(["rawmaterialreception_id"], ["rawmaterialreceptions.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_lotevents_lot_id_id", "lotevents", ["lot_id", "id"], unique=False)
+    op.create_index("ix_lotevents_kind_id", "lotevents", ["kind", "id"], unique=False)
+
+    op.create_table(
+        "projectionoffsets",
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("gaps", sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.create_table(
+        "projectionvalues",
+        sa.Column("projection", sa.String(length=32), nullable=False),
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("projection", "key", name="uq_projectionvalues_key"),
+    )
+    op.create_table(
+        "lotstateclocks",
+        sa.Column("lot_id", sa.Integer(), nullable=False),
+        sa.Column("state", sa.String(length=1), nullable=False),
+        sa.Column("entered_at", sa.DateTime(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["lot_id"], ["lots.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("lot_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("lotstateclocks")
+    op.drop_table("projectionvalues")
+    op.drop_table("projectionoffsets")
+    op.drop_index("ix_lotevents_kind_id", table_name="lotevents")
+    op.drop_index("ix_lotevents_lot_id_id", table_name="lotevents")
+    op.drop_table("lotevents")
@@ -0,0 +1,73 @@
+"""add qc control charts
+
+Revision ID: b8d4f2a61e93
+Revises: e5b19a7d4c63
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b8d4f2a61e93"
+down_revision = "e5b19a7d4c63"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing lot QCs are charted afterwards with `flask rebuild-spc-charts`.
+    op.create_table(
+        "qccontrolcharts",
+        sa.Column("scope", sa.String(length=8), nullable=False),
+        sa.Column("scope_key", sa.String(length=64), nullable=False),
+        sa.Column("metric", sa.String(length=24), nullable=False),
+        sa.Column("kind", sa.String(length=4), nullable=False),
+        sa.Column("subgroup_size", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("mean", sa.Float(), nullable=False),
+        sa.Column("m2", sa.Float(), nullable=False),
+        sa.Column("subgroups", sa.Integer(), nullable=False),
+        sa.Column("xbar_mean", sa.Float(), nullable=False),
+        sa.Column("range_mean", sa.Float(), nullable=False),
+        sa.Column("defective", sa.Integer(), nullable=False),
+        sa.Column("inspected", sa.Integer(), nullable=False),
+        sa.Column("open_count", sa.Integer(), nullable=False),
+        sa.Column("open_sum", sa.Float(), nullable=False),
+        sa.Column("open_min", sa.Float(), nullable=True),
+        sa.Column("open_max", sa.Float(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.CheckConstraint("scope IN ('variety', 'analyst')", name="ck_qccontrolcharts_scope_valid"),
+        sa.CheckConstraint("kind IN ('xbar', 'p')", name="ck_qccontrolcharts_kind_valid"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("scope", "scope_key", "metric", name="uq_qccontrolcharts_scope_metric"),
+    )
+    op.create_table(
+        "qccontrolpoints",
+        sa.Column("chart_id", sa.Integer(), nullable=False),
+        sa.Column("sequence", sa.Integer(), nullable=False),
+        sa.Column("lotqc_id", sa.Integer(), nullable=True),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("range", sa.Float(), nullable=True),
+        sa.Column("center", sa.Float(), nullable=True),
+        sa.Column("lcl", sa.Float(), nullable=True),
+        sa.Column("ucl", sa.Float(), nullable=True),
+        sa.Column("range_lcl", sa.Float(), nullable=True),
+        sa.Column("range_ucl", sa.Float(), nullable=True),
+        sa.Column("out_of_control", sa.Boolean(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["chart_id"], ["qccontrolcharts.id"]),
+        sa.ForeignKeyConstraint(["lotqc_id"], ["lotsqc.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("chart_id", "sequence", name="uq_qccontrolpoints_chart_sequence"),
+    )
+
+
+def downgrade():
+    op.drop_table("qccontrolpoints")
+    op.drop_table("qccontrolcharts")
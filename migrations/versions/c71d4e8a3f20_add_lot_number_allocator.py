@@ -0,0 +1,42 @@
+"""add lot number allocator
+
+Revision ID: c71d4e8a3f20
+Revises: 9a3e5f7c2b14
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c71d4e8a3f20"
+down_revision = "9a3e5f7c2b14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "lotnumbercounters",
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("next_value", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    # Start numbering right after the lots that already exist.
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.schema.CreateSequence(sa.Sequence("lot_number_seq")))
+        op.execute(
+            "SELECT setval('lot_number_seq', COALESCE((SELECT MAX(lot_number) FROM lots), 0) + 1, false)"
+        )
+    else:
+        op.execute(
+            "INSERT INTO lotnumbercounters (name, next_value) "
+            "SELECT 'lot_number', COALESCE(MAX(lot_number), 0) + 1 FROM lots"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.schema.DropSequence(sa.Sequence("lot_number_seq")))
+    op.drop_table("lotnumbercounters")
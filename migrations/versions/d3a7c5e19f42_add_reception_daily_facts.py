@@ -0,0 +1,49 @@
+"""add reception daily facts
+
+Revision ID: d3a7c5e19f42
+Revises: b8d4f2a61e93
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d3a7c5e19f42"
+down_revision = "b8d4f2a61e93"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing lots are loaded afterwards with `flask rebuild-throughput`.
+    op.create_table(
+        "receptiondailyfacts",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("client_id", sa.Integer(), nullable=False),
+        sa.Column("grower_id", sa.Integer(), nullable=False),
+        sa.Column("variety_id", sa.Integer(), nullable=False),
+        sa.Column("rawmaterialpackaging_id", sa.Integer(), nullable=False),
+        sa.Column("lots", sa.Float(), nullable=False),
+        sa.Column("bins", sa.Float(), nullable=False),
+        sa.Column("net_kg", sa.Float(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "day",
+            "client_id",
+            "grower_id",
+            "variety_id",
+            "rawmaterialpackaging_id",
+            name="uq_receptiondailyfacts_key",
+        ),
+    )
+    op.create_index("ix_receptiondailyfacts_day", "receptiondailyfacts", ["day"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_receptiondailyfacts_day", table_name="receptiondailyfacts")
+    op.drop_table("receptiondailyfacts")
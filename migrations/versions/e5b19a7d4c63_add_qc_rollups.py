@@ -0,0 +1,48 @@
+"""add qc rollups
+
+Revision ID: e5b19a7d4c63
+Revises: c71d4e8a3f20
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e5b19a7d4c63"
+down_revision = "c71d4e8a3f20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing QC records are rolled up afterwards with `flask rebuild-qc-rollups`.
+    op.create_table(
+        "qcrollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("source", sa.String(length=6), nullable=False),
+        sa.Column("dimension", sa.String(length=7), nullable=False),
+        sa.Column("dimension_id", sa.Integer(), nullable=False),
+        sa.Column("metric", sa.String(length=24), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("total_sq", sa.Float(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.CheckConstraint("source IN ('lot', 'sample')", name="ck_qcrollups_source_valid"),
+        sa.CheckConstraint(
+            "dimension IN ('all', 'grower', 'variety', 'client')", name="ck_qcrollups_dimension_valid"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("day", "source", "dimension", "dimension_id", "metric", name="uq_qcrollups_bucket"),
+    )
+    op.create_index(
+        "ix_qcrollups_source_dimension_day", "qcrollups", ["source", "dimension", "day"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_qcrollups_source_dimension_day", table_name="qcrollups")
+    op.drop_table("qcrollups")
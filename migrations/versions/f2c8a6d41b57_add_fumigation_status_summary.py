@@ -0,0 +1,63 @@
+"""add fumigation status summary
+
+Revision ID: f2c8a6d41b57
+Revises: d3a7c5e19f42
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f2c8a6d41b57"
+down_revision = "d3a7c5e19f42"
+branch_labels = None
+depends_on = None
+
+
+def _lot_count(state):
+    return (
+        "(SELECT COUNT(*) FROM fumigation_lot JOIN lots ON lots.id = fumigation_lot.lot_id "
+        f"WHERE fumigation_lot.fumigation_id = fumigations.id AND lots.fumigation_status = '{state}')"
+    )
+
+
+def upgrade():
+    with op.batch_alter_table("fumigations") as batch_op:
+        batch_op.add_column(sa.Column("status", sa.String(length=1), nullable=False, server_default="2"))
+        batch_op.add_column(sa.Column("assigned_lots", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("started_lots", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("completed_lots", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("net_weight", sa.Float(), nullable=False, server_default="0"))
+
+    # Same precedence the list used when it derived the status from the lots.
+    op.execute(
+        "UPDATE fumigations SET "
+        f"assigned_lots = {_lot_count('2')}, "
+        f"started_lots = {_lot_count('3')}, "
+        f"completed_lots = {_lot_count('4')}, "
+        "net_weight = (SELECT COALESCE(SUM(lots.net_weight), 0) FROM fumigation_lot "
+        "JOIN lots ON lots.id = fumigation_lot.lot_id WHERE fumigation_lot.fumigation_id = fumigations.id)"
+    )
+    op.execute(
+        "UPDATE fumigations SET status = CASE "
+        "WHEN real_end_date IS NOT NULL THEN '4' "
+        "WHEN started_lots > 0 THEN '3' "
+        "ELSE '2' END"
+    )
+
+    with op.batch_alter_table("fumigations") as batch_op:
+        batch_op.create_check_constraint("ck_fumigations_status_valid", "status IN ('2', '3', '4')")
+        batch_op.create_index("ix_fumigations_status_created_at", ["status", "created_at"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("fumigations") as batch_op:
+        batch_op.drop_index("ix_fumigations_status_created_at")
+        batch_op.drop_constraint("ck_fumigations_status_valid", type_="check")
+        batch_op.drop_column("net_weight")
+        batch_op.drop_column("completed_lots")
+        batch_op.drop_column("started_lots")
+        batch_op.drop_column("assigned_lots")
+        batch_op.drop_column("status")
@@ -0,0 +1,151 @@
+import os
+import unittest
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import text
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_benchmarks.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Lot,
+    LotEvent,
+    LotNumberCounter,
+    LotQC,
+    ProjectionOffset,
+    QCControlChart,
+    QCRollup,
+    ReceptionDailyFact,
+)
+from app.services.lot_number_service import LotNumberAllocator  # noqa: E402
+from benchmarks.load_test import StepRecorder, percentile, select_options  # noqa: E402
+from benchmarks.run_benchmarks import compare_to_baseline, measure  # noqa: E402
+from benchmarks.season_data import generate_season  # noqa: E402
+from benchmarks.startup_time import measure_startup  # noqa: E402
+
+
+class SeasonDataTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def _lot_rows(self):
+        with app.app_context():
+            return [
+                (lot.lot_number, lot.packagings_quantity, lot.net_weight, lot.fumigation_status, lot.created_at)
+                for lot in Lot.query.order_by(Lot.id).all()
+            ]
+
+    def test_same_seed_generates_identical_season(self):
+        end_date = date(2025, 5, 31)
+        counts = generate_season(120, seed=7, end_date=end_date, reset=True)
+        first_rows = self._lot_rows()
+        generate_season(120, seed=7, end_date=end_date, reset=True)
+
+        self.assertEqual(counts["lots"], 120)
+        self.assertGreater(counts["lotsqc"], 0)
+        self.assertGreater(counts["fumigations"], 0)
+        self.assertEqual(self._lot_rows(), first_rows)
+        with app.app_context():
+            qc = LotQC.query.first()
+            self.assertTrue(os.path.exists(os.path.join(app.config["UPLOAD_ROOT"], *qc.inshell_image_path.split("/"))))
+            # The report tables are built too, so their endpoints are measured on real data.
+            self.assertEqual(LotEvent.query.count(), 120)
+            self.assertGreater(QCRollup.query.count(), 0)
+            self.assertGreater(QCControlChart.query.count(), 0)
+            self.assertGreater(ReceptionDailyFact.query.count(), 0)
+            self.assertEqual(db.session.get(ProjectionOffset, "lot_counters").position, 120)
+
+    def test_lot_numbers_allocated_afterwards_continue_past_the_season(self):
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            # A counter left by lots deleted before generating.
+            db.session.add(LotNumberCounter(name="lot_number", next_value=3))
+            db.session.commit()
+        generate_season(20, seed=3, end_date=date(2025, 5, 31))
+        with app.app_context():
+            self.assertEqual(LotNumberAllocator.reserve(), [21])
+            db.session.rollback()
+
+    def test_refuses_to_mix_with_existing_operational_data(self):
+        generate_season(10, seed=1, end_date=date(2025, 5, 31), reset=True)
+        with self.assertRaises(RuntimeError):
+            generate_season(10, seed=1, end_date=date(2025, 5, 31))
+
+
+class BaselineComparisonTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        # measure() opens the test database again after SeasonDataTests removed it.
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def test_more_queries_or_slower_median_is_a_regression(self):
+        baseline = {
+            "list_lots": {"median_ms": 40.0, "p95_ms": 50.0, "queries": 4},
+            "list_rmrs": {"median_ms": 20.0, "p95_ms": 22.0, "queries": 5},
+            "lot_labels_pdf": {"skipped": "weasyprint unavailable"},
+        }
+        results = {
+            "list_lots": {"median_ms": 41.0, "p95_ms": 60.0, "queries": 5},
+            "list_rmrs": {"median_ms": 90.0, "p95_ms": 95.0, "queries": 5},
+            "lot_labels_pdf": {"median_ms": 300.0, "p95_ms": 320.0, "queries": 3},
+        }
+        regressions = compare_to_baseline(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("list_lots: queries 4 -> 5", regressions[0])
+        self.assertIn("list_rmrs: median", regressions[1])
+
+    def test_measure_reports_query_count(self):
+        with app.app_context():
+            result = measure(lambda: db.session.execute(text("SELECT 1")), repeat=3)
+        self.assertEqual(result["queries"], 1)
+        self.assertGreaterEqual(result["p95_ms"], result["median_ms"])
+
+
+class LoadTestHelperTests(unittest.TestCase):
+    def test_select_options_reads_rendered_wtforms_select(self):
+        html = (
+            '<select class="form-select" id="lot_id" name="lot_id">'
+            '<option value="12">1001</option><option selected value="15">1002</option></select>'
+            '<select id="other" name="other"><option value="1">x</option></select>'
+        )
+        self.assertEqual(select_options(html, "lot_id"), [("12", "1001"), ("15", "1002")])
+        self.assertEqual(select_options(html, "missing"), [])
+
+    def test_step_summary_reports_percentiles_and_error_rate(self):
+        recorder = StepRecorder()
+        for duration_ms in range(1, 101):
+            recorder.record("create_lot", float(duration_ms), ok=duration_ms % 10 != 0)
+        recorder.mark_failed("create_lot")
+
+        row = recorder.summary()["create_lot"]
+        self.assertEqual(row["count"], 100)
+        self.assertEqual(row["errors"], 11)
+        self.assertEqual((row["p50_ms"], row["p95_ms"], row["p99_ms"]), (50.0, 95.0, 99.0))
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+class StartupTimeTests(unittest.TestCase):
+    def test_importing_app_does_not_load_pdf_or_qr_libraries(self):
+        result = measure_startup(runs=2)
+        self.assertEqual(result["heavy_modules"], [])
+        self.assertGreater(result["import_ms_median"], 0)
+        self.assertGreater(result["peak_rss_mb_median"], 0)
+        self.assertGreater(result["templates"], 0)
+        self.assertGreater(result["template_ms_cold"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import gzip
+import os
+import unittest
+from pathlib import Path
+
+import brotli
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_compression.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, cache, db  # noqa: E402
+from app.metrics import registry  # noqa: E402
+from app.models import Role, User  # noqa: E402
+
+
+class ResponseCompressionTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._original_min_bytes = app.config.get("COMPRESSION_MIN_BYTES")
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, COMPRESSION_MIN_BYTES=200)
+        self.client = app.test_client()
+        with app.app_context():
+            cache.clear()
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Compresion",
+                email="admin@compression.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            db.session.add_all([admin_role, user])
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        app.config["COMPRESSION_MIN_BYTES"] = self._original_min_bytes
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_negotiates_brotli_or_gzip_and_sets_vary(self):
+        self._login()
+        identity = self.client.get("/list_lots")
+        self.assertNotIn("Content-Encoding", identity.headers)
+
+        br = self.client.get("/list_lots", headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(br.headers["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", br.headers["Vary"])
+        self.assertEqual(brotli.decompress(br.data), identity.data)
+
+        gz = self.client.get("/list_lots", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(gz.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(gz.data), identity.data)
+
+    def test_small_and_non_text_responses_are_left_alone(self):
+        small = self.client.get("/healthz", headers={"Accept-Encoding": "br"})
+        self.assertNotIn("Content-Encoding", small.headers)
+        icon = self.client.get("/static/favicon.ico", headers={"Accept-Encoding": "br"})
+        self.assertEqual(icon.status_code, 200)
+        self.assertNotIn("Content-Encoding", icon.headers)
+        icon.close()
+
+    def test_static_assets_keep_conditional_requests_working(self):
+        first = self.client.get("/static/css/main.css", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(first.headers["Content-Encoding"], "gzip")
+        self.assertTrue(first.headers["ETag"].startswith("W/"))
+        revalidated = self.client.get(
+            "/static/css/main.css", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]}
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_cached_view_reuses_compressed_body(self):
+        self._login()
+        registry._reset()
+        for _ in range(2):
+            response = self.client.get("/api/dashboard/summary", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.headers["Content-Encoding"], "br")
+        results = {
+            dict(labels)["cache"]: value
+            for name, labels, value in registry.snapshot()["counters"]
+            if name == "petru_http_compressed_responses_total"
+        }
+        self.assertEqual(results, {"miss": 1.0, "hit": 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,9 +27,12 @@ class EndpointResolutionTests(unittest.TestCase):
             ("auth.login", {}),
             ("auth.logout", {}),
             ("dashboard.healthz", {}),
+            ("dashboard.metrics", {}),
             ("dashboard.index_summary_api", {}),
             ("dashboard.dashboard_tv", {}),
             ("dashboard.dashboard_summary_api", {}),
+            ("dashboard.throughput_report_api", {}),
+            ("dashboard.projection_api", {"name": "lot_counters"}),
             ("admin.add_user", {}),
             ("admin.list_users", {}),
             ("admin.edit_user", {"user_id": 1}),
@@ -60,17 +63,30 @@ class EndpointResolutionTests(unittest.TestCase):
             ("admin.list_raw_material_packagings", {}),
             ("admin.edit_raw_material_packaging", {"rmp_id": 1}),
             ("admin.toggle_raw_material_packaging", {"rmp_id": 1}),
+            ("admin.list_slow_queries", {}),
+            ("admin.list_request_profiles", {}),
+            ("admin.view_request_profile", {"profile_id": "20250101T000000000000_req"}),
+            ("admin.download_request_profile", {"profile_id": "20250101T000000000000_req"}),
             ("materiaprima.create_raw_material_reception", {}),
             ("materiaprima.list_rmrs", {}),
+            ("materiaprima.export_rmrs", {"export_format": "csv"}),
             ("materiaprima.create_lot", {"reception_id": 1}),
+            ("materiaprima.create_lots", {"reception_id": 1}),
+            ("materiaprima.register_truck_weights", {}),
             ("materiaprima.list_lots", {}),
+            ("materiaprima.export_lots", {"export_format": "csv"}),
             ("materiaprima.register_full_truck_weight", {"lot_id": 1}),
             ("materiaprima.update_lot_weight_inline", {"lot_id": 1}),
             ("materiaprima.generate_qr", {"reception_id": 1}),
             ("materiaprima.lot_labels_pdf", {"lot_id": 1}),
+            ("materiaprima.ingest_scale_readings", {}),
             ("qc.create_lot_qc", {}),
             ("qc.create_sample_qc", {}),
             ("qc.list_lot_qc_reports", {}),
+            ("qc.export_lot_qc_reports", {"export_format": "xlsx"}),
+            ("qc.qc_analytics", {}),
+            ("qc.qc_spc_chart", {}),
+            ("qc.import_qc", {}),
             ("qc.list_sample_qc_reports", {}),
             ("qc.view_lot_qc_report", {"report_id": 1}),
             ("qc.view_lot_qc_report_image", {"report_id": 1, "image_kind": "inshell"}),
@@ -80,10 +96,12 @@ class EndpointResolutionTests(unittest.TestCase):
             ("qc.view_sample_qc_report_pdf", {"report_id": 1}),
             ("fumigation.create_fumigation", {}),
             ("fumigation.list_fumigations", {}),
+            ("fumigation.plan_fumigations", {}),
             ("fumigation.view_fumigation_document", {"fumigation_id": 1, "document_kind": "sign"}),
             ("fumigation.start_fumigation", {"fumigation_id": 1}),
             ("fumigation.complete_fumigation", {"fumigation_id": 1}),
             ("static", {"filename": "css/main.css"}),
+            ("asset", {"digest": "0123456789ab", "filename": "css/main.css"}),
         ]
 
         with app.test_request_context():
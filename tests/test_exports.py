@@ -0,0 +1,138 @@
+import csv
+import io
+import os
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import date, time
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_exports.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.exports import iter_csv  # noqa: E402
+from app.models import Client, Grower, Lot, RawMaterialPackaging, RawMaterialReception, Role, User, Variety  # noqa: E402
+
+SHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+class ExportTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, EXPORT_YIELD_PER=2)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Export",
+                email="admin@export.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            db.session.add_all([admin_role, user, variety, packaging])
+            db.session.flush()
+            self.user_id = user.id
+
+            for waybill, client_name in ((2001, "Cliente Norte"), (2002, "=Cliente Sur")):
+                client = Client(name=client_name, tax_id=str(waybill), address="Dir", comuna="Comuna", is_active=True)
+                grower = Grower(name=f"Productor {waybill}", tax_id=f"9{waybill}", csg_code=f"CSG{waybill}", is_active=True)
+                reception = RawMaterialReception(
+                    waybill=waybill,
+                    date=date(2026, 3, 2),
+                    time=time(8, 0),
+                    truck_plate="AA1111",
+                    trucker_name="Chofer",
+                    observations="",
+                    is_open=False,
+                )
+                reception.clients.append(client)
+                reception.growers.append(grower)
+                db.session.add(reception)
+                db.session.flush()
+                for offset in range(3):
+                    db.session.add(
+                        Lot(
+                            lot_number=waybill - 2000 + offset * 10,
+                            packagings_quantity=10,
+                            net_weight=100.5 if offset else 0,
+                            fumigation_status="1",
+                            rawmaterialreception_id=reception.id,
+                            variety_id=variety.id,
+                            rawmaterialpackaging_id=packaging.id,
+                        )
+                    )
+            db.session.commit()
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_lot_csv_export_streams_rows_with_the_list_filters(self):
+        self._login()
+        response = self.client.get("/list_lots/export/csv?client=norte&sort=lot_number_desc&page=3")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertIn('filename="lotes_', response.headers["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip("\ufeff"))))
+        self.assertEqual(rows[0][:3], ["Lote", "Fecha recepción", "Guía"])
+        self.assertEqual([row[0] for row in rows[1:]], ["21", "11", "1"])
+        self.assertEqual(rows[1][3], "Cliente Norte")
+        self.assertEqual((rows[1][8], rows[3][8]), ("100.5", ""))
+
+    def test_lot_xlsx_export_is_a_valid_workbook(self):
+        self._login()
+        response = self.client.get("/list_lots/export/xlsx")
+
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = ET.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+        rows = sheet.findall("s:sheetData/s:row", SHEET_NS)
+        self.assertEqual(len(rows), 7)
+        first_lot = rows[1].findall("s:c", SHEET_NS)
+        self.assertEqual(first_lot[0].find("s:v", SHEET_NS).text, "1")
+        self.assertEqual(first_lot[3].find("s:is/s:t", SHEET_NS).text, "Cliente Norte")
+
+    def test_reception_export_and_unknown_format(self):
+        self._login()
+        body = self.client.get("/list_rmrs/export/csv").get_data(as_text=True)
+        rows = list(csv.reader(io.StringIO(body.lstrip("\ufeff"))))
+        self.assertEqual(len(rows), 3)
+        # Values that spreadsheets would run as formulas are neutralised.
+        self.assertIn("'=Cliente Sur", [row[6] for row in rows])
+        self.assertEqual(self.client.get("/list_rmrs/export/pdf").status_code, 404)
+
+    def test_lot_qc_export_without_reports_has_only_the_header(self):
+        self._login()
+        response = self.client.get("/list_lot_qc_reports/export/csv")
+        self.assertEqual(response.status_code, 200)
+        lines = response.get_data(as_text=True).strip().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("Porcentaje de Pulpa", lines[0])
+
+    def test_csv_is_flushed_in_chunks(self):
+        chunks = list(iter_csv(["n"], ([str(number) * 100] for number in range(2000))))
+        self.assertGreater(len(chunks), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
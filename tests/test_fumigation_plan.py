@@ -0,0 +1,132 @@
+import os
+import unittest
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_fumigation_plan.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import Fumigation, Lot, RawMaterialPackaging, RawMaterialReception, Role, User, Variety  # noqa: E402
+from app.services.fumigation_plan_service import (  # noqa: E402
+    FumigationPlanError,
+    FumigationPlanService,
+    WaitingLot,
+    parse_capacities,
+)
+
+START = datetime(2026, 3, 1, 8, 0)
+
+
+def _waiting(lot_number, net_weight, bins=10, hours=0):
+    return WaitingLot(lot_number, lot_number, net_weight, bins, START + timedelta(hours=hours or lot_number))
+
+
+class FumigationPlanTests(unittest.TestCase):
+    def test_oldest_lots_go_first_and_younger_small_lots_fill_the_gap(self):
+        lots = [_waiting(1, 600), _waiting(2, 500), _waiting(3, 300), _waiting(4, 100), _waiting(5, 0)]
+        plan = FumigationPlanService.plan(lots, [1000, 500])
+
+        self.assertEqual([[lot.lot_number for lot in load.lots] for load in plan.loads], [[1, 3, 4], [2]])
+        self.assertEqual([load.fill for load in plan.loads], [1.0, 1.0])
+        self.assertEqual([lot.lot_number for lot in plan.skipped], [5])
+        self.assertEqual(plan.waiting, [])
+
+        by_bins = FumigationPlanService.plan(lots, [25], unit="bins")
+        self.assertEqual(by_bins.loads[0].lot_ids, [1, 2])
+        self.assertEqual([lot.lot_number for lot in by_bins.waiting], [3, 4, 5])
+
+    def test_a_peak_day_backlog_fills_every_chamber(self):
+        lots = [_waiting(number, 200 + (number * 37) % 500, hours=number) for number in range(1, 5001)]
+        plan = FumigationPlanService.plan(lots, [24000] * 10)
+        self.assertEqual(len(plan.loads), 10)
+        self.assertTrue(all(load.fill > 0.99 for load in plan.loads))
+        self.assertEqual(plan.loads[0].lots[0].lot_number, 1)
+
+    def test_capacities_are_parsed(self):
+        self.assertEqual(parse_capacities("24000; 18000 12000"), [24000.0, 18000.0, 12000.0])
+        for text in ("", "abc", "0", "-5", "nan", "inf, 18000"):
+            with self.assertRaises(FumigationPlanError):
+                parse_capacities(text)
+
+
+class FumigationPlanPageTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Camaras",
+                email="admin@camaras.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            reception = RawMaterialReception(
+                waybill=9001, date=date(2026, 3, 1), time=time(7, 0), truck_plate="CAM001", is_open=False
+            )
+            db.session.add_all([admin_role, user, variety, packaging, reception])
+            db.session.flush()
+            for lot_number, net_weight in ((1, 600.0), (2, 500.0), (3, 400.0)):
+                db.session.add(
+                    Lot(
+                        lot_number=lot_number,
+                        packagings_quantity=10,
+                        net_weight=net_weight,
+                        created_at=START + timedelta(hours=lot_number),
+                        rawmaterialreception_id=reception.id,
+                        variety_id=variety.id,
+                        rawmaterialpackaging_id=packaging.id,
+                    )
+                )
+            db.session.commit()
+            self.user_id = user.id
+
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_planned_load_is_submitted_as_a_work_order(self):
+        response = self.client.get("/plan_fumigations?capacities=1000&unit=kg")
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn("Lote 001, Lote 003", body)
+        self.assertIn("1 lotes quedan esperando", body)
+
+        with app.app_context():
+            plan = FumigationPlanService.plan_waiting_lots([1000])
+        response = self.client.post(
+            "/create_fumigation",
+            data={"work_order": "OT-CAM-1", "lot_selection": plan.loads[0].lot_ids},
+        )
+        self.assertEqual(response.status_code, 302)
+        with app.app_context():
+            fumigation = Fumigation.query.filter_by(work_order="OT-CAM-1").one()
+            self.assertEqual((fumigation.assigned_lots, fumigation.net_weight), (2, 1000.0))
+            self.assertEqual([lot.lot_number for lot in FumigationPlanService.waiting_lots()], [2])
+
+    def test_invalid_capacities_are_reported(self):
+        response = self.client.get("/plan_fumigations?capacities=mucho")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Capacidad de cámara no válida", response.get_data(as_text=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
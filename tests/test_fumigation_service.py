@@ -10,7 +10,13 @@ os.environ["SECRET_KEY"] = "test-secret-key"
 
 from app import app, db
 from app.models import Fumigation, Lot, RawMaterialPackaging, RawMaterialReception, Variety
-from app.services.fumigation_service import FumigationService, can_transition, transition_fumigation_status
+from app.services.fumigation_service import (
+    FumigationService,
+    FumigationTransitionError,
+    can_transition,
+    transition_fumigation_status,
+)
+from app.services.lot_service import LotService
 
 
 class FumigationServiceTests(unittest.TestCase):
@@ -126,6 +132,63 @@ class FumigationServiceTests(unittest.TestCase):
 
             self.assertEqual(Fumigation.query.filter_by(work_order="OT-300").count(), 0)
 
+    def test_set_based_transition_reports_the_blocking_lots_and_changes_none(self):
+        with app.app_context():
+            fumigation = FumigationService.assign_fumigation("OT-400", self.lot_ids)
+            db.session.commit()
+            lot = db.session.get(Lot, self.lot_ids[1])
+            lot.fumigation_status = "1"
+            db.session.commit()
+
+            with self.assertRaises(FumigationTransitionError) as raised:
+                FumigationService.start_fumigation(
+                    fumigation=fumigation,
+                    real_start_date=date.today(),
+                    real_start_time=time(10, 0),
+                )
+            db.session.rollback()
+            self.assertEqual(raised.exception.blocked, [(self.lot_ids[1], 2, "1")])
+            self.assertIn("lote 2 (estado 1)", str(raised.exception))
+            statuses = dict(db.session.query(Lot.id, Lot.fumigation_status).all())
+            self.assertEqual(statuses, {self.lot_ids[0]: "2", self.lot_ids[1]: "1"})
+            self.assertIsNone(db.session.get(Fumigation, fumigation.id).real_start_date)
+
+            with self.assertRaises(FumigationTransitionError) as raised:
+                FumigationService.transition_lots([self.lot_ids[1], 999], FumigationService.ASSIGNED)
+            self.assertEqual(raised.exception.blocked, [(999, None, None)])
+            self.assertEqual(db.session.get(Lot, self.lot_ids[1]).fumigation_status, "1")
+
+    @staticmethod
+    def _summary(fumigation):
+        return (
+            fumigation.status,
+            fumigation.assigned_lots,
+            fumigation.started_lots,
+            fumigation.completed_lots,
+            fumigation.net_weight,
+        )
+
+    def test_work_order_keeps_status_lot_counts_and_net_weight(self):
+        with app.app_context():
+            LotService.register_full_truck_weight(db.session.get(Lot, self.lot_ids[0]), 1000, 500)
+            fumigation = FumigationService.assign_fumigation("OT-500", self.lot_ids)
+            db.session.commit()
+            self.assertEqual(self._summary(fumigation), ("2", 2, 0, 0, 490.0))
+
+            # Weighing a lot after assignment updates its work order.
+            LotService.register_full_truck_weight(db.session.get(Lot, self.lot_ids[1]), 700, 500)
+            db.session.commit()
+            db.session.refresh(fumigation)
+            self.assertEqual(fumigation.net_weight, 680.0)
+
+            FumigationService.start_fumigation(fumigation, date.today(), time(10, 0))
+            db.session.commit()
+            self.assertEqual(self._summary(fumigation), ("3", 0, 2, 0, 680.0))
+            FumigationService.complete_fumigation(fumigation, date.today(), time(12, 0))
+            db.session.commit()
+            self.assertEqual(self._summary(fumigation), ("4", 0, 0, 2, 680.0))
+            self.assertEqual(Fumigation.query.filter_by(status="4").count(), 1)
+
     def test_state_machine_allows_valid_transition_1_to_2(self):
         with app.app_context():
             lot = db.session.get(Lot, self.lot_ids[0])
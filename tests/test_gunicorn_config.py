@@ -0,0 +1,94 @@
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_gunicorn_config.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, db  # noqa: E402
+
+GUNICORN_CONFIG_PATH = Path(__file__).resolve().parent.parent / "gunicorn_config.py"
+
+
+def _load_gunicorn_config(env):
+    with patch.dict(os.environ, env):
+        spec = importlib.util.spec_from_file_location("gunicorn_config_under_test", GUNICORN_CONFIG_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+class _FakeLog:
+    def info(self, *args):
+        pass
+
+
+class _FakeWorker:
+    pid = 4242
+    log = _FakeLog()
+
+
+class GunicornConfigTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def test_defaults_preload_threaded_workers_with_recycling(self):
+        config = _load_gunicorn_config({})
+        self.assertEqual(config.worker_class, "gthread")
+        self.assertTrue(config.preload_app)
+        self.assertGreaterEqual(config.workers, 2)
+        self.assertLessEqual(config.workers, 8)
+        self.assertGreater(config.max_requests, 0)
+        self.assertGreater(config.max_requests_jitter, 0)
+
+    def test_environment_overrides(self):
+        config = _load_gunicorn_config(
+            {"GUNICORN_WORKERS": "3", "GUNICORN_THREADS": "12", "GUNICORN_PRELOAD": "0", "GUNICORN_MAX_REQUESTS": "50"}
+        )
+        self.assertEqual((config.workers, config.threads, config.max_requests), (3, 12, 50))
+        self.assertFalse(config.preload_app)
+
+    def test_post_fork_resets_database_pool_without_closing_parent_connections(self):
+        config = _load_gunicorn_config({})
+        with app.app_context():
+            engine = db.engine
+        with patch.object(engine, "dispose") as dispose:
+            config.post_fork(server=None, worker=_FakeWorker())
+        dispose.assert_called_once_with(close=False)
+
+    def test_preloaded_master_precompiles_templates_once(self):
+        config = _load_gunicorn_config({})
+        app.extensions.pop("template_warmup", None)
+        config.post_worker_init(_FakeWorker())
+        self.assertNotIn("template_warmup", app.extensions)
+        config.when_ready(_FakeWorker())
+        self.assertGreater(app.extensions["template_warmup"]["templates"], 0)
+
+    def test_child_exit_folds_the_worker_snapshot_into_the_retired_totals(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, True)
+        config = _load_gunicorn_config({"METRICS_DIR": metrics_dir})
+        snapshot = {"pid": _FakeWorker.pid, "counters": [["petru_http_requests_total", [["endpoint", "a"]], 4]]}
+        with open(os.path.join(metrics_dir, f"metrics_{_FakeWorker.pid}.json"), "w", encoding="utf-8") as handle:
+            json.dump(snapshot, handle)
+
+        config.child_exit(server=None, worker=_FakeWorker())
+
+        self.assertEqual(os.listdir(metrics_dir), ["metrics_retired.json"])
+        with open(os.path.join(metrics_dir, "metrics_retired.json"), encoding="utf-8") as handle:
+            self.assertEqual(json.load(handle)["counters"], [["petru_http_requests_total", [["endpoint", "a"]], 4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
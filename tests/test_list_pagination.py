@@ -178,6 +178,14 @@ class ListPaginationTests(unittest.TestCase):
         self.assertIn("status=en_fumigacion", html)
         self.assertIn("per_page=1", html)
 
+    def test_create_lot_on_closed_reception_redirects_to_dashboard(self):
+        self._login()
+        with app.app_context():
+            reception_id = RawMaterialReception.query.filter_by(waybill=1001).one().id
+        response = self.client.get(f"/create_lot/{reception_id}")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers["Location"], "/")
+
 
 if __name__ == "__main__":
     unittest.main()
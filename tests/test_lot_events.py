@@ -0,0 +1,342 @@
+import os
+import unittest
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_lot_events.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from sqlalchemy import delete, event, func, insert, select, update  # noqa: E402
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Lot,
+    LotEvent,
+    LotStateClock,
+    ProjectionOffset,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    Role,
+    User,
+    Variety,
+)
+from app.services.fumigation_service import FumigationService  # noqa: E402
+from app.services.lot_event_service import LotEventService  # noqa: E402
+from app.services.lot_service import LotService, LotSpec, TruckWeightEntry  # noqa: E402
+from app.services.projection_service import PROJECTIONS, ProjectionService  # noqa: E402
+from app.services.qc_service import QCService  # noqa: E402
+
+START = datetime(2026, 3, 10, 8, 0)
+
+
+def _qc_payload(lot_id):
+    payload = {
+        "lot_id": lot_id,
+        "analyst": "Ana",
+        "date": date(2026, 3, 10),
+        "time": time(9, 0),
+        "inshell_weight": 100.0,
+        "lessthan30": 20,
+        "between3032": 20,
+        "between3234": 20,
+        "between3436": 20,
+        "morethan36": 20,
+        "extra_light": 10.0,
+        "light": 15.0,
+        "light_amber": 12.0,
+        "amber": 13.0,
+        "yellow": 0.0,
+    }
+    for name in (
+        "broken_walnut", "split_walnut", "light_stain", "serious_stain", "adhered_hull", "shrivel", "empty",
+        "insect_damage", "inactive_fungus", "active_fungus",
+    ):
+        payload[name] = 0
+    return payload
+
+
+class LotEventTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Eventos",
+                email="admin@eventos.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            reception = RawMaterialReception(
+                waybill=8001, date=date(2026, 3, 10), time=time(8, 0), truck_plate="TP8001", is_open=True
+            )
+            db.session.add_all([admin_role, user, variety, packaging, reception])
+            db.session.commit()
+            self.user_id = user.id
+            self.variety_id = variety.id
+            self.packaging_id = packaging.id
+
+            lots = LotService.create_lots(
+                reception,
+                [
+                    LotSpec(variety_id=variety.id, rawmaterialpackaging_id=packaging.id, packagings_quantity=10),
+                    LotSpec(variety_id=variety.id, rawmaterialpackaging_id=packaging.id, packagings_quantity=20),
+                ],
+                close_reception=True,
+            )
+            db.session.commit()
+            self.lot_ids = [lot.id for lot in lots]
+            # Net weights 490 and 480 kg.
+            LotService.register_full_truck_weights(
+                [TruckWeightEntry(self.lot_ids[0], 1000, 500), TruckWeightEntry(self.lot_ids[1], 1000, 500)]
+            )
+            db.session.commit()
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_writers_journal_every_change_and_counters_follow(self):
+        with app.app_context():
+            QCService.create_lot_qc(_qc_payload(self.lot_ids[0]), "images/a.jpg", "images/b.jpg")
+            fumigation = FumigationService.assign_fumigation("OT-900", self.lot_ids)
+            FumigationService.start_fumigation(fumigation, date(2026, 3, 11), time(8, 0))
+            FumigationService.complete_fumigation(fumigation, date(2026, 3, 12), time(8, 0))
+            db.session.commit()
+
+            kinds = db.session.execute(select(LotEvent.kind).order_by(LotEvent.id)).scalars().all()
+            self.assertEqual(
+                kinds,
+                ["lot_created"] * 2 + ["reception_closed"] + ["lot_weighed"] * 2 + ["qc_recorded"]
+                + ["fumigation_status_changed"] * 6,
+            )
+            moves = db.session.execute(
+                select(LotEvent.data).where(LotEvent.kind == "fumigation_status_changed").order_by(LotEvent.id)
+            ).scalars().all()
+            self.assertEqual(
+                [(move["from"], move["to"]) for move in moves],
+                [("1", "2"), ("1", "2"), ("2", "3"), ("2", "3"), ("3", "4"), ("3", "4")],
+            )
+            self.assertTrue(all(move["fumigation_id"] == fumigation.id for move in moves))
+
+            counters = ProjectionService.read("lot_counters", settle_seconds=0)
+            self.assertEqual(counters["position"], len(kinds))
+            self.assertEqual(
+                counters["values"],
+                {
+                    "fumigation_status:1": 0.0,
+                    "fumigation_status:2": 0.0,
+                    "fumigation_status:3": 0.0,
+                    "fumigation_status:4": 2.0,
+                    "lots": 2.0,
+                    "net_kg": 970.0,
+                    "pending_qc": 1.0,
+                    "receptions_closed": 1.0,
+                },
+            )
+
+            # Only the new events are applied on the next read.
+            lot = db.session.get(Lot, self.lot_ids[1])
+            LotService.register_full_truck_weight(lot, 1100, 500)
+            db.session.commit()
+            self.assertEqual(ProjectionService.catch_up("lot_counters", settle_seconds=0), 1)
+            self.assertEqual(PROJECTIONS["lot_counters"].read()["net_kg"], 1070.0)
+
+    def test_time_in_state_and_daily_activity(self):
+        with app.app_context():
+            db.session.execute(delete(LotEvent))
+            first, second = self.lot_ids
+            LotEventService.record("lot_snapshot", [(first, {"net_weight": 500.0, "packagings_quantity": 10})], START)
+            LotEventService.record("lot_snapshot", [(second, {"net_weight": 400.0, "packagings_quantity": 8})], START)
+            LotEventService.record(
+                "fumigation_status_changed", [(first, {"from": "1", "to": "2"})], START + timedelta(hours=2)
+            )
+            LotEventService.record(
+                "fumigation_status_changed", [(second, {"from": "1", "to": "2"})], START + timedelta(hours=6)
+            )
+            LotEventService.record(
+                "fumigation_status_changed", [(first, {"from": "2", "to": "3"})], START + timedelta(days=1)
+            )
+            LotEventService.record("lot_weighed", [(second, {"net_weight": 450.0, "delta": 50.0})], START)
+            db.session.commit()
+
+            in_state = ProjectionService.read("time_in_state", settle_seconds=0)["values"]
+            self.assertEqual(in_state["1"], {"lots": 2, "average_hours": 4.0})
+            self.assertEqual(in_state["2"], {"lots": 1, "average_hours": 22.0})
+
+            daily = ProjectionService.read("daily_activity", settle_seconds=0)["values"]
+            self.assertEqual(daily, {"2026-03-10": {"lots": 2.0, "bins": 18.0, "net_kg": 950.0, "qcs": 0.0}})
+
+    def test_rebuild_matches_the_incremental_projections(self):
+        with app.app_context():
+            fumigation = FumigationService.assign_fumigation("OT-901", self.lot_ids)
+            FumigationService.start_fumigation(fumigation, date(2026, 3, 11), time(8, 0))
+            db.session.commit()
+            incremental = {}
+            for name in PROJECTIONS:
+                # Small batches cross several pages of the journal.
+                ProjectionService.catch_up(name, batch_size=2, settle_seconds=0)
+                incremental[name] = PROJECTIONS[name].read()
+            db.session.commit()
+
+            for name in PROJECTIONS:
+                self.assertGreater(ProjectionService.rebuild(name, batch_size=3), 0)
+                self.assertEqual(PROJECTIONS[name].read(), incremental[name])
+
+    def test_catch_up_waits_on_a_new_gap_and_applies_events_that_commit_late(self):
+        with app.app_context():
+            last_id = db.session.execute(select(LotEvent.id).order_by(LotEvent.id.desc())).scalars().first()
+            LotEventService.record("qc_recorded", [(self.lot_ids[0], {}), (self.lot_ids[1], {})])
+            # The first of the two looks like a transaction that has not committed yet. The event after
+            # the gap is dated well past the settle window: only the time the gap has been seen counts.
+            slow = db.session.get(LotEvent, last_id + 1)
+            late_row = {column.name: getattr(slow, column.name) for column in LotEvent.__table__.columns}
+            db.session.delete(slow)
+            db.session.execute(
+                update(LotEvent)
+                .where(LotEvent.id == last_id + 2)
+                .values(created_at=slow.created_at - timedelta(minutes=5))
+            )
+            db.session.commit()
+
+            self.assertEqual(ProjectionService.catch_up("lot_counters", settle_seconds=60), 5)
+            self.assertEqual(ProjectionService.read("lot_counters", settle_seconds=60)["position"], last_id)
+            # Past the settle time the gap is skipped, but its id is still looked up.
+            self.assertEqual(ProjectionService.catch_up("lot_counters", settle_seconds=0), 1)
+            self.assertEqual(PROJECTIONS["lot_counters"].read()["pending_qc"], 1.0)
+            self.assertEqual(
+                db.session.get(ProjectionOffset, "lot_counters").gaps.keys(), {f"{last_id + 1}-{last_id + 1}"}
+            )
+            db.session.commit()
+
+            db.session.execute(insert(LotEvent), [late_row])
+            db.session.commit()
+            self.assertEqual(ProjectionService.catch_up("lot_counters", settle_seconds=0), 1)
+            self.assertEqual(PROJECTIONS["lot_counters"].read()["pending_qc"], 0.0)
+            self.assertEqual(db.session.get(ProjectionOffset, "lot_counters").gaps, {})
+
+    def test_a_rolled_back_batch_is_one_gap_and_reads_with_nothing_new_do_not_write(self):
+        with app.app_context():
+            first_id = db.session.execute(select(func.max(LotEvent.id))).scalar_one() + 1
+            LotEventService.record("qc_recorded", [(lot_id, {}) for lot_id in self.lot_ids * 2])
+            rolled_back = db.session.execute(select(LotEvent).where(LotEvent.id < first_id + 3)).scalars().all()
+            late_row = {column.name: getattr(rolled_back[-2], column.name) for column in LotEvent.__table__.columns}
+            db.session.execute(delete(LotEvent).where(LotEvent.id.between(first_id, first_id + 2)))
+            db.session.commit()
+
+            self.assertEqual(ProjectionService.catch_up("lot_counters", settle_seconds=0), 6)
+            db.session.commit()
+            self.assertEqual(
+                db.session.get(ProjectionOffset, "lot_counters").gaps.keys(), {f"{first_id}-{first_id + 2}"}
+            )
+
+            db.session.execute(insert(LotEvent), [late_row])
+            db.session.commit()
+            self.assertEqual(ProjectionService.catch_up("lot_counters", settle_seconds=0), 1)
+            db.session.commit()
+            self.assertEqual(
+                db.session.get(ProjectionOffset, "lot_counters").gaps.keys(),
+                {f"{first_id}-{first_id}", f"{first_id + 2}-{first_id + 2}"},
+            )
+
+            statements = []
+
+            def record_statement(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(db.engine, "before_cursor_execute", record_statement)
+            try:
+                payload = ProjectionService.read("lot_counters", settle_seconds=0)
+                db.session.commit()
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record_statement)
+            self.assertEqual(payload["position"], first_id + 3)
+            writes = [statement for statement in statements if statement.lstrip().startswith(("INSERT", "UPDATE"))]
+            self.assertEqual(writes, [])
+
+    def test_backfill_journals_lots_from_before_the_journal(self):
+        with app.app_context():
+            reception = db.session.get(RawMaterialReception, 1)
+            old_lot = Lot(
+                rawmaterialreception_id=reception.id,
+                variety_id=self.variety_id,
+                rawmaterialpackaging_id=self.packaging_id,
+                packagings_quantity=5,
+                lot_number=900,
+                net_weight=250.0,
+                has_qc=True,
+                fumigation_status="2",
+                created_at=datetime(2025, 4, 1, 9, 0),
+            )
+            db.session.add(old_lot)
+            db.session.commit()
+
+            self.assertEqual(LotEventService.backfill(), 1)
+            self.assertEqual(LotEventService.backfill(), 0)
+            db.session.commit()
+
+            counters = ProjectionService.read("lot_counters", settle_seconds=0)["values"]
+            self.assertEqual((counters["lots"], counters["net_kg"], counters["pending_qc"]), (3.0, 1220.0, 2.0))
+            self.assertEqual(counters["fumigation_status:2"], 1.0)
+            daily = ProjectionService.read("daily_activity", settle_seconds=0)["values"]
+            self.assertEqual(daily["2025-04-01"]["bins"], 5.0)
+
+    def test_backfill_takes_the_state_before_events_written_ahead_of_it(self):
+        with app.app_context():
+            db.session.execute(delete(LotEvent))
+            db.session.commit()
+            # Both lots predate the journal; the first is reweighed, analysed and assigned before the backfill.
+            first = db.session.get(Lot, self.lot_ids[0])
+            LotService.register_full_truck_weight(first, 1100, 500)
+            QCService.create_lot_qc(_qc_payload(first.id), "images/a.jpg", "images/b.jpg")
+            FumigationService.assign_fumigation("OT-902", [first.id])
+            db.session.commit()
+
+            self.assertEqual(LotEventService.backfill(), 2)
+            db.session.commit()
+            snapshot = db.session.execute(
+                select(LotEvent.data).where(LotEvent.kind == "lot_snapshot", LotEvent.lot_id == first.id)
+            ).scalar_one()
+            self.assertEqual(
+                (snapshot["net_weight"], snapshot["has_qc"], snapshot["fumigation_status"]), (490.0, False, "1")
+            )
+
+            counters = ProjectionService.read("lot_counters", settle_seconds=0)["values"]
+            self.assertEqual((counters["lots"], counters["net_kg"], counters["pending_qc"]), (2.0, 1070.0, 1.0))
+            self.assertEqual((counters["fumigation_status:1"], counters["fumigation_status:2"]), (1.0, 1.0))
+            ProjectionService.catch_up("time_in_state", settle_seconds=0)
+            self.assertEqual(
+                db.session.execute(select(LotStateClock.state).where(LotStateClock.lot_id == first.id)).scalar_one(),
+                "2",
+            )
+
+    def test_projection_api(self):
+        self._login()
+        response = self.client.get("/api/projections/lot_counters")
+        self.assertEqual(response.status_code, 200)
+        payload = response.get_json()
+        self.assertEqual(payload["name"], "lot_counters")
+        self.assertEqual(payload["values"]["lots"], 2.0)
+        self.assertEqual(self.client.get("/api/projections/unknown").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
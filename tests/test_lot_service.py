@@ -0,0 +1,229 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, time
+from pathlib import Path
+from unittest.mock import patch
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_lot_service.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import FullTruckWeight, Lot, RawMaterialPackaging, RawMaterialReception, Role, User, Variety  # noqa: E402
+from app.services.lot_number_service import LotNumberAllocator  # noqa: E402
+from app.services.lot_service import LotService, LotSpec, LotValidationError, TruckWeightEntry  # noqa: E402
+from app.services.pdf_cache_service import get_cached_pdf, save_pdf_to_cache  # noqa: E402
+
+
+class LotServiceTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Lotes",
+                email="admin@lots.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            reception = RawMaterialReception(
+                waybill=3000,
+                date=date.today(),
+                time=time(7, 0),
+                truck_plate="CC3333",
+                trucker_name="Chofer",
+                observations="",
+                is_open=True,
+            )
+            db.session.add_all([admin_role, user, variety, packaging, reception])
+            db.session.flush()
+            existing_lot = Lot(
+                lot_number=5,
+                packagings_quantity=10,
+                rawmaterialreception_id=reception.id,
+                variety_id=variety.id,
+                rawmaterialpackaging_id=packaging.id,
+            )
+            db.session.add(existing_lot)
+            db.session.commit()
+            self.existing_lot_id = existing_lot.id
+            self.user_id = user.id
+            self.variety_id = variety.id
+            self.packaging_id = packaging.id
+            self.reception_id = reception.id
+
+    def _specs(self, *lot_numbers):
+        return [LotSpec(self.variety_id, self.packaging_id, 20, lot_number) for lot_number in lot_numbers]
+
+    def _create_pending_lots(self, *lot_numbers):
+        with app.app_context():
+            reception = db.session.get(RawMaterialReception, self.reception_id)
+            lots = LotService.create_lots(reception, self._specs(*lot_numbers))
+            db.session.commit()
+            return [lot.id for lot in lots]
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_creates_all_lots_and_closes_reception_in_one_transaction(self):
+        with app.app_context():
+            reception = db.session.get(RawMaterialReception, self.reception_id)
+            lots = LotService.create_lots(reception, self._specs(8, 6, 7), close_reception=True)
+            db.session.commit()
+
+            self.assertEqual([lot.lot_number for lot in lots], [6, 7, 8])
+            self.assertTrue(all(lot.id for lot in lots))
+            self.assertEqual(Lot.query.filter_by(rawmaterialreception_id=self.reception_id).count(), 4)
+            self.assertFalse(db.session.get(RawMaterialReception, self.reception_id).is_open)
+
+    def test_existing_or_repeated_numbers_reject_the_whole_batch(self):
+        with app.app_context():
+            reception = db.session.get(RawMaterialReception, self.reception_id)
+            with self.assertRaisesRegex(LotValidationError, "El Lote 005 ya existe"):
+                LotService.create_lots(reception, self._specs(4, 5))
+            with self.assertRaisesRegex(LotValidationError, "Los Lotes 009, 010 están repetidos"):
+                LotService.create_lots(reception, self._specs(9, 10, 9, 10))
+            with self.assertRaises(LotValidationError):
+                LotService.create_lots(reception, [])
+            db.session.rollback()
+            self.assertEqual(Lot.query.count(), 1)
+            self.assertTrue(db.session.get(RawMaterialReception, self.reception_id).is_open)
+
+    def test_lots_without_number_receive_the_next_free_block(self):
+        with app.app_context():
+            reception = db.session.get(RawMaterialReception, self.reception_id)
+            self.assertEqual(LotNumberAllocator.suggest_next(), 6)
+            lots = LotService.create_lots(reception, self._specs(None, 20, None))
+            db.session.commit()
+
+            self.assertEqual([lot.lot_number for lot in lots], [6, 7, 20])
+            # Numbers typed by hand move the allocator past them.
+            self.assertEqual(LotNumberAllocator.suggest_next(), 21)
+            lot = LotService.create_lot(reception, self.variety_id, self.packaging_id, 12)
+            db.session.commit()
+            self.assertEqual(lot.lot_number, 21)
+
+    def test_taken_number_is_reported_without_consuming_reserved_numbers(self):
+        with app.app_context():
+            reception = db.session.get(RawMaterialReception, self.reception_id)
+            with self.assertRaisesRegex(LotValidationError, "El Lote 005 ya existe"):
+                LotService.create_lot(reception, self.variety_id, self.packaging_id, 12, lot_number=5)
+            with self.assertRaisesRegex(LotValidationError, "El Lote 005 ya existe"):
+                LotService.create_lots(reception, self._specs(None, None, 5))
+            db.session.commit()
+
+            self.assertEqual(Lot.query.count(), 1)
+            self.assertEqual(LotService.create_lots(reception, self._specs(None))[0].lot_number, 6)
+
+    def test_single_lot_form_suggests_and_assigns_the_next_number(self):
+        self._login()
+        html = self.client.get(f"/create_lot/{self.reception_id}").get_data(as_text=True)
+        self.assertIn('placeholder="006"', html)
+
+        response = self.client.post(
+            f"/create_lot/{self.reception_id}",
+            data={"variety_id": self.variety_id, "rawmaterialpackaging_id": self.packaging_id, "packagings_quantity": 24},
+        )
+        self.assertIn("Lote 6 creado exitosamente.", response.get_data(as_text=True))
+        with app.app_context():
+            self.assertEqual(Lot.query.filter_by(lot_number=6).count(), 1)
+
+    def test_batch_form_returns_every_label_url(self):
+        self._login()
+        form_data = {"is_last_lot": "y"}
+        for index, lot_number in enumerate((11, 12, 13)):
+            form_data.update(
+                {
+                    f"lots-{index}-variety_id": self.variety_id,
+                    f"lots-{index}-rawmaterialpackaging_id": self.packaging_id,
+                    f"lots-{index}-packagings_quantity": 24,
+                    f"lots-{index}-lot_number": lot_number,
+                }
+            )
+        response = self.client.post(f"/create_lots/{self.reception_id}", data=form_data)
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn("3 lotes creados exitosamente.", html)
+        with app.app_context():
+            lot_ids = [lot.id for lot in Lot.query.filter(Lot.lot_number.in_([11, 12, 13])).all()]
+            self.assertFalse(db.session.get(RawMaterialReception, self.reception_id).is_open)
+        self.assertEqual(len(lot_ids), 3)
+        for lot_id in lot_ids:
+            self.assertIn(f"/lots/{lot_id}/labels.pdf", html)
+
+    def test_bulk_weights_upsert_one_row_per_lot_and_update_net_weight(self):
+        first_id, second_id = self._create_pending_lots(20, 21)
+        with app.app_context():
+            db.session.add(FullTruckWeight(lot_id=first_id, loaded_truck_weight=900.0, empty_truck_weight=100.0))
+            db.session.commit()
+
+            computations = LotService.register_full_truck_weights(
+                [TruckWeightEntry(first_id, 1500.0, 500.0), TruckWeightEntry(second_id, 1200.5, 400.0)]
+            )
+            db.session.commit()
+
+            # 20 bins with a 1 kg tare each.
+            self.assertEqual(computations[first_id].net_weight, 980.0)
+            self.assertEqual(computations[second_id].net_weight, 780.5)
+            db.session.expire_all()
+            self.assertEqual(FullTruckWeight.query.filter_by(lot_id=first_id).count(), 1)
+            self.assertEqual(db.session.get(Lot, first_id).full_truck_weight.loaded_truck_weight, 1500.0)
+            self.assertEqual(db.session.get(Lot, second_id).net_weight, 780.5)
+
+    def test_bulk_weights_reject_every_row_when_one_is_invalid(self):
+        first_id, second_id = self._create_pending_lots(22, 23)
+        with app.app_context():
+            with self.assertRaisesRegex(LotValidationError, "Lote 023: El peso cargado debe ser mayor"):
+                LotService.register_full_truck_weights(
+                    [TruckWeightEntry(first_id, 1500.0, 500.0), TruckWeightEntry(second_id, 400.0, 500.0)]
+                )
+            db.session.rollback()
+            self.assertEqual(FullTruckWeight.query.count(), 0)
+
+    def test_weight_grid_registers_filled_rows_and_drops_their_label_cache(self):
+        first_id, second_id = self._create_pending_lots(24, 25)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        environ_patch = patch.dict(os.environ, {"PDF_CACHE_DIR": cache_dir})
+        environ_patch.start()
+        self.addCleanup(environ_patch.stop)
+        for lot_id in (first_id, second_id):
+            save_pdf_to_cache("lot_labels", lot_id, None, b"%PDF-1.4 labels")
+
+        self._login()
+        response = self.client.post(
+            "/register_truck_weights",
+            data={"lot_id": [first_id, second_id], f"loaded_{first_id}": "1500", f"empty_{first_id}": "500"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(get_cached_pdf("lot_labels", first_id, None))
+        self.assertIsNotNone(get_cached_pdf("lot_labels", second_id, None))
+
+        html = self.client.get("/register_truck_weights").get_data(as_text=True)
+        self.assertIn(f'name="loaded_{second_id}"', html)
+        self.assertNotIn(f'name="loaded_{first_id}"', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_metrics.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, cache, db  # noqa: E402
+from app.metrics import (  # noqa: E402
+    MetricsRegistry,
+    _read_snapshots,
+    registry,
+    render_prometheus,
+    retire_snapshot,
+)
+from app.models import Role, User  # noqa: E402
+from app.services import get_cached_pdf, save_pdf_to_cache  # noqa: E402
+
+
+class PrometheusRenderingTests(unittest.TestCase):
+    def test_worker_snapshots_are_summed_and_histograms_are_cumulative(self):
+        first = MetricsRegistry()
+        second = MetricsRegistry()
+        first.inc("petru_http_requests_total", endpoint="a", method="GET", status=200)
+        second.inc("petru_http_requests_total", 2, endpoint="a", method="GET", status=200)
+        first.observe("petru_http_request_duration_seconds", 0.02, endpoint="a")
+        second.observe("petru_http_request_duration_seconds", 3.0, endpoint="a")
+
+        text = render_prometheus([first.snapshot(), second.snapshot()])
+
+        self.assertIn('petru_http_requests_total{endpoint="a",method="GET",status="200"} 3', text)
+        self.assertIn('petru_http_request_duration_seconds_bucket{endpoint="a",le="0.025"} 1', text)
+        self.assertIn('petru_http_request_duration_seconds_bucket{endpoint="a",le="5"} 2', text)
+        self.assertIn('petru_http_request_duration_seconds_bucket{endpoint="a",le="+Inf"} 2', text)
+        self.assertIn('petru_http_request_duration_seconds_count{endpoint="a"} 2', text)
+
+    def test_exited_workers_are_folded_into_one_retired_snapshot(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, True)
+        live = MetricsRegistry()
+        live.inc("petru_http_requests_total", endpoint="a", method="GET", status=200)
+        for pid, count in ((101, 2), (102, 3)):
+            exited = MetricsRegistry()
+            exited.inc("petru_http_requests_total", count, endpoint="a", method="GET", status=200)
+            exited.observe("petru_http_request_duration_seconds", 0.02, endpoint="a")
+            exited.set_gauge("petru_db_pool_size", 5)
+            snapshot = dict(exited.snapshot(), pid=pid)
+            with open(os.path.join(metrics_dir, f"metrics_{pid}.json"), "w", encoding="utf-8") as snapshot_file:
+                json.dump(snapshot, snapshot_file)
+            retire_snapshot(metrics_dir, pid)
+
+        self.assertEqual(os.listdir(metrics_dir), ["metrics_retired.json"])
+        text = render_prometheus([live.snapshot(), *_read_snapshots(metrics_dir)])
+        self.assertIn('petru_http_requests_total{endpoint="a",method="GET",status="200"} 6', text)
+        self.assertIn('petru_http_request_duration_seconds_count{endpoint="a"} 2', text)
+        self.assertNotIn('pid="101"', text)
+
+
+class MetricsEndpointTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._original_config = {
+            key: app.config.get(key)
+            for key in ("METRICS_DIR", "METRICS_TOKEN", "METRICS_ALLOWED_IPS", "PDF_CACHE_DIR")
+        }
+        self._original_pdf_cache_env = os.environ.get("PDF_CACHE_DIR")
+        app.config.update(
+            TESTING=True,
+            WTF_CSRF_ENABLED=False,
+            METRICS_DIR=os.path.join(self._temp_dir, "metrics"),
+            METRICS_TOKEN="scrape-token",
+            METRICS_ALLOWED_IPS="127.0.0.1",
+        )
+        registry._reset()
+        self.client = app.test_client()
+        with app.app_context():
+            cache.clear()
+            db.drop_all()
+            db.create_all()
+            self.user_id = self._create_admin_user()
+            db.session.commit()
+
+    def tearDown(self):
+        app.config.update(self._original_config)
+        if self._original_pdf_cache_env is None:
+            os.environ.pop("PDF_CACHE_DIR", None)
+        else:
+            os.environ["PDF_CACHE_DIR"] = self._original_pdf_cache_env
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def _create_admin_user(self):
+        admin_role = Role(name="Admin", description="Administrador", is_active=True)
+        user = User(
+            name="Admin",
+            last_name="Metrics",
+            email="admin@metrics.local",
+            phone_number="123456789",
+            password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+            is_active=True,
+            is_external=False,
+        )
+        user.roles.append(admin_role)
+        db.session.add_all([admin_role, user])
+        db.session.flush()
+        return user.id
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def _scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def test_requests_are_counted_and_timed_per_endpoint(self):
+        self.client.get("/healthz")
+        self.client.get("/healthz")
+
+        text = self._scrape()
+        self.assertIn('petru_http_requests_total{endpoint="dashboard.healthz",method="GET",status="200"} 2', text)
+        self.assertIn('petru_http_request_duration_seconds_count{endpoint="dashboard.healthz"} 2', text)
+        self.assertIn('petru_db_queries_total{endpoint="dashboard.healthz"} 2', text)
+        self.assertIn("petru_db_pool_checked_out{", text)
+        self.assertTrue(os.path.exists(os.path.join(app.config["METRICS_DIR"], f"metrics_{os.getpid()}.json")))
+
+    def test_endpoint_is_hidden_from_other_addresses_without_token(self):
+        remote = {"REMOTE_ADDR": "10.0.0.8"}
+        self.assertEqual(self.client.get("/metrics", environ_base=remote).status_code, 404)
+        response = self.client.get(
+            "/metrics",
+            environ_base=remote,
+            headers={"Authorization": "Bearer scrape-token"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_cache_hits_and_misses_are_counted(self):
+        self._login()
+        self.client.get("/api/dashboard/summary")
+        self.client.get("/api/dashboard/summary")
+        self.client.get("/api/dashboard/summary")
+
+        text = self._scrape()
+        self.assertIn('petru_cache_requests_total{cache="dashboard_tv",result="miss"} 1', text)
+        self.assertIn('petru_cache_requests_total{cache="dashboard_tv",result="hit"} 2', text)
+
+    def test_pdf_cache_lookups_are_counted(self):
+        os.environ["PDF_CACHE_DIR"] = os.path.join(self._temp_dir, "pdf_cache")
+        updated_at = datetime(2025, 1, 1, 8, 0)
+        self.assertIsNone(get_cached_pdf("lot_labels", 1, updated_at))
+        save_pdf_to_cache("lot_labels", 1, updated_at, b"%PDF-1.4")
+        self.assertIsNotNone(get_cached_pdf("lot_labels", 1, updated_at))
+
+        text = self._scrape()
+        self.assertIn('petru_pdf_cache_requests_total{kind="lot_labels",result="hit"} 1', text)
+        self.assertIn('petru_pdf_cache_requests_total{kind="lot_labels",result="miss"} 1', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,7 @@ os.environ["SECRET_KEY"] = "test-secret-key"
 from app.services.pdf_cache_service import (
     get_cached_pdf,
     invalidate_cached_pdf,
+    invalidate_cached_pdfs,
     save_pdf_to_cache,
 )
 
@@ -59,6 +60,20 @@ class PDFCacheServiceTests(unittest.TestCase):
         invalidate_cached_pdf("lot_qc_report", 2001)
         self.assertIsNone(get_cached_pdf("lot_qc_report", 2001, updated_at))
 
+    def test_batch_invalidate_removes_only_listed_entities(self):
+        updated_at = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
+        for entity_id in (41, 42, 43, 421):
+            save_pdf_to_cache("lot_labels", entity_id, updated_at, b"%PDF-1.4 batch")
+        save_pdf_to_cache("lot_qc_report", 41, updated_at, b"%PDF-1.4 other kind")
+
+        invalidate_cached_pdfs("lot_labels", [41, 42])
+
+        self.assertIsNone(get_cached_pdf("lot_labels", 41, updated_at))
+        self.assertIsNone(get_cached_pdf("lot_labels", 42, updated_at))
+        self.assertIsNotNone(get_cached_pdf("lot_labels", 43, updated_at))
+        self.assertIsNotNone(get_cached_pdf("lot_labels", 421, updated_at))
+        self.assertIsNotNone(get_cached_pdf("lot_qc_report", 41, updated_at))
+
     def test_different_updated_at_is_cache_miss(self):
         updated_at = datetime(2026, 2, 19, 12, 0, 0, tzinfo=timezone.utc)
         newer_updated_at = updated_at + timedelta(minutes=1)
@@ -0,0 +1,133 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_profiling.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db, profiling  # noqa: E402
+from app.models import Role, User  # noqa: E402
+from app.profiling import PROFILE_HEADER, generate_profile_token, list_profiles, profile_paths  # noqa: E402
+
+
+class RequestProfilerTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._original_config = {
+            key: app.config.get(key) for key in ("PROFILING_DIR", "PROFILING_SAMPLE_RATE")
+        }
+        app.config.update(
+            TESTING=True,
+            WTF_CSRF_ENABLED=False,
+            PROFILING_DIR=self._temp_dir,
+            PROFILING_SAMPLE_RATE=0,
+        )
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            self.user_id = self._create_admin_user()
+            db.session.commit()
+
+    def tearDown(self):
+        app.config.update(self._original_config)
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def _create_admin_user(self):
+        admin_role = Role(name="Admin", description="Administrador", is_active=True)
+        user = User(
+            name="Admin",
+            last_name="Profiler",
+            email="admin@profiler.local",
+            phone_number="123456789",
+            password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+            is_active=True,
+            is_external=False,
+        )
+        user.roles.append(admin_role)
+        db.session.add_all([admin_role, user])
+        db.session.flush()
+        return user.id
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_unflagged_and_anonymous_flagged_requests_are_not_profiled(self):
+        self.client.get("/healthz")
+        self.client.get("/healthz?_profile=1")
+        self.client.get("/healthz", headers={PROFILE_HEADER: "forged-token"})
+        self.assertEqual(list_profiles(self._temp_dir), [])
+
+    def test_signed_header_stores_pstats_and_memory_summary(self):
+        with app.app_context():
+            token = generate_profile_token()
+        response = self.client.get("/healthz", headers={PROFILE_HEADER: token, "X-Request-ID": "req-prof-1"})
+        self.assertEqual(response.status_code, 200)
+
+        profiles = list_profiles(self._temp_dir)
+        self.assertEqual(len(profiles), 1)
+        profile = profiles[0]
+        self.assertEqual(profile["request_id"], "req-prof-1")
+        self.assertEqual(profile["endpoint"], "dashboard.healthz")
+        self.assertEqual(profile["trigger"], "header")
+        self.assertGreater(profile["peak_memory_kb"], 0)
+        self.assertTrue(profile["top_functions"])
+
+        _summary_path, pstats_path = profile_paths(self._temp_dir, profile["profile_id"])
+        self.assertGreater(pstats.Stats(pstats_path).total_calls, 0)
+
+    def test_request_triggered_while_another_is_profiled_runs_unprofiled(self):
+        with app.app_context():
+            token = generate_profile_token()
+        # Another thread of the process holds the profiler.
+        with profiling._profile_lock:
+            response = self.client.get("/healthz", headers={PROFILE_HEADER: token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list_profiles(self._temp_dir), [])
+
+        self.client.get("/healthz", headers={PROFILE_HEADER: token})
+        self.assertEqual(len(list_profiles(self._temp_dir)), 1)
+
+    def test_admin_query_flag_and_admin_pages(self):
+        self._login()
+        response = self.client.get("/admin/slow_queries?_profile=1")
+        self.assertEqual(response.status_code, 200)
+        profile = list_profiles(self._temp_dir)[0]
+        self.assertEqual(profile["trigger"], "query")
+
+        listing = self.client.get("/admin/profiles").get_data(as_text=True)
+        self.assertIn(profile["profile_id"], listing)
+        self.assertIn(PROFILE_HEADER, listing)
+
+        detail = self.client.get(f"/admin/profiles/{profile['profile_id']}")
+        self.assertEqual(detail.status_code, 200)
+        download = self.client.get(f"/admin/profiles/{profile['profile_id']}/pstats")
+        self.assertEqual(download.status_code, 200)
+        download.close()
+        self.assertEqual(self.client.get("/admin/profiles/..%2Fsecret").status_code, 404)
+
+    def test_sampling_profiles_one_in_n_requests(self):
+        app.config["PROFILING_SAMPLE_RATE"] = 1
+        self.client.get("/healthz")
+        self.client.get("/healthz")
+        profiles = list_profiles(self._temp_dir)
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual({profile["trigger"] for profile in profiles}, {"sample"})
+
+
+if __name__ == "__main__":
+    unittest.main()
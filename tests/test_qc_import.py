@@ -0,0 +1,207 @@
+import io
+import os
+import unittest
+from datetime import date, time
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_qc_import.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from sqlalchemy import update  # noqa: E402
+
+from app import app, bcrypt, db  # noqa: E402
+from app.exports import iter_csv, iter_xlsx  # noqa: E402
+from app.imports import TableImportError, read_table  # noqa: E402
+from app.models import (  # noqa: E402
+    Grower,
+    Lot,
+    LotQC,
+    QCControlChart,
+    QCRollup,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    Role,
+    SampleQC,
+    User,
+    Variety,
+)
+from app.services.qc_import_service import QC_IMPORT_COLUMNS, QCImportService  # noqa: E402
+from app.services.qc_service import QCService  # noqa: E402
+
+LOT_HEADER = [label for _name, label, _parser in QC_IMPORT_COLUMNS["lot"]]
+SAMPLE_HEADER = [label for _name, label, _parser in QC_IMPORT_COLUMNS["sample"]]
+# Sizes 10/20/30/20/20 and a shelled weight of 55 g over 100 g in shell.
+MEASUREMENTS = ["100", "10", "20", "30", "20", "20"] + ["0"] * 10 + ["40", "10", "5", "0", "0"]
+
+
+def _lot_row(lot_number, day="2026-03-02", sizes=None):
+    measurements = list(MEASUREMENTS)
+    if sizes is not None:
+        measurements[1:6] = sizes
+    return [str(lot_number), "Ana", day, "08:00", *measurements]
+
+
+def _encode(iterator):
+    return b"".join(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8") for chunk in iterator)
+
+
+class QCImportTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Laboratorio",
+                email="admin@laboratorio.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            grower = Grower(name="Productor Lab", tax_id="940000001", csg_code="CSG940", is_active=True)
+            reception = RawMaterialReception(
+                waybill=8001, date=date(2026, 3, 1), time=time(7, 0), truck_plate="LAB001", is_open=False
+            )
+            reception.growers.append(grower)
+            db.session.add_all([admin_role, user, variety, packaging, grower, reception])
+            db.session.flush()
+            for lot_number in range(1, 5):
+                db.session.add(
+                    Lot(
+                        lot_number=lot_number,
+                        packagings_quantity=10,
+                        rawmaterialreception_id=reception.id,
+                        variety_id=variety.id,
+                        rawmaterialpackaging_id=packaging.id,
+                    )
+                )
+            db.session.commit()
+            self.user_id = user.id
+
+    def test_valid_rows_are_imported_and_the_rest_reported_by_line(self):
+        data = _encode(iter_csv(LOT_HEADER, [
+            _lot_row(1),
+            _lot_row(2, day="2026-03-03"),
+            _lot_row(3, sizes=["10", "20", "30", "20", "10"]),
+            _lot_row(9),
+            _lot_row(2),
+            _lot_row(4, day="ayer"),
+        ]))
+        with app.app_context():
+            header, rows = read_table("qc.csv", data)
+            result = QCImportService.import_rows("lot", header, rows)
+            db.session.commit()
+
+            self.assertEqual((result.total, len(result.created_ids)), (6, 2))
+            self.assertEqual([line for line, _message in result.errors], [4, 5, 6, 7])
+            messages = dict(result.errors)
+            self.assertIn("100", messages[4])
+            self.assertEqual(messages[5], "El Lote 009 no existe.")
+            self.assertEqual(messages[6], "El Lote 002 está repetido en el archivo.")
+            self.assertIn("Fecha: fecha no válida", messages[7])
+
+            qcs = LotQC.query.order_by(LotQC.id).all()
+            self.assertEqual([(qc.units, qc.shelled_weight, qc.yieldpercentage) for qc in qcs], [(100, 55.0, 55.0)] * 2)
+            self.assertEqual({lot.lot_number for lot in Lot.query.filter_by(has_qc=True)}, {1, 2})
+            self.assertTrue(QCRollup.query.count())
+            self.assertTrue(QCControlChart.query.filter_by(metric="yieldpercentage").count())
+
+            # A lot that already has its QC is rejected on a second import.
+            again = QCImportService.import_rows("lot", header, rows[:1])
+            self.assertEqual(again.errors, [(2, "El Lote 001 ya tiene un registro QC.")])
+
+    def test_xlsx_export_layout_is_read_back_and_missing_columns_are_refused(self):
+        data = _encode(iter_xlsx(LOT_HEADER + ["Unidades Analizadas"], [
+            [1, "Ana", date(2026, 3, 2), time(8, 0), *(float(value) for value in MEASUREMENTS), 100],
+        ]))
+        with app.app_context():
+            header, rows = read_table("qc.xlsx", data)
+            result = QCImportService.import_rows("lot", header, rows)
+            db.session.commit()
+            self.assertEqual(result.errors, [])
+            qc = LotQC.query.one()
+            self.assertEqual((qc.date, qc.time, qc.yieldpercentage), (date(2026, 3, 2), time(8, 0), 55.0))
+
+            with self.assertRaises(TableImportError):
+                QCImportService.import_rows("lot", header[1:], [(2, row[1:]) for _line, row in rows])
+            with self.assertRaises(TableImportError):
+                read_table("qc.txt", data)
+
+    def test_numeric_text_cells_are_kept_and_non_finite_numbers_reported(self):
+        rows = [
+            (2, [1, 1234, "2026-03-02", "08:00", *MEASUREMENTS]),
+            (3, [2, "Ana", "2026-03-02", "08:00", float("nan"), *MEASUREMENTS[1:]]),
+            (4, [3, "Ana", "2026-03-02", "08:00", *MEASUREMENTS[:-1], "inf"]),
+        ]
+        with app.app_context():
+            result = QCImportService.import_rows("lot", LOT_HEADER, rows)
+            db.session.commit()
+            self.assertEqual(LotQC.query.one().analyst, "1234")
+            self.assertEqual([line for line, _message in result.errors], [3, 4])
+            self.assertTrue(all("debe ser numérico" in message for _line, message in result.errors))
+
+    def test_lots_given_a_qc_during_the_import_abort_it(self):
+        with app.app_context():
+            lots_by_id = {lot.id: lot for lot in Lot.query.filter(Lot.lot_number.in_([1, 2]))}
+            taken = next(lot.id for lot in lots_by_id.values() if lot.lot_number == 2)
+            # The QC form flags lot 002 after the import checked it.
+            db.session.execute(update(Lot).where(Lot.id == taken).values(has_qc=True))
+            db.session.commit()
+
+            with self.assertRaisesRegex(TableImportError, "Los Lotes 002"):
+                with QCService._transaction_context():
+                    QCImportService._flag_lots(sorted(lots_by_id), lots_by_id)
+            db.session.commit()
+            self.assertEqual({lot.lot_number for lot in Lot.query.filter_by(has_qc=True)}, {2})
+
+    def test_sample_qcs_are_imported(self):
+        data = _encode(iter_csv(SAMPLE_HEADER, [
+            ["Productor Lab", "Juan", "Ana", "2026-03-02", "08:00", *MEASUREMENTS],
+            ["Productor Lab", "Juan", "Ana", "2026-03-02", "09:00", *MEASUREMENTS[:-1], "ninguno"],
+        ]))
+        with app.app_context():
+            header, rows = read_table("muestras.csv", data.replace(b",", b";"))
+            result = QCImportService.import_rows("sample", header, rows)
+            db.session.commit()
+            self.assertEqual(len(result.created_ids), 1)
+            self.assertEqual(result.errors[0][0], 3)
+            self.assertEqual(SampleQC.query.one().brought_by, "Juan")
+
+    def test_import_page(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+        self.assertEqual(self.client.get("/import_qc").status_code, 200)
+        data = _encode(iter_csv(LOT_HEADER, [_lot_row(1), _lot_row(9)]))
+        response = self.client.post(
+            "/import_qc",
+            data={"kind": "lot", "table": (io.BytesIO(data), "qc.csv")},
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn("1 de 2 filas importadas.", body)
+        self.assertIn("El Lote 009 no existe.", body)
+        with app.app_context():
+            self.assertTrue(db.session.get(Lot, 1).has_qc)
+
+
+if __name__ == "__main__":
+    unittest.main()
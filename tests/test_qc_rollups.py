@@ -0,0 +1,173 @@
+import os
+import unittest
+from datetime import date, time
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_qc_rollups.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Client,
+    Grower,
+    Lot,
+    QCRollup,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    Role,
+    User,
+    Variety,
+)
+from app.services.qc_rollup_service import QCRollupService  # noqa: E402
+from app.services.qc_service import QCService  # noqa: E402
+
+
+def _qc_payload(lot_id, extra_light, light_stain):
+    return {
+        "lot_id": lot_id,
+        "analyst": "Ana",
+        "date": date(2026, 3, 10),
+        "time": time(8, 0),
+        "inshell_weight": 100.0,
+        "lessthan30": 10,
+        "between3032": 20,
+        "between3234": 30,
+        "between3436": 20,
+        "morethan36": 20,
+        "broken_walnut": 0,
+        "split_walnut": 0,
+        "light_stain": light_stain,
+        "serious_stain": 0,
+        "adhered_hull": 0,
+        "shrivel": 0,
+        "empty": 0,
+        "insect_damage": 0,
+        "inactive_fungus": 0,
+        "active_fungus": 0,
+        "extra_light": extra_light,
+        "light": 10.0,
+        "light_amber": 5.0,
+        "amber": 5.0,
+        "yellow": 0.0,
+    }
+
+
+class QCRollupTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="QC",
+                email="admin@qc.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="SERR", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            client = Client(name="Cliente QC", tax_id="900000009", address="Dir", comuna="Comuna", is_active=True)
+            grower_a = Grower(name="Productor A", tax_id="910000001", csg_code="CSG001", is_active=True)
+            grower_b = Grower(name="Productor B", tax_id="910000002", csg_code="CSG002", is_active=True)
+            db.session.add_all([admin_role, user, variety, packaging, client, grower_a, grower_b])
+            db.session.flush()
+
+            shared = RawMaterialReception(
+                waybill=5001, date=date(2026, 3, 9), time=time(7, 0), truck_plate="QC0001", is_open=False
+            )
+            shared.growers.extend([grower_a, grower_b])
+            shared.clients.append(client)
+            single = RawMaterialReception(
+                waybill=5002, date=date(2026, 3, 9), time=time(9, 0), truck_plate="QC0002", is_open=False
+            )
+            single.growers.append(grower_a)
+            db.session.add_all([shared, single])
+            db.session.flush()
+            self.lot_ids = []
+            for lot_number, reception in ((1, shared), (2, single)):
+                lot = Lot(
+                    lot_number=lot_number,
+                    packagings_quantity=10,
+                    rawmaterialreception_id=reception.id,
+                    variety_id=variety.id,
+                    rawmaterialpackaging_id=packaging.id,
+                )
+                db.session.add(lot)
+                db.session.flush()
+                self.lot_ids.append(lot.id)
+            db.session.commit()
+            self.user_id = user.id
+
+            QCService.create_lot_qc(_qc_payload(self.lot_ids[0], 30.0, 2), "images/a.jpg", "images/b.jpg")
+            QCService.create_lot_qc(_qc_payload(self.lot_ids[1], 40.0, 4), "images/c.jpg", "images/d.jpg")
+            db.session.commit()
+
+    def _stats_by_grower(self, metric):
+        members = QCRollupService.summarize("grower", date_from=date(2026, 3, 1), date_to=date(2026, 3, 31))
+        return {member["name"]: member["metrics"][metric] for member in members}
+
+    def test_lot_qc_is_rolled_up_for_each_grower_of_its_reception(self):
+        with app.app_context():
+            yields = self._stats_by_grower("yieldpercentage")
+
+            # Yields are 50% and 60%; both lots belong to grower A, only the first to grower B.
+            self.assertEqual(yields["Productor A"]["count"], 2)
+            self.assertAlmostEqual(yields["Productor A"]["mean"], 55.0)
+            self.assertAlmostEqual(yields["Productor A"]["std"], 7.0710678, places=5)
+            self.assertEqual((yields["Productor B"]["count"], yields["Productor B"]["std"]), (1, 0.0))
+
+            plant = QCRollupService.summarize("all")[0]
+            self.assertEqual(plant["name"], "Planta")
+            self.assertAlmostEqual(plant["metrics"]["light_stain"]["mean"], 3.0)
+            daily = QCRollupService.daily("yieldpercentage")
+            self.assertEqual([(day, stats["count"]) for day, stats in daily], [(date(2026, 3, 10), 2)])
+
+    def test_rebuild_reproduces_the_incremental_rollups(self):
+        with app.app_context():
+            before = self._stats_by_grower("between3234")
+            QCService.create_sample_qc(
+                {key: value for key, value in _qc_payload(None, 20.0, 1).items() if key != "lot_id"}
+                | {"grower": "Externo", "brought_by": "Chofer"},
+                "images/e.jpg",
+                "images/f.jpg",
+            )
+            db.session.commit()
+            bucket_count = QCRollup.query.count()
+
+            self.assertEqual(QCRollupService.rebuild(), 3)
+            db.session.commit()
+
+            self.assertEqual(QCRollup.query.count(), bucket_count)
+            self.assertEqual(self._stats_by_grower("between3234"), before)
+            samples = QCRollupService.summarize("all", source="sample")
+            self.assertEqual(samples[0]["metrics"]["yieldpercentage"]["count"], 1)
+
+    def test_analytics_page_reads_the_rollups(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+        response = self.client.get("/qc_analytics?dimension=grower&date_from=2026-03-01&date_to=2026-03-31")
+
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn("Productor A", html)
+        self.assertIn("55.00 &plusmn; 7.07", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import unittest
+from datetime import date, time
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_query_instrumentation.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import Lot, RawMaterialPackaging, RawMaterialReception, Role, User, Variety  # noqa: E402
+from app.query_instrumentation import (  # noqa: E402
+    QueryBudgetExceeded,
+    collect_queries,
+    statement_fingerprint,
+)
+from app.services import FumigationService  # noqa: E402
+
+
+class StatementFingerprintTests(unittest.TestCase):
+    def test_expanded_in_lists_share_fingerprint(self):
+        short = statement_fingerprint("SELECT * FROM lots WHERE lots.id IN (?, ?)")
+        long = statement_fingerprint("SELECT *   FROM lots\nWHERE lots.id IN (?, ?, ?, ?, ?)")
+        self.assertEqual(short, long)
+
+    def test_literals_are_normalized(self):
+        self.assertEqual(
+            statement_fingerprint("SELECT 1 FROM lots WHERE lot_number = 15 AND name = 'A'"),
+            statement_fingerprint("SELECT 2 FROM lots WHERE lot_number = 99 AND name = 'B'"),
+        )
+
+
+class QueryInstrumentationTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, SQL_QUERY_BUDGET_STRICT=True)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            self.user_id = self._create_admin_user()
+            db.session.commit()
+
+    def _create_admin_user(self):
+        admin_role = Role(name="Admin", description="Administrador", is_active=True)
+        user = User(
+            name="Admin",
+            last_name="Queries",
+            email="admin@queries.local",
+            phone_number="123456789",
+            password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+            is_active=True,
+            is_external=False,
+        )
+        user.roles.append(admin_role)
+        db.session.add_all([admin_role, user])
+        db.session.flush()
+        return user.id
+
+    def _create_fumigated_lots(self, count):
+        variety = Variety(name="CHANDLER", is_active=True)
+        packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+        reception = RawMaterialReception(
+            waybill=500,
+            date=date.today(),
+            time=time(8, 0),
+            truck_plate="QQ1111",
+            is_open=False,
+        )
+        db.session.add_all([variety, packaging, reception])
+        db.session.flush()
+        lot_ids = []
+        for lot_number in range(1, count + 1):
+            lot = Lot(
+                lot_number=lot_number,
+                packagings_quantity=5,
+                rawmaterialreception_id=reception.id,
+                variety_id=variety.id,
+                rawmaterialpackaging_id=packaging.id,
+            )
+            db.session.add(lot)
+            db.session.flush()
+            lot_ids.append(lot.id)
+        db.session.commit()
+        for index in range(0, count, 2):
+            FumigationService.assign_fumigation(f"OT-{index}", lot_ids[index:index + 2])
+        db.session.commit()
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_collect_queries_counts_statements(self):
+        with app.app_context():
+            with collect_queries() as stats:
+                Lot.query.count()
+                Lot.query.count()
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.repeated_statements(2)[0][1], 2)
+
+    def test_response_reports_server_timing_and_logs_db_figures(self):
+        with self.assertLogs(app.logger, level="INFO") as captured:
+            response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;desc="1 queries"', response.headers["Server-Timing"])
+        self.assertIn("app;dur=", response.headers["Server-Timing"])
+        completed = [line for line in captured.output if "request_completed" in line]
+        self.assertTrue(completed)
+        self.assertIn("db_queries=1", completed[-1])
+
+    def test_list_fumigations_stays_within_budget_as_rows_grow(self):
+        with app.app_context():
+            self._create_fumigated_lots(12)
+        self._login()
+        response = self.client.get("/list_fumigations?per_page=50")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Lote 012", response.get_data(as_text=True))
+        filtered = self.client.get("/list_fumigations?status=en_fumigacion")
+        self.assertEqual(filtered.status_code, 200)
+        self.assertNotIn("OT-0", filtered.get_data(as_text=True))
+
+    def test_strict_mode_fails_when_budget_is_exceeded(self):
+        view = app.view_functions["dashboard.healthz"]
+        view.query_budget = 0
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/healthz")
+        finally:
+            del view.query_budget
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import json
+import os
+import unittest
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_scale_ingestion.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app import app, db  # noqa: E402
+from app.models import FullTruckWeight, Lot, RawMaterialPackaging, RawMaterialReception, ScaleReading, Variety  # noqa: E402
+from app.services.scale_service import (  # noqa: E402
+    ScaleReadingApplier,
+    ScaleReadingError,
+    ScaleService,
+    parse_scale_reading,
+)
+
+TOKEN = "scale-secret"
+
+
+class ScaleIngestionTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._original_token = app.config.get("SCALE_INGEST_TOKEN")
+        app.config.update(TESTING=True, SCALE_INGEST_TOKEN=TOKEN, SCALE_APPLY_IN_BACKGROUND=False)
+        self.client = app.test_client()
+        self.today = date.today()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            variety = Variety(name="SERR", is_active=True)
+            packaging = RawMaterialPackaging(name="Maxisaco", tare=2.0, is_active=True)
+            db.session.add_all([variety, packaging])
+            db.session.flush()
+            self.lot_ids = {}
+            for waybill, plate, lot_numbers in ((4001, "AB-CD12", (1,)), (4002, "XY9876", (2, 3))):
+                reception = RawMaterialReception(
+                    waybill=waybill,
+                    date=self.today,
+                    time=time(8, 0),
+                    truck_plate=plate,
+                    trucker_name="Chofer",
+                    observations="",
+                    is_open=False,
+                )
+                db.session.add(reception)
+                db.session.flush()
+                for lot_number in lot_numbers:
+                    lot = Lot(
+                        lot_number=lot_number,
+                        packagings_quantity=10,
+                        rawmaterialreception_id=reception.id,
+                        variety_id=variety.id,
+                        rawmaterialpackaging_id=packaging.id,
+                    )
+                    db.session.add(lot)
+                    db.session.flush()
+                    self.lot_ids[lot_number] = lot.id
+            db.session.commit()
+
+    def tearDown(self):
+        app.config.update(SCALE_INGEST_TOKEN=self._original_token, SCALE_APPLY_IN_BACKGROUND=False)
+
+    def _timestamp(self, hour):
+        return datetime.combine(self.today, time(hour, 0)).isoformat()
+
+    def _post(self, body, content_type, token=TOKEN):
+        return self.client.post(
+            "/api/scale/readings",
+            data=body,
+            content_type=content_type,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def test_requires_the_scale_token(self):
+        response = self._post("[]", "application/json", token="wrong")
+        self.assertEqual(response.status_code, 401)
+
+    def test_json_lines_pair_is_matched_by_plate_and_applied(self):
+        lines = [
+            {"plate": "abcd12", "timestamp": self._timestamp(9), "kind": "loaded", "weight": 1500},
+            {"plate": "ABCD12", "timestamp": self._timestamp(10), "kind": "empty", "weight": 480},
+            {"plate": "ABCD12", "kind": "empty", "weight": "x"},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\n"
+        response = self._post(body, "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 202)
+        payload = response.get_json()
+        self.assertEqual((payload["accepted"], payload["invalid"]), (2, 1))
+        self.assertEqual(payload["errors"][0]["line"], 3)
+        self.assertEqual(payload["applied"], {"applied": 2})
+        with app.app_context():
+            lot = db.session.get(Lot, self.lot_ids[1])
+            # 1500 - 480 - 10 bags x 2 kg
+            self.assertEqual(lot.net_weight, 1000.0)
+            self.assertEqual(lot.full_truck_weight.empty_truck_weight, 480.0)
+
+    def test_replayed_batch_is_ignored(self):
+        body = (
+            "plate,timestamp,kind,weight,lot_number\n"
+            f"XY9876,{self._timestamp(9)},loaded,2000,3\n"
+            f"XY9876,{self._timestamp(11)},empty,900,3\n"
+        )
+        first = self._post(body, "text/csv").get_json()
+        replay = self._post(body, "text/csv").get_json()
+
+        self.assertEqual((first["accepted"], first["duplicates"]), (2, 0))
+        self.assertEqual((replay["accepted"], replay["duplicates"]), (0, 2))
+        with app.app_context():
+            self.assertEqual(ScaleReading.query.count(), 2)
+            self.assertEqual(FullTruckWeight.query.count(), 1)
+            self.assertEqual(db.session.get(Lot, self.lot_ids[3]).net_weight, 1080.0)
+
+    def test_ambiguous_or_unknown_trucks_wait_then_expire(self):
+        old_day = datetime.combine(self.today - timedelta(days=5), time(9, 0)).isoformat()
+        readings = [
+            {"plate": "XY9876", "timestamp": self._timestamp(9), "kind": "loaded", "weight": 2000},
+            {"plate": "ZZ0000", "timestamp": old_day, "kind": "loaded", "weight": 2000},
+        ]
+        payload = self._post(json.dumps({"readings": readings}), "application/json").get_json()
+
+        self.assertEqual(payload["applied"], {"unmatched": 1})
+        with app.app_context():
+            statuses = {reading.truck_plate: (reading.status, reading.error) for reading in ScaleReading.query.all()}
+        self.assertEqual(statuses["ZZ0000"][0], "unmatched")
+        self.assertEqual(statuses["XY9876"][0], "pending")
+        self.assertIn("lot_number", statuses["XY9876"][1])
+
+    def test_background_applier_processes_stored_readings(self):
+        with app.app_context():
+            ScaleService.store_readings(
+                enumerate(
+                    [
+                        {"plate": "ABCD12", "timestamp": self._timestamp(9), "kind": "loaded", "weight": 1500},
+                        {"plate": "ABCD12", "timestamp": self._timestamp(10), "kind": "empty", "weight": 500},
+                    ],
+                    start=1,
+                )
+            )
+        applier = ScaleReadingApplier()
+        applier._app = app
+        self.assertEqual(applier.run_once(), {"applied": 2})
+        with app.app_context():
+            self.assertEqual(db.session.get(Lot, self.lot_ids[1]).net_weight, 980.0)
+
+    def test_non_finite_weights_are_invalid_and_stored_ones_do_not_block_the_queue(self):
+        for weight in ("nan", "inf", "-Infinity"):
+            record = {"plate": "ABCD12", "timestamp": self._timestamp(9), "kind": "loaded", "weight": weight}
+            with self.assertRaises(ScaleReadingError):
+                parse_scale_reading(record)
+
+        with app.app_context():
+            # A reading stored before weights were checked, next to another truck's valid pair.
+            readings = [
+                ("ABCD12", 9, "loaded", 1, None),
+                ("ABCD12", 10, "empty", 480, None),
+                ("XY9876", 9, "loaded", 2000, 3),
+                ("XY9876", 11, "empty", 900, 3),
+            ]
+            rows = [
+                parse_scale_reading(
+                    {"plate": plate, "timestamp": self._timestamp(hour), "kind": kind, "weight": weight,
+                     "lot_number": lot_number}
+                )
+                for plate, hour, kind, weight, lot_number in readings
+            ]
+            rows[0]["weight"] = float("inf")
+            ScaleService._insert_new(rows)
+            db.session.commit()
+
+            summary = ScaleService.apply_pending_readings()
+            self.assertEqual(summary, {"rejected": 2, "applied": 2})
+            statuses = {(reading.truck_plate, reading.kind): reading.status for reading in ScaleReading.query.all()}
+            self.assertEqual(statuses[("ABCD12", "loaded")], "rejected")
+            self.assertEqual(db.session.get(Lot, self.lot_ids[3]).net_weight, 1080.0)
+
+    def test_pending_batches_are_claimed_with_skip_locked_on_postgresql(self):
+        statement = ScaleService._pending_batch(0, 500).compile(dialect=postgresql.dialect())
+        self.assertTrue(str(statement).rstrip().endswith("FOR UPDATE SKIP LOCKED"))
+
+    def test_reading_key_is_stable_without_an_id(self):
+        record = {"plate": "ab-cd 12", "timestamp": "2026-03-01T09:00:00", "kind": "LOADED", "weight": "1500,5"}
+        first, second = parse_scale_reading(record), parse_scale_reading(dict(record, plate="ABCD12"))
+        self.assertEqual(first["reading_key"], second["reading_key"])
+        self.assertEqual((first["truck_plate"], first["kind"], first["weight"]), ("ABCD12", "loaded", 1500.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
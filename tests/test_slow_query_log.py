@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_slow_query_log.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app, bcrypt, db  # noqa: E402
+from app import slow_query_log  # noqa: E402
+from app.models import Lot, Role, User  # noqa: E402
+from app.slow_query_log import bind_shape, read_slow_query_entries, summarize_slow_queries  # noqa: E402
+
+
+class SlowQueryLogTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._log_path = os.path.join(self._temp_dir, "slow_queries.log")
+        self._original_config = {
+            key: app.config.get(key)
+            for key in ("SLOW_QUERY_THRESHOLD_MS", "SLOW_QUERY_LOG_PATH", "SLOW_QUERY_EXPLAIN")
+        }
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            self.user_id = self._create_admin_user()
+            db.session.commit()
+
+        slow_query_log._explained_fingerprints.clear()
+        app.config.update(
+            SLOW_QUERY_THRESHOLD_MS=0.0001,
+            SLOW_QUERY_LOG_PATH=self._log_path,
+            SLOW_QUERY_EXPLAIN=True,
+        )
+
+    def tearDown(self):
+        app.config.update(self._original_config)
+        for handler in list(slow_query_log._logger.handlers):
+            slow_query_log._logger.removeHandler(handler)
+            handler.close()
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def _create_admin_user(self):
+        admin_role = Role(name="Admin", description="Administrador", is_active=True)
+        user = User(
+            name="Admin",
+            last_name="Slow",
+            email="admin@slow.local",
+            phone_number="123456789",
+            password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+            is_active=True,
+            is_external=False,
+        )
+        user.roles.append(admin_role)
+        db.session.add_all([admin_role, user])
+        db.session.flush()
+        return user.id
+
+    def _lot_lookup_entries(self):
+        return [
+            entry
+            for entry in read_slow_query_entries(self._log_path)
+            if "FROM lots" in entry["sql"] and "lot_number" in entry["sql"]
+        ]
+
+    def test_first_occurrence_of_fingerprint_captures_query_plan(self):
+        with app.app_context():
+            Lot.query.filter(Lot.lot_number == 1).all()
+            Lot.query.filter(Lot.lot_number == 2).all()
+
+        entries = self._lot_lookup_entries()
+        self.assertEqual(len(entries), 2)
+        newest, oldest = entries
+        self.assertEqual(newest["fingerprint"], oldest["fingerprint"])
+        self.assertTrue(oldest["explain"])
+        self.assertIsNone(newest["explain"])
+        self.assertEqual(oldest["bind_shape"], ["int"])
+
+    def test_query_plan_is_captured_without_a_second_pooled_connection(self):
+        checkouts = []
+
+        def count_checkout(*_args):
+            checkouts.append(1)
+
+        with app.app_context():
+            event.listen(db.engine, "checkout", count_checkout)
+            try:
+                Lot.query.filter(Lot.lot_number == 1).all()
+                db.session.rollback()
+            finally:
+                event.remove(db.engine, "checkout", count_checkout)
+
+        self.assertEqual(len(checkouts), 1)
+        self.assertTrue(self._lot_lookup_entries()[0]["explain"])
+
+    def test_request_context_and_admin_page(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+        response = self.client.get("/admin/slow_queries", headers={"X-Request-ID": "req-slow-1"})
+        self.assertEqual(response.status_code, 200)
+
+        entries = read_slow_query_entries(self._log_path)
+        self.assertTrue(any(entry["request_id"] == "req-slow-1" for entry in entries))
+        self.assertTrue(any(entry["endpoint"] == "admin.list_slow_queries" for entry in entries))
+
+        summaries = summarize_slow_queries(entries)
+        page = self.client.get("/admin/slow_queries").get_data(as_text=True)
+        self.assertIn(summaries[0]["fingerprint"], page)
+
+    def test_bind_shape_never_contains_values(self):
+        self.assertEqual(bind_shape({"email": "a@b.cl", "id": 3}), {"email": "str", "id": "int"})
+        self.assertEqual(
+            bind_shape([(1, "x"), (2, "y")], executemany=True),
+            {"executemany": 2, "row": ["int", "str"]},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
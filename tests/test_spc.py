@@ -0,0 +1,161 @@
+import os
+import statistics
+import unittest
+from datetime import date, time
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_spc.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Grower,
+    Lot,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    Role,
+    User,
+    Variety,
+)
+from app.services.qc_service import QCService  # noqa: E402
+from app.services.spc_service import SPCService  # noqa: E402
+
+# Yield is 20% plus the extra light weight; the last subgroup and QC drift far from the rest.
+YIELDS = (50, 52, 51, 53, 50, 52, 80, 82)
+INSECT_DAMAGE = (2, 2, 3, 2, 2, 3, 2, 30)
+
+
+def _qc_payload(lot_id, day, yieldpercentage, insect_damage):
+    return {
+        "lot_id": lot_id,
+        "analyst": "Ana",
+        "date": date(2026, 3, day),
+        "time": time(8, 0),
+        "inshell_weight": 100.0,
+        "lessthan30": 10,
+        "between3032": 20,
+        "between3234": 30,
+        "between3436": 20,
+        "morethan36": 20,
+        "broken_walnut": 0,
+        "split_walnut": 0,
+        "light_stain": 0,
+        "serious_stain": 0,
+        "adhered_hull": 0,
+        "shrivel": 0,
+        "empty": 0,
+        "insect_damage": insect_damage,
+        "inactive_fungus": 0,
+        "active_fungus": 0,
+        "extra_light": float(yieldpercentage - 20),
+        "light": 10.0,
+        "light_amber": 5.0,
+        "amber": 5.0,
+        "yellow": 0.0,
+    }
+
+
+class SPCTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, SPC_SUBGROUP_SIZE=2, SPC_MIN_SUBGROUPS=2)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="SPC",
+                email="admin@spc.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            grower = Grower(name="Productor SPC", tax_id="920000001", csg_code="CSG920", is_active=True)
+            reception = RawMaterialReception(
+                waybill=6001, date=date(2026, 3, 1), time=time(7, 0), truck_plate="SPC001", is_open=False
+            )
+            reception.growers.append(grower)
+            db.session.add_all([admin_role, user, variety, packaging, grower, reception])
+            db.session.flush()
+            lot_ids = []
+            for lot_number in range(1, len(YIELDS) + 1):
+                lot = Lot(
+                    lot_number=lot_number,
+                    packagings_quantity=10,
+                    rawmaterialreception_id=reception.id,
+                    variety_id=variety.id,
+                    rawmaterialpackaging_id=packaging.id,
+                )
+                db.session.add(lot)
+                db.session.flush()
+                lot_ids.append(lot.id)
+            db.session.commit()
+            self.user_id = user.id
+            self.variety_key = str(variety.id)
+
+            for day, (lot_id, yieldpercentage, insect_damage) in enumerate(zip(lot_ids, YIELDS, INSECT_DAMAGE), 2):
+                QCService.create_lot_qc(
+                    _qc_payload(lot_id, day, yieldpercentage, insect_damage), "images/a.jpg", "images/b.jpg"
+                )
+                db.session.commit()
+
+    def test_xbar_chart_keeps_welford_statistics_and_flags_the_drifting_subgroup(self):
+        with app.app_context():
+            chart = SPCService.chart_data("variety", self.variety_key, "yieldpercentage")
+
+            self.assertEqual((chart["chart"], chart["observations"], chart["subgroups"]), ("xbar", 8, 4))
+            self.assertAlmostEqual(chart["mean"], statistics.mean(YIELDS))
+            self.assertAlmostEqual(chart["std"], statistics.stdev(YIELDS))
+            self.assertEqual([point["value"] for point in chart["points"]], [51.0, 52.0, 51.0, 81.0])
+            self.assertEqual([point["out_of_control"] for point in chart["points"]], [False, False, False, True])
+            # Points before SPC_MIN_SUBGROUPS carry no limits.
+            self.assertIsNone(chart["points"][1]["ucl"])
+            last = chart["points"][-1]
+            self.assertAlmostEqual(last["center"], (51 + 52 + 51) / 3)
+            self.assertAlmostEqual(last["ucl"], last["center"] + 1.880 * 2.0)
+            self.assertAlmostEqual(chart["limits"]["range_center"], 2.0)
+
+    def test_p_chart_flags_the_defect_spike_for_variety_and_analyst(self):
+        with app.app_context():
+            for scope, key in (("variety", self.variety_key), ("analyst", "Ana")):
+                chart = SPCService.chart_data(scope, key, "insect_damage")
+                self.assertEqual(chart["chart"], "p")
+                flagged = [point["sequence"] for point in chart["points"] if point["out_of_control"]]
+                self.assertEqual(flagged, [8])
+                self.assertAlmostEqual(chart["limits"]["center"], sum(INSECT_DAMAGE) / 800)
+
+    def test_rebuild_replays_the_same_charts(self):
+        with app.app_context():
+            before = SPCService.chart_data("analyst", "Ana", "yieldpercentage")
+            self.assertEqual(SPCService.rebuild(subgroup_size=2, min_subgroups=2), len(YIELDS))
+            db.session.commit()
+            self.assertEqual(SPCService.chart_data("analyst", "Ana", "yieldpercentage"), before)
+
+    def test_chart_endpoint(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+        response = self.client.get(f"/api/qc/spc?scope=variety&key={self.variety_key}&metric=active_fungus")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()["points"]), len(YIELDS))
+        self.assertEqual(self.client.get("/api/qc/spc?scope=variety&key=999").status_code, 404)
+        self.assertEqual(self.client.get("/api/qc/spc?metric=units").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
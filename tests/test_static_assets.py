@@ -0,0 +1,96 @@
+import gzip
+import os
+import re
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_static_assets.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, db  # noqa: E402
+from app.static_assets import AssetManifest  # noqa: E402
+
+
+class AssetManifestTests(unittest.TestCase):
+    def test_digest_follows_content_and_skips_excluded_dirs(self):
+        with tempfile.TemporaryDirectory() as static_folder:
+            Path(static_folder, "css").mkdir()
+            Path(static_folder, "pdf_cache").mkdir()
+            css_path = Path(static_folder, "css", "main.css")
+            css_path.write_text("body { color: black; }")
+            Path(static_folder, "pdf_cache", "cached.css").write_text("x")
+            Path(static_folder, "notes.txt").write_text("not fingerprinted")
+
+            manifest = AssetManifest(
+                static_folder, skip_dirs=[os.path.join(static_folder, "pdf_cache")], auto_reload=True
+            )
+            self.assertEqual(len(manifest), 1)
+            first = manifest.digest("css/main.css")
+            self.assertRegex(first, r"^[0-9a-f]{12}$")
+            self.assertIsNone(manifest.digest("notes.txt"))
+            self.assertIsNone(manifest.digest("pdf_cache/cached.css"))
+            self.assertIsNone(manifest.digest("../outside.css"))
+
+            time.sleep(0.01)
+            css_path.write_text("body { color: white; }")
+            self.assertNotEqual(manifest.digest("css/main.css"), first)
+
+
+class FingerprintedAssetRouteTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def _main_css_url(self):
+        html = self.client.get("/login").get_data(as_text=True)
+        match = re.search(r'href="(/assets/[0-9a-f]{12}/css/main\.css)"', html)
+        self.assertIsNotNone(match, "base.html should link main.css through asset_url")
+        return match.group(1)
+
+    def test_current_digest_is_cached_as_immutable(self):
+        response = self.client.get(self._main_css_url())
+        self.assertEqual(response.status_code, 200)
+        cache_control = response.cache_control
+        self.assertEqual(cache_control.max_age, 31536000)
+        self.assertTrue(cache_control.public)
+        self.assertTrue(cache_control.immutable)
+        response.close()
+
+    def test_stale_digest_serves_current_file_without_pinning_it(self):
+        response = self.client.get("/assets/000000000000/css/main.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.cache_control.no_cache)
+        self.assertFalse(response.cache_control.immutable)
+        response.close()
+
+    def test_unknown_and_escaping_paths_are_not_found(self):
+        for path in ("/assets/000000000000/css/missing.css", "/assets/000000000000/../config.py"):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_fingerprinted_assets_are_compressed(self):
+        url = self._main_css_url()
+        plain = self.client.get(url)
+        body = plain.get_data()
+        plain.close()
+        compressed = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.data), body)
+
+
+if __name__ == "__main__":
+    unittest.main()
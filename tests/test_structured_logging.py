@@ -0,0 +1,147 @@
+import io
+import json
+import logging
+import os
+import threading
+import unittest
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_structured_logging.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, bcrypt, db  # noqa: E402
+from app.metrics import registry  # noqa: E402
+from app.models import Role, User  # noqa: E402
+from app.structured_logging import (  # noqa: E402
+    BackgroundQueueHandler,
+    JsonLogFormatter,
+    RequestContextFilter,
+    request_log_sample_rate,
+)
+
+
+class _BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.unblock.wait(5)
+
+
+class BackgroundQueueHandlerTests(unittest.TestCase):
+    def _logger(self, handler):
+        logger = logging.getLogger(f"petru.test.{self.id()}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.handlers = [handler]
+        return logger
+
+    def test_records_are_written_as_json_by_the_listener(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonLogFormatter())
+        handler = BackgroundQueueHandler([target], maxsize=100)
+        handler.addFilter(RequestContextFilter())
+        logger = self._logger(handler)
+
+        logger.info("request_completed", extra={"event": "request_completed", "log_fields": {"db_ms": 1.5}})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed %s", "render")
+        handler.stop_listener()
+
+        first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+        self.assertEqual((first["message"], first["db_ms"], first["request_id"]), ("request_completed", 1.5, "-"))
+        self.assertEqual(second["message"], "failed render")
+        self.assertIn("ValueError: boom", second["exception"])
+
+    def test_full_queue_drops_and_counts_instead_of_blocking(self):
+        registry._reset()
+        blocking = _BlockingHandler()
+        handler = BackgroundQueueHandler([blocking], maxsize=1)
+        logger = self._logger(handler)
+        try:
+            for index in range(5):
+                logger.info("line %s", index)
+        finally:
+            blocking.unblock.set()
+            handler.stop_listener()
+        dropped = [value for name, _labels, value in registry.snapshot()["counters"] if name == "petru_log_records_dropped_total"]
+        self.assertGreaterEqual(dropped[0], 3)
+
+    def test_listener_is_recreated_in_a_forked_process(self):
+        stream = io.StringIO()
+        handler = BackgroundQueueHandler([logging.StreamHandler(stream)], maxsize=10)
+        logger = self._logger(handler)
+        logger.info("parent")
+        parent_queue = handler.queue
+        handler._listener_pid = -1  # what a child sees after fork: the listener belongs to another pid
+        logger.info("child")
+        handler.stop_listener()
+        self.assertIsNot(handler.queue, parent_queue)
+        self.assertIn("child", stream.getvalue())
+
+
+class RequestLogSamplingTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._original_rules = app.config.get("LOG_SAMPLE_RULES")
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Logs",
+                email="admin@logs.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            db.session.add_all([admin_role, user])
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        app.config["LOG_SAMPLE_RULES"] = self._original_rules
+
+    def _login(self):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+    def test_rules_match_endpoint_or_path_and_keep_errors(self):
+        rules = "/api/dashboard/summary:200=0.01,dashboard.healthz=0.5,bad,x=abc"
+        self.assertEqual(request_log_sample_rate(rules, "dashboard.dashboard_summary_api", "/api/dashboard/summary", 200), 0.01)
+        self.assertEqual(request_log_sample_rate(rules, "dashboard.dashboard_summary_api", "/api/dashboard/summary", 500), 1.0)
+        self.assertEqual(request_log_sample_rate(rules, "dashboard.healthz", "/healthz", 200), 0.5)
+        self.assertEqual(request_log_sample_rate(rules, "dashboard.healthz", "/healthz", 503), 1.0)
+        self.assertEqual(request_log_sample_rate("", "dashboard.index", "/", 200), 1.0)
+
+    def test_sampled_out_dashboard_polls_are_not_logged(self):
+        self._login()
+        app.config["LOG_SAMPLE_RULES"] = "/api/dashboard/summary:200=0"
+        with self.assertLogs(app.logger, level="INFO") as captured:
+            self.assertEqual(self.client.get("/api/dashboard/summary").status_code, 200)
+            self.client.get("/healthz")
+        completed = [record for record in captured.records if getattr(record, "event", None) == "request_completed"]
+        self.assertEqual([record.log_fields["path"] for record in completed], ["/healthz"])
+        self.assertIn("db_ms", completed[0].log_fields)
+
+
+if __name__ == "__main__":
+    unittest.main()
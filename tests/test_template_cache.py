@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_template_cache.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from app import app, db  # noqa: E402
+from app.metrics import registry  # noqa: E402
+from app.template_cache import install_template_cache, warm_templates  # noqa: E402
+
+
+class TemplateCacheTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._original_cache_dir = app.config["TEMPLATE_CACHE_DIR"]
+        self._original_bytecode_cache = app.jinja_env.bytecode_cache
+        app.config["TEMPLATE_CACHE_DIR"] = self._tmp.name
+        install_template_cache(app)
+        app.jinja_env.cache.clear()
+
+    def tearDown(self):
+        app.config["TEMPLATE_CACHE_DIR"] = self._original_cache_dir
+        app.jinja_env.bytecode_cache = self._original_bytecode_cache
+        app.jinja_env.cache.clear()
+        self._tmp.cleanup()
+
+    def test_warmup_compiles_every_template_into_the_shared_cache(self):
+        registry._reset()
+        result = warm_templates(app)
+
+        template_count = len(app.jinja_env.list_templates(extensions=["html"]))
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["templates"], template_count)
+        self.assertEqual(len(list(Path(self._tmp.name).glob("petru-*.cache"))), template_count)
+        gauges = {name: value for name, _labels, value in registry.snapshot()["gauges"]}
+        self.assertEqual(gauges["petru_templates_precompiled"], template_count)
+        self.assertIn("petru_template_warmup_seconds", gauges)
+
+    def test_second_worker_loads_bytecode_instead_of_compiling(self):
+        warm_templates(app)
+        app.jinja_env.cache.clear()
+        compiled = []
+        original_compile = app.jinja_env.compile
+        app.jinja_env.compile = lambda *args, **kwargs: compiled.append(args) or original_compile(*args, **kwargs)
+        try:
+            warm_templates(app)
+        finally:
+            del app.jinja_env.compile
+        self.assertEqual(compiled, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import unittest
+from datetime import date, time
+from pathlib import Path
+
+TEST_DB_PATH = Path(__file__).resolve().parent / "test_throughput.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH.as_posix()}"
+os.environ["SECRET_KEY"] = "test-secret-key"
+
+from sqlalchemy import func, select, update  # noqa: E402
+
+from app import app, bcrypt, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Client,
+    Grower,
+    Lot,
+    RawMaterialPackaging,
+    RawMaterialReception,
+    Role,
+    User,
+    Variety,
+)
+from app.services.lot_service import LotService, LotSpec, TruckWeightEntry  # noqa: E402
+from app.services.throughput_service import ThroughputService, season_start  # noqa: E402
+
+SEASON = (date(2026, 3, 1), date(2026, 3, 31))
+
+
+class ThroughputTests(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if TEST_DB_PATH.exists():
+            TEST_DB_PATH.unlink()
+
+    def setUp(self):
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            admin_role = Role(name="Admin", description="Administrador", is_active=True)
+            user = User(
+                name="Admin",
+                last_name="Reportes",
+                email="admin@reportes.local",
+                phone_number="123456789",
+                password_hash=bcrypt.generate_password_hash("secret").decode("utf-8"),
+                is_active=True,
+                is_external=False,
+            )
+            user.roles.append(admin_role)
+            variety = Variety(name="CHANDLER", is_active=True)
+            packaging = RawMaterialPackaging(name="Bins", tare=1.0, is_active=True)
+            client = Client(name="Cliente Norte", tax_id="930000001", address="Dir", comuna="Comuna", is_active=True)
+            grower_a = Grower(name="Productor A", tax_id="930000002", csg_code="CSG931", is_active=True)
+            grower_b = Grower(name="Productor B", tax_id="930000003", csg_code="CSG932", is_active=True)
+            shared = RawMaterialReception(
+                waybill=7001, date=date(2026, 3, 10), time=time(8, 0), truck_plate="TP0001", is_open=True
+            )
+            shared.clients.append(client)
+            shared.growers.extend([grower_a, grower_b])
+            last_season = RawMaterialReception(
+                waybill=6001, date=date(2025, 3, 12), time=time(8, 0), truck_plate="TP0002", is_open=True
+            )
+            last_season.clients.append(client)
+            last_season.growers.append(grower_a)
+            db.session.add_all([admin_role, user, variety, packaging, client, grower_a, grower_b, shared, last_season])
+            db.session.commit()
+            self.user_id = user.id
+
+            lots = LotService.create_lots(
+                shared,
+                [
+                    LotSpec(variety_id=variety.id, rawmaterialpackaging_id=packaging.id, packagings_quantity=10),
+                    LotSpec(variety_id=variety.id, rawmaterialpackaging_id=packaging.id, packagings_quantity=20),
+                ],
+            )
+            LotService.create_lot(last_season, variety.id, packaging.id, 12)
+            db.session.commit()
+            self.lot_ids = [lot.id for lot in lots]
+            # Net weights 490 and 480 kg.
+            LotService.register_full_truck_weights(
+                [TruckWeightEntry(self.lot_ids[0], 1000, 500), TruckWeightEntry(self.lot_ids[1], 1000, 500)]
+            )
+            db.session.commit()
+
+    def test_lots_and_weights_are_split_across_the_growers_of_a_shared_reception(self):
+        with app.app_context():
+            plant = ThroughputService.totals(*SEASON)[None]
+            self.assertEqual(plant, {"lots": 2.0, "bins": 30.0, "net_kg": 970.0})
+
+            by_grower = ThroughputService.totals(*SEASON, dimension="grower")
+            self.assertEqual([values["net_kg"] for values in by_grower.values()], [485.0, 485.0])
+
+            # Reweighing a lot only adds its difference.
+            lot = db.session.get(Lot, self.lot_ids[0])
+            LotService.register_full_truck_weight(lot, 1100, 500)
+            db.session.commit()
+            self.assertEqual(ThroughputService.totals(*SEASON)[None]["net_kg"], 1070.0)
+
+    def test_reweighing_takes_its_delta_from_the_stored_weight(self):
+        with app.app_context():
+            lot = db.session.get(Lot, self.lot_ids[0])
+            # Another request weighed the lot to 600 kg after this one loaded it at 490 kg.
+            db.session.execute(
+                update(Lot)
+                .where(Lot.id == lot.id)
+                .values(net_weight=600.0)
+                .execution_options(synchronize_session=False)
+            )
+            ThroughputService.record_net_weight_changes([(lot, 110.0)])
+            self.assertEqual(lot.net_weight, 490.0)
+
+            LotService.register_full_truck_weight(lot, 1090, 500)
+            db.session.commit()
+            stored = db.session.execute(select(func.sum(Lot.net_weight)).where(Lot.id.in_(self.lot_ids))).scalar()
+            self.assertEqual(ThroughputService.totals(*SEASON)[None]["net_kg"], stored)
+
+    def test_rebuild_matches_the_incremental_facts(self):
+        with app.app_context():
+            before = ThroughputService.totals(date(2025, 1, 1), date(2026, 12, 31), dimension="grower")
+            self.assertEqual(ThroughputService.rebuild(yield_per=2), 3)
+            db.session.commit()
+            self.assertEqual(
+                ThroughputService.totals(date(2025, 1, 1), date(2026, 12, 31), dimension="grower"), before
+            )
+
+    def test_season_to_date_report_against_the_previous_year(self):
+        self.assertEqual(season_start(date(2026, 2, 10)), date(2025, 3, 1))
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+        response = self.client.get("/api/reports/throughput?dimension=client&date_from=2026-03-01&date_to=2026-03-31")
+        self.assertEqual(response.status_code, 200)
+        payload = response.get_json()
+        self.assertEqual(payload["previous_date_from"], "2025-03-01")
+        row = payload["rows"][0]
+        self.assertEqual((row["name"], row["lots"], row["previous"]["lots"]), ("Cliente Norte", 2.0, 1.0))
+        self.assertEqual(row["previous"]["bins"], 12.0)
+
+        daily = self.client.get("/api/reports/throughput?dimension=day&date_from=2026-03-01&date_to=2026-03-31")
+        self.assertEqual(
+            [(row["day"], row["lots"], row["previous"]["lots"]) for row in daily.get_json()["rows"]],
+            [("2026-03-10", 2.0, 0.0), ("2026-03-12", 0.0, 1.0)],
+        )
+        self.assertEqual(self.client.get("/api/reports/throughput?dimension=truck").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()